@@ -1,14 +1,16 @@
 # Diario_App_FINAL.py (Código FINAL com Lógica Premium e Login)
 
 import streamlit as st
-import sqlite3 # Mantém esta importação, pois faz parte do Python nativo
-import pandas as pd
-import numpy as np
 import datetime
 import os 
-# --- NOVAS IMPORTAÇÕES PARA POSTGRESQL ---
-from sqlalchemy import create_engine
-import psycopg2
+from meu_projeto.repositorio_db import (criar_repositorio, schema_postgres_diario, schema_postgres_alertas_de_risco,
+                                        schema_postgres_ano_letivo_das_notas)
+from meu_projeto.exportacao import FORMATOS_EXPORTACAO
+from meu_projeto.arquivo_parquet import listar_anos_arquivados
+from meu_projeto.regras_avaliacao import compilar_regras
+from meu_projeto import nucleo
+from meu_projeto.nucleo import DIAS_DA_SEMANA, SQL_INCREMENTAR_VERSAO_DADOS, DDL_ANO_LETIVO_DAS_NOTAS
+# SQLAlchemy e o driver do Render só são importados quando o status premium é consultado (get_db_engine)
 
 # =========================================================================
 # 1. CONFIGURAÇÃO DE CONEXÃO E CONSTANTES
@@ -16,16 +18,41 @@ import psycopg2
 
 # A URL COMPLETA SERÁ CARREGADA DOS SECRETS DO STREAMLIT
 RENDER_DB_URL = os.environ.get("RENDER_DB_URL") 
+RENDER_CONNECT_TIMEOUT_S = 5 # Banco do Render fora do ar: falha rápido em vez de travar a página
 
 # Link do Checkout do Mercado Pago (USADO NO BOTÃO DE UPGRADE)
 MP_CHECKOUT_LINK = "https://mpago.la/19wM16s" 
 
-CORTE_FREQUENCIA = 75
-NOTA_APROVACAO_DIRETA = 7.0
-NOTA_MINIMA_P3 = 4.0
-NOTA_MINIMA_FINAL = 5.0
+# Regras de avaliação do curso (P1 e P2, com P3 de recuperação): avaliações, notas de corte e
+# recuperação declaradas em regras_avaliacao.py
+REGRAS_AVALIACAO = compilar_regras("p1_p2_recuperacao_p3")
+
+# Avaliações lançáveis (cada uma vira a coluna nota_<tipo> de ResumoAlunoDisciplina)
+TIPOS_AVALIACAO = REGRAS_AVALIACAO.tipos_avaliacao
+
+# Situações finais possíveis (filtro do relatório paginado)
+SITUACOES_FINAIS = REGRAS_AVALIACAO.situacoes_finais
+
 DB_NAME = 'diario_de_classe.db'
 
+# Banco externo opcional (postgresql://... ou sqlite:///caminho); sem ele, usa o arquivo local DB_NAME
+DB_URL = os.environ.get("DIARIO_DB_URL")
+
+# Anos letivos encerrados saem do banco e ficam em Parquet neste diretório (ver arquivar_ano_letivo)
+DIRETORIO_ARQUIVO = os.environ.get("DIARIO_ARQUIVO_DIR", "arquivo_diario")
+
+# Relatórios prontos e páginas do relatório mantidos em memória (LRU por chave de consulta)
+CACHE_RELATORIO_MAX_ENTRADAS = 128
+
+# Relatório paginado: linhas por página
+TAMANHOS_PAGINA_RELATORIO = [25, 50, 100]
+TAMANHO_PAGINA_PADRAO = 50
+
+# Cache de permissões (status premium por e-mail), em segundos; ajustável por variável de ambiente
+CACHE_ACESSO_TTL_S = int(os.environ.get("CACHE_ACESSO_TTL_S", "300"))
+CACHE_ACESSO_TTL_FALHA_S = int(os.environ.get("CACHE_ACESSO_TTL_FALHA_S", "30")) # Banco fora do ar: resposta negativa dura menos
+CACHE_ACESSO_MAX_USUARIOS = 256
+
 diario_de_classe = {
     "Alice": {},  
     "Bruno": {},
@@ -39,244 +66,431 @@ diario_de_classe = {
 @st.cache_resource
 def get_db_engine():
     """Cria e armazena o motor de conexão do Render (PostgreSQL) para reutilização."""
-    return create_engine(RENDER_DB_URL)
+    from sqlalchemy import create_engine # O driver (psycopg2) é carregado pelo próprio SQLAlchemy
+
+    return create_engine(RENDER_DB_URL, pool_pre_ping=True, connect_args={"connect_timeout": RENDER_CONNECT_TIMEOUT_S})
+
+SQL_ACESSO_PREMIUM = "SELECT acesso_premium FROM professores WHERE email = :email"
+
+# --- CACHE DE PERMISSÕES (TTL por usuário) ---
+# Evita uma ida ao Render a cada rerun do admin; o botão "Já fiz o upgrade" invalida na hora.
+
+@st.cache_resource
+def obter_cache_acessos():
+    """Cache de permissões compartilhado entre sessões (nucleo.CacheAcessos)."""
+    return nucleo.CacheAcessos(CACHE_ACESSO_TTL_S, CACHE_ACESSO_TTL_FALHA_S, CACHE_ACESSO_MAX_USUARIOS)
+
+def _consultar_acesso_premium(email_usuario):
+    from sqlalchemy import text
+
+    with get_db_engine().connect() as conn:
+        return bool(conn.execute(text(SQL_ACESSO_PREMIUM), {"email": email_usuario}).scalar())
 
 def verificar_acesso_premium(email_usuario):
-    """Consulta o banco de dados do Render para verificar o status premium do usuário."""
-    engine = get_db_engine()
-    select_query = f"SELECT acesso_premium FROM professores WHERE email = '{email_usuario}'"
-    
-    try:
-        df = pd.read_sql_query(select_query, engine)
-        
-        if not df.empty:
-            return df['acesso_premium'].iloc[0] 
-        else:
-            return False 
-            
-    except Exception as e:
-        st.sidebar.error(f"⚠️ Erro no BD. Status Básico Ativo.")
-        return False
+    """Status premium do usuário no banco do Render, com cache TTL por e-mail."""
+    is_premium, falhou = obter_cache_acessos().obter(("premium", email_usuario), lambda: _consultar_acesso_premium(email_usuario), False)
+    if falhou:
+        st.sidebar.error("⚠️ Erro no BD. Status Básico Ativo.")
+    return is_premium
 
 # =========================================================================
 # 3. FUNÇÕES DE LÓGICA E BD (SQLite) - SUAS FUNÇÕES ORIGINAIS
 # =========================================================================
 
 @st.cache_resource
-def criar_e_popular_sqlite():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("DROP TABLE IF EXISTS Frequencia")
-    cursor.execute("DROP TABLE IF EXISTS Notas")
-    cursor.execute("DROP TABLE IF EXISTS Aulas")
-    cursor.execute("DROP TABLE IF EXISTS Alunos")
-    cursor.execute("DROP TABLE IF EXISTS Disciplinas")
-    cursor.execute("DROP TABLE IF EXISTS Turmas")
-    conn.commit()
-    
-    cursor.execute('''CREATE TABLE Alunos (id_aluno INTEGER PRIMARY KEY, nome TEXT NOT NULL, matricula TEXT UNIQUE NOT NULL);''')
-    cursor.execute('''CREATE TABLE Disciplinas (id_disciplina INTEGER PRIMARY KEY, nome_disciplina TEXT UNIQUE NOT NULL);''')
-    cursor.execute('''CREATE TABLE Turmas (id_turma INTEGER PRIMARY KEY, nome_turma TEXT NOT NULL, ano_letivo INTEGER NOT NULL);''')
-    cursor.execute('''CREATE TABLE Aulas (id_aula INTEGER PRIMARY KEY, id_turma INTEGER, id_disciplina INTEGER, data_aula DATE NOT NULL, conteudo_lecionado TEXT, FOREIGN KEY (id_turma) REFERENCES Turmas(id_turma), FOREIGN KEY (id_disciplina) REFERENCES Disciplinas(id_disciplina));''')
-    cursor.execute('''CREATE TABLE Notas (id_nota INTEGER PRIMARY KEY, id_aluno INTEGER, id_disciplina INTEGER, tipo_avaliacao TEXT NOT NULL, valor_nota REAL NOT NULL, UNIQUE(id_aluno, id_disciplina, tipo_avaliacao), FOREIGN KEY (id_aluno) REFERENCES Alunos(id_aluno), FOREIGN KEY (id_disciplina) REFERENCES Disciplinas(id_disciplina));''')
-    cursor.execute('''CREATE TABLE Frequencia (id_frequencia INTEGER PRIMARY KEY, id_aula INTEGER, id_aluno INTEGER, presente BOOLEAN NOT NULL, UNIQUE(id_aula, id_aluno), FOREIGN KEY (id_aula) REFERENCES Aulas(id_aula), FOREIGN KEY (id_aluno) REFERENCES Alunos(id_aluno));''')
-    conn.commit()
-
-    aluno_map = {}; disciplina_map = {}; id_turma_padrao = 1
-    cursor.execute("REPLACE INTO Turmas (id_turma, nome_turma, ano_letivo) VALUES (?, ?, ?)", (id_turma_padrao, "Exemplo 2025/1", 2025))
+def obter_repositorio():
+    """Repositório de armazenamento (SQLite ou PostgreSQL, pool incluso), compartilhado entre reruns e sessões."""
+    return criar_repositorio(DB_URL, DB_NAME, MIGRACOES_SCHEMA, MIGRACOES_SCHEMA_POSTGRES)
+
+def conexao_db():
+    """Empresta uma conexão do repositório: commit ao sair do bloco, rollback em caso de erro."""
+    return obter_repositorio().conexao()
+
+# --- MIGRAÇÕES DE SCHEMA (versão registrada em PRAGMA user_version) ---
+# Cada migração roda uma única vez, em ordem. Nunca altere uma migração já publicada:
+# acrescente uma nova função ao final de MIGRACOES_SCHEMA. O que depende das regras de avaliação fica congelado
+# em texto literal, como foi publicado: mudar REGRAS_AVALIACAO não altera bancos já migrados.
+
+# Avaliações com coluna nota_<tipo> em ResumoAlunoDisciplina (migração 003 / PG 001)
+TIPOS_AVALIACAO_MIGRACAO_003 = ("P1", "P2", "P3")
+
+# Coluna gerada nivel_alerta (migração 006 / PG 003): 1 = reprovado por falta, 2 = abaixo da nota mínima,
+# 3 = a uma falta da reprovação, 4 = abaixo da média de aprovação
+SQL_NIVEL_ALERTA_MIGRACAO_006 = """CASE
+    WHEN total_aulas > 0 AND total_presencas * 100 < 75 * total_aulas THEN 1
+    WHEN nota_P3 IS NULL
+        AND (CASE WHEN nota_P1 IS NOT NULL THEN 1 ELSE 0 END + CASE WHEN nota_P2 IS NOT NULL THEN 1 ELSE 0 END) > 0
+        AND (COALESCE(nota_P1, 0.0) + COALESCE(nota_P2, 0.0)) < 4.0 * (CASE WHEN nota_P1 IS NOT NULL THEN 1 ELSE 0 END + CASE WHEN nota_P2 IS NOT NULL THEN 1 ELSE 0 END) THEN 2
+    WHEN total_aulas > 0 AND total_presencas * 100 < 75 * (total_aulas + 1) THEN 3
+    WHEN nota_P3 IS NULL
+        AND (CASE WHEN nota_P1 IS NOT NULL THEN 1 ELSE 0 END + CASE WHEN nota_P2 IS NOT NULL THEN 1 ELSE 0 END) > 0
+        AND (COALESCE(nota_P1, 0.0) + COALESCE(nota_P2, 0.0)) < 7.0 * (CASE WHEN nota_P1 IS NOT NULL THEN 1 ELSE 0 END + CASE WHEN nota_P2 IS NOT NULL THEN 1 ELSE 0 END) THEN 4
+END"""
+
+def _migracao_001_schema_inicial(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Alunos (id_aluno INTEGER PRIMARY KEY, nome TEXT NOT NULL, matricula TEXT UNIQUE NOT NULL);''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Disciplinas (id_disciplina INTEGER PRIMARY KEY, nome_disciplina TEXT UNIQUE NOT NULL);''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Turmas (id_turma INTEGER PRIMARY KEY, nome_turma TEXT NOT NULL, ano_letivo INTEGER NOT NULL);''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Aulas (id_aula INTEGER PRIMARY KEY, id_turma INTEGER, id_disciplina INTEGER, data_aula DATE NOT NULL, conteudo_lecionado TEXT, FOREIGN KEY (id_turma) REFERENCES Turmas(id_turma), FOREIGN KEY (id_disciplina) REFERENCES Disciplinas(id_disciplina));''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Notas (id_nota INTEGER PRIMARY KEY, id_aluno INTEGER, id_disciplina INTEGER, tipo_avaliacao TEXT NOT NULL, valor_nota REAL NOT NULL, UNIQUE(id_aluno, id_disciplina, tipo_avaliacao), FOREIGN KEY (id_aluno) REFERENCES Alunos(id_aluno), FOREIGN KEY (id_disciplina) REFERENCES Disciplinas(id_disciplina));''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Frequencia (id_frequencia INTEGER PRIMARY KEY, id_aula INTEGER, id_aluno INTEGER, presente BOOLEAN NOT NULL, UNIQUE(id_aula, id_aluno), FOREIGN KEY (id_aula) REFERENCES Aulas(id_aula), FOREIGN KEY (id_aluno) REFERENCES Alunos(id_aluno));''')
+
+def _migracao_002_indices_consultas(cursor):
+    # Índices dos caminhos quentes (ver CONSULTAS_MONITORADAS / verificar_planos_de_consulta)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_aulas_turma_disciplina_data ON Aulas (id_turma, id_disciplina, data_aula)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_aulas_disciplina ON Aulas (id_disciplina)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_frequencia_aluno_aula ON Frequencia (id_aluno, id_aula)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notas_disciplina_aluno ON Notas (id_disciplina, id_aluno)")
+
+def _migracao_003_resumo_aluno_disciplina(cursor):
+    # Resumo materializado do relatório: uma linha por (aluno, disciplina), mantida pelos gatilhos
+    cursor.execute('''CREATE TABLE IF NOT EXISTS ResumoAlunoDisciplina (id_aluno INTEGER NOT NULL, id_disciplina INTEGER NOT NULL, total_presencas INTEGER NOT NULL DEFAULT 0, total_aulas INTEGER NOT NULL DEFAULT 0, nota_P1 REAL, nota_P2 REAL, nota_P3 REAL, PRIMARY KEY (id_aluno, id_disciplina)) WITHOUT ROWID;''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumo_disciplina ON ResumoAlunoDisciplina (id_disciplina)")
+    for gatilho in nucleo.gatilhos_resumo_aluno_disciplina(TIPOS_AVALIACAO_MIGRACAO_003, por_professor=False):
+        cursor.execute(gatilho)
+    nucleo.reconstruir_resumo(cursor, TIPOS_AVALIACAO_MIGRACAO_003)
+
+def _migracao_004_versao_dados(cursor):
+    # Contador incrementado por qualquer escrita nas tabelas do diário (cache do relatório, ver nucleo.CacheRelatorio)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS VersaoDados (id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL);''')
+    cursor.execute("INSERT OR IGNORE INTO VersaoDados (id, versao) VALUES (1, 0)")
+    for tabela in ['Alunos', 'Disciplinas', 'Aulas', 'Frequencia', 'Notas']:
+        for evento in ['INSERT', 'UPDATE', 'DELETE']:
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_versao_{tabela.lower()}_{evento.lower()} AFTER {evento} ON {tabela} BEGIN {SQL_INCREMENTAR_VERSAO_DADOS}; END;")
+
+def _migracao_005_ano_letivo_das_notas(cursor):
+    # As notas ganham o próprio ano letivo: o arquivo de um ano deixa de depender das turmas
+    for comando in DDL_ANO_LETIVO_DAS_NOTAS:
+        cursor.execute(comando)
+
+def _migracao_006_alertas_de_risco(cursor):
+    # Nível de alerta de cada (aluno, disciplina): coluna gerada do resumo, recalculada só na linha que os gatilhos atualizam
+    cursor.execute(f"ALTER TABLE ResumoAlunoDisciplina ADD COLUMN nivel_alerta INTEGER GENERATED ALWAYS AS ({SQL_NIVEL_ALERTA_MIGRACAO_006}) VIRTUAL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumo_alerta ON ResumoAlunoDisciplina (nivel_alerta) WHERE nivel_alerta IS NOT NULL")
+
+MIGRACOES_SCHEMA = [
+    _migracao_001_schema_inicial,
+    _migracao_002_indices_consultas,
+    _migracao_003_resumo_aluno_disciplina,
+    _migracao_004_versao_dados,
+    _migracao_005_ano_letivo_das_notas,
+    _migracao_006_alertas_de_risco,
+]
+
+# No PostgreSQL o schema nasce direto no estado final das migrações acima (versão em VersaoSchema)
+def _migracao_pg_001_schema_completo(cursor):
+    for comando in schema_postgres_diario(TIPOS_AVALIACAO_MIGRACAO_003, com_professores=False):
+        cursor.execute(comando)
+
+def _migracao_pg_002_ano_letivo_das_notas(cursor):
+    for comando in schema_postgres_ano_letivo_das_notas():
+        cursor.execute(comando)
+
+def _migracao_pg_003_alertas_de_risco(cursor):
+    for comando in schema_postgres_alertas_de_risco(SQL_NIVEL_ALERTA_MIGRACAO_006):
+        cursor.execute(comando)
+
+MIGRACOES_SCHEMA_POSTGRES = [
+    _migracao_pg_001_schema_completo,
+    _migracao_pg_002_ano_letivo_das_notas,
+    _migracao_pg_003_alertas_de_risco,
+]
+
+# Regras vigentes x schema publicado: para na carga se as regras mudaram sem migração nova
+nucleo.conferir_schema_com_as_regras(REGRAS_AVALIACAO, TIPOS_AVALIACAO_MIGRACAO_003, SQL_NIVEL_ALERTA_MIGRACAO_006)
+
+# --- CONSULTAS DOS CAMINHOS QUENTES ---
+# Montadas em nucleo.py a partir das regras de avaliação (as mesmas dos diários com vários
+# professores, aqui sem id_professor), para que verificar_planos_de_consulta analise exatamente o SQL usado pelo app.
+
+# Lê o resumo materializado: uma busca por chave primária por (aluno, disciplina)
+SQL_RELATORIO_CONSOLIDADO = nucleo.sql_relatorio_consolidado(REGRAS_AVALIACAO, por_professor=False)
+
+# Colunas de ordenação aceitas pelo relatório paginado (rótulo na tela -> coluna da consulta)
+ORDENACOES_RELATORIO = {
+    "Aluno": '"Aluno"',
+    "Disciplina": '"Disciplina"',
+    "Nota Final": "nota_final",
+    "Frequência (%)": "frequencia",
+}
+
+# Conjunto do arquivo Parquet -> consulta que o alimenta
+CONJUNTOS_ARQUIVO = nucleo.conjuntos_arquivo(por_professor=False)
+
+# (nome, sql, parâmetros de exemplo, aliases/tabelas em que um SCAN completo é esperado)
+CONSULTAS_MONITORADAS = nucleo.consultas_monitoradas(REGRAS_AVALIACAO, 1, por_professor=False)
+
+def verificar_planos_de_consulta(conn):
+    """Regressões de plano (SCAN fora do esperado) em CONSULTAS_MONITORADAS; lista vazia = nenhuma."""
+    return nucleo.verificar_planos_de_consulta(conn, CONSULTAS_MONITORADAS)
+
+def reconstruir_resumo_relatorio():
+    """Reconstrução completa do resumo (manutenção: corrige qualquer divergência)."""
+    try:
+        nucleo.reconstruir_resumo_relatorio(obter_repositorio(), REGRAS_AVALIACAO)
+        st.success("✅ Resumo do relatório reconstruído a partir das notas e frequências.")
+        return True
+    except Exception as e:
+        st.error(f"❌ Erro ao reconstruir o resumo do relatório: {e}")
+        return False
+
+def _popular_dados_demo(cursor):
+    """Semeia turma, disciplinas e alunos de exemplo (apenas em banco vazio)."""
+    id_turma_padrao = 1
+    cursor.execute("INSERT INTO Turmas (id_turma, nome_turma, ano_letivo) VALUES (?, ?, ?) ON CONFLICT DO NOTHING", (id_turma_padrao, "Exemplo 2025/1", 2025))
     
     disciplinas_list = ["Língua Portuguesa", "Matemática", "Ciências", "História", "Geografia", "Artes"]
-    for i, disc in enumerate(disciplinas_list): 
-        cursor.execute("REPLACE INTO Disciplinas (id_disciplina, nome_disciplina) VALUES (?, ?)", (i+1, disc))
-    cursor.execute("SELECT id_disciplina, nome_disciplina FROM Disciplinas")
-    for id_disc, nome_disc in cursor.fetchall(): 
-        disciplina_map[nome_disc] = id_disc
+    cursor.executemany("INSERT INTO Disciplinas (nome_disciplina) VALUES (?) ON CONFLICT DO NOTHING",
+                       [(disc,) for disc in disciplinas_list])
     
     alunos_list = list(diario_de_classe.keys())
-    for i, aluno in enumerate(alunos_list): 
-        cursor.execute("REPLACE INTO Alunos (id_aluno, nome, matricula) VALUES (?, ?, ?)", (i+1, aluno, f"MAT{2025000 + i + 1}"))
-    cursor.execute("SELECT id_aluno, nome FROM Alunos")
-    for id_aluno, nome_aluno in cursor.fetchall(): 
-        aluno_map[nome_aluno] = id_aluno
-
-    conn.commit()
-    conn.close()
-    return aluno_map, disciplina_map
+    cursor.executemany("INSERT INTO Alunos (nome, matricula) VALUES (?, ?) ON CONFLICT DO NOTHING",
+                       [(aluno, f"MAT{2025000 + i + 1}") for i, aluno in enumerate(alunos_list)])
 
-def calcular_media_final(avaliacoes):
-    p1_val = avaliacoes.get("P1"); p2_val = avaliacoes.get("P2"); p3_val = avaliacoes.get("P3")
-    
-    p1 = float(p1_val) if pd.notna(p1_val) and p1_val is not None else 0.0
-    p2 = float(p2_val) if pd.notna(p2_val) and p2_val is not None else 0.0
-    
-    p3 = None
-    if p3_val is not None and pd.notna(p3_val): p3 = float(p3_val)
-    
-    media_parcial = (p1 + p2) / 2
-    nota_final = media_parcial
-    situacao_nota = ""
-    
-    if media_parcial >= NOTA_APROVACAO_DIRETA:
-        situacao_nota = "APROVADO POR MÉDIA"
-    elif media_parcial >= NOTA_MINIMA_P3:
-        if p3 is None: situacao_nota = "PENDENTE (AGUARDANDO P3)"
-        else:
-            media_final_com_p3 = (media_parcial + p3) / 2
-            nota_final = media_final_com_p3
-            if nota_final >= NOTA_MINIMA_FINAL: situacao_nota = "APROVADO APÓS P3"
-            else: situacao_nota = "REPROVADO POR NOTA"
-    else: situacao_nota = "REPROVADO DIRETO"
-    
-    return nota_final, situacao_nota, media_parcial
+@st.cache_resource
+def criar_e_popular_sqlite():
+    obter_repositorio().aplicar_migracoes()
+
+    with conexao_db() as conn:
+        cursor = conn.cursor()
+        banco_vazio = cursor.execute("SELECT NOT EXISTS (SELECT 1 FROM Disciplinas)").fetchone()[0]
+        if banco_vazio:
+            _popular_dados_demo(cursor)
+
+        disciplina_map = {nome_disc: id_disc for id_disc, nome_disc in cursor.execute("SELECT id_disciplina, nome_disciplina FROM Disciplinas")}
+        aluno_map = {nome_aluno: id_aluno for id_aluno, nome_aluno in cursor.execute("SELECT id_aluno, nome FROM Alunos")}
+
+    return aluno_map, disciplina_map
 
 def lancar_aula_e_frequencia(id_disciplina, data_aula, conteudo):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
     id_turma_padrao = 1
     try:
-        cursor.execute("""INSERT INTO Aulas (id_turma, id_disciplina, data_aula, conteudo_lecionado) VALUES (?, ?, ?, ?)""", (id_turma_padrao, id_disciplina, data_aula, conteudo))
-        conn.commit()
-        id_aula = cursor.lastrowid
-        
-        cursor.execute("SELECT id_aluno FROM Alunos")
-        alunos_ids = [row[0] for row in cursor.fetchall()]
-        
-        if not alunos_ids:
-            st.warning("⚠️ Alunos não encontrados no DB. Por favor, recarregue a página.")
-            return
-
-        registros_frequencia = [(id_aula, id_aluno, 1) for id_aluno in alunos_ids]
-        cursor.executemany("""INSERT INTO Frequencia (id_aula, id_aluno, presente) VALUES (?, ?, ?)""", registros_frequencia)
-        conn.commit()
-        st.success(f"✅ Aula de {conteudo} em {data_aula} lançada (ID: {id_aula}). Todos marcados como Presentes.")
+        id_aula = nucleo.lancar_aula_e_frequencia(obter_repositorio(), id_turma_padrao, id_disciplina, data_aula, conteudo)
+    except nucleo.SemAlunosCadastrados as e:
+        st.warning(f"⚠️ {e}")
+        return
     except Exception as e:
         st.error(f"❌ Erro ao lançar aula: {e}")
-    finally:
-        conn.close()
+        return
+    st.success(f"✅ Aula de {conteudo} em {data_aula} lançada (ID: {id_aula}). Todos marcados como Presentes.")
+
+def lancar_aulas_do_periodo(ids_disciplinas, data_inicio, data_fim, dias_semana, conteudo):
+    """Cria as aulas do período e a frequência padrão (ver nucleo.lancar_aulas_do_periodo). Devolve quantas aulas foram criadas."""
+    id_turma_padrao = 1
+    try:
+        aulas_criadas = nucleo.lancar_aulas_do_periodo(obter_repositorio(), id_turma_padrao, ids_disciplinas, data_inicio, data_fim, dias_semana, conteudo)
+    except nucleo.PeriodoInvalido as e:
+        st.warning(f"⚠️ {e}")
+        return 0
+    except Exception as e:
+        st.error(f"❌ Erro ao lançar as aulas do período: {e}")
+        return 0
+    st.success(f"✅ {aulas_criadas} aula(s) lançada(s) de {data_inicio:%d/%m/%Y} a {data_fim:%d/%m/%Y}. Todos marcados como Presentes.")
+    return aulas_criadas
 
 def inserir_nota_no_db(id_aluno, id_disciplina, tipo_avaliacao, valor_nota):
-    if valor_nota is None or valor_nota < 0 or valor_nota > 10.0:
-        st.warning("⚠️ Erro: Insira um valor de nota válido (0.0 a 10.0).")
-        return
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
     try:
-        cursor.execute("""REPLACE INTO Notas (id_aluno, id_disciplina, tipo_avaliacao, valor_nota) VALUES (?, ?, ?, ?)""", (id_aluno, id_disciplina, tipo_avaliacao, valor_nota))
-        conn.commit()
-        st.success(f"✅ Nota {tipo_avaliacao} ({valor_nota:.1f}) inserida/atualizada.")
+        nucleo.gravar_nota(obter_repositorio(), id_aluno, id_disciplina, tipo_avaliacao, valor_nota, TIPOS_AVALIACAO)
+    except nucleo.NotaInvalida as e:
+        st.warning(f"⚠️ {e}")
+        return
+    except nucleo.AvaliacaoInvalida as e:
+        st.error(f"❌ {e}")
+        return
     except Exception as e:
         st.error(f"❌ Erro ao inserir nota: {e}")
-    finally: conn.close()
+        return
+    st.success(f"✅ Nota {tipo_avaliacao} ({valor_nota:.1f}) inserida/atualizada.")
+
+def importar_notas_em_lote(arquivo):
+    """Importa a planilha inteira numa única transação. Devolve (notas_gravadas, df_erros) ou None."""
+    try:
+        return nucleo.importar_notas_em_lote(obter_repositorio(), arquivo, TIPOS_AVALIACAO)
+    except Exception as e:
+        st.error(f"❌ Erro ao importar planilha de notas: {e}")
+        return None
 
 def obter_frequencia_por_aula(id_disciplina, data_aula):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    """(df_chamada, id_aula) da aula, ou (None, motivo) se não há aula/frequência nessa data."""
     id_turma_padrao = 1
-    cursor.execute("""
-        SELECT id_aula FROM Aulas WHERE id_turma = ? AND id_disciplina = ? AND data_aula = ?
-    """, (id_turma_padrao, id_disciplina, data_aula)) 
-    result = cursor.fetchone()
-    
-    if not result:
-        conn.close()
-        return None, "Aula não encontrada para essa data/disciplina."
-        
-    id_aula = result[0]
-    df = pd.read_sql_query(f"""
-        SELECT 
-            A.nome AS "Aluno", 
-            F.id_frequencia,
-            F.presente 
-        FROM Frequencia F
-        JOIN Alunos A ON F.id_aluno = A.id_aluno
-        WHERE F.id_aula = {id_aula}
-        ORDER BY A.nome;
-    """, conn)
-    conn.close()
-    
-    if df.empty:
-        return None, f"Nenhum registro de frequência encontrado para a Aula ID: {id_aula}."
-        
-    df['Status Atual'] = df['presente'].apply(lambda x: 'PRESENTE ✅' if x == 1 else 'FALTA 🚫')
-    df['Opção'] = df['id_frequencia'].astype(str) + ' - ' + df['Aluno']
-    return df, id_aula
+    try:
+        return nucleo.obter_chamada_da_aula(obter_repositorio(), id_turma_padrao, id_disciplina, data_aula)
+    except nucleo.ErroDeNegocio as e:
+        return None, str(e)
 
 
 def atualizar_status_frequencia(id_frequencia, novo_status):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
     try:
-        cursor.execute("""
-            UPDATE Frequencia SET presente = ? WHERE id_frequencia = ?
-        """, (novo_status, id_frequencia))
-        conn.commit()
-        st.success(f"✅ Status de Presença Atualizado! (ID Frequência: {id_frequencia})")
+        nucleo.atualizar_presenca(obter_repositorio(), id_frequencia, novo_status)
     except Exception as e:
         st.error(f"❌ Erro ao atualizar frequência: {e}")
-    finally:
-        conn.close()
+        return
+    st.success(f"✅ Status de Presença Atualizado! (ID Frequência: {id_frequencia})")
 
-def gerar_relatorio_final_completo(): 
+def salvar_chamada_editada(df_chamada, df_grade):
+    """Compara a grade editada com a chamada carregada e grava só as presenças alteradas.
+
+    Todas as mudanças vão num único executemany (uma transação). Devolve quantas mudaram.
+    """
+    alteracoes = nucleo.presencas_alteradas(df_chamada, df_grade)
+    if not alteracoes:
+        st.info("Nenhuma presença foi alterada na grade.")
+        return 0
     try:
-        conn = sqlite3.connect(DB_NAME)
-        query_sql_completa = """
-        SELECT A.nome AS "Aluno", D.nome_disciplina AS "Disciplina", 
-            MAX(CASE WHEN N.tipo_avaliacao = 'P1' THEN N.valor_nota ELSE NULL END) AS "P1",
-            MAX(CASE WHEN N.tipo_avaliacao = 'P2' THEN N.valor_nota ELSE NULL END) AS "P2",
-            MAX(CASE WHEN N.tipo_avaliacao = 'P3' THEN N.valor_nota ELSE NULL END) AS "P3",
-            COUNT(CASE WHEN F.presente = 1 THEN 1 ELSE NULL END) AS "Total_Presencas",
-            COUNT(AU.id_aula) AS "Total_Aulas"
-        FROM Alunos A CROSS JOIN Disciplinas D 
-        LEFT JOIN Notas N ON A.id_aluno = N.id_aluno AND D.id_disciplina = N.id_disciplina
-        LEFT JOIN Aulas AU ON D.id_disciplina = AU.id_disciplina
-        LEFT JOIN Frequencia F ON A.id_aluno = F.id_aluno AND AU.id_aula = F.id_aula
-        GROUP BY A.nome, D.nome_disciplina;
-        """
-        df_relatorio = pd.read_sql_query(query_sql_completa, conn)
+        return nucleo.gravar_presencas(obter_repositorio(), alteracoes)
+    except Exception as e:
+        st.error(f"❌ Erro ao salvar a chamada: {e}")
+        return 0
 
+@st.cache_resource
+def obter_cache_relatorio():
+    """LRU de relatórios prontos compartilhado entre sessões (nucleo.CacheRelatorio)."""
+    return nucleo.CacheRelatorio(CACHE_RELATORIO_MAX_ENTRADAS)
+
+def _montar_relatorio_final(df_relatorio):
+    import pandas as pd
+
+    situacao = REGRAS_AVALIACAO.avaliar(df_relatorio)
+    return pd.DataFrame({
+        "Aluno": df_relatorio['Aluno'], "Disciplina": df_relatorio['Disciplina'],
+        **{coluna: nucleo.formatar_nota_vetorizado(df_relatorio[coluna]) for coluna in REGRAS_AVALIACAO.colunas.values()},
+        "Frequência (%)": nucleo.formatar_nota_vetorizado(situacao['frequencia_percentual']),
+        "Nota Final": nucleo.formatar_nota_vetorizado(situacao['nota_final']),
+        "Situação Final": situacao['situacao_final']
+    })
+
+def gerar_relatorio_final_completo(usuario_id=None):
+    """Relatório consolidado inteiro; SQL e pandas só rodam de novo quando VersaoDados muda.
+
+    A tela usa o relatório paginado (consultar_pagina_do_relatorio); esta função fica para o benchmark.py.
+    """
+    try:
+        df_final = nucleo.gerar_relatorio_final(obter_repositorio(), obter_cache_relatorio(), usuario_id,
+                                                SQL_RELATORIO_CONSOLIDADO, _montar_relatorio_final)
     except Exception as e:
         st.error(f"❌ ERRO FATAL na consulta SQL/Pandas. Verifique a estrutura do DB. Mensagem: {e}")
+        return None
+    if df_final is None:
+        st.info("Nenhum dado de aluno/disciplina encontrado no DB para o relatório. Verifique a inicialização.")
+    return df_final
+
+# --- ALERTAS DE RISCO (barra lateral) ---
+
+def obter_alertas_de_risco():
+    """Alunos em risco (ver nucleo.listar_alertas_de_risco); None em caso de erro."""
+    try:
+        return nucleo.listar_alertas_de_risco(obter_repositorio())
+    except Exception as e:
+        st.sidebar.error(f"❌ Erro ao consultar os alertas de risco: {e}")
+        return None
+
+def exibir_alertas_de_risco():
+    """Painel lateral com os alunos perto de reprovar, por frequência ou por nota."""
+    st.sidebar.markdown("---")
+    st.sidebar.header("🚨 Alertas de Risco")
+    df_alertas = obter_alertas_de_risco()
+    if df_alertas is None:
         return
+    if df_alertas.empty:
+        st.sidebar.success("✅ Nenhum aluno em risco no momento.")
+        return
+    # Já vem do alerta mais grave para o mais leve
+    for alerta, quantidade in df_alertas["Alerta"].value_counts(sort=False).items():
+        st.sidebar.markdown(f"{alerta}: **{quantidade}**")
+    with st.sidebar.expander(f"Ver os {len(df_alertas)} aluno(s)/disciplina(s) em risco"):
+        st.dataframe(df_alertas, hide_index=True, use_container_width=True)
 
-    if df_relatorio.empty:
-        st.info("Nenhum dado de aluno/disciplina encontrado no DB para o relatório. Verifique a inicialização.")
+# --- ARQUIVO DE ANOS LETIVOS ENCERRADOS (Parquet) ---
+
+def arquivar_ano_letivo(ano_letivo):
+    """Move as aulas, frequências e notas de um ano letivo encerrado do banco para o arquivo Parquet.
+
+    Ver nucleo.arquivar_ano_letivo. Devolve o número de aulas arquivadas (None em caso de erro ou de ano ainda em curso).
+    """
+    try:
+        aulas_arquivadas, notas_arquivadas = nucleo.arquivar_ano_letivo([obter_repositorio()], ano_letivo, DIRETORIO_ARQUIVO, CONJUNTOS_ARQUIVO)
+    except nucleo.ErroDeNegocio as e:
+        st.warning(f"⚠️ {e}")
+        return None
+    except Exception as e:
+        st.error(f"❌ Erro ao arquivar o ano letivo {ano_letivo}: {e}")
         return None
 
-    resultados_finais = []
-    for index, row in df_relatorio.iterrows():
-        total_aulas = row['Total_Aulas'] or 0; total_presencas = row['Total_Presencas'] or 0
-        frequencia_percentual = (total_presencas / total_aulas * 100) if total_aulas > 0 else 0
-        
-        avaliacoes = {"P1": row.get('P1'), "P2": row.get('P2'), "P3": row.get('P3')}
-        
-        nota_final, situacao_nota, media_parcial = calcular_media_final(avaliacoes)
-        situacao_frequencia = "REPROVADO POR FALTA" if frequencia_percentual < CORTE_FREQUENCIA else "APROVADO POR FREQUÊNCIA"
-
-        if situacao_frequencia.startswith("REPROVADO") or situacao_nota.startswith("REPROVADO"):
-            situacao_final = "REPROVADO GERAL 🔴"
-        elif situacao_nota.startswith("PENDENTE"):
-            situacao_final = "PENDENTE ⚠️"
-        else:
-            situacao_final = "APROVADO GERAL 🟢"
-
-        resultados_finais.append({
-            "Aluno": row['Aluno'], "Disciplina": row['Disciplina'],
-            "P1": f"{row['P1']:.1f}" if pd.notna(row['P1']) else '-',
-            "P2": f"{row['P2']:.1f}" if pd.notna(row['P2']) else '-',
-            "P3": f"{row['P3']:.1f}" if pd.notna(row['P3']) else '-',
-            "Frequência (%)": f"{frequencia_percentual:.1f}",
-            "Nota Final": f"{nota_final:.1f}",
-            "Situação Final": situacao_final
-        })
-
-    if not resultados_finais: st.info("Nenhum dado encontrado para o relatório.")
-    
+    if aulas_arquivadas or notas_arquivadas:
+        st.success(f"✅ Ano letivo {ano_letivo} arquivado: {aulas_arquivadas} aula(s) com as frequências e {notas_arquivadas} nota(s) movidas para o arquivo.")
+    else:
+        st.info(f"Nenhuma aula ou nota do ano letivo {ano_letivo} no banco: nada a arquivar.")
+    return aulas_arquivadas
+
+def gerar_relatorio_arquivado(ano_letivo, id_disciplina=None):
+    """Relatório consolidado de um ano letivo arquivado, lido só das partições pedidas."""
+    try:
+        return nucleo.gerar_relatorio_arquivado(DIRETORIO_ARQUIVO, REGRAS_AVALIACAO, _montar_relatorio_final, ano_letivo, id_disciplina)
+    except Exception as e:
+        st.error(f"❌ Erro ao ler o arquivo do ano letivo {ano_letivo}: {e}")
+        return None
+
+def exportar_relatorio_completo(repositorio, formato):
+    """Bytes do relatório completo em CSV, Parquet ou XLSX, lido e gravado lote a lote.
+
+    Roda no clique do download_button, fora do script: recebe o repositório
+    já resolvido e não usa comandos st.*.
+    """
+    return nucleo.exportar_relatorio_completo(repositorio, SQL_RELATORIO_CONSOLIDADO, _montar_relatorio_final, formato)
+
+def consultar_pagina_do_relatorio(id_disciplina, situacao, prefixo_nome, ordenar_por, decrescente, pagina, tamanho_pagina):
+    """Uma página do relatório (ver nucleo.consultar_pagina_do_relatorio): (df_pagina, total).
+
+    Cada página fica no cache até a próxima mudança de VersaoDados.
+    """
+    return nucleo.consultar_pagina_do_relatorio(
+        obter_repositorio(), obter_cache_relatorio(), REGRAS_AVALIACAO, _montar_relatorio_final,
+        id_disciplina, situacao, prefixo_nome, ORDENACOES_RELATORIO[ordenar_por], decrescente, pagina, tamanho_pagina,
+    )
+
+def exibir_relatorio_paginado(disciplina_map_nome):
+    """Tela do relatório: filtros e navegação por páginas, sem carregar a turma inteira."""
+    col_disc, col_sit, col_nome = st.columns(3)
+    disciplina = col_disc.selectbox("Disciplina", ["Todas"] + list(disciplina_map_nome.keys()), key="rel_filtro_disciplina")
+    situacao = col_sit.selectbox("Situação Final", ["Todas"] + SITUACOES_FINAIS, key="rel_filtro_situacao")
+    prefixo_nome = col_nome.text_input("Nome do aluno começa com", key="rel_filtro_nome").strip()
+
+    col_ordem, col_desc, col_tamanho, col_pagina = st.columns(4)
+    ordenar_por = col_ordem.selectbox("Ordenar por", list(ORDENACOES_RELATORIO.keys()), key="rel_ordenar_por")
+    decrescente = col_desc.checkbox("Ordem decrescente", key="rel_decrescente")
+    tamanho_pagina = col_tamanho.selectbox(
+        "Linhas por página", TAMANHOS_PAGINA_RELATORIO,
+        index=TAMANHOS_PAGINA_RELATORIO.index(TAMANHO_PAGINA_PADRAO), key="rel_tamanho_pagina"
+    )
+
+    # Filtro ou ordenação novos começam de novo na primeira página
+    filtros = (disciplina, situacao, prefixo_nome, ordenar_por, decrescente, tamanho_pagina)
+    if st.session_state.get("rel_filtros_anteriores") != filtros:
+        st.session_state.rel_filtros_anteriores = filtros
+        st.session_state.rel_pagina = 1
+
+    # O total vem da mesma consulta da página; a página pedida é ajustada depois se passar do fim
+    pagina = col_pagina.number_input("Página", min_value=1, step=1, key="rel_pagina")
+    try:
+        df_pagina, total = consultar_pagina_do_relatorio(
+            disciplina_map_nome.get(disciplina), None if situacao == "Todas" else situacao,
+            prefixo_nome, ordenar_por, decrescente, int(pagina), tamanho_pagina
+        )
+    except Exception as e:
+        st.error(f"❌ ERRO FATAL na consulta SQL/Pandas. Verifique a estrutura do DB. Mensagem: {e}")
+        return
+
+    total_paginas = max(1, -(-total // tamanho_pagina))
+    if total == 0:
+        st.info("Nenhuma linha do relatório atende aos filtros escolhidos.")
+        return
+    if pagina > total_paginas:
+        st.warning(f"⚠️ A página {int(pagina)} não existe; o relatório filtrado tem {total_paginas} página(s).")
+        return
+
     st.markdown("### Relatório Final Consolidado")
-    df_final = pd.DataFrame(resultados_finais)
-    st.dataframe(df_final.set_index(["Aluno", "Disciplina"]), use_container_width=True)
-    
-    return df_final
+    st.dataframe(df_pagina.set_index(["Aluno", "Disciplina"]), use_container_width=True)
+    st.caption(f"Página {int(pagina)} de {total_paginas} ({total} linhas)")
 
 
 # =========================================================================
@@ -361,6 +575,10 @@ def main():
                     """,
                     unsafe_allow_html=True
                 )
+                # Depois do pagamento, relê o status sem esperar o TTL do cache
+                if st.sidebar.button("🔄 Já fiz o upgrade", key="recarregar_acesso_premium"):
+                    obter_cache_acessos().invalidar(("premium", email_logado))
+                    st.rerun()
         # ------------------------------------------
 
         # APLICAÇÃO DA LIMITAÇÃO DE USO (AVISO LATERAL) 
@@ -370,9 +588,6 @@ def main():
             
         # 1. INICIALIZAÇÃO DO DB e Persistência
         aluno_map_nome, disciplina_map_nome = criar_e_popular_sqlite()
-        
-        aluno_map_id = {v: k for k, v in aluno_map_nome.items()}
-        disciplina_map_id = {v: k for k, v in disciplina_map_nome.items()}
 
         # -------------------------------------------------------------------------
         # 1. Lançamento de Aulas e Frequência (CRIAÇÃO LIBERADA PARA TODOS)
@@ -393,6 +608,25 @@ def main():
                 lancar_aula_e_frequencia(id_disciplina, data_input.strftime("%Y-%m-%d"), conteudo)
                 st.rerun() 
 
+        st.subheader("📆 Lançar Aulas do Período (em lote)")
+        with st.form("form_aulas_periodo"):
+            col1, col2, col3 = st.columns(3)
+            disciplinas_periodo = col1.multiselect('Disciplinas', options=list(disciplina_map_nome.keys()), key="disc_periodo")
+            data_inicio_periodo = col2.date_input('Início do Período', value=datetime.date.today(), key="inicio_periodo")
+            data_fim_periodo = col3.date_input('Fim do Período', value=datetime.date.today() + datetime.timedelta(days=120), key="fim_periodo")
+            dias_periodo = st.multiselect('Dias da Semana', options=list(DIAS_DA_SEMANA.keys()), default=['Segunda', 'Quarta'], key="dias_periodo")
+            conteudo_periodo = st.text_input('Conteúdo (igual para todas as aulas)', value="Aula regular", key="conteudo_periodo")
+
+            if st.form_submit_button("Lançar Aulas do Período e Marcar Todos Presentes"):
+                if disciplinas_periodo and dias_periodo:
+                    lancar_aulas_do_periodo(
+                        [disciplina_map_nome[nome] for nome in disciplinas_periodo],
+                        data_inicio_periodo, data_fim_periodo,
+                        [DIAS_DA_SEMANA[dia] for dia in dias_periodo], conteudo_periodo,
+                    )
+                else:
+                    st.warning("Escolha ao menos uma disciplina e um dia da semana.")
+
         # -------------------------------------------------------------------------
         # 2. Painel de Chamada (Ajuste de Faltas - BLOQUEIO CONDICIONAL)
         # -------------------------------------------------------------------------
@@ -407,7 +641,7 @@ def main():
         if st.button("Carregar Chamada da Aula"):
             df_frequencia_atual, id_aula_ou_erro = obter_frequencia_por_aula(id_disciplina_chamada, data_consulta.strftime("%Y-%m-%d"))
             
-            if isinstance(df_frequencia_atual, pd.DataFrame):
+            if df_frequencia_atual is not None:
                 st.session_state['df_chamada'] = df_frequencia_atual
                 st.session_state['id_aula'] = id_aula_ou_erro
                 st.session_state['msg_chamada'] = f"✅ Chamada Carregada (Aula ID: {id_aula_ou_erro})"
@@ -418,7 +652,27 @@ def main():
         if 'msg_chamada' in st.session_state:
             st.markdown(st.session_state['msg_chamada'])
             if st.session_state['df_chamada'] is not None and not st.session_state['df_chamada'].empty:
-                st.dataframe(st.session_state['df_chamada'][['Aluno', 'Status Atual']], hide_index=True)
+                df_chamada = st.session_state['df_chamada']
+                chave_grade = f"grade_chamada_{st.session_state['id_aula']}"
+                # Grade editável: marque/desmarque várias presenças e salve tudo de uma vez
+                df_grade = st.data_editor(
+                    df_chamada[['Aluno']].assign(Presente=df_chamada['presente'] == 1),
+                    column_config={'Presente': st.column_config.CheckboxColumn('Presente')},
+                    disabled=['Aluno'], hide_index=True, key=chave_grade
+                )
+
+                if st.button("Salvar Chamada (todas as alterações)", key="btn_salvar_grade_chamada"):
+                    if st.session_state.is_restricted:
+                        st.error("❌ A alteração de frequência está bloqueada nesta conta de demonstração (modifica dados existentes).")
+                    else:
+                        alteradas = salvar_chamada_editada(df_chamada, df_grade)
+                        if alteradas:
+                            df_chamada = df_chamada.assign(presente=df_grade['Presente'].reindex(df_chamada.index).astype(int))
+                            df_chamada['Status Atual'] = df_chamada['presente'].apply(lambda x: 'PRESENTE ✅' if x == 1 else 'FALTA 🚫')
+                            st.session_state['df_chamada'] = df_chamada
+                            st.session_state['msg_chamada'] = f"✅ {alteradas} presença(s) atualizada(s) em uma única gravação (Aula ID: {st.session_state['id_aula']})"
+                            st.session_state.pop(chave_grade, None)
+                            st.rerun()
                 st.markdown("---")
 
                 st.subheader("Alterar Status (Falta/Presença)")
@@ -457,7 +711,7 @@ def main():
             
             aluno_nome = col1.selectbox('Aluno(a)', options=list(aluno_map_nome.keys()))
             disciplina_nome = col2.selectbox('Disciplina (Nota)', options=list(disciplina_map_nome.keys()), key="disc_nota")
-            tipo_avaliacao = col3.selectbox('Avaliação', options=['P1', 'P2', 'P3'])
+            tipo_avaliacao = col3.selectbox('Avaliação', options=TIPOS_AVALIACAO)
             valor_nota = col4.number_input('Nota (0-10)', min_value=0.0, max_value=10.0, step=0.5, value=7.0)
             
             id_aluno = aluno_map_nome.get(aluno_nome)
@@ -469,27 +723,67 @@ def main():
                 inserir_nota_no_db(id_aluno, id_disciplina, tipo_avaliacao, valor_nota)
                 st.rerun()
 
+        st.subheader("📥 Importar Notas em Lote (CSV/XLSX)")
+        st.caption(f"Colunas: matrícula, disciplina, avaliação ({', '.join(TIPOS_AVALIACAO)}) e nota (0 a 10). Todas as linhas válidas são gravadas de uma vez.")
+        arquivo_notas = st.file_uploader("Planilha de notas", type=['csv', 'xlsx'], key="upload_notas")
+        if arquivo_notas is not None and st.button("Importar Notas", key="btn_importar_notas"):
+            resultado = importar_notas_em_lote(arquivo_notas)
+            if resultado is not None:
+                notas_gravadas, df_erros = resultado
+                st.success(f"✅ {notas_gravadas} nota(s) importada(s) em uma única transação.")
+                if not df_erros.empty:
+                    st.warning(f"⚠️ {len(df_erros)} linha(s) não importada(s):")
+                    st.dataframe(df_erros, hide_index=True, use_container_width=True)
+
         st.markdown("---")
 
         # -------------------------------------------------------------------------
         # 4. Relatório Consolidado (VISUALIZAÇÃO LIBERADA PARA TODOS)
         # -------------------------------------------------------------------------
         st.header("📊 Relatório Consolidado")
-        
-        df_relatorio_final = gerar_relatorio_final_completo()
-        
-        if df_relatorio_final is not None and not df_relatorio_final.empty:
-            st.markdown("---")
-            col_csv, col_spacer = st.columns([1, 4]) 
-            
-            csv_data = df_relatorio_final.to_csv(index=False).encode('utf-8')
-            col_csv.download_button(
-                label="⬇️ Gerar Conteúdo (CSV)",
-                data=csv_data,
-                file_name=f'Relatorio_Diario_Classe_{datetime.date.today()}.csv',
-                mime='text/csv',
-                key='download_csv'
-            )
+
+        exibir_relatorio_paginado(disciplina_map_nome)
+
+        st.markdown("---")
+        col_formato, col_download, col_spacer = st.columns([1, 1, 3])
+        formato_exportacao = col_formato.selectbox("Formato", list(FORMATOS_EXPORTACAO.keys()), key='formato_relatorio')
+        extensao, mime = FORMATOS_EXPORTACAO[formato_exportacao]
+        repositorio = obter_repositorio()
+        col_download.download_button(
+            label=f"⬇️ Gerar Conteúdo ({formato_exportacao})",
+            # O arquivo só é montado no clique; reruns comuns não pagam pela exportação
+            data=lambda: exportar_relatorio_completo(repositorio, formato_exportacao),
+            file_name=f'Relatorio_Diario_Classe_{datetime.date.today()}.{extensao}',
+            mime=mime,
+            key='download_relatorio'
+        )
+
+        # Anos letivos encerrados: lidos do arquivo Parquet, sem tocar no banco
+        anos_arquivados = listar_anos_arquivados(DIRETORIO_ARQUIVO, "aulas")
+        if anos_arquivados:
+            with st.expander("📦 Anos Letivos Arquivados"):
+                col_ano, col_disc_arquivo = st.columns(2)
+                ano_arquivado = col_ano.selectbox("Ano Letivo", anos_arquivados, key='ano_arquivado')
+                disciplina_arquivada = col_disc_arquivo.selectbox("Disciplina", ["Todas"] + list(disciplina_map_nome.keys()), key='disciplina_arquivada')
+                df_arquivado = gerar_relatorio_arquivado(ano_arquivado, disciplina_map_nome.get(disciplina_arquivada))
+                if df_arquivado is not None and df_arquivado.empty:
+                    st.info("Nenhum registro arquivado para esse ano/disciplina.")
+                elif df_arquivado is not None:
+                    st.dataframe(df_arquivado.set_index(["Aluno", "Disciplina"]), use_container_width=True)
+
+        if not st.session_state.is_restricted:
+            # Reconstrução completa do resumo materializado (manutenção)
+            if st.button("🛠️ Reconstruir Resumo do Relatório", key='btn_reconstruir_resumo'):
+                reconstruir_resumo_relatorio()
+
+            # Encerramento do ano letivo: aulas, frequências e notas saem do banco para o arquivo Parquet
+            col_ano_arquivar, col_btn_arquivar = st.columns([1, 2])
+            ano_a_arquivar = col_ano_arquivar.number_input("Ano letivo a arquivar", min_value=2000, max_value=datetime.date.today().year - 1, value=datetime.date.today().year - 1, step=1, key='ano_a_arquivar')
+            if col_btn_arquivar.button("📦 Arquivar Ano Letivo", key='btn_arquivar_ano'):
+                arquivar_ano_letivo(int(ano_a_arquivar))
+
+        # ALERTAS DE RISCO: desenhados por último, para já refletir o que foi gravado nas seções acima
+        exibir_alertas_de_risco()
             
     # -------------------------------------------------------------------------
     # 6. LÓGICA DE FALHA DE LOGIN
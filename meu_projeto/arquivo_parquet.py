@@ -0,0 +1,96 @@
+# arquivo_parquet.py - ARQUIVO HISTÓRICO EM PARQUET (anos letivos encerrados)
+# Os diários tiram do banco as aulas, frequências e notas de um ano letivo encerrado e gravam
+# aqui, em conjuntos Parquet particionados (estilo Hive) por ano/turma/disciplina:
+#   <diretorio>/<conjunto>/ano_letivo=2025/id_turma=1/id_disciplina=3/<lote>.parquet
+# A leitura filtra pelas partições (só os diretórios do ano/disciplina pedidos são abertos)
+# e pelas estatísticas de cada row group (ex.: id_professor) antes de trazer qualquer linha.
+# --- IMPORTS ---
+import os
+import uuid
+
+# =========================================================================
+# 1. CONSTANTES
+# =========================================================================
+
+PARTICOES_ARQUIVO = ["ano_letivo", "id_turma", "id_disciplina"]
+COMPRESSAO_ARQUIVO = "zstd"
+
+# =========================================================================
+# 2. GRAVAÇÃO
+# =========================================================================
+
+def _tabela_do_lote(df_lote, particoes):
+    import pyarrow as pa
+
+    tabela = pa.Table.from_pandas(df_lote, preserve_index=False)
+    # Coluna toda nula num lote (ex.: conteúdo em branco) viraria tipo "null" e quebraria a
+    # leitura junto com os outros arquivos; partições sempre como inteiro de 64 bits
+    schema = pa.schema([
+        campo.with_type(pa.int64()) if campo.name in particoes
+        else campo.with_type(pa.string()) if pa.types.is_null(campo.type)
+        else campo
+        for campo in tabela.schema
+    ])
+    return tabela.cast(schema)
+
+def gravar_no_arquivo(lotes, diretorio, conjunto, particoes=PARTICOES_ARQUIVO):
+    """Grava os lotes (DataFrames) no conjunto, particionado pelas colunas `particoes`.
+
+    Os arquivos novos nunca sobrescrevem os existentes. Devolve a lista de
+    caminhos gravados, para que quem chama possa desfazer a gravação
+    (remover_do_arquivo) se a transação no banco falhar.
+    """
+    import pyarrow.dataset as ds
+
+    caminhos = []
+    prefixo = uuid.uuid4().hex
+    for numero, df_lote in enumerate(lotes):
+        if df_lote.empty:
+            continue
+        tabela = _tabela_do_lote(df_lote, particoes)
+        ds.write_dataset(
+            tabela, os.path.join(diretorio, conjunto), format="parquet",
+            partitioning=particoes, partitioning_flavor="hive",
+            basename_template=f"{prefixo}-{numero}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression=COMPRESSAO_ARQUIVO),
+            file_visitor=lambda arquivo: caminhos.append(arquivo.path),
+        )
+    return caminhos
+
+def remover_do_arquivo(caminhos):
+    for caminho in caminhos:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+# =========================================================================
+# 3. LEITURA (com filtro nas partições e nos row groups)
+# =========================================================================
+
+def ler_do_arquivo(diretorio, conjunto, filtros, colunas):
+    """DataFrame com as `colunas` do conjunto que atendem a `filtros` ({coluna: valor}, todos com igualdade).
+
+    Conjunto ainda inexistente devolve um DataFrame vazio com as colunas pedidas.
+    """
+    import pandas as pd
+    import pyarrow.dataset as ds
+
+    caminho = os.path.join(diretorio, conjunto)
+    if not os.path.isdir(caminho):
+        return pd.DataFrame(columns=colunas)
+    conjunto_parquet = ds.dataset(caminho, format="parquet", partitioning="hive")
+    filtro = None
+    for coluna, valor in filtros.items():
+        condicao = ds.field(coluna) == valor
+        filtro = condicao if filtro is None else filtro & condicao
+    return conjunto_parquet.to_table(columns=colunas, filter=filtro).to_pandas()
+
+def listar_anos_arquivados(diretorio, conjunto):
+    """Anos letivos com partição no conjunto, do mais recente para o mais antigo."""
+    caminho = os.path.join(diretorio, conjunto)
+    if not os.path.isdir(caminho):
+        return []
+    return sorted(
+        (int(nome.split("=", 1)[1]) for nome in os.listdir(caminho) if nome.startswith("ano_letivo=")),
+        reverse=True,
+    )
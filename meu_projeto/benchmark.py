@@ -0,0 +1,444 @@
+# benchmark.py - BENCHMARK DOS DIÁRIOS E DO CRM (sem Streamlit rodando)
+# Gera uma instituição sintética (N alunos, M disciplinas, L aulas por disciplina, notas e
+# presenças sorteadas) num SQLite temporário, cronometra as funções mais usadas de cada app
+# em várias escalas e grava o resultado em JSON, para comparar um commit com outro:
+#   python meu_projeto/benchmark.py --escalas pequena,media --saida bench_novo.json
+#   python meu_projeto/benchmark.py --saida bench_novo.json --comparar bench_main.json
+# Com --comparar, o processo sai com código 1 se alguma função ficou mais lenta que a tolerância.
+# Cada app também tem a partida a frio medida (escala "partida"): o tempo de importação do
+# módulo num processo novo (python -X importtime) e quais módulos pesados ele já carrega.
+# --- IMPORTS ---
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+DIRETORIO_PROJETO = os.path.dirname(os.path.abspath(__file__))
+DIRETORIO_RAIZ = os.path.dirname(DIRETORIO_PROJETO)
+# Os diários importam repositorio_db como módulo solto (meu_projeto/) e o diário da raiz como pacote
+for _caminho in (DIRETORIO_PROJETO, DIRETORIO_RAIZ):
+    if _caminho not in sys.path:
+        sys.path.insert(0, _caminho)
+
+import streamlit as st
+
+# =========================================================================
+# 1. CONSTANTES
+# =========================================================================
+
+# Apps medidos: arquivo e turma padrão usada pelas funções de lançamento de cada um
+DIARIOS = {
+    "raiz": {"arquivo": os.path.join(DIRETORIO_RAIZ, "Diario_Web.final.py"), "id_turma": 1},
+    "eb": {"arquivo": os.path.join(DIRETORIO_PROJETO, "Diario_Web_final.py"), "id_turma": 1},
+    "fac": {"arquivo": os.path.join(DIRETORIO_PROJETO, "diario_faculdade.py"), "id_turma": 2},
+}
+ARQUIVO_CRM = os.path.join(DIRETORIO_PROJETO, "crm_profissional.py")
+
+# Volumes por escala. Nos diários com vários professores cada um recebe alunos/disciplinas/aulas
+# próprios; o diário da raiz não separa por professor e usa só o primeiro.
+ESCALAS = {
+    "pequena": {"professores": 1, "alunos": 40, "disciplinas": 6, "aulas": 40, "clientes": 50, "sessoes": 500},
+    "media": {"professores": 2, "alunos": 300, "disciplinas": 8, "aulas": 80, "clientes": 500, "sessoes": 10_000},
+    "grande": {"professores": 3, "alunos": 800, "disciplinas": 10, "aulas": 100, "clientes": 5_000, "sessoes": 200_000},
+}
+ESCALAS_PADRAO = ["pequena", "media"]
+
+# Distribuições da instituição sintética
+PERFIL_PADRAO = {
+    "presenca_media": 0.85,      # Taxa média de presença (cada aluno sorteia a sua numa Beta com essa média)
+    "nota_media": 6.5,
+    "nota_desvio": 2.0,
+    "prob_nota_ausente": 0.1,    # Chance de uma avaliação ainda não ter sido lançada
+    "semente": 2026,
+}
+
+STATUS_PAGAMENTO_CRM = ["Pago", "Pendente", "Cancelado"]
+PROB_STATUS_PAGAMENTO_CRM = [0.7, 0.25, 0.05]
+
+REPETICOES_PADRAO = 5
+# Módulos que a tela de login não deve carregar (só os caminhos que precisam deles importam)
+MODULOS_PESADOS = ["pandas", "numpy", "sqlalchemy", "psycopg", "psycopg2", "pyarrow", "openpyxl"]
+TOLERANCIA_REGRESSAO = 1.25 # Mediana nova / mediana anterior acima disso conta como regressão
+LOTE_INSERCAO = 50_000
+
+# =========================================================================
+# 2. CARGA DOS APPS (sem executar main())
+# =========================================================================
+
+def carregar_app(caminho, nome_modulo):
+    spec = importlib.util.spec_from_file_location(nome_modulo, caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def _multi_professor(modulo):
+    return hasattr(modulo, "obter_repositorio_do_professor")
+
+def _apontar_para_banco(modulo, caminho_db):
+    """Faz o app usar um SQLite novo em caminho_db, descartando repositórios e caches já criados."""
+    modulo.DB_URL = f"sqlite:///{caminho_db}"
+    if _multi_professor(modulo):
+        modulo.BANCO_POR_PROFESSOR = False
+    st.cache_resource.clear()
+    modulo.obter_repositorio().aplicar_migracoes()
+
+# =========================================================================
+# 3. INSTITUIÇÃO SINTÉTICA (carga em massa)
+# =========================================================================
+
+def _inserir_em_lotes(conn, sql, linhas):
+    for inicio in range(0, len(linhas), LOTE_INSERCAO):
+        conn.executemany(sql, linhas[inicio:inicio + LOTE_INSERCAO])
+
+def gerar_instituicao_sintetica(modulo, id_turma, professores, alunos, disciplinas, aulas, perfil=PERFIL_PADRAO):
+    """Preenche o banco do diário com dados sintéticos. Devolve os ids e datas usados nas medições.
+
+    Os ids são atribuídos aqui (aluno, disciplina e aula de cada professor em faixas
+    contíguas) e tudo vai numa única transação, com os gatilhos do resumo ativos.
+    """
+    rng = np.random.default_rng(perfil["semente"])
+    multi_professor = _multi_professor(modulo)
+    if not multi_professor:
+        professores = 1
+    tipos = modulo.TIPOS_AVALIACAO
+    ano = datetime.date.today().year
+    datas = [(datetime.date(ano, 2, 1) + datetime.timedelta(days=dia)).strftime("%Y-%m-%d") for dia in range(aulas)]
+    concentracao = 10.0
+    media = perfil["presenca_media"]
+
+    por_professor = {}
+    with modulo.conexao_db() as conn:
+        conn.execute("INSERT INTO Turmas (id_turma, nome_turma, ano_letivo) VALUES (?, ?, ?)", (id_turma, "Turma Sintética", ano))
+        id_aula = 0
+        for indice in range(professores):
+            id_professor = indice + 1
+            ids_alunos = list(range(indice * alunos + 1, (indice + 1) * alunos + 1))
+            ids_disciplinas = list(range(indice * disciplinas + 1, (indice + 1) * disciplinas + 1))
+            if multi_professor:
+                conn.execute("INSERT INTO Professores (id_professor, usuario, senha, nome_completo, is_admin, data_expiracao) VALUES (?, ?, ?, ?, ?, ?)",
+                             (id_professor, f"bench_{id_professor}", "Senha123", f"Professor Sintético {id_professor}", 0, None))
+                conn.executemany("INSERT INTO Alunos (id_aluno, id_professor, nome, matricula) VALUES (?, ?, ?, ?)",
+                                 [(id_aluno, id_professor, f"Aluno {id_aluno:06d}", f"BENCH{id_aluno:06d}") for id_aluno in ids_alunos])
+                conn.executemany("INSERT INTO Disciplinas (id_disciplina, id_professor, nome_disciplina) VALUES (?, ?, ?)",
+                                 [(id_disc, id_professor, f"Disciplina {id_disc:03d}") for id_disc in ids_disciplinas])
+            else:
+                conn.executemany("INSERT INTO Alunos (id_aluno, nome, matricula) VALUES (?, ?, ?)",
+                                 [(id_aluno, f"Aluno {id_aluno:06d}", f"BENCH{id_aluno:06d}") for id_aluno in ids_alunos])
+                conn.executemany("INSERT INTO Disciplinas (id_disciplina, nome_disciplina) VALUES (?, ?)",
+                                 [(id_disc, f"Disciplina {id_disc:03d}") for id_disc in ids_disciplinas])
+
+            # Cada aluno tem a sua taxa de presença; cada chamada é um sorteio com essa taxa
+            taxa_presenca = rng.beta(media * concentracao, (1 - media) * concentracao, size=alunos)
+            for id_disciplina in ids_disciplinas:
+                ids_aulas = list(range(id_aula + 1, id_aula + aulas + 1))
+                id_aula += aulas
+                conn.executemany("INSERT INTO Aulas (id_aula, id_turma, id_disciplina, data_aula, conteudo_lecionado) VALUES (?, ?, ?, ?, ?)",
+                                 [(aula, id_turma, id_disciplina, data, "Conteúdo sintético") for aula, data in zip(ids_aulas, datas)])
+                presente = (rng.random((aulas, alunos)) < taxa_presenca).astype(int)
+                _inserir_em_lotes(conn, "INSERT INTO Frequencia (id_aula, id_aluno, presente) VALUES (?, ?, ?)",
+                                  [(aula, id_aluno, int(presente[i, j])) for i, aula in enumerate(ids_aulas) for j, id_aluno in enumerate(ids_alunos)])
+
+                notas = np.clip(rng.normal(perfil["nota_media"], perfil["nota_desvio"], size=(alunos, len(tipos))), 0.0, 10.0).round(1)
+                lancada = rng.random((alunos, len(tipos))) >= perfil["prob_nota_ausente"]
+                conn.executemany("INSERT INTO Notas (id_aluno, id_disciplina, tipo_avaliacao, valor_nota) VALUES (?, ?, ?, ?)",
+                                 [(id_aluno, id_disciplina, tipo, float(notas[j, k]))
+                                  for j, id_aluno in enumerate(ids_alunos) for k, tipo in enumerate(tipos) if lancada[j, k]])
+
+            por_professor[id_professor] = {"ids_alunos": ids_alunos, "ids_disciplinas": ids_disciplinas, "datas": datas}
+    return por_professor
+
+def gerar_crm_sintetico(modulo, clientes, sessoes, perfil=PERFIL_PADRAO):
+    """Preenche o banco do CRM com clientes e sessões sintéticos (valores log-normais, status sorteado)."""
+    rng = np.random.default_rng(perfil["semente"])
+    hoje = datetime.date.today()
+    with modulo.conexao_db() as conn:
+        conn.executemany("INSERT INTO Clientes (id_cliente, nome_cliente, contato_principal, data_cadastro) VALUES (?, ?, ?, ?)",
+                         [(id_cliente, f"Cliente {id_cliente:06d}", f"cliente{id_cliente}@email.com", hoje.strftime("%Y-%m-%d"))
+                          for id_cliente in range(1, clientes + 1)])
+        id_clientes = rng.integers(1, clientes + 1, size=sessoes)
+        dias_atras = rng.integers(0, 365, size=sessoes)
+        valores = rng.lognormal(mean=5.3, sigma=0.6, size=sessoes).round(2)
+        status = rng.choice(STATUS_PAGAMENTO_CRM, p=PROB_STATUS_PAGAMENTO_CRM, size=sessoes)
+        _inserir_em_lotes(conn, "INSERT INTO Sessoes_Atividades (id_cliente, data_servico, descricao_servico, valor_cobrado, status_pagamento) VALUES (?, ?, ?, ?, ?)",
+                          [(int(id_clientes[i]), (hoje - datetime.timedelta(days=int(dias_atras[i]))).strftime("%Y-%m-%d"),
+                            "Sessão sintética", float(valores[i]), str(status[i])) for i in range(sessoes)])
+
+# =========================================================================
+# 4. MEDIÇÃO
+# =========================================================================
+
+def medir(funcao, repeticoes, preparar=None):
+    """Executa funcao(n) `repeticoes` vezes e devolve as estatísticas em milissegundos.
+
+    `preparar(n)` roda antes de cada execução, fora do tempo medido.
+    """
+    tempos = []
+    for numero in range(repeticoes):
+        if preparar is not None:
+            preparar(numero)
+        inicio = time.perf_counter()
+        funcao(numero)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return _estatisticas(tempos, repeticoes)
+
+def _estatisticas(tempos, repeticoes):
+    return {
+        "repeticoes": repeticoes,
+        "min_ms": round(min(tempos), 3),
+        "mediana_ms": round(statistics.median(tempos), 3),
+        "media_ms": round(statistics.fmean(tempos), 3),
+        "max_ms": round(max(tempos), 3),
+    }
+
+def _contar(modulo, tabela):
+    with modulo.conexao_db() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+def medir_diario(modulo, id_turma, volumes, repeticoes, perfil=PERFIL_PADRAO):
+    """Carga sintética + tempos das funções quentes do diário, medidas no primeiro professor."""
+    inicio = time.perf_counter()
+    dados = gerar_instituicao_sintetica(modulo, id_turma, volumes["professores"], volumes["alunos"], volumes["disciplinas"], volumes["aulas"], perfil)
+    carga_s = time.perf_counter() - inicio
+
+    id_professor = 1
+    dados_professor = dados[id_professor]
+    # Diários com vários professores: as funções da tela são as de interface_diario, que recebem o app e o professor
+    if _multi_professor(modulo):
+        import interface_diario as app
+        prefixo = (modulo, id_professor)
+    else:
+        app, prefixo = modulo, ()
+    rng = np.random.default_rng(perfil["semente"])
+    ids_alunos, ids_disciplinas, datas = dados_professor["ids_alunos"], dados_professor["ids_disciplinas"], dados_professor["datas"]
+    linhas_relatorio = len(ids_alunos) * len(ids_disciplinas)
+
+    def relatorio(_):
+        df = app.gerar_relatorio_final_completo(*prefixo)
+        if df is None or len(df) != linhas_relatorio:
+            raise RuntimeError(f"Relatório com {0 if df is None else len(df)} linhas; esperado {linhas_relatorio}.")
+
+    def chamada(numero):
+        df, _ = app.obter_frequencia_por_aula(*prefixo, ids_disciplinas[numero % len(ids_disciplinas)], datas[numero % len(datas)])
+        if df is None:
+            raise RuntimeError("Chamada da aula sintética não encontrada.")
+
+    def nota(numero):
+        app.inserir_nota_no_db(*prefixo, int(rng.choice(ids_alunos)), ids_disciplinas[numero % len(ids_disciplinas)],
+                               modulo.TIPOS_AVALIACAO[0], float(rng.integers(0, 101)) / 10)
+
+    data_extra = datetime.date.fromisoformat(datas[-1])
+    def aula(numero):
+        data_aula = (data_extra + datetime.timedelta(days=numero + 1)).strftime("%Y-%m-%d")
+        app.lancar_aula_e_frequencia(*prefixo, ids_disciplinas[0], data_aula, "Aula do benchmark")
+
+    funcoes = {}
+    funcoes["gerar_relatorio_final_completo"] = medir(relatorio, repeticoes, preparar=lambda _: modulo.obter_cache_relatorio.clear())
+    modulo.obter_cache_relatorio.clear()
+    relatorio(0)
+    funcoes["gerar_relatorio_final_completo[cache]"] = medir(relatorio, repeticoes)
+    funcoes["obter_frequencia_por_aula"] = medir(chamada, repeticoes)
+    funcoes["inserir_nota_no_db"] = medir(nota, repeticoes)
+
+    aulas_antes = _contar(modulo, "Aulas")
+    funcoes["lancar_aula_e_frequencia"] = medir(aula, repeticoes)
+    if _contar(modulo, "Aulas") != aulas_antes + repeticoes:
+        raise RuntimeError("lancar_aula_e_frequencia não gravou as aulas do benchmark.")
+
+    if hasattr(app, "remover_aluno_db"):
+        alunos_antes = _contar(modulo, "Alunos")
+        a_remover = ids_alunos[-repeticoes:]
+        funcoes["remover_aluno_db"] = medir(lambda numero: app.remover_aluno_db(*prefixo, a_remover[numero], f"Aluno {a_remover[numero]:06d}"), repeticoes)
+        if _contar(modulo, "Alunos") != alunos_antes - len(a_remover):
+            raise RuntimeError("remover_aluno_db não removeu os alunos do benchmark.")
+
+    return {"carga_s": round(carga_s, 3), "funcoes": funcoes}
+
+def medir_crm(modulo, volumes, repeticoes, perfil=PERFIL_PADRAO):
+    inicio = time.perf_counter()
+    gerar_crm_sintetico(modulo, volumes["clientes"], volumes["sessoes"], perfil)
+    carga_s = time.perf_counter() - inicio
+
+    hoje = datetime.date.today().strftime("%Y-%m-%d")
+    sessoes_antes = _contar(modulo, "Sessoes_Atividades")
+    funcoes = {"inserir_sessao_no_db": medir(
+        lambda numero: modulo.inserir_sessao_no_db(numero % volumes["clientes"] + 1, hoje, "Sessão do benchmark", 150.0, "Pendente"), repeticoes)}
+    if _contar(modulo, "Sessoes_Atividades") != sessoes_antes + repeticoes:
+        raise RuntimeError("inserir_sessao_no_db não gravou as sessões do benchmark.")
+    # Lê só o agregado FaturamentoClienteMes: não deve crescer com o número de sessões
+    funcoes["painel_de_faturamento"] = medir(lambda numero: modulo.obter_painel_de_faturamento(modulo.MESES_PAINEL_FATURAMENTO), repeticoes)
+    # Índice de busca: só os melhores resultados saem do banco, qualquer que seja o número de clientes
+    funcoes["buscar_clientes"] = medir(lambda numero: modulo.buscar_clientes(f"cliente {numero % volumes['clientes'] + 1}"), repeticoes)
+    # Contas a receber sem o cache: a agregação inteira sobre o índice parcial das pendentes
+    funcoes["envelhecimento_de_recebiveis"] = medir(lambda numero: modulo.obter_envelhecimento_de_recebiveis(), repeticoes,
+                                                    preparar=lambda _: modulo.obter_cache_recebiveis().limpar())
+    return {"carga_s": round(carga_s, 3), "funcoes": funcoes}
+
+# Carrega o app (sem main()) num processo novo e lista os módulos pesados já importados
+_SCRIPT_PARTIDA = """
+import importlib.util, json, sys
+sys.path[:0] = {caminhos!r}
+spec = importlib.util.spec_from_file_location("app_partida", {arquivo!r})
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(json.dumps([nome for nome in {pesados!r} if nome in sys.modules]))
+"""
+
+def _importacao_ms(saida_importtime):
+    """Soma dos tempos cumulativos dos imports de primeiro nível na saída de -X importtime."""
+    total_us = 0
+    for linha in saida_importtime.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        _, cumulativo, modulo = linha.split("|")
+        # Submódulos vêm com recuo extra e já estão somados no cumulativo de quem os importou
+        if cumulativo.strip().isdigit() and not modulo.startswith("  "):
+            total_us += int(cumulativo)
+    return total_us / 1000
+
+def medir_partida(arquivo, repeticoes):
+    """Tempo de importação do app num processo novo (partida a frio) e os MODULOS_PESADOS que ele carrega."""
+    script = _SCRIPT_PARTIDA.format(caminhos=[DIRETORIO_PROJETO, DIRETORIO_RAIZ], arquivo=arquivo, pesados=MODULOS_PESADOS)
+    tempos = []
+    with tempfile.TemporaryDirectory(prefix="bench_partida_") as diretorio: # Nenhum banco cai no diretório atual
+        for _ in range(repeticoes):
+            processo = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=diretorio,
+                                      capture_output=True, text=True, check=True)
+            tempos.append(_importacao_ms(processo.stderr))
+    modulos_pesados = json.loads(processo.stdout.strip().splitlines()[-1])
+    return {"funcoes": {"importacao_do_app": _estatisticas(tempos, repeticoes)}, "modulos_pesados": modulos_pesados}
+
+def executar_benchmark(nomes_escalas, nomes_apps, repeticoes, escalas=ESCALAS, perfil=PERFIL_PADRAO):
+    """Roda cada app em cada escala, num SQLite novo por combinação. Devolve o dicionário do JSON."""
+    resultados = []
+    for nome_app in nomes_apps:
+        partida = medir_partida(ARQUIVO_CRM if nome_app == "crm" else DIARIOS[nome_app]["arquivo"], repeticoes)
+        resultados.append({"app": nome_app, "escala": "partida", **partida})
+        print(f"{nome_app:>4} {'partida':<12} importação {partida['funcoes']['importacao_do_app']['mediana_ms']:.0f}ms  "
+              f"módulos pesados: {', '.join(partida['modulos_pesados']) or 'nenhum'}")
+
+    with tempfile.TemporaryDirectory(prefix="bench_diario_") as diretorio:
+        for nome_app in nomes_apps:
+            if nome_app == "crm":
+                modulo = carregar_app(ARQUIVO_CRM, "bench_crm")
+            else:
+                modulo = carregar_app(DIARIOS[nome_app]["arquivo"], f"bench_diario_{nome_app}")
+            for nome_escala in nomes_escalas:
+                volumes = escalas[nome_escala]
+                _apontar_para_banco(modulo, os.path.join(diretorio, f"{nome_app}_{nome_escala}.db"))
+                if nome_app == "crm":
+                    medicao = medir_crm(modulo, volumes, repeticoes, perfil)
+                else:
+                    medicao = medir_diario(modulo, DIARIOS[nome_app]["id_turma"], volumes, repeticoes, perfil)
+                resultados.append({"app": nome_app, "escala": nome_escala, "volumes": volumes, **medicao})
+                print(f"{nome_app:>4} {nome_escala:<12} carga {medicao['carga_s']:.1f}s  " +
+                      "  ".join(f"{nome}={estat['mediana_ms']:.1f}ms" for nome, estat in medicao["funcoes"].items()))
+    return {
+        "gerado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "perfil": perfil,
+        "resultados": resultados,
+    }
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRETORIO_RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# =========================================================================
+# 5. COMPARAÇÃO ENTRE EXECUÇÕES
+# =========================================================================
+
+def comparar_resultados(atual, anterior, tolerancia=TOLERANCIA_REGRESSAO):
+    """Lista (app, escala, função, mediana anterior, mediana atual, razão) das funções que pioraram além da tolerância."""
+    medianas_anteriores = {
+        (item["app"], item["escala"], nome): estat["mediana_ms"]
+        for item in anterior["resultados"] for nome, estat in item["funcoes"].items()
+    }
+    regressoes = []
+    for item in atual["resultados"]:
+        for nome, estat in item["funcoes"].items():
+            mediana_anterior = medianas_anteriores.get((item["app"], item["escala"], nome))
+            if not mediana_anterior:
+                continue
+            razao = estat["mediana_ms"] / mediana_anterior
+            if razao > tolerancia:
+                regressoes.append((item["app"], item["escala"], nome, mediana_anterior, estat["mediana_ms"], round(razao, 2)))
+    return regressoes
+
+def comparar_modulos_pesados(atual, anterior):
+    """Lista (app, módulos) dos MODULOS_PESADOS que a partida do app passou a carregar."""
+    carregados_antes = {item["app"]: set(item["modulos_pesados"]) for item in anterior["resultados"] if "modulos_pesados" in item}
+    novos = []
+    for item in atual["resultados"]:
+        if item["app"] in carregados_antes and "modulos_pesados" in item:
+            modulos = sorted(set(item["modulos_pesados"]) - carregados_antes[item["app"]])
+            if modulos:
+                novos.append((item["app"], modulos))
+    return novos
+
+# =========================================================================
+# 6. LINHA DE COMANDO
+# =========================================================================
+
+def _ler_argumentos(argv):
+    parser = argparse.ArgumentParser(description="Benchmark dos diários e do CRM com dados sintéticos.")
+    parser.add_argument("--escalas", default=",".join(ESCALAS_PADRAO), help=f"Escalas separadas por vírgula ({', '.join(ESCALAS)}, personalizada).")
+    parser.add_argument("--apps", default=",".join([*DIARIOS, "crm"]), help="Apps separados por vírgula (raiz, eb, fac, crm).")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES_PADRAO)
+    parser.add_argument("--saida", default="benchmark.json", help="Arquivo JSON com o resultado.")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior; sai com código 1 se houver regressão.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_REGRESSAO)
+    # Escala "personalizada": parte da escala pequena e troca só os volumes informados
+    for volume in ESCALAS["pequena"]:
+        parser.add_argument(f"--{volume}", type=int)
+    for parametro, padrao in PERFIL_PADRAO.items():
+        parser.add_argument(f"--{parametro.replace('_', '-')}", type=type(padrao), default=padrao)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = _ler_argumentos(argv)
+    escalas = dict(ESCALAS)
+    escalas["personalizada"] = {volume: getattr(args, volume) or padrao for volume, padrao in ESCALAS["pequena"].items()}
+    nomes_escalas = args.escalas.split(",")
+    nomes_apps = args.apps.split(",")
+    desconhecidas = [nome for nome in nomes_escalas if nome not in escalas] + [nome for nome in nomes_apps if nome not in [*DIARIOS, "crm"]]
+    if desconhecidas:
+        sys.exit(f"Escala/app desconhecido: {', '.join(desconhecidas)}")
+    if args.repeticoes < 1:
+        sys.exit("--repeticoes deve ser pelo menos 1.")
+    perfil = {parametro: getattr(args, parametro) for parametro in PERFIL_PADRAO}
+
+    resultado = executar_benchmark(nomes_escalas, nomes_apps, args.repeticoes, escalas, perfil)
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultado gravado em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        regressoes = comparar_resultados(resultado, anterior, args.tolerancia)
+        for app, escala, funcao, antes, depois, razao in regressoes:
+            print(f"REGRESSÃO {app}/{escala}/{funcao}: {antes:.1f}ms -> {depois:.1f}ms ({razao}x)")
+        modulos_novos = comparar_modulos_pesados(resultado, anterior)
+        for app, modulos in modulos_novos:
+            print(f"REGRESSÃO {app}/partida: passou a importar {', '.join(modulos)}")
+        if regressoes or modulos_novos:
+            sys.exit(1)
+        print(f"Sem regressões acima de {args.tolerancia}x em relação a {args.comparar} (commit {anterior.get('commit')}).")
+
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore") # Avisos de "missing ScriptRunContext" do Streamlit em modo bare
+    main()
@@ -1,10 +1,11 @@
 # crm_profissional.py - MINI-CRM PARA PROFISSIONAIS LIBERAIS
 # --- IMPORTS ---
 import streamlit as st
-import pandas as pd
-import numpy as np
-import sqlite3 
 import datetime
+import os
+from repositorio_db import criar_repositorio, schema_postgres_faturamento_crm, schema_postgres_busca_clientes, schema_postgres_recebiveis_crm
+from exportacao import FORMATOS_EXPORTACAO, exportar_em_lotes
+import nucleo
 
 # =========================================================================
 # 1. CONFIGURAÇÃO DE CONEXÃO E CONSTANTES
@@ -12,15 +13,25 @@ import datetime
 
 DB_NAME = 'CRM_PROFISSIONAL.db'
 
+# Banco externo opcional (postgresql://... ou sqlite:///caminho); sem ele, usa o arquivo local DB_NAME
+DB_URL = os.environ.get('CRM_DB_URL')
+
+# Painel de faturamento: janela do Dashboard, quantos maiores clientes e períodos do Relatório
+MESES_PAINEL_FATURAMENTO = 12
+MAIORES_CLIENTES_PAINEL = 10
+PERIODOS_RELATORIO_MESES = [6, 12, 24, 36]
+
+# Busca de clientes: quantos resultados a lista de seleção mostra por vez
+RESULTADOS_BUSCA_CLIENTES = 20
+
+# Contas a receber: relatórios guardados (um por dia; a versão dos recebíveis invalida os antigos)
+CACHE_RECEBIVEIS_MAX_ENTRADAS = 4
+
 # =========================================================================
-# 2. FUNÇÃO DE CRIAÇÃO E POPULAÇÃO DO DB (SQLite)
+# 2. FUNÇÃO DE CRIAÇÃO E POPULAÇÃO DO DB (SQLite ou PostgreSQL)
 # =========================================================================
 
-@st.cache_resource
-def criar_e_popular_sqlite():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
+def _migracao_001_schema_inicial(cursor):
     # 1. TABELA CLIENTES (Quem?)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS Clientes (
@@ -30,7 +41,7 @@ def criar_e_popular_sqlite():
             data_cadastro DATE NOT NULL
         );
     ''')
-    
+
     # 2. TABELA SESSOES_ATIVIDADES (Quando? Quanto?)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS Sessoes_Atividades (
@@ -43,111 +54,420 @@ def criar_e_popular_sqlite():
             FOREIGN KEY (id_cliente) REFERENCES Clientes(id_cliente)
         );
     ''')
-    
-    # --- POPULANDO DADOS INICIAIS (DEMO) ---
+
+# As migrações abaixo são texto literal, como foram publicadas: nada nelas vem de constantes do módulo,
+# então mexer no código do CRM nunca muda o que uma migração já aplicada criou. Mudou o schema? Migração nova.
+
+def _migracao_002_faturamento_agregado(cursor):
+    # Faturamento agregado, mantido pelos gatilhos: o Dashboard e o Relatório leem daqui, nunca de Sessoes_Atividades.
+    # Por cliente e mês (extrato do cliente), por mês (gráfico e totais) e por cliente (maiores clientes)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS FaturamentoClienteMes (id_cliente INTEGER NOT NULL, mes TEXT NOT NULL, status_pagamento TEXT NOT NULL, total_sessoes INTEGER NOT NULL, valor_total REAL NOT NULL, PRIMARY KEY (id_cliente, mes, status_pagamento)) WITHOUT ROWID;''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS FaturamentoMes (mes TEXT NOT NULL, status_pagamento TEXT NOT NULL, total_sessoes INTEGER NOT NULL, valor_total REAL NOT NULL, PRIMARY KEY (mes, status_pagamento)) WITHOUT ROWID;''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS FaturamentoCliente (id_cliente INTEGER NOT NULL, status_pagamento TEXT NOT NULL, total_sessoes INTEGER NOT NULL, valor_total REAL NOT NULL, PRIMARY KEY (id_cliente, status_pagamento)) WITHOUT ROWID;''')
+    cursor.execute("DELETE FROM FaturamentoClienteMes")
+    cursor.execute('''
+        INSERT INTO FaturamentoClienteMes (id_cliente, mes, status_pagamento, total_sessoes, valor_total)
+        SELECT S.id_cliente, strftime('%Y-%m', S.data_servico), S.status_pagamento, COUNT(*), SUM(COALESCE(S.valor_cobrado, 0))
+        FROM Sessoes_Atividades S GROUP BY S.id_cliente, strftime('%Y-%m', S.data_servico), S.status_pagamento
+    ''')
+    cursor.execute("DELETE FROM FaturamentoMes")
+    cursor.execute('''
+        INSERT INTO FaturamentoMes (mes, status_pagamento, total_sessoes, valor_total)
+        SELECT strftime('%Y-%m', S.data_servico), S.status_pagamento, COUNT(*), SUM(COALESCE(S.valor_cobrado, 0))
+        FROM Sessoes_Atividades S GROUP BY strftime('%Y-%m', S.data_servico), S.status_pagamento
+    ''')
+    cursor.execute("DELETE FROM FaturamentoCliente")
+    cursor.execute('''
+        INSERT INTO FaturamentoCliente (id_cliente, status_pagamento, total_sessoes, valor_total)
+        SELECT S.id_cliente, S.status_pagamento, COUNT(*), SUM(COALESCE(S.valor_cobrado, 0))
+        FROM Sessoes_Atividades S GROUP BY S.id_cliente, S.status_pagamento
+    ''')
+    # Maiores clientes: os primeiros do índice (status, valor), sem ordenar todos os clientes
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_faturamento_cliente_valor ON FaturamentoCliente (status_pagamento, valor_total)")
+
+    # Gatilhos: cada escrita em Sessoes_Atividades atualiza os três agregados na mesma transação
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_faturamento_sessao_inserida AFTER INSERT ON Sessoes_Atividades BEGIN
+        INSERT INTO FaturamentoClienteMes (id_cliente, mes, status_pagamento, total_sessoes, valor_total)
+        VALUES (NEW.id_cliente, strftime('%Y-%m', NEW.data_servico), NEW.status_pagamento, 1, COALESCE(NEW.valor_cobrado, 0))
+        ON CONFLICT (id_cliente, mes, status_pagamento) DO UPDATE SET
+            total_sessoes = total_sessoes + 1, valor_total = valor_total + excluded.valor_total;
+        INSERT INTO FaturamentoMes (mes, status_pagamento, total_sessoes, valor_total)
+        VALUES (strftime('%Y-%m', NEW.data_servico), NEW.status_pagamento, 1, COALESCE(NEW.valor_cobrado, 0))
+        ON CONFLICT (mes, status_pagamento) DO UPDATE SET
+            total_sessoes = total_sessoes + 1, valor_total = valor_total + excluded.valor_total;
+        INSERT INTO FaturamentoCliente (id_cliente, status_pagamento, total_sessoes, valor_total)
+        VALUES (NEW.id_cliente, NEW.status_pagamento, 1, COALESCE(NEW.valor_cobrado, 0))
+        ON CONFLICT (id_cliente, status_pagamento) DO UPDATE SET
+            total_sessoes = total_sessoes + 1, valor_total = valor_total + excluded.valor_total;
+    END;''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_faturamento_sessao_removida AFTER DELETE ON Sessoes_Atividades BEGIN
+        UPDATE FaturamentoClienteMes SET total_sessoes = total_sessoes - 1, valor_total = valor_total - COALESCE(OLD.valor_cobrado, 0)
+        WHERE id_cliente = OLD.id_cliente AND mes = strftime('%Y-%m', OLD.data_servico) AND status_pagamento = OLD.status_pagamento;
+        DELETE FROM FaturamentoClienteMes WHERE id_cliente = OLD.id_cliente AND mes = strftime('%Y-%m', OLD.data_servico) AND status_pagamento = OLD.status_pagamento AND total_sessoes = 0;
+        UPDATE FaturamentoMes SET total_sessoes = total_sessoes - 1, valor_total = valor_total - COALESCE(OLD.valor_cobrado, 0)
+        WHERE mes = strftime('%Y-%m', OLD.data_servico) AND status_pagamento = OLD.status_pagamento;
+        DELETE FROM FaturamentoMes WHERE mes = strftime('%Y-%m', OLD.data_servico) AND status_pagamento = OLD.status_pagamento AND total_sessoes = 0;
+        UPDATE FaturamentoCliente SET total_sessoes = total_sessoes - 1, valor_total = valor_total - COALESCE(OLD.valor_cobrado, 0)
+        WHERE id_cliente = OLD.id_cliente AND status_pagamento = OLD.status_pagamento;
+        DELETE FROM FaturamentoCliente WHERE id_cliente = OLD.id_cliente AND status_pagamento = OLD.status_pagamento AND total_sessoes = 0;
+    END;''')
+    # Alteração = sai das chaves antigas (OLD) e entra nas novas (NEW)
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_faturamento_sessao_alterada
+    AFTER UPDATE OF id_cliente, data_servico, valor_cobrado, status_pagamento ON Sessoes_Atividades BEGIN
+        UPDATE FaturamentoClienteMes SET total_sessoes = total_sessoes - 1, valor_total = valor_total - COALESCE(OLD.valor_cobrado, 0)
+        WHERE id_cliente = OLD.id_cliente AND mes = strftime('%Y-%m', OLD.data_servico) AND status_pagamento = OLD.status_pagamento;
+        DELETE FROM FaturamentoClienteMes WHERE id_cliente = OLD.id_cliente AND mes = strftime('%Y-%m', OLD.data_servico) AND status_pagamento = OLD.status_pagamento AND total_sessoes = 0;
+        UPDATE FaturamentoMes SET total_sessoes = total_sessoes - 1, valor_total = valor_total - COALESCE(OLD.valor_cobrado, 0)
+        WHERE mes = strftime('%Y-%m', OLD.data_servico) AND status_pagamento = OLD.status_pagamento;
+        DELETE FROM FaturamentoMes WHERE mes = strftime('%Y-%m', OLD.data_servico) AND status_pagamento = OLD.status_pagamento AND total_sessoes = 0;
+        UPDATE FaturamentoCliente SET total_sessoes = total_sessoes - 1, valor_total = valor_total - COALESCE(OLD.valor_cobrado, 0)
+        WHERE id_cliente = OLD.id_cliente AND status_pagamento = OLD.status_pagamento;
+        DELETE FROM FaturamentoCliente WHERE id_cliente = OLD.id_cliente AND status_pagamento = OLD.status_pagamento AND total_sessoes = 0;
+        INSERT INTO FaturamentoClienteMes (id_cliente, mes, status_pagamento, total_sessoes, valor_total)
+        VALUES (NEW.id_cliente, strftime('%Y-%m', NEW.data_servico), NEW.status_pagamento, 1, COALESCE(NEW.valor_cobrado, 0))
+        ON CONFLICT (id_cliente, mes, status_pagamento) DO UPDATE SET
+            total_sessoes = total_sessoes + 1, valor_total = valor_total + excluded.valor_total;
+        INSERT INTO FaturamentoMes (mes, status_pagamento, total_sessoes, valor_total)
+        VALUES (strftime('%Y-%m', NEW.data_servico), NEW.status_pagamento, 1, COALESCE(NEW.valor_cobrado, 0))
+        ON CONFLICT (mes, status_pagamento) DO UPDATE SET
+            total_sessoes = total_sessoes + 1, valor_total = valor_total + excluded.valor_total;
+        INSERT INTO FaturamentoCliente (id_cliente, status_pagamento, total_sessoes, valor_total)
+        VALUES (NEW.id_cliente, NEW.status_pagamento, 1, COALESCE(NEW.valor_cobrado, 0))
+        ON CONFLICT (id_cliente, status_pagamento) DO UPDATE SET
+            total_sessoes = total_sessoes + 1, valor_total = valor_total + excluded.valor_total;
+    END;''')
+
+def _migracao_003_chave_natural_sessoes(cursor):
+    # Sessões repetidas (ex.: sementes da demo regravadas a cada partida a frio) saem antes do índice único;
+    # fica a primeira de cada grupo (os gatilhos descontam as demais do faturamento)
+    cursor.execute('''
+        DELETE FROM Sessoes_Atividades WHERE id_sessao NOT IN (
+            SELECT MIN(id_sessao) FROM Sessoes_Atividades
+            GROUP BY id_cliente, data_servico, COALESCE(descricao_servico, ''), COALESCE(valor_cobrado, -1)
+        )
+    ''')
+    # Chave natural da sessão (cliente, data, descrição, valor): o índice único torna a importação idempotente
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sessoes_chave_natural
+        ON Sessoes_Atividades (id_cliente, data_servico, (COALESCE(descricao_servico, '')), (COALESCE(valor_cobrado, -1)))
+    ''')
+
+def _migracao_004_busca_clientes(cursor):
+    # Índice FTS5 de conteúdo externo (só o índice invertido; o texto continua em Clientes)
+    cursor.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS ClientesBusca USING fts5(
+        nome_cliente, contato_principal, content='Clientes', content_rowid='id_cliente',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')""")
+    cursor.execute("INSERT INTO ClientesBusca (ClientesBusca) VALUES ('rebuild')")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_nome ON Clientes (nome_cliente)")
+    # Gatilhos: ClientesBusca acompanha Clientes na mesma transação de cada escrita
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_busca_cliente_inserido AFTER INSERT ON Clientes BEGIN
+        INSERT INTO ClientesBusca (rowid, nome_cliente, contato_principal) VALUES (NEW.id_cliente, NEW.nome_cliente, NEW.contato_principal);
+    END;''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_busca_cliente_removido AFTER DELETE ON Clientes BEGIN
+        INSERT INTO ClientesBusca (ClientesBusca, rowid, nome_cliente, contato_principal) VALUES ('delete', OLD.id_cliente, OLD.nome_cliente, OLD.contato_principal);
+    END;''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_busca_cliente_alterado
+    AFTER UPDATE OF id_cliente, nome_cliente, contato_principal ON Clientes BEGIN
+        INSERT INTO ClientesBusca (ClientesBusca, rowid, nome_cliente, contato_principal) VALUES ('delete', OLD.id_cliente, OLD.nome_cliente, OLD.contato_principal);
+        INSERT INTO ClientesBusca (rowid, nome_cliente, contato_principal) VALUES (NEW.id_cliente, NEW.nome_cliente, NEW.contato_principal);
+    END;''')
+
+def _migracao_005_contas_a_receber(cursor):
+    # Contas a receber: índice parcial só com as sessões pendentes, cobrindo tudo que o relatório lê
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sessoes_pendentes
+        ON Sessoes_Atividades (id_cliente, data_servico, valor_cobrado)
+        WHERE status_pagamento = 'Pendente'
+    ''')
+    cursor.execute("CREATE TABLE IF NOT EXISTS VersaoRecebiveis (id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL)")
+    cursor.execute("INSERT OR IGNORE INTO VersaoRecebiveis (id, versao) VALUES (1, 0)")
+    # Gatilhos: a versão sobe a cada escrita que mexe numa sessão pendente (ou no nome do cliente)
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_recebiveis_sessao_inserida AFTER INSERT ON Sessoes_Atividades
+    WHEN NEW.status_pagamento = 'Pendente' BEGIN
+        UPDATE VersaoRecebiveis SET versao = versao + 1 WHERE id = 1;
+    END;''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_recebiveis_sessao_removida AFTER DELETE ON Sessoes_Atividades
+    WHEN OLD.status_pagamento = 'Pendente' BEGIN
+        UPDATE VersaoRecebiveis SET versao = versao + 1 WHERE id = 1;
+    END;''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_recebiveis_sessao_alterada
+    AFTER UPDATE OF id_cliente, data_servico, valor_cobrado, status_pagamento ON Sessoes_Atividades
+    WHEN 'Pendente' IN (OLD.status_pagamento, NEW.status_pagamento) BEGIN
+        UPDATE VersaoRecebiveis SET versao = versao + 1 WHERE id = 1;
+    END;''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS trg_recebiveis_cliente_renomeado AFTER UPDATE OF nome_cliente ON Clientes BEGIN
+        UPDATE VersaoRecebiveis SET versao = versao + 1 WHERE id = 1;
+    END;''')
+
+def _migracao_pg_001_schema_inicial(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Clientes (id_cliente SERIAL PRIMARY KEY, nome_cliente TEXT NOT NULL, contato_principal TEXT, data_cadastro DATE NOT NULL)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Sessoes_Atividades (id_sessao SERIAL PRIMARY KEY, id_cliente INTEGER NOT NULL REFERENCES Clientes(id_cliente), data_servico DATE NOT NULL, descricao_servico TEXT, valor_cobrado DOUBLE PRECISION, status_pagamento TEXT NOT NULL)''')
+
+def _migracao_pg_002_faturamento_agregado(cursor):
+    for comando in schema_postgres_faturamento_crm():
+        cursor.execute(comando)
+
+def _migracao_pg_003_chave_natural_sessoes(cursor):
+    # Mesmo SQL da migração SQLite 003
+    cursor.execute('''
+        DELETE FROM Sessoes_Atividades WHERE id_sessao NOT IN (
+            SELECT MIN(id_sessao) FROM Sessoes_Atividades
+            GROUP BY id_cliente, data_servico, COALESCE(descricao_servico, ''), COALESCE(valor_cobrado, -1)
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sessoes_chave_natural
+        ON Sessoes_Atividades (id_cliente, data_servico, (COALESCE(descricao_servico, '')), (COALESCE(valor_cobrado, -1)))
+    ''')
+
+def _migracao_pg_004_busca_clientes(cursor):
+    for comando in schema_postgres_busca_clientes():
+        cursor.execute(comando)
+
+def _migracao_pg_005_contas_a_receber(cursor):
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sessoes_pendentes
+        ON Sessoes_Atividades (id_cliente, data_servico, valor_cobrado)
+        WHERE status_pagamento = 'Pendente'
+    ''')
+    for comando in schema_postgres_recebiveis_crm():
+        cursor.execute(comando)
+
+# Ordem importa: a posição na lista (1, 2, ...) é a versão gravada no banco
+MIGRACOES_SCHEMA = [
+    _migracao_001_schema_inicial,
+    _migracao_002_faturamento_agregado,
+    _migracao_003_chave_natural_sessoes,
+    _migracao_004_busca_clientes,
+    _migracao_005_contas_a_receber,
+]
+MIGRACOES_SCHEMA_POSTGRES = [
+    _migracao_pg_001_schema_inicial,
+    _migracao_pg_002_faturamento_agregado,
+    _migracao_pg_003_chave_natural_sessoes,
+    _migracao_pg_004_busca_clientes,
+    _migracao_pg_005_contas_a_receber,
+]
+
+@st.cache_resource
+def obter_repositorio():
+    """Repositório de armazenamento (pool de conexões incluso), compartilhado entre reruns e sessões."""
+    return criar_repositorio(DB_URL, DB_NAME, MIGRACOES_SCHEMA, MIGRACOES_SCHEMA_POSTGRES)
+
+def conexao_db():
+    """Empresta uma conexão do repositório: commit ao sair do bloco, rollback em caso de erro."""
+    return obter_repositorio().conexao()
+
+def _popular_dados_demo(conn):
+    """Semeia clientes e sessões de exemplo (apenas em banco vazio)."""
     hoje = datetime.date.today().strftime('%Y-%m-%d')
-    
+
     # Clientes Demo
     clientes_demo = [
         ("Advogado Marcos", "marcos.adv@email.com", hoje),
         ("Psicóloga Ana", "ana.psi@email.com", hoje),
         ("Consultor Pedro", "pedro.consultor@email.com", hoje),
     ]
-    cursor.executemany("INSERT OR IGNORE INTO Clientes (nome_cliente, contato_principal, data_cadastro) VALUES (?, ?, ?)", clientes_demo)
-    
-    # Sessões Demo
-    # Assumindo IDs de cliente 1, 2, 3
+    ids_clientes = [conn.inserir_e_obter_id("INSERT INTO Clientes (nome_cliente, contato_principal, data_cadastro) VALUES (?, ?, ?)", cliente, "id_cliente")
+                    for cliente in clientes_demo]
+
+    # Sessões Demo (uma por cliente, na ordem acima)
     sessoes_demo = [
-        (1, hoje, "Consulta Inicial - Direito", 350.00, "Pago"),
-        (2, hoje, "Sessão Terapia Semanal", 150.00, "Pendente"),
-        (3, hoje, "Reunião de Escopo Projeto X", 800.00, "Pago"),
+        ("Consulta Inicial - Direito", 350.00, "Pago"),
+        ("Sessão Terapia Semanal", 150.00, "Pendente"),
+        ("Reunião de Escopo Projeto X", 800.00, "Pago"),
     ]
-    cursor.executemany("INSERT OR IGNORE INTO Sessoes_Atividades (id_cliente, data_servico, descricao_servico, valor_cobrado, status_pagamento) VALUES (?, ?, ?, ?, ?)", sessoes_demo)
-    
-    conn.commit()
-    conn.close()
-    st.info("✅ Estrutura do Banco de Dados criada e populada com sucesso!")
-    
-    # Retorna o mapa de clientes para uso na interface
-    conn = sqlite3.connect(DB_NAME)
-    df_clientes = pd.read_sql_query("SELECT id_cliente, nome_cliente FROM Clientes", conn)
-    conn.close()
-    return {nome: id for id, nome in df_clientes[['id_cliente', 'nome_cliente']].values}
-
-# =========================================================================
-# 3. FUNÇÃO PRINCIPAL DO STREAMLIT (Interface)
-# =========================================================================
+    conn.executemany(nucleo.SQL_IMPORTAR_SESSAO, [(id_cliente, hoje, *sessao) for id_cliente, sessao in zip(ids_clientes, sessoes_demo)])
 
-def main():
-    st.set_page_config(layout="wide")
-    st.title("💼 Mini-CRM: Gestão de Clientes e Atividades")
-    st.markdown("---")
-
-    # Chama a função para criar o DB e obter o mapa de clientes
-    cliente_mapa = criar_e_popular_sqlite() 
-    
-    # Interface inicial de demonstração
-    st.header("Visão Geral (Dashboard)")
-    st.write(f"Clientes cadastrados: **{len(cliente_mapa)}**")
-    
-    st.markdown("---")
-    
-    # Placeholder para a próxima etapa: Cadastrar Clientes
-    st.header("Próxima Etapa: Cadastrar Nova Atividade/Sessão")
+@st.cache_resource
+def criar_e_popular_sqlite():
+    obter_repositorio().aplicar_migracoes()
 
+    with conexao_db() as conn:
+        banco_vazio = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM Clientes)").fetchone()[0]
+        if banco_vazio:
+            _popular_dados_demo(conn)
 
-if __name__ == "__main__":
-    main()
+    st.info("✅ Estrutura do Banco de Dados criada e populada com sucesso!")
 
+# =========================================================================
+# 3. SESSÕES E FATURAMENTO
+# =========================================================================
 
 # --- FUNÇÃO DE INSERÇÃO DE DADOS ---
 def inserir_sessao_no_db(id_cliente, data_servico, descricao, valor, status):
-    """Insere um novo registro na tabela Sessoes_Atividades."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    """Insere um novo registro na tabela Sessoes_Atividades.
+
+    Os gatilhos atualizam os agregados de faturamento (migração 002) na mesma transação do INSERT.
+    """
     try:
-        cursor.execute(
-            """
-            INSERT INTO Sessoes_Atividades 
-            (id_cliente, data_servico, descricao_servico, valor_cobrado, status_pagamento) 
-            VALUES (?, ?, ?, ?, ?)
-            """, 
-            (id_cliente, data_servico, descricao, valor, status)
-        )
-        conn.commit()
+        nucleo.inserir_sessao(obter_repositorio(), id_cliente, data_servico, descricao, valor, status)
         st.success("✅ Sessão/Atividade registrada com sucesso!")
         return True
+    except nucleo.SessaoInvalida as e:
+        st.error(f"❌ {e}")
+        return False
     except Exception as e:
         st.error(f"❌ Erro ao registrar sessão: {e}")
         return False
-    finally:
-        conn.close()
 
-# --- FUNÇÃO DE INSERÇÃO DE DADOS ---
-def inserir_sessao_no_db(id_cliente, data_servico, descricao, valor, status):
-    """Insere um novo registro na tabela Sessoes_Atividades."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+def importar_sessoes_em_lote(arquivo, status_padrao):
+    """Importa o arquivo numa única transação. Devolve (sessoes_novas, sessoes_ja_registradas, df_erros) ou None."""
     try:
-        cursor.execute(
-            """
-            INSERT INTO Sessoes_Atividades 
-            (id_cliente, data_servico, descricao_servico, valor_cobrado, status_pagamento) 
-            VALUES (?, ?, ?, ?, ?)
-            """, 
-            (id_cliente, data_servico, descricao, valor, status)
-        )
-        conn.commit()
-        st.success("✅ Sessão/Atividade registrada com sucesso!")
-        return True
+        return nucleo.importar_sessoes_em_lote(obter_repositorio(), arquivo, status_padrao)
     except Exception as e:
-        st.error(f"❌ Erro ao registrar sessão: {e}")
-        return False
-    finally:
-        conn.close()
+        st.error(f"❌ Erro ao importar sessões: {e}")
+        return None
+
+# --- BUSCA DE CLIENTES (índice ClientesBusca; só os melhores resultados chegam à página) ---
+
+def buscar_clientes(texto, limite=RESULTADOS_BUSCA_CLIENTES):
+    """Ver nucleo.buscar_clientes; None em caso de erro."""
+    try:
+        return nucleo.buscar_clientes(obter_repositorio(), texto, limite)
+    except Exception as e:
+        st.error(f"❌ Erro ao buscar clientes: {e}")
+        return None
+
+def selecionar_cliente(chave, rotulo="Cliente"):
+    """Campo de busca (atualiza enquanto se digita) e lista com os clientes encontrados.
+
+    Devolve (id_cliente, nome_cliente) do cliente escolhido, ou (None, None).
+    """
+    texto = st.text_input(f"Buscar {rotulo.lower()} (nome ou contato)", type="search", live=True, key=f"busca_{chave}")
+    df_clientes = buscar_clientes(texto)
+    if df_clientes is None:
+        return None, None
+    if df_clientes.empty:
+        st.info("Nenhum cliente encontrado para essa busca.")
+        return None, None
+    nomes = dict(zip(df_clientes["id_cliente"], df_clientes["nome_cliente"]))
+    rotulos = {id_cliente: f"{nome} ({contato})" if contato else nome
+               for id_cliente, nome, contato in df_clientes[["id_cliente", "nome_cliente", "contato_principal"]].itertuples(index=False)}
+    id_cliente = st.selectbox(rotulo, options=list(rotulos), format_func=rotulos.get, key=chave)
+    return id_cliente, nomes[id_cliente]
+
+# --- PAINEL DE FATURAMENTO (lê só os agregados de faturamento da migração 002) ---
+
+def formatar_moeda(valor):
+    """R$ no formato brasileiro (1.234,56)."""
+    return "R$ " + f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def obter_painel_de_faturamento(meses, maiores_clientes=MAIORES_CLIENTES_PAINEL):
+    """Ver nucleo.painel_de_faturamento; None em caso de erro."""
+    try:
+        return nucleo.painel_de_faturamento(obter_repositorio(), meses, maiores_clientes)
+    except Exception as e:
+        st.error(f"❌ Erro ao consultar o faturamento: {e}")
+        return None
+
+def exibir_dashboard_faturamento():
+    st.header("📊 Dashboard - Visão Geral")
+    painel = obter_painel_de_faturamento(MESES_PAINEL_FATURAMENTO)
+    if painel is None:
+        return
+    st.write(f"Clientes cadastrados: **{painel['total_clientes']}**")
+    if painel["por_status"].empty:
+        st.info("Nenhuma sessão registrada ainda. Lance a primeira na aba Lançamento.")
+        return
+
+    # Totais de todo o histórico por status de pagamento
+    colunas = st.columns(len(painel["por_status"]))
+    for coluna, linha in zip(colunas, painel["por_status"].itertuples()):
+        coluna.metric(f"Total {linha.status_pagamento}", formatar_moeda(linha.valor_total), f"{int(linha.total_sessoes)} sessões", delta_color="off")
+
+    st.subheader(f"💰 Faturamento por Mês (últimos {MESES_PAINEL_FATURAMENTO} meses)")
+    if painel["por_mes"].empty:
+        st.info("Nenhuma sessão no período.")
+    else:
+        st.bar_chart(painel["por_mes"].pivot(index="mes", columns="status_pagamento", values="valor_total").fillna(0.0))
+
+    st.subheader("🏆 Maiores Clientes (valor pago, todo o histórico)")
+    df_clientes = painel["maiores_clientes"].rename(columns={"total_sessoes": "Sessões Pagas", "valor_total": "Valor Pago"})
+    df_clientes["Valor Pago"] = df_clientes["Valor Pago"].map(formatar_moeda)
+    st.dataframe(df_clientes, hide_index=True, use_container_width=True)
+
+def _tabela_mensal(df_por_mes):
+    """Uma linha por mês: valor por status de pagamento e o total do mês (em R$)."""
+    df_mensal = df_por_mes.pivot(index="mes", columns="status_pagamento", values="valor_total").fillna(0.0)
+    df_mensal["Total"] = df_mensal.sum(axis=1)
+    df_mensal.index.name, df_mensal.columns.name = "Mês", None
+    return df_mensal.map(formatar_moeda)
+
+def exibir_relatorio_faturamento():
+    st.header("📈 Relatórios Financeiros")
+    meses = st.selectbox("Período (meses)", PERIODOS_RELATORIO_MESES,
+                         index=PERIODOS_RELATORIO_MESES.index(MESES_PAINEL_FATURAMENTO), key="periodo_relatorio_crm")
+    painel = obter_painel_de_faturamento(meses)
+    if painel is None:
+        return
+    if painel["por_mes"].empty:
+        st.info("Nenhuma sessão no período escolhido.")
+    else:
+        st.subheader("Faturamento Mensal")
+        st.dataframe(_tabela_mensal(painel["por_mes"]), use_container_width=True)
+
+    st.subheader("Extrato por Cliente")
+    id_cliente, cliente_nome = selecionar_cliente("cliente_extrato_crm")
+    if id_cliente is None:
+        return
+    try:
+        df_extrato = nucleo.extrato_do_cliente(obter_repositorio(), id_cliente, meses)
+    except Exception as e:
+        st.error(f"❌ Erro ao consultar o extrato do cliente: {e}")
+        return
+    if df_extrato.empty:
+        st.info(f"Nenhuma sessão de {cliente_nome} no período escolhido.")
+    else:
+        st.dataframe(_tabela_mensal(df_extrato), use_container_width=True)
+
+# --- CONTAS A RECEBER (sessões pendentes por faixa de atraso) ---
+
+@st.cache_resource
+def obter_cache_recebiveis():
+    """Relatórios de contas a receber já calculados, compartilhados entre sessões."""
+    return nucleo.CacheRelatorio(CACHE_RECEBIVEIS_MAX_ENTRADAS)
+
+def obter_envelhecimento_de_recebiveis():
+    """Ver nucleo.envelhecimento_de_recebiveis; None em caso de erro."""
+    try:
+        return nucleo.envelhecimento_de_recebiveis(obter_repositorio(), obter_cache_recebiveis())
+    except Exception as e:
+        st.error(f"❌ Erro ao consultar as contas a receber: {e}")
+        return None
+
+def exibir_envelhecimento_recebiveis():
+    st.subheader("⏳ Contas a Receber por Tempo em Aberto")
+    df_recebiveis = obter_envelhecimento_de_recebiveis()
+    if df_recebiveis is None:
+        return
+    if df_recebiveis.empty:
+        st.success("✅ Nenhuma sessão pendente de pagamento.")
+        return
+
+    colunas_valor = ["0–30 dias", "31–60 dias", "61–90 dias", "90+ dias", "Total Pendente"]
+    colunas = st.columns(len(colunas_valor))
+    for coluna, faixa in zip(colunas, colunas_valor):
+        coluna.metric(faixa, formatar_moeda(df_recebiveis[faixa].sum()))
+
+    df_exibicao = df_recebiveis.copy() # O DataFrame do cache é compartilhado: formata uma cópia
+    df_exibicao[colunas_valor] = df_exibicao[colunas_valor].map(formatar_moeda)
+    st.dataframe(df_exibicao, hide_index=True, use_container_width=True)
+
+    col_formato, col_download, col_spacer = st.columns([1, 1, 3])
+    formato_exportacao = col_formato.selectbox("Formato", list(FORMATOS_EXPORTACAO.keys()), key="formato_recebiveis_crm")
+    extensao, mime = FORMATOS_EXPORTACAO[formato_exportacao]
+    col_download.download_button(
+        label=f"⬇️ Exportar ({formato_exportacao})",
+        # O arquivo só é montado no clique; reruns comuns não pagam pela exportação
+        data=lambda: exportar_em_lotes([df_recebiveis], formato_exportacao),
+        file_name=f"Contas_a_Receber_{datetime.date.today()}.{extensao}",
+        mime=mime,
+        key="download_recebiveis_crm",
+    )
 
 # =========================================================================
-# 3. FUNÇÃO PRINCIPAL DO STREAMLIT (Interface)
+# 4. FUNÇÃO PRINCIPAL DO STREAMLIT (Interface)
 # =========================================================================
 
 def main():
@@ -155,8 +475,8 @@ def main():
     st.title("💼 Mini-CRM: Gestão de Clientes e Atividades")
     st.markdown("---")
 
-    # Chama a função para criar o DB e obter o mapa de clientes
-    cliente_mapa_nome = criar_e_popular_sqlite() 
+    # Cria/migra o DB (e semeia a demo em banco vazio) uma vez por processo
+    criar_e_popular_sqlite()
     
     # -------------------------------------------------------------------------
     # ESTRUTURA DE ABAS
@@ -168,29 +488,19 @@ def main():
     tab_clientes = abas[2]
     tab_relatorio = abas[3]
 
-    # --- ABA: DASHBOARD (Placeholder) ---
+    # --- ABA: DASHBOARD ---
     with tab_dashboard:
-        st.header("📊 Dashboard - Visão Geral")
-        st.write(f"Clientes cadastrados: **{len(cliente_mapa_nome)}**")
-        st.info("Aqui será exibido o resumo de Faturamento e Pendências.")
+        exibir_dashboard_faturamento()
         
     # --- ABA: LANÇAMENTO DE SESSÕES ---
     with tab_lancamento:
         st.header("🗓️ Lançamento de Nova Sessão/Atividade")
 
-        # Inverte o mapa para facilitar a busca de ID pelo nome
-        cliente_mapa_id = {v: k for k, v in cliente_mapa_nome.items()}
-        
+        # 1. Seleção do Cliente (fora do formulário: a busca atualiza enquanto se digita)
+        id_cliente_selecionado, _ = selecionar_cliente("sel_cliente_lancamento")
+
         with st.form("form_lancamento_sessao"): 
-            col1, col2 = st.columns(2)
-            col3, col4, col5 = st.columns(3)
-            
-            # 1. Seleção do Cliente
-            cliente_nome = col1.selectbox(
-                'Cliente', 
-                options=list(cliente_mapa_nome.keys()), 
-                key="sel_cliente_lancamento"
-            )
+            col2, col3, col4 = st.columns(3)
             
             # 2. Data do Serviço
             data_servico = col2.date_input(
@@ -211,7 +521,7 @@ def main():
             # 4. Status de Pagamento
             status_pagamento = col4.selectbox(
                 'Status de Pagamento', 
-                options=['Pago', 'Pendente', 'Cancelado'], 
+                options=nucleo.STATUS_PAGAMENTO, 
                 key="status_pagamento_lancamento"
             )
 
@@ -224,23 +534,36 @@ def main():
             submitted = st.form_submit_button("Registrar Sessão/Atividade")
 
             if submitted:
-                # Obter o ID do cliente selecionado
-                id_cliente_selecionado = cliente_mapa_nome.get(cliente_nome)
-                
                 if id_cliente_selecionado is not None:
                     # Formatar a data para o SQLite
                     data_str = data_servico.strftime("%Y-%m-%d")
                     
-                    inserir_sessao_no_db(
+                    if inserir_sessao_no_db(
                         id_cliente_selecionado, 
                         data_str, 
                         descricao, 
                         valor_cobrado, 
                         status_pagamento
-                    )
-                    st.experimental_rerun() # Para limpar o formulário
+                    ):
+                        st.rerun() # Para limpar o formulário e atualizar o Dashboard
                 else:
-                    st.error("❌ Cliente não encontrado no sistema.")
+                    st.error("❌ Selecione um cliente antes de registrar a sessão.")
+
+        st.markdown("---")
+        st.subheader("📥 Importar Sessões em Lote (CSV, XLSX ou OFX)")
+        st.caption("Colunas: cliente (nome ou contato), data, descrição, valor e, opcionalmente, status. "
+                   "No extrato OFX, cada crédito vira uma sessão paga. Sessões já registradas são ignoradas.")
+        arquivo_sessoes = st.file_uploader("Arquivo de sessões", type=['csv', 'xlsx', 'ofx'], key="upload_sessoes_crm")
+        status_padrao = st.selectbox("Status quando a coluna estiver ausente", nucleo.STATUS_PAGAMENTO, key="status_padrao_importacao")
+        if arquivo_sessoes is not None and st.button("Importar Sessões", key="btn_importar_sessoes_crm"):
+            resultado = importar_sessoes_em_lote(arquivo_sessoes, status_padrao)
+            if resultado is not None:
+                sessoes_novas, sessoes_ja_registradas, df_erros = resultado
+                st.success(f"✅ {sessoes_novas} sessão(ões) importada(s) em uma única transação; "
+                           f"{sessoes_ja_registradas} já registrada(s) foram ignoradas.")
+                if not df_erros.empty:
+                    st.warning(f"⚠️ {len(df_erros)} linha(s) não importada(s):")
+                    st.dataframe(df_erros, hide_index=True, use_container_width=True)
 
 
     # --- ABA: CLIENTES (Placeholder) ---
@@ -248,10 +571,11 @@ def main():
         st.header("👥 Gestão de Clientes")
         st.info("Aqui você poderá cadastrar novos clientes e editar informações.")
 
-    # --- ABA: RELATÓRIO (Placeholder) ---
+    # --- ABA: RELATÓRIO ---
     with tab_relatorio:
-        st.header("📈 Relatórios Financeiros")
-        st.info("Aqui você verá relatórios de faturamento, pagamentos pendentes e histórico.")
+        exibir_relatorio_faturamento()
+        st.markdown("---")
+        exibir_envelhecimento_recebiveis()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+# exportacao.py - EXPORTAÇÃO DE RELATÓRIOS EM LOTES (CSV, Parquet ou XLSX)
+# Os diários entregam um iterador de DataFrames (lotes lidos do banco com ler_em_lotes) e
+# recebem os bytes do arquivo pronto. Cada lote é gravado e descartado antes do próximo:
+# a memória usada não cresce com o tamanho da turma/instituição.
+# --- IMPORTS ---
+import io
+import tempfile
+
+# =========================================================================
+# 1. CONSTANTES
+# =========================================================================
+
+# Formato -> (extensão, mime type)
+FORMATOS_EXPORTACAO = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Acima deste tamanho o arquivo temporário sai da memória e vai para o disco
+EXPORTACAO_MAX_MEMORIA = 8 * 1024 * 1024
+
+# =========================================================================
+# 2. GRAVAÇÃO POR FORMATO (um lote por vez)
+# =========================================================================
+
+def _gravar_csv(lotes, arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8", newline="")
+    for numero, df_lote in enumerate(lotes):
+        df_lote.to_csv(texto, index=False, header=numero == 0)
+    texto.flush()
+    texto.detach() # Devolve o arquivo binário sem fechá-lo
+
+def _gravar_parquet(lotes, arquivo):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    gravador = None
+    try:
+        for df_lote in lotes:
+            if gravador is None:
+                tabela = pa.Table.from_pandas(df_lote, preserve_index=False)
+                gravador = pq.ParquetWriter(arquivo, tabela.schema)
+            else:
+                # Todos os lotes seguem o schema do primeiro (um row group por lote)
+                tabela = pa.Table.from_pandas(df_lote, schema=gravador.schema, preserve_index=False)
+            gravador.write_table(tabela)
+    finally:
+        if gravador is not None:
+            gravador.close()
+
+def _gravar_xlsx(lotes, arquivo):
+    from openpyxl import Workbook
+
+    # write_only: as linhas vão para o disco conforme são adicionadas, sem montar a planilha em memória
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet("Relatorio")
+    for numero, df_lote in enumerate(lotes):
+        if numero == 0:
+            aba.append(list(df_lote.columns))
+        for linha in df_lote.itertuples(index=False, name=None):
+            aba.append(linha)
+    planilha.save(arquivo)
+
+_GRAVADORES = {"CSV": _gravar_csv, "Parquet": _gravar_parquet, "XLSX": _gravar_xlsx}
+
+# =========================================================================
+# 3. API USADA PELOS DIÁRIOS
+# =========================================================================
+
+def exportar_em_lotes(lotes, formato):
+    """Grava os lotes (iterador de DataFrames com as mesmas colunas) no formato pedido e devolve os bytes.
+
+    O arquivo é montado num SpooledTemporaryFile: fica em memória até
+    EXPORTACAO_MAX_MEMORIA e depois passa para o disco.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=EXPORTACAO_MAX_MEMORIA) as arquivo:
+        _GRAVADORES[formato](lotes, arquivo)
+        arquivo.seek(0)
+        return arquivo.read()
@@ -0,0 +1,758 @@
+# interface_diario.py - INTERFACE STREAMLIT COMUM AOS DIÁRIOS COM VÁRIOS PROFESSORES
+# Educação Básica (Diario_Web_final.py) e Faculdade (diario_faculdade.py) só declaram a configuração
+# deles (regras de avaliação, turma padrão, bancos, dados de exemplo) e chamam main(diario) com o
+# próprio módulo. Tudo aqui recebe esse módulo como `diario`; o acesso a dados fica em nucleo.py.
+# --- IMPORTS ---
+import datetime
+import os
+
+import streamlit as st
+
+from repositorio_db import ler_dataframe
+from exportacao import FORMATOS_EXPORTACAO
+from arquivo_parquet import listar_anos_arquivados
+import nucleo
+from nucleo import DIAS_DA_SEMANA, SQL_LOGIN_PROFESSOR, SQL_STATUS_PROFESSOR, SQL_ALUNOS_DO_PROFESSOR
+
+# =========================================================================
+# 1. CONSTANTES
+# =========================================================================
+
+# Relatórios prontos e páginas do relatório mantidos em memória (LRU por chave de consulta)
+CACHE_RELATORIO_MAX_ENTRADAS = 128
+
+# Relatório paginado: linhas por página
+TAMANHOS_PAGINA_RELATORIO = [25, 50, 100]
+TAMANHO_PAGINA_PADRAO = 50
+
+# Colunas de ordenação aceitas pelo relatório paginado (rótulo na tela -> coluna da consulta)
+ORDENACOES_RELATORIO = {
+    "Aluno": '"Aluno"',
+    "Disciplina": '"Disciplina"',
+    "Média Final": "nota_final",
+    "Frequência (%)": "frequencia",
+}
+
+# Cache de permissões (status/expiração do professor), em segundos; ajustável por variável de ambiente
+CACHE_ACESSO_TTL_S = int(os.environ.get("CACHE_ACESSO_TTL_S", "300"))
+CACHE_ACESSO_TTL_FALHA_S = int(os.environ.get("CACHE_ACESSO_TTL_FALHA_S", "30")) # Banco fora do ar: resposta negativa dura menos
+CACHE_ACESSO_MAX_USUARIOS = 256
+
+# Conjunto do arquivo Parquet -> consulta que o alimenta (cada linha leva o id_professor)
+CONJUNTOS_ARQUIVO = nucleo.conjuntos_arquivo()
+
+# =========================================================================
+# 2. LANÇAMENTOS (aulas, frequência, notas, alunos)
+# =========================================================================
+
+def lancar_aula_e_frequencia(diario, id_professor, id_disciplina, data_aula, conteudo):
+    """Insere a aula e a frequência (todos presentes) no banco do professor."""
+    try:
+        nucleo.lancar_aula_e_frequencia(diario.obter_repositorio_do_professor(id_professor), diario.ID_TURMA_PADRAO, id_disciplina, data_aula, conteudo, id_professor)
+    except (nucleo.SemAlunosCadastrados, nucleo.DisciplinaNaoEncontrada) as e:
+        st.warning(f"⚠️ {e}")
+    except Exception as e:
+        st.error(f"❌ Erro ao lançar aula no SQLite (Frequência): {e}")
+
+def lancar_aulas_do_periodo(diario, id_professor, ids_disciplinas, data_inicio, data_fim, dias_semana, conteudo):
+    """Cria as aulas do período e a frequência padrão (ver nucleo.lancar_aulas_do_periodo). Devolve quantas aulas foram criadas."""
+    try:
+        aulas_criadas = nucleo.lancar_aulas_do_periodo(diario.obter_repositorio_do_professor(id_professor), diario.ID_TURMA_PADRAO, ids_disciplinas, data_inicio, data_fim, dias_semana, conteudo, id_professor)
+    except nucleo.PeriodoInvalido as e:
+        st.warning(f"⚠️ {e}")
+        return 0
+    except Exception as e:
+        st.error(f"❌ Erro ao lançar as aulas do período: {e}")
+        return 0
+    st.success(f"✅ {aulas_criadas} aula(s) lançada(s) de {data_inicio:%d/%m/%Y} a {data_fim:%d/%m/%Y}. Todos marcados como Presentes.")
+    return aulas_criadas
+
+def inserir_nota_no_db(diario, id_professor, id_aluno, id_disciplina, tipo_avaliacao, valor_nota):
+    try:
+        nucleo.gravar_nota(diario.obter_repositorio_do_professor(id_professor), id_aluno, id_disciplina, tipo_avaliacao, valor_nota, diario.TIPOS_AVALIACAO, id_professor)
+    except nucleo.NotaInvalida as e:
+        st.warning(f"⚠️ {e}")
+        return
+    except nucleo.AvaliacaoInvalida as e:
+        st.error(f"❌ {e}")
+        return
+    except Exception as e:
+        st.error(f"❌ Erro ao inserir nota: {e}")
+        return
+    st.success(f"✅ Nota {tipo_avaliacao} ({valor_nota:.1f}) inserida/atualizada.")
+
+def importar_notas_em_lote(diario, id_professor, arquivo):
+    """Importa a planilha inteira numa única transação. Devolve (notas_gravadas, df_erros) ou None."""
+    try:
+        return nucleo.importar_notas_em_lote(diario.obter_repositorio_do_professor(id_professor), arquivo, diario.TIPOS_AVALIACAO, id_professor)
+    except Exception as e:
+        st.error(f"❌ Erro ao importar planilha de notas: {e}")
+        return None
+
+def obter_frequencia_por_aula(diario, id_professor, id_disciplina, data_aula):
+    """(df_chamada, id_aula) da aula, ou (None, motivo) se não há aula/frequência nessa data."""
+    try:
+        return nucleo.obter_chamada_da_aula(diario.obter_repositorio_do_professor(id_professor), diario.ID_TURMA_PADRAO, id_disciplina, data_aula, id_professor)
+    except nucleo.ErroDeNegocio as e:
+        return None, str(e)
+
+def atualizar_status_frequencia(diario, id_professor, id_frequencia, novo_status):
+    try:
+        nucleo.atualizar_presenca(diario.obter_repositorio_do_professor(id_professor), id_frequencia, novo_status, id_professor)
+    except Exception as e:
+        st.error(f"❌ Erro ao atualizar frequência: {e}")
+        return
+    st.success(f"✅ Status de Presença Atualizado! (ID Frequência: {id_frequencia})")
+
+def salvar_chamada_editada(diario, id_professor, df_chamada, df_grade):
+    """Compara a grade editada com a chamada carregada e grava só as presenças alteradas.
+
+    Todas as mudanças vão num único executemany (uma transação). Devolve quantas mudaram.
+    """
+    alteracoes = nucleo.presencas_alteradas(df_chamada, df_grade)
+    if not alteracoes:
+        st.info("Nenhuma presença foi alterada na grade.")
+        return 0
+    try:
+        return nucleo.gravar_presencas(diario.obter_repositorio_do_professor(id_professor), alteracoes, id_professor)
+    except Exception as e:
+        st.error(f"❌ Erro ao salvar a chamada: {e}")
+        return 0
+
+def adicionar_aluno_db(diario, id_professor, nome, matricula):
+    try:
+        nucleo.adicionar_aluno(diario.obter_repositorio_do_professor(id_professor), id_professor, nome, matricula)
+    except nucleo.MatriculaDuplicada as e:
+        st.error(f"❌ {e}")
+        return False
+    except Exception as e:
+        st.error(f"❌ Erro ao adicionar aluno: {e}")
+        return False
+    diario.obter_mapas_do_professor.clear(id_professor) # Recarrega só os mapas deste professor
+    st.success(f"✅ Aluno(a) '{nome}' (Matrícula: {matricula}) adicionado(a) com sucesso!")
+    return True
+
+def remover_aluno_db(diario, id_professor, id_aluno, nome_aluno):
+    try:
+        nucleo.remover_aluno(diario.obter_repositorio_do_professor(id_professor), id_aluno, id_professor)
+    except Exception as e:
+        st.error(f"❌ Erro ao remover aluno: {e}")
+        return False
+    diario.obter_mapas_do_professor.clear(id_professor) # Recarrega só os mapas deste professor
+    st.success(f"🗑️ Aluno(a) '{nome_aluno}' e seus dados foram removidos com sucesso.")
+    return True
+
+# =========================================================================
+# 3. RELATÓRIO
+# =========================================================================
+
+def _montar_relatorio_final(diario):
+    return lambda df_relatorio: nucleo.montar_relatorio_final(df_relatorio, diario.REGRAS_AVALIACAO)
+
+def gerar_relatorio_final_completo(diario, id_professor):
+    """Relatório consolidado inteiro do professor; SQL e pandas só rodam de novo quando a versão dos dados dele muda.
+
+    A tela usa o relatório paginado (consultar_pagina_do_relatorio); esta função fica para o benchmark.py.
+    """
+    try:
+        df_final = nucleo.gerar_relatorio_final(diario.obter_repositorio_do_professor(id_professor), diario.obter_cache_relatorio(), id_professor,
+                                                nucleo.sql_relatorio_consolidado(diario.REGRAS_AVALIACAO), _montar_relatorio_final(diario), id_professor)
+    except Exception as e:
+        st.error(f"❌ ERRO FATAL na consulta SQL/Pandas. Verifique a estrutura do DB. Mensagem: {e}")
+        return None
+    if df_final is None:
+        st.info("Nenhum dado de aluno/disciplina encontrado no DB para o relatório.")
+    return df_final
+
+def consultar_pagina_do_relatorio(diario, id_professor, id_disciplina, situacao, prefixo_nome, ordenar_por, decrescente, pagina, tamanho_pagina):
+    """Uma página do relatório do professor (ver nucleo.consultar_pagina_do_relatorio): (df_pagina, total)."""
+    return nucleo.consultar_pagina_do_relatorio(
+        diario.obter_repositorio_do_professor(id_professor), diario.obter_cache_relatorio(), diario.REGRAS_AVALIACAO, _montar_relatorio_final(diario),
+        id_disciplina, situacao, prefixo_nome, ORDENACOES_RELATORIO[ordenar_por], decrescente, pagina, tamanho_pagina, id_professor,
+    )
+
+def exibir_relatorio_paginado(diario, id_professor, disciplina_map_nome):
+    """Tela do relatório: filtros e navegação por páginas, sem carregar a turma inteira."""
+    sufixo = diario.SUFIXO_CHAVES
+    col_disc, col_sit, col_nome = st.columns(3)
+    disciplina = col_disc.selectbox("Disciplina", ["Todas"] + list(disciplina_map_nome.keys()), key=f"rel_filtro_disciplina_{sufixo}")
+    situacao = col_sit.selectbox("Situação Final", ["Todas"] + diario.SITUACOES_FINAIS, key=f"rel_filtro_situacao_{sufixo}")
+    prefixo_nome = col_nome.text_input("Nome do aluno começa com", key=f"rel_filtro_nome_{sufixo}").strip()
+
+    col_ordem, col_desc, col_tamanho, col_pagina = st.columns(4)
+    ordenar_por = col_ordem.selectbox("Ordenar por", list(ORDENACOES_RELATORIO.keys()), key=f"rel_ordenar_por_{sufixo}")
+    decrescente = col_desc.checkbox("Ordem decrescente", key=f"rel_decrescente_{sufixo}")
+    tamanho_pagina = col_tamanho.selectbox(
+        "Linhas por página", TAMANHOS_PAGINA_RELATORIO,
+        index=TAMANHOS_PAGINA_RELATORIO.index(TAMANHO_PAGINA_PADRAO), key=f"rel_tamanho_pagina_{sufixo}"
+    )
+
+    # Filtro ou ordenação novos começam de novo na primeira página
+    filtros = (disciplina, situacao, prefixo_nome, ordenar_por, decrescente, tamanho_pagina)
+    if st.session_state.get(f"rel_filtros_anteriores_{sufixo}") != filtros:
+        st.session_state[f"rel_filtros_anteriores_{sufixo}"] = filtros
+        st.session_state[f"rel_pagina_{sufixo}"] = 1
+
+    # O total vem da mesma consulta da página; a página pedida é conferida depois
+    pagina = col_pagina.number_input("Página", min_value=1, step=1, key=f"rel_pagina_{sufixo}")
+    try:
+        df_pagina, total = consultar_pagina_do_relatorio(
+            diario, id_professor, disciplina_map_nome.get(disciplina), None if situacao == "Todas" else situacao,
+            prefixo_nome, ordenar_por, decrescente, int(pagina), tamanho_pagina
+        )
+    except Exception as e:
+        st.error(f"❌ ERRO FATAL na consulta SQL/Pandas. Verifique a estrutura do DB. Mensagem: {e}")
+        return
+
+    total_paginas = max(1, -(-total // tamanho_pagina))
+    if total == 0:
+        st.info("Nenhuma linha do relatório atende aos filtros escolhidos.")
+        return
+    if pagina > total_paginas:
+        st.warning(f"⚠️ A página {int(pagina)} não existe; o relatório filtrado tem {total_paginas} página(s).")
+        return
+
+    st.markdown("### Relatório Final Consolidado")
+    st.dataframe(df_pagina.set_index(["Aluno", "Disciplina"]), use_container_width=True)
+    st.caption(f"Página {int(pagina)} de {total_paginas} ({total} linhas)")
+
+def exportar_relatorio_completo(diario, repositorio, id_professor, formato):
+    """Bytes do relatório completo do professor em CSV, Parquet ou XLSX, lido e gravado lote a lote.
+
+    Roda no clique do download_button, fora do script: recebe o repositório
+    do professor já resolvido e não usa comandos st.*.
+    """
+    return nucleo.exportar_relatorio_completo(repositorio, nucleo.sql_relatorio_consolidado(diario.REGRAS_AVALIACAO),
+                                              _montar_relatorio_final(diario), formato, id_professor)
+
+def reconstruir_resumo_relatorio(diario, id_professor):
+    """Reconstrução do resumo do professor (manutenção: corrige qualquer divergência)."""
+    try:
+        nucleo.reconstruir_resumo_relatorio(diario.obter_repositorio_do_professor(id_professor), diario.REGRAS_AVALIACAO, id_professor)
+    except Exception as e:
+        st.error(f"❌ Erro ao reconstruir o resumo do relatório: {e}")
+        return False
+    st.success("✅ Resumo do relatório reconstruído a partir das notas e frequências.")
+    return True
+
+# --- ALERTAS DE RISCO (barra lateral) ---
+
+def obter_alertas_de_risco(diario, id_professor):
+    """Alunos em risco do professor (ver nucleo.listar_alertas_de_risco); None em caso de erro."""
+    try:
+        return nucleo.listar_alertas_de_risco(diario.obter_repositorio_do_professor(id_professor), id_professor)
+    except Exception as e:
+        st.sidebar.error(f"❌ Erro ao consultar os alertas de risco: {e}")
+        return None
+
+def exibir_alertas_de_risco(diario, id_professor):
+    """Painel lateral com os alunos perto de reprovar, por frequência ou por nota."""
+    st.sidebar.markdown("---")
+    st.sidebar.header("🚨 Alertas de Risco")
+    df_alertas = obter_alertas_de_risco(diario, id_professor)
+    if df_alertas is None:
+        return
+    if df_alertas.empty:
+        st.sidebar.success("✅ Nenhum aluno em risco no momento.")
+        return
+    # Já vem do alerta mais grave para o mais leve
+    for alerta, quantidade in df_alertas["Alerta"].value_counts(sort=False).items():
+        st.sidebar.markdown(f"{alerta}: **{quantidade}**")
+    with st.sidebar.expander(f"Ver os {len(df_alertas)} aluno(s)/disciplina(s) em risco"):
+        st.dataframe(df_alertas, hide_index=True, use_container_width=True)
+
+# =========================================================================
+# 4. ARQUIVO DE ANOS LETIVOS ENCERRADOS (Parquet)
+# =========================================================================
+
+def repositorios_com_dados(diario):
+    """Repositórios com dados de professores: o principal ou, com BANCO_POR_PROFESSOR, cada arquivo já criado."""
+    repositorio = diario.obter_repositorio()
+    if not diario.BANCO_POR_PROFESSOR or repositorio.dialeto != "sqlite":
+        return [repositorio]
+    with diario.conexao_db() as conn:
+        ids_professores = [linha[0] for linha in conn.execute("SELECT id_professor FROM Professores")]
+    return [diario.obter_repositorio_do_professor(id_professor) for id_professor in ids_professores
+            if os.path.exists(diario.DB_NAME_PROFESSOR.format(id_professor))]
+
+def arquivar_ano_letivo(diario, ano_letivo):
+    """Move as aulas, frequências e notas do ano letivo (de todos os professores) do banco para o arquivo Parquet.
+
+    Ver nucleo.arquivar_ano_letivo. Devolve o número de aulas arquivadas (None em caso de erro ou de ano ainda em curso).
+    """
+    try:
+        aulas_arquivadas, notas_arquivadas = nucleo.arquivar_ano_letivo(repositorios_com_dados(diario), ano_letivo, diario.DIRETORIO_ARQUIVO, CONJUNTOS_ARQUIVO)
+    except nucleo.ErroDeNegocio as e:
+        st.warning(f"⚠️ {e}")
+        return None
+    except Exception as e:
+        st.error(f"❌ Erro ao arquivar o ano letivo {ano_letivo}: {e}")
+        return None
+
+    if aulas_arquivadas or notas_arquivadas:
+        st.success(f"✅ Ano letivo {ano_letivo} arquivado: {aulas_arquivadas} aula(s) com as frequências e {notas_arquivadas} nota(s) movidas para o arquivo.")
+    else:
+        st.info(f"Nenhuma aula ou nota do ano letivo {ano_letivo} no banco: nada a arquivar.")
+    return aulas_arquivadas
+
+def gerar_relatorio_arquivado(diario, id_professor, ano_letivo, id_disciplina=None):
+    """Relatório consolidado do professor num ano letivo arquivado, lido só das partições pedidas."""
+    try:
+        return nucleo.gerar_relatorio_arquivado(diario.DIRETORIO_ARQUIVO, diario.REGRAS_AVALIACAO, _montar_relatorio_final(diario),
+                                                ano_letivo, id_disciplina, id_professor)
+    except Exception as e:
+        st.error(f"❌ Erro ao ler o arquivo do ano letivo {ano_letivo}: {e}")
+        return None
+
+def exibir_exportacao_e_arquivo(diario, id_professor, disciplina_map_nome):
+    """Download do relatório completo e relatórios dos anos letivos arquivados."""
+    sufixo = diario.SUFIXO_CHAVES
+    st.markdown("---")
+    col_formato, col_download, col_spacer = st.columns([1, 1, 3])
+    formato_exportacao = col_formato.selectbox("Formato", list(FORMATOS_EXPORTACAO.keys()), key=f'formato_relatorio_tab_{sufixo}')
+    extensao, mime = FORMATOS_EXPORTACAO[formato_exportacao]
+    repositorio = diario.obter_repositorio_do_professor(id_professor)
+    col_download.download_button(
+        label=f"⬇️ Gerar Conteúdo ({formato_exportacao})",
+        # O arquivo só é montado no clique; reruns comuns não pagam pela exportação
+        data=lambda: exportar_relatorio_completo(diario, repositorio, id_professor, formato_exportacao),
+        file_name=f'Relatorio_Diario_Classe_{diario.ROTULO_ARQUIVOS}_{datetime.date.today()}.{extensao}',
+        mime=mime,
+        key=f'download_relatorio_tab_{sufixo}'
+    )
+
+    # Anos letivos encerrados: lidos do arquivo Parquet, sem tocar no banco
+    anos_arquivados = listar_anos_arquivados(diario.DIRETORIO_ARQUIVO, "aulas")
+    if anos_arquivados:
+        with st.expander("📦 Anos Letivos Arquivados"):
+            col_ano, col_disc_arquivo = st.columns(2)
+            ano_arquivado = col_ano.selectbox("Ano Letivo", anos_arquivados, key=f'ano_arquivado_{sufixo}')
+            disciplina_arquivada = col_disc_arquivo.selectbox("Disciplina", ["Todas"] + list(disciplina_map_nome.keys()), key=f'disciplina_arquivada_{sufixo}')
+            df_arquivado = gerar_relatorio_arquivado(diario, id_professor, ano_arquivado, disciplina_map_nome.get(disciplina_arquivada))
+            if df_arquivado is not None and df_arquivado.empty:
+                st.info("Nenhum registro arquivado para esse ano/disciplina.")
+            elif df_arquivado is not None:
+                st.dataframe(df_arquivado.set_index(["Aluno", "Disciplina"]), use_container_width=True)
+
+def exibir_encerramento_do_ano(diario):
+    """Arquivamento de um ano letivo (só admin: vale para todos os professores)."""
+    sufixo = diario.SUFIXO_CHAVES
+    st.markdown("---")
+    st.subheader("📦 Encerrar Ano Letivo")
+    st.caption("Move aulas, frequências e notas do ano para o arquivo Parquet; o relatório do ano continua disponível na aba Relatório.")
+    ano_a_arquivar = st.number_input("Ano letivo a arquivar", min_value=2000, max_value=datetime.date.today().year - 1, value=datetime.date.today().year - 1, step=1, key=f"ano_a_arquivar_{sufixo}")
+    if st.button("Arquivar Ano Letivo", key=f"btn_arquivar_ano_{sufixo}"):
+        arquivar_ano_letivo(diario, int(ano_a_arquivar))
+
+# =========================================================================
+# 5. LOGIN E PERMISSÕES
+# =========================================================================
+# O cache de permissões evita uma consulta a Professores a cada rerun; a expiração em si é comparada
+# com a data de hoje a cada rerun, então só mudanças no cadastro (upgrade, nova data) dependem da invalidação/TTL.
+
+def _consultar_status_professor(diario, usuario):
+    with diario.conexao_db() as conn:
+        return conn.execute(SQL_STATUS_PROFESSOR, (usuario,)).fetchone()
+
+def obter_status_professor(diario, usuario):
+    """(nome_completo, is_admin, data_expiracao) do professor via cache; devolve (status, falhou).
+
+    Com o banco fora do ar o professor fica como não-admin e sem expiração (acesso restrito).
+    """
+    return diario.obter_cache_acessos().obter(("status", usuario), lambda: _consultar_status_professor(diario, usuario), (usuario, 0, None))
+
+def do_logout(diario):
+    diario.obter_cache_acessos().invalidar(("status", st.session_state['user_login_name']))
+    st.session_state['user_login_name'] = None
+    st.session_state['is_restricted'] = None
+    st.session_state.pop('df_chamada', None)
+    st.session_state.pop('msg_chamada', None)
+    st.rerun()
+
+# =========================================================================
+# 6. FUNÇÃO PRINCIPAL DO STREAMLIT (Interface)
+# =========================================================================
+
+def main(diario):
+    sufixo = diario.SUFIXO_CHAVES
+
+    # 1. CONFIGURAÇÃO DA PÁGINA
+    st.set_page_config(layout="wide")
+    st.title(diario.TITULO)
+    st.markdown("---")
+
+    st.sidebar.title("Login")
+
+    if 'user_login_name' not in st.session_state: st.session_state['user_login_name'] = None
+    if 'is_restricted' not in st.session_state: st.session_state['is_restricted'] = None
+
+    # >>> INICIALIZAÇÃO DA SESSÃO DE FREQUÊNCIA
+    if 'df_chamada' not in st.session_state: st.session_state['df_chamada'] = None
+    if 'id_aula' not in st.session_state: st.session_state['id_aula'] = None
+    if 'msg_chamada' not in st.session_state: st.session_state['msg_chamada'] = None
+
+    is_admin = False
+    is_expired = True
+    data_expiracao = None
+
+    # O banco (migrações e dados de exemplo) só é preparado no primeiro login: a tela de login
+    # abre sem tocar no banco nem carregar pandas
+
+    # 🚨 Formulário de Login na Sidebar
+
+    if st.session_state.user_login_name is None:
+        with st.sidebar.form(f"login_form_{sufixo}"):
+            username = st.text_input("Usuário", key=f"user_input_{sufixo}")
+            password = st.text_input("Senha", type="password", key=f"pwd_input_{sufixo}")
+            submitted = st.form_submit_button("Entrar") # <-- BOTÃO DE ENTRAR NA SIDEBAR
+
+    # 5. PORTÃO DE LOGIN COM VERIFICAÇÃO DE EXPIRAÇÃO
+        if submitted:
+            diario.criar_e_popular_sqlite()
+            with diario.conexao_db() as conn:
+                user_data = conn.execute(SQL_LOGIN_PROFESSOR, (username, password)).fetchone()
+
+            if user_data:
+                id_professor_db, user, pwd, nome_completo_db, is_admin_db, data_expiracao_str = user_data
+
+                is_admin = bool(is_admin_db)
+
+                st.session_state.user_login_name = username
+                st.session_state.user_full_name = nome_completo_db
+                # O login já trouxe o status: o rerun seguinte não precisa consultar Professores de novo
+                diario.obter_cache_acessos().guardar(("status", username), (nome_completo_db, is_admin_db, data_expiracao_str))
+
+                # --- ID DO PROFESSOR: chave de isolamento de todos os dados do diário ---
+                st.session_state['usuario_id'] = id_professor_db
+
+                if is_admin: st.session_state.is_restricted = False; is_expired = False
+                else:
+                    if data_expiracao_str:
+                        data_expiracao = datetime.date.fromisoformat(str(data_expiracao_str))
+                        data_hoje = datetime.date.today()
+
+                        if data_hoje <= data_expiracao: st.session_state.is_restricted = False; is_expired = False
+                        else: st.session_state.is_restricted = True; is_expired = True
+                    else: st.session_state.is_restricted = True
+
+                st.rerun()
+            else:
+                  st.sidebar.error("Usuário ou senha incorretos.")
+
+    # 3. LÓGICA DE LOGIN BEM-SUCEDIDO (Verifica o estado da sessão)
+    if st.session_state.user_login_name is not None:
+        diario.criar_e_popular_sqlite() # Em cache: só roda de novo num processo novo com a sessão ainda aberta
+
+        # Recarrega dados de status para exibição (cache TTL: sem ida ao banco a cada rerun)
+        user_data_reloaded, falha_no_banco = obter_status_professor(diario, st.session_state.user_login_name)
+
+        if user_data_reloaded:
+            nome_exibicao, is_admin_db, data_expiracao_str = user_data_reloaded
+            is_admin = bool(is_admin_db)
+
+            is_expired = True
+            if is_admin: is_expired = False
+            elif data_expiracao_str:
+                 data_expiracao = datetime.date.fromisoformat(str(data_expiracao_str))
+                 data_hoje = datetime.date.today()
+                 if data_hoje <= data_expiracao: is_expired = False
+            st.session_state.is_restricted = is_expired # Upgrade/expiração valem sem novo login
+
+
+            # MENSAGENS DE STATUS NA BARRA LATERAL
+            if is_admin: st.sidebar.success(f"Login bem-sucedido! Bem-vindo, {nome_exibicao} (Admin).")
+            elif falha_no_banco: st.sidebar.error("⚠️ Erro no BD. Acesso Restrito Ativo.")
+            elif is_expired:
+                data_expiracao_formatada = data_expiracao.strftime('%d/%m/%Y') if data_expiracao else 'N/A'
+                st.sidebar.warning(f"Seu acesso total expirou em {data_expiracao_formatada}. Acesso Restrito Ativo.")
+            else:
+                dias_restantes = (data_expiracao - datetime.date.today()).days
+                st.sidebar.success(f"Login bem-sucedido! Acesso total por mais {dias_restantes} dias.")
+
+            # BOTÃO DE SAIR
+            st.sidebar.button("🚪 Sair / Logout", on_click=do_logout, args=(diario,), key=f"logout_{sufixo}")
+
+            # ** STATUS PREMIUM: admin tem tudo liberado; os demais veem o link de pagamento **
+            st.sidebar.markdown("---")
+            st.sidebar.header("Status da Conta Premium")
+
+            if is_admin:
+                st.sidebar.success("✅ Você é Premium! Todos os recursos liberados.")
+            else:
+                st.sidebar.warning("🔒 Acesso Básico. Faça Upgrade para liberar tudo.")
+                st.sidebar.markdown(
+                    f"""
+                    <a href="{diario.MP_CHECKOUT_LINK}" target="_blank">
+                        <button style="background-color: #009ee3; color: white; padding: 10px 20px; border-radius: 5px; border: none; font-weight: bold;">
+                            Fazer Upgrade para Premium!
+                        </button>
+                    </a>
+                    """,
+                    unsafe_allow_html=True
+                )
+                # Depois do pagamento, relê o cadastro sem esperar o TTL do cache
+                if st.sidebar.button("🔄 Já fiz o upgrade", key=f"recarregar_acesso_{sufixo}"):
+                    diario.obter_cache_acessos().invalidar(("status", st.session_state.user_login_name))
+                    st.rerun()
+
+            # APLICAÇÃO DA LIMITAÇÃO DE USO (AVISO LATERAL)
+            if st.session_state.is_restricted:
+                st.sidebar.warning("⚠️ **Aviso Demo:** A modificação de dados existentes está bloqueada.")
+                st.sidebar.info("Apenas a criação e visualização são permitidas.")
+
+            # 1. CONTINUAÇÃO DA INICIALIZAÇÃO DO DB e Persistência (só os dados do professor logado)
+            id_professor = st.session_state['usuario_id']
+            aluno_map_nome, disciplina_map_nome = diario.obter_mapas_do_professor(id_professor)
+
+            # -------------------------------------------------------------------------
+            # 6. ESTRUTURA DE ABAS (TABS) E SEÇÕES DA INTERFACE
+            # -------------------------------------------------------------------------
+
+            abas_titles = ["Lançamento", "Frequência", "Notas", "Relatório"]
+
+            # A aba "Gerenciar Alunos" só aparece para quem não está com acesso restrito
+            is_admin_or_unrestricted = not st.session_state.is_restricted
+            if is_admin_or_unrestricted:
+                abas_titles.append("Gerenciar Alunos")
+
+            abas = st.tabs(abas_titles)
+
+            tab_lancamento = abas[0]
+            tab_frequencia = abas[1]
+            tab_notas = abas[2]
+            tab_relatorio = abas[3]
+            tab_gerenciar_alunos = abas[4] if len(abas) > 4 else None
+
+            # =========================================================================
+            # ABA: LANÇAMENTO DE AULAS
+            # =========================================================================
+            with tab_lancamento:
+                st.header("🗓️ Lançamento de Aulas (Liberado)")
+                with st.form(f"form_aulas_{sufixo}"):
+                    col1, col2, col3 = st.columns(3)
+
+                    disciplina_aula_nome = col1.selectbox('Disciplina', options=list(disciplina_map_nome.keys()), key=f"tab_disc_aula_{sufixo}")
+                    data_input = col2.date_input('Data', value=datetime.date.today(), key=f"tab_data_aula_{sufixo}")
+                    conteudo = col3.text_input('Conteúdo da Aula', key=f"tab_conteudo_aula_{sufixo}")
+
+                    id_disciplina = disciplina_map_nome.get(disciplina_aula_nome)
+
+                    submitted_aula = st.form_submit_button("Lançar Aula e Marcar Todos Presentes")
+
+                    if submitted_aula:
+                        lancar_aula_e_frequencia(diario, id_professor, id_disciplina, data_input.strftime("%Y-%m-%d"), conteudo)
+                        st.rerun()
+
+                st.subheader("📆 Lançar Aulas do Período (em lote)")
+                with st.form(f"form_aulas_periodo_{sufixo}"):
+                    col1, col2, col3 = st.columns(3)
+                    disciplinas_periodo = col1.multiselect('Disciplinas', options=list(disciplina_map_nome.keys()), key=f"disc_periodo_{sufixo}")
+                    data_inicio_periodo = col2.date_input('Início do Período', value=datetime.date.today(), key=f"inicio_periodo_{sufixo}")
+                    data_fim_periodo = col3.date_input('Fim do Período', value=datetime.date.today() + datetime.timedelta(days=120), key=f"fim_periodo_{sufixo}")
+                    dias_periodo = st.multiselect('Dias da Semana', options=list(DIAS_DA_SEMANA.keys()), default=['Segunda', 'Quarta'], key=f"dias_periodo_{sufixo}")
+                    conteudo_periodo = st.text_input('Conteúdo (igual para todas as aulas)', value="Aula regular", key=f"conteudo_periodo_{sufixo}")
+
+                    if st.form_submit_button("Lançar Aulas do Período e Marcar Todos Presentes"):
+                        if disciplinas_periodo and dias_periodo:
+                            lancar_aulas_do_periodo(
+                                diario, id_professor, [disciplina_map_nome[nome] for nome in disciplinas_periodo],
+                                data_inicio_periodo, data_fim_periodo,
+                                [DIAS_DA_SEMANA[dia] for dia in dias_periodo], conteudo_periodo,
+                            )
+                        else:
+                            st.warning("Escolha ao menos uma disciplina e um dia da semana.")
+
+            # =========================================================================
+            # ABA: AJUSTE DE FALTAS (BLOQUEIO CONDICIONAL)
+            # =========================================================================
+            with tab_frequencia:
+                st.header("📋 Ajuste de Faltas Pontuais")
+
+                col1, col2 = st.columns(2)
+                disciplina_chamada_nome = col1.selectbox('Disciplina (Ajuste)', options=list(disciplina_map_nome.keys()), key=f"sel_disc_chamada_tab_{sufixo}")
+                data_consulta = col2.date_input('Data da Aula (Ajuste)', value=datetime.date.today(), key=f"data_chamada_tab_{sufixo}")
+
+                id_disciplina_chamada = disciplina_map_nome.get(disciplina_chamada_nome)
+
+                col_carregar, col_recarregar = st.columns([1, 4])
+
+                if col_carregar.button("Carregar Chamada da Aula", key=f"btn_carregar_chamada_{sufixo}"):
+                    df_frequencia_atual, id_aula_ou_erro = obter_frequencia_por_aula(diario, id_professor, id_disciplina_chamada, data_consulta.strftime("%Y-%m-%d"))
+
+                    if df_frequencia_atual is not None:
+                        st.session_state['df_chamada'] = df_frequencia_atual
+                        st.session_state['id_aula'] = id_aula_ou_erro
+                        st.session_state['msg_chamada'] = f"✅ Chamada Carregada (Aula ID: {id_aula_ou_erro})"
+                    else:
+                        st.session_state['df_chamada'] = None
+                        st.session_state['msg_chamada'] = f"❌ ERRO: {id_aula_ou_erro}"
+
+                if 'df_chamada' in st.session_state and st.session_state['df_chamada'] is not None:
+                    if col_recarregar.button("Recarregar/Atualizar a Lista", key=f"btn_recarregar_chamada_{sufixo}"):
+                        st.rerun()
+
+                if 'msg_chamada' in st.session_state:
+                    st.markdown(st.session_state['msg_chamada'])
+                    if st.session_state['df_chamada'] is not None and not st.session_state['df_chamada'].empty:
+
+                        st.subheader(f"Lista de Alunos e Status (Aula ID: {st.session_state['id_aula']})")
+                        df_chamada = st.session_state['df_chamada']
+                        chave_grade = f"grade_chamada_{sufixo}_{st.session_state['id_aula']}"
+                        # Grade editável: marque/desmarque várias presenças e salve tudo de uma vez
+                        df_grade = st.data_editor(
+                            df_chamada[['Aluno']].assign(Presente=df_chamada['presente'] == 1),
+                            column_config={'Presente': st.column_config.CheckboxColumn('Presente')},
+                            disabled=['Aluno'], hide_index=True, key=chave_grade
+                        )
+
+                        if st.button("Salvar Chamada (todas as alterações)", key=f"btn_salvar_grade_chamada_{sufixo}"):
+                            if st.session_state.is_restricted:
+                                st.error("❌ A alteração de frequência está bloqueada nesta conta de demonstração (modifica dados existentes).")
+                            else:
+                                alteradas = salvar_chamada_editada(diario, id_professor, df_chamada, df_grade)
+                                if alteradas:
+                                    df_chamada = df_chamada.assign(presente=df_grade['Presente'].reindex(df_chamada.index).astype(int))
+                                    df_chamada['Status Atual'] = df_chamada['presente'].apply(lambda x: 'PRESENTE ✅' if x == 1 else 'FALTA 🚫')
+                                    st.session_state['df_chamada'] = df_chamada
+                                    st.session_state['msg_chamada'] = f"✅ {alteradas} presença(s) atualizada(s) em uma única gravação (Aula ID: {st.session_state['id_aula']})"
+                                    st.session_state.pop(chave_grade, None)
+                                    st.rerun()
+                        st.markdown("---")
+
+                        st.subheader("Alterar Status (Falta/Presença)")
+
+                        df_chamada = st.session_state['df_chamada']
+                        opcoes_ajuste = {row['Aluno']: row['id_frequencia'] for index, row in df_chamada.iterrows()}
+                        col_aluno, col_status = st.columns([2, 1])
+
+                        aluno_ajuste = col_aluno.selectbox('Aluno para Ajuste', options=list(opcoes_ajuste.keys()), key=f"sel_aluno_ajuste_{sufixo}")
+                        novo_status_label = col_status.selectbox('Novo Status', options=['PRESENTE', 'FALTA'], key=f"sel_status_ajuste_{sufixo}")
+
+                        if st.button("Salvar Alteração de Frequência", key=f"btn_salvar_frequencia_{sufixo}"):
+
+                            if st.session_state.is_restricted:
+                                st.error("❌ A alteração de frequência está bloqueada nesta conta de demonstração (modifica dados existentes).")
+
+                            else:
+                                id_frequencia_registro = opcoes_ajuste[aluno_ajuste]
+                                novo_status = 1 if novo_status_label == 'PRESENTE' else 0
+
+                                atualizar_status_frequencia(diario, id_professor, id_frequencia_registro, novo_status)
+                                st.info("✅ Atualização salva. Clique em 'Recarregar/Atualizar a Lista' para confirmar.")
+                                st.rerun()
+
+                        if st.session_state.is_restricted:
+                            st.markdown("⚠️ **Aviso:** Este botão está desabilitado para contas de demonstração.")
+
+            # =========================================================================
+            # ABA: LANÇAMENTO DE NOTAS
+            # =========================================================================
+            with tab_notas:
+                st.header("🖊️ Lançamento de Notas (Liberado)")
+                with st.form(f"form_notas_tab_{sufixo}"):
+                    col1, col2, col3, col4 = st.columns(4)
+
+                    aluno_nome = col1.selectbox('Aluno(a)', options=list(aluno_map_nome.keys()), key=f"sel_aluno_nota_{sufixo}")
+                    disciplina_nome = col2.selectbox('Disciplina (Nota)', options=list(disciplina_map_nome.keys()), key=f"disc_nota_tab_{sufixo}")
+                    tipo_avaliacao = col3.selectbox('Avaliação', options=diario.TIPOS_AVALIACAO, key=f"sel_avaliacao_nota_{sufixo}")
+                    valor_nota = col4.number_input('Nota (0-10)', min_value=0.0, max_value=10.0, step=0.5, value=7.0, key=f"input_nota_{sufixo}")
+
+                    id_aluno = aluno_map_nome.get(aluno_nome)
+                    id_disciplina = disciplina_map_nome.get(disciplina_nome)
+
+                    submitted_nota = st.form_submit_button("Inserir/Atualizar Nota")
+
+                    if submitted_nota:
+                        inserir_nota_no_db(diario, id_professor, id_aluno, id_disciplina, tipo_avaliacao, valor_nota)
+                        st.rerun()
+
+                st.subheader("📥 Importar Notas em Lote (CSV/XLSX)")
+                st.caption(f"Colunas: matrícula, disciplina, avaliação ({', '.join(diario.TIPOS_AVALIACAO)}) e nota (0 a 10). Todas as linhas válidas são gravadas de uma vez.")
+                arquivo_notas = st.file_uploader("Planilha de notas", type=['csv', 'xlsx'], key=f"upload_notas_{sufixo}")
+                if arquivo_notas is not None and st.button("Importar Notas", key=f"btn_importar_notas_{sufixo}"):
+                    resultado = importar_notas_em_lote(diario, id_professor, arquivo_notas)
+                    if resultado is not None:
+                        notas_gravadas, df_erros = resultado
+                        st.success(f"✅ {notas_gravadas} nota(s) importada(s) em uma única transação.")
+                        if not df_erros.empty:
+                            st.warning(f"⚠️ {len(df_erros)} linha(s) não importada(s):")
+                            st.dataframe(df_erros, hide_index=True, use_container_width=True)
+
+            # =========================================================================
+            # ABA: RELATÓRIO CONSOLIDADO
+            # =========================================================================
+            with tab_relatorio:
+                st.header("📊 Relatório Consolidado")
+
+                exibir_relatorio_paginado(diario, id_professor, disciplina_map_nome)
+                exibir_exportacao_e_arquivo(diario, id_professor, disciplina_map_nome)
+
+            # =========================================================================
+            # ABA: GERENCIAR ALUNOS (APENAS ADMIN/ILIMITADO)
+            # =========================================================================
+
+            if tab_gerenciar_alunos:
+                with tab_gerenciar_alunos:
+                    st.header("⚙️ Gerenciar Cadastro de Alunos")
+                    st.markdown("---")
+
+                    # --- SEÇÃO ADICIONAR ALUNO ---
+                    st.subheader("➕ Adicionar Novo Aluno")
+                    with st.form(f"form_add_aluno_{sufixo}"):
+                        nome_novo = st.text_input("Nome Completo do Novo Aluno")
+                        matricula_nova = st.text_input("Matrícula (Única)")
+
+                        if st.form_submit_button("Cadastrar Aluno"):
+                            if nome_novo and matricula_nova:
+                                if adicionar_aluno_db(diario, id_professor, nome_novo, matricula_nova):
+                                    st.rerun()
+                            else:
+                                st.warning("Preencha Nome e Matrícula.")
+
+                    st.markdown("---")
+
+                    # --- SEÇÃO REMOVER ALUNO ---
+                    st.subheader("🗑️ Remover Aluno Existente")
+                    st.warning("Remover um aluno apagará TODAS as suas notas e registros de frequência.")
+
+                    with diario.conexao_db(id_professor) as conn:
+                        df_alunos = ler_dataframe(conn, SQL_ALUNOS_DO_PROFESSOR, (id_professor,))
+
+                    opcoes_select = {row['nome']: row['id_aluno'] for index, row in df_alunos.iterrows()}
+
+                    aluno_selecionado = st.selectbox(
+                        'Selecione o Aluno para Remover',
+                        options=[''] + list(opcoes_select.keys()),
+                        key=f"sel_remover_aluno_{sufixo}"
+                    )
+
+                    if aluno_selecionado:
+                        id_aluno_remover = opcoes_select[aluno_selecionado]
+
+                        if st.button(f"CONFIRMAR Remoção de {aluno_selecionado}", key=f"btn_confirmar_remocao_{sufixo}"):
+                            if remover_aluno_db(diario, id_professor, id_aluno_remover, aluno_selecionado):
+                                st.rerun()
+
+                    st.markdown("---")
+
+                    # --- SEÇÃO MANUTENÇÃO DO RELATÓRIO ---
+                    st.subheader("🛠️ Manutenção do Relatório")
+                    st.caption("O relatório lê um resumo atualizado a cada lançamento. Use a reconstrução completa só se os totais parecerem divergentes.")
+                    if st.button("Reconstruir Resumo do Relatório", key=f"btn_reconstruir_resumo_{sufixo}"):
+                        reconstruir_resumo_relatorio(diario, id_professor)
+
+                    # --- SEÇÃO ENCERRAMENTO DO ANO LETIVO (APENAS ADMIN: vale para todos os professores) ---
+                    if is_admin:
+                        exibir_encerramento_do_ano(diario)
+
+            # ALERTAS DE RISCO: desenhados por último, para já refletir o que foi gravado nas seções acima
+            exibir_alertas_de_risco(diario, id_professor)
+
+    # -------------------------------------------------------------------------
+    # 7. LÓGICA DE FALHA DE LOGIN
+    # -------------------------------------------------------------------------
+    elif st.session_state.user_login_name is None:
+        st.info("Insira seu nome de usuário e senha na barra lateral para acessar o Diário de Classe.")
+        return
+
+    st.markdown("---")
@@ -0,0 +1,1562 @@
+# nucleo.py - NÚCLEO SEM INTERFACE DOS DIÁRIOS E DO CRM
+# Acesso a dados e regras comuns aos três diários (raiz, Educação Básica e Faculdade) e ao CRM.
+# Nada aqui chama st.*: as funções recebem o repositório (repositorio_db), devolvem o resultado
+# e levantam ErroDeNegocio (mensagem pronta para o usuário) ou o próprio erro do banco. Os apps
+# Streamlit só traduzem isso em st.success/st.warning/st.error; benchmark, workers e scripts
+# chamam estas funções direto.
+#
+# Diários com vários professores passam id_professor; o diário da raiz (um só usuário) passa None.
+# O SQL do relatório e o do arquivo de cada diário saem daqui, montados a partir das regras de
+# avaliação dele (regras_avaliacao.RegrasCompiladas) e da turma padrão; as migrações também, mas
+# com o que depende das regras congelado em texto literal pelo próprio diário.
+# --- IMPORTS ---
+import datetime
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# numpy/pandas são importados dentro das funções que os usam (a tela de login dos apps não os carrega)
+try: # Importado como meu_projeto.nucleo (diário da raiz) ou como nucleo (apps dentro de meu_projeto/)
+    from .repositorio_db import (
+        ler_dataframe, ler_em_lotes, erros_de_integridade,
+        schema_postgres_diario, schema_postgres_isolamento_por_professor, schema_postgres_alertas_de_risco,
+        schema_postgres_ano_letivo_das_notas,
+    )
+    from .arquivo_parquet import gravar_no_arquivo, remover_do_arquivo, ler_do_arquivo
+    from .exportacao import exportar_em_lotes
+    from .regras_avaliacao import ALERTAS_DE_RISCO
+except ImportError:
+    from repositorio_db import (
+        ler_dataframe, ler_em_lotes, erros_de_integridade,
+        schema_postgres_diario, schema_postgres_isolamento_por_professor, schema_postgres_alertas_de_risco,
+        schema_postgres_ano_letivo_das_notas,
+    )
+    from arquivo_parquet import gravar_no_arquivo, remover_do_arquivo, ler_do_arquivo
+    from exportacao import exportar_em_lotes
+    from regras_avaliacao import ALERTAS_DE_RISCO
+
+# =========================================================================
+# 1. CONSTANTES
+# =========================================================================
+
+NOTA_MAXIMA = 10.0
+
+# Cabeçalho esperado na importação de notas em lote (sem acento, em minúsculas)
+COLUNAS_IMPORTACAO_NOTAS = ['matricula', 'disciplina', 'avaliacao', 'nota']
+
+# Importação de sessões do CRM: colunas obrigatórias (status é opcional) e status aceitos
+COLUNAS_IMPORTACAO_SESSOES = ['cliente', 'data', 'descricao', 'valor']
+STATUS_PAGAMENTO = ['Pago', 'Pendente', 'Cancelado']
+
+# Busca de clientes: quantos resultados entram na ordenação por relevância (ver SQL_BUSCAR_CLIENTES)
+CANDIDATOS_BUSCA_CLIENTES = 1000
+
+# Dias da semana do lançamento em lote -> código de strftime('%w') do SQLite
+DIAS_DA_SEMANA = {'Segunda': '1', 'Terça': '2', 'Quarta': '3', 'Quinta': '4', 'Sexta': '5', 'Sábado': '6', 'Domingo': '0'}
+
+# =========================================================================
+# 2. ERROS DE NEGÓCIO
+# =========================================================================
+
+class ErroDeNegocio(Exception):
+    """Operação recusada por regra de negócio; a mensagem já pode ser mostrada ao usuário."""
+
+class NotaInvalida(ErroDeNegocio):
+    pass
+
+class AvaliacaoInvalida(ErroDeNegocio):
+    pass
+
+class MatriculaDuplicada(ErroDeNegocio):
+    pass
+
+class SemAlunosCadastrados(ErroDeNegocio):
+    pass
+
+class PeriodoInvalido(ErroDeNegocio):
+    pass
+
+class AulaNaoEncontrada(ErroDeNegocio):
+    pass
+
+class DisciplinaNaoEncontrada(ErroDeNegocio):
+    pass
+
+class ChamadaVazia(ErroDeNegocio):
+    pass
+
+class SessaoInvalida(ErroDeNegocio):
+    pass
+
+class AnoLetivoEmAberto(ErroDeNegocio):
+    pass
+
+# =========================================================================
+# 3. SQL COMUM AOS DIÁRIOS
+# =========================================================================
+# O SQL que depende das avaliações de cada diário (relatório, resumo) é montado nas seções 4 e 5.
+
+SQL_LOGIN_PROFESSOR = "SELECT id_professor, usuario, senha, nome_completo, is_admin, data_expiracao FROM Professores WHERE usuario = ? AND senha = ?"
+SQL_STATUS_PROFESSOR = "SELECT nome_completo, is_admin, data_expiracao FROM Professores WHERE usuario = ?"
+
+# Todas as leituras de Alunos/Disciplinas são do professor logado (índices começam por id_professor)
+SQL_ALUNOS_DO_PROFESSOR = "SELECT id_aluno, nome FROM Alunos WHERE id_professor = ? ORDER BY nome"
+SQL_DISCIPLINAS_DO_PROFESSOR = "SELECT id_disciplina, nome_disciplina FROM Disciplinas WHERE id_professor = ? ORDER BY nome_disciplina"
+
+SQL_AULA_POR_TURMA_DISCIPLINA_DATA = "SELECT id_aula FROM Aulas WHERE id_turma = ? AND id_disciplina = ? AND data_aula = ?"
+SQL_AULA_POR_TURMA_DISCIPLINA_DATA_DO_PROFESSOR = """
+    SELECT AU.id_aula FROM Aulas AU JOIN Disciplinas D ON D.id_disciplina = AU.id_disciplina
+    WHERE AU.id_turma = ? AND AU.id_disciplina = ? AND AU.data_aula = ? AND D.id_professor = ?
+"""
+
+SQL_CHAMADA_DA_AULA = """
+    SELECT
+        A.nome AS "Aluno",
+        F.id_frequencia,
+        F.presente
+    FROM Frequencia F
+    JOIN Alunos A ON F.id_aluno = A.id_aluno
+    WHERE F.id_aula = ?
+    ORDER BY A.nome;
+"""
+SQL_CHAMADA_DA_AULA_DO_PROFESSOR = SQL_CHAMADA_DA_AULA.replace("WHERE F.id_aula = ?", "WHERE F.id_aula = ? AND A.id_professor = ?")
+
+SQL_ATUALIZAR_PRESENCA = "UPDATE Frequencia SET presente = ? WHERE id_frequencia = ?"
+
+SQL_REMOVER_ALUNO = [
+    # Ações de DELETAR CASCATA: Notas, Frequência, e depois o Aluno.
+    "DELETE FROM Notas WHERE id_aluno = ?",
+    "DELETE FROM Frequencia WHERE id_aluno = ?",
+    "DELETE FROM Alunos WHERE id_aluno = ?",
+]
+
+# Escritas com banco compartilhado entre professores: só tocam linhas de alunos do professor da sessão
+# (um id vindo de outra sessão, ou forjado, não altera os dados de outro professor)
+SQL_ALUNO_DO_PROFESSOR = "id_aluno IN (SELECT id_aluno FROM Alunos WHERE id_professor = ?)"
+SQL_ATUALIZAR_PRESENCA_DO_PROFESSOR = f"UPDATE Frequencia SET presente = ? WHERE id_frequencia = ? AND {SQL_ALUNO_DO_PROFESSOR}"
+SQL_REMOVER_ALUNO_DO_PROFESSOR = [
+    f"DELETE FROM Notas WHERE id_aluno = ? AND {SQL_ALUNO_DO_PROFESSOR}",
+    f"DELETE FROM Frequencia WHERE id_aluno = ? AND {SQL_ALUNO_DO_PROFESSOR}",
+    "DELETE FROM Alunos WHERE id_aluno = ? AND id_professor = ?",
+]
+
+SQL_INSERIR_AULA = "INSERT INTO Aulas (id_turma, id_disciplina, data_aula, conteudo_lecionado) VALUES (?, ?, ?, ?)"
+# Mesma aula, criada só se a disciplina é do professor (nenhuma linha gravada caso contrário)
+SQL_INSERIR_AULA_DO_PROFESSOR = """
+    INSERT INTO Aulas (id_turma, id_disciplina, data_aula, conteudo_lecionado)
+    SELECT ?, D.id_disciplina, ?, ? FROM Disciplinas D WHERE D.id_disciplina = ? AND D.id_professor = ?
+"""
+
+SQL_ALUNOS = "SELECT id_aluno FROM Alunos"
+SQL_IDS_ALUNOS_DO_PROFESSOR = "SELECT id_aluno FROM Alunos WHERE id_professor = ?"
+SQL_INSERIR_FREQUENCIA = "INSERT INTO Frequencia (id_aula, id_aluno, presente) VALUES (?, ?, ?)"
+SQL_INSERIR_ALUNO = "INSERT INTO Alunos (id_professor, nome, matricula) VALUES (?, ?, ?)"
+
+# Planilha de notas: matrícula -> id_aluno e nome da disciplina -> id_disciplina
+SQL_MATRICULAS = "SELECT matricula, id_aluno FROM Alunos"
+SQL_MATRICULAS_DO_PROFESSOR = "SELECT matricula, id_aluno FROM Alunos WHERE id_professor = ?"
+SQL_NOMES_DISCIPLINAS = "SELECT nome_disciplina, id_disciplina FROM Disciplinas"
+SQL_NOMES_DISCIPLINAS_DO_PROFESSOR = "SELECT nome_disciplina, id_disciplina FROM Disciplinas WHERE id_professor = ?"
+
+# Lançamento em lote: as datas do período são geradas no próprio SQLite (CTE recursiva);
+# datas que já têm aula da mesma turma/disciplina são puladas
+SQL_LANCAR_AULAS_DO_PERIODO = """
+    WITH RECURSIVE Dias(dia) AS (
+        SELECT date(:data_inicio)
+        UNION ALL
+        SELECT date(dia, '+1 day') FROM Dias WHERE dia < date(:data_fim)
+    )
+    INSERT INTO Aulas (id_turma, id_disciplina, data_aula, conteudo_lecionado)
+    SELECT :id_turma, :id_disciplina, dia, :conteudo
+    FROM Dias
+    WHERE instr(:dias_semana, strftime('%w', dia)) > 0
+      AND NOT EXISTS (SELECT 1 FROM Aulas AU WHERE AU.id_turma = :id_turma AND AU.id_disciplina = :id_disciplina AND AU.data_aula = Dias.dia)
+"""
+
+# Mesmo lançamento no PostgreSQL: generate_series no lugar da CTE recursiva, EXTRACT(DOW) no lugar de %w
+SQL_LANCAR_AULAS_DO_PERIODO_POSTGRES = """
+    INSERT INTO Aulas (id_turma, id_disciplina, data_aula, conteudo_lecionado)
+    SELECT :id_turma, :id_disciplina, CAST(Dias.dia AS DATE), :conteudo
+    FROM generate_series(CAST(:data_inicio AS DATE), CAST(:data_fim AS DATE), INTERVAL '1 day') AS Dias(dia)
+    WHERE strpos(:dias_semana, CAST(EXTRACT(DOW FROM Dias.dia) AS TEXT)) > 0
+      AND NOT EXISTS (SELECT 1 FROM Aulas AU WHERE AU.id_turma = :id_turma AND AU.id_disciplina = :id_disciplina AND AU.data_aula = CAST(Dias.dia AS DATE))
+"""
+
+# Por professor, o período só é lançado numa disciplina dele (nos dois bancos)
+SQL_DISCIPLINA_DO_PROFESSOR = "      AND EXISTS (SELECT 1 FROM Disciplinas D WHERE D.id_disciplina = :id_disciplina AND D.id_professor = :id_professor)\n"
+SQL_LANCAR_AULAS_DO_PERIODO_DO_PROFESSOR = SQL_LANCAR_AULAS_DO_PERIODO + SQL_DISCIPLINA_DO_PROFESSOR
+SQL_LANCAR_AULAS_DO_PERIODO_POSTGRES_DO_PROFESSOR = SQL_LANCAR_AULAS_DO_PERIODO_POSTGRES + SQL_DISCIPLINA_DO_PROFESSOR
+
+# Aulas criadas pelo lançamento do período: as de id_aula acima do último antes dele
+SQL_ULTIMA_AULA = "SELECT COALESCE(MAX(id_aula), 0) FROM Aulas"
+SQL_CONTAR_AULAS_NOVAS = "SELECT COUNT(*) FROM Aulas WHERE id_aula > ?"
+
+# Todos os alunos presentes nas aulas criadas depois de id_aula = ?
+SQL_PRESENCAS_DAS_AULAS_NOVAS = """
+    INSERT INTO Frequencia (id_aula, id_aluno, presente)
+    SELECT AU.id_aula, A.id_aluno, 1
+    FROM Aulas AU CROSS JOIN Alunos A
+    WHERE AU.id_aula > ?
+"""
+
+# Mesmo lançamento por professor: só os alunos dele, nas aulas das disciplinas dele
+SQL_PRESENCAS_DAS_AULAS_NOVAS_DO_PROFESSOR = """
+    INSERT INTO Frequencia (id_aula, id_aluno, presente)
+    SELECT AU.id_aula, A.id_aluno, 1
+    FROM Aulas AU
+    JOIN Disciplinas D ON D.id_disciplina = AU.id_disciplina
+    JOIN Alunos A ON A.id_professor = D.id_professor
+    WHERE AU.id_aula > ? AND D.id_professor = ?
+"""
+
+# Upsert de nota: mantém o id_nota e dispara o gatilho de UPDATE do resumo; a nota fica no ano letivo em que
+# foi lançada por último (ver ano_letivo_corrente)
+SQL_GRAVAR_NOTA = """
+    INSERT INTO Notas (id_aluno, id_disciplina, tipo_avaliacao, valor_nota, ano_letivo) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (id_aluno, id_disciplina, tipo_avaliacao) DO UPDATE SET valor_nota = excluded.valor_nota, ano_letivo = excluded.ano_letivo
+"""
+
+SQL_VERSAO_DADOS = "SELECT versao FROM VersaoDados WHERE id = 1"
+SQL_VERSAO_DADOS_DO_PROFESSOR = "SELECT COALESCE(MAX(versao), 0) FROM VersaoDadosProfessor WHERE id_professor = ?"
+# Mesmo upsert, gravado só se aluno e disciplina são do professor
+SQL_GRAVAR_NOTA_DO_PROFESSOR = """
+    INSERT INTO Notas (id_aluno, id_disciplina, tipo_avaliacao, valor_nota, ano_letivo)
+    SELECT A.id_aluno, D.id_disciplina, ?, ?, ?
+    FROM Alunos A JOIN Disciplinas D ON D.id_professor = A.id_professor
+    WHERE A.id_aluno = ? AND D.id_disciplina = ? AND A.id_professor = ?
+    ON CONFLICT (id_aluno, id_disciplina, tipo_avaliacao) DO UPDATE SET valor_nota = excluded.valor_nota, ano_letivo = excluded.ano_letivo
+"""
+
+# Contador global (diário da raiz; nos diários por professor, só até a migração 006)
+SQL_INCREMENTAR_VERSAO_DADOS = "UPDATE VersaoDados SET versao = versao + 1 WHERE id = 1"
+SQL_INCREMENTAR_VERSAO_DO_PROFESSOR = """
+    INSERT INTO VersaoDadosProfessor (id_professor, versao) VALUES (?, 1)
+    ON CONFLICT (id_professor) DO UPDATE SET versao = VersaoDadosProfessor.versao + 1
+"""
+
+# Alunos em risco: só as linhas com nivel_alerta (coluna gerada do resumo, com índice parcial)
+SQL_ALERTAS_DE_RISCO = """
+    SELECT R.nivel_alerta, A.nome AS "Aluno", D.nome_disciplina AS "Disciplina"
+    FROM ResumoAlunoDisciplina R
+    JOIN Alunos A ON A.id_aluno = R.id_aluno
+    JOIN Disciplinas D ON D.id_disciplina = R.id_disciplina
+    WHERE R.nivel_alerta IS NOT NULL
+    ORDER BY R.nivel_alerta, A.nome, D.nome_disciplina
+"""
+SQL_ALERTAS_DE_RISCO_DO_PROFESSOR = """
+    SELECT R.nivel_alerta, A.nome AS "Aluno", D.nome_disciplina AS "Disciplina"
+    FROM ResumoAlunoDisciplina R
+    JOIN Alunos A ON A.id_aluno = R.id_aluno
+    JOIN Disciplinas D ON D.id_disciplina = R.id_disciplina
+    WHERE R.nivel_alerta IS NOT NULL AND A.id_professor = ?
+    ORDER BY R.nivel_alerta, A.nome, D.nome_disciplina
+"""
+
+SQL_INSERIR_SESSAO = """
+    INSERT INTO Sessoes_Atividades
+    (id_cliente, data_servico, descricao_servico, valor_cobrado, status_pagamento)
+    VALUES (?, ?, ?, ?, ?)
+"""
+# Sessão já registrada (mesma chave natural: cliente, data, descrição e valor; índice único idx_sessoes_chave_natural)
+# é ignorada: importar o mesmo arquivo de novo não muda nada
+SQL_IMPORTAR_SESSAO = SQL_INSERIR_SESSAO + "ON CONFLICT DO NOTHING\n"
+
+# Painel de faturamento do CRM: só os agregados mantidos pelos gatilhos (FaturamentoMes,
+# FaturamentoCliente, FaturamentoClienteMes), nunca Sessoes_Atividades, para o custo não
+# crescer com o histórico de sessões
+SQL_FATURAMENTO_POR_MES = """
+    SELECT mes, status_pagamento, total_sessoes, valor_total
+    FROM FaturamentoMes
+    WHERE mes >= ?
+    ORDER BY mes, status_pagamento
+"""
+SQL_FATURAMENTO_POR_STATUS = """
+    SELECT status_pagamento, SUM(total_sessoes) AS total_sessoes, SUM(valor_total) AS valor_total
+    FROM FaturamentoMes
+    GROUP BY status_pagamento
+    ORDER BY status_pagamento
+"""
+# Percorre o índice (status_pagamento, valor_total) do fim para o começo e para no LIMIT
+SQL_MAIORES_CLIENTES = """
+    SELECT C.nome_cliente AS "Cliente", F.total_sessoes, F.valor_total
+    FROM FaturamentoCliente F
+    JOIN Clientes C ON C.id_cliente = F.id_cliente
+    WHERE F.status_pagamento = 'Pago'
+    ORDER BY F.valor_total DESC
+    LIMIT ?
+"""
+SQL_EXTRATO_DO_CLIENTE = """
+    SELECT mes, status_pagamento, total_sessoes, valor_total
+    FROM FaturamentoClienteMes
+    WHERE id_cliente = ? AND mes >= ?
+    ORDER BY mes, status_pagamento
+"""
+SQL_CONTAR_CLIENTES = "SELECT COUNT(*) FROM Clientes"
+
+# Contas a receber: só o índice parcial idx_sessoes_pendentes (sessões pendentes), que cobre tudo que o relatório lê
+SQL_VERSAO_RECEBIVEIS = "SELECT versao FROM VersaoRecebiveis WHERE id = 1"
+# Valor pendente por cliente e faixa de atraso (dias desde data_servico até :hoje), numa só
+# passada pelo índice parcial; {dias_em_aberto} é a subtração de datas de cada banco
+_SQL_ENVELHECIMENTO_RECEBIVEIS = """
+    SELECT C.nome_cliente AS "Cliente", R.sessoes AS "Sessões Pendentes",
+           R.ate_30 AS "0–30 dias", R.ate_60 AS "31–60 dias", R.ate_90 AS "61–90 dias", R.acima_90 AS "90+ dias",
+           R.total AS "Total Pendente", R.maior_atraso AS "Maior Atraso (dias)"
+    FROM (
+        SELECT id_cliente, COUNT(*) AS sessoes,
+               SUM(CASE WHEN dias <= 30 THEN valor ELSE 0 END) AS ate_30,
+               SUM(CASE WHEN dias BETWEEN 31 AND 60 THEN valor ELSE 0 END) AS ate_60,
+               SUM(CASE WHEN dias BETWEEN 61 AND 90 THEN valor ELSE 0 END) AS ate_90,
+               SUM(CASE WHEN dias > 90 THEN valor ELSE 0 END) AS acima_90,
+               SUM(valor) AS total, MAX(dias) AS maior_atraso
+        FROM (
+            SELECT id_cliente, {dias_em_aberto} AS dias, COALESCE(valor_cobrado, 0) AS valor
+            FROM Sessoes_Atividades
+            WHERE status_pagamento = 'Pendente'
+        ) P
+        GROUP BY id_cliente
+    ) R
+    JOIN Clientes C ON C.id_cliente = R.id_cliente
+    ORDER BY R.total DESC, C.nome_cliente
+"""
+SQL_ENVELHECIMENTO_RECEBIVEIS = _SQL_ENVELHECIMENTO_RECEBIVEIS.format(
+    dias_em_aberto="CAST(julianday(:hoje) - julianday(data_servico) AS INTEGER)")
+SQL_ENVELHECIMENTO_RECEBIVEIS_POSTGRES = _SQL_ENVELHECIMENTO_RECEBIVEIS.format(
+    dias_em_aberto="(CAST(:hoje AS DATE) - data_servico)")
+
+# Busca de clientes: índice FTS5 ClientesBusca no SQLite, coluna tsvector busca no PostgreSQL.
+# A relevância só é calculada para os primeiros :candidatos encontrados: um prefixo curto
+# ("c") casa com quase todos os clientes e ordenar todos custaria uma varredura completa.
+SQL_BUSCAR_CLIENTES = """
+    SELECT B.id_cliente, C.nome_cliente, C.contato_principal
+    FROM (
+        SELECT rowid AS id_cliente, rank FROM ClientesBusca WHERE ClientesBusca MATCH :consulta LIMIT :candidatos
+    ) B
+    JOIN Clientes C ON C.id_cliente = B.id_cliente
+    ORDER BY B.rank, C.nome_cliente
+    LIMIT :limite
+"""
+SQL_BUSCAR_CLIENTES_POSTGRES = """
+    SELECT id_cliente, nome_cliente, contato_principal
+    FROM (
+        SELECT id_cliente, nome_cliente, contato_principal, busca FROM Clientes
+        WHERE busca @@ to_tsquery('simple', :consulta) LIMIT :candidatos
+    ) C
+    ORDER BY ts_rank(busca, to_tsquery('simple', :consulta)) DESC, nome_cliente
+    LIMIT :limite
+"""
+SQL_PRIMEIROS_CLIENTES = """
+    SELECT id_cliente, nome_cliente, contato_principal
+    FROM Clientes
+    ORDER BY nome_cliente
+    LIMIT :limite
+"""
+
+# Ano letivo de uma aula = ano de data_aula (:inicio <= data_aula < :fim); o de uma nota, a coluna Notas.ano_letivo.
+# A turma não entra: os lançamentos usam sempre a turma padrão, de um ano para o outro.
+SQL_CONTAR_DO_ANO_LETIVO = """
+    SELECT (SELECT COUNT(*) FROM Aulas WHERE data_aula >= :inicio AND data_aula < :fim),
+           (SELECT COUNT(*) FROM Notas WHERE ano_letivo = :ano_letivo)
+"""
+
+# Ordem importa: a Frequencia sai antes das Aulas (gatilhos do resumo)
+SQL_REMOVER_ANO_LETIVO = (
+    "DELETE FROM Frequencia WHERE id_aula IN (SELECT id_aula FROM Aulas WHERE data_aula >= :inicio AND data_aula < :fim)",
+    "DELETE FROM Notas WHERE ano_letivo = :ano_letivo",
+    "DELETE FROM Aulas WHERE data_aula >= :inicio AND data_aula < :fim",
+)
+
+# =========================================================================
+# 4. SCHEMA DOS DIÁRIOS (resumo materializado, versão dos dados e migrações)
+# =========================================================================
+# Os gatilhos atualizam ResumoAlunoDisciplina dentro da mesma transação de cada escrita em
+# Alunos, Disciplinas, Aulas, Frequencia e Notas; o relatório não precisa agregar nada.
+# As migrações dos diários com vários professores (Educação Básica e Faculdade) ficam aqui;
+# o diário da raiz tem as suas, com os mesmos gatilhos e a mesma reconstrução do resumo.
+
+def gatilhos_resumo_aluno_disciplina(tipos_avaliacao, por_professor=True):
+    """SQL dos gatilhos que mantêm ResumoAlunoDisciplina em dia, linha a linha.
+
+    por_professor=False gera os gatilhos sem a coluna id_professor (diário da raiz e
+    diários por professor antes da migração 006).
+    """
+    mesmo_professor_da_disciplina = " WHERE D.id_professor = NEW.id_professor" if por_professor else ""
+    mesmo_professor_do_aluno = " WHERE id_professor = NEW.id_professor" if por_professor else ""
+    nota_lancada = ", ".join(
+        f"nota_{tipo} = CASE WHEN NEW.tipo_avaliacao = '{tipo}' THEN NEW.valor_nota ELSE nota_{tipo} END"
+        for tipo in tipos_avaliacao)
+    nota_apagada = ", ".join(
+        f"nota_{tipo} = CASE WHEN OLD.tipo_avaliacao = '{tipo}' THEN NULL ELSE nota_{tipo} END"
+        for tipo in tipos_avaliacao)
+    return [
+        # Aluno novo entra com o total de aulas já dadas em cada disciplina (e nenhuma presença)
+        f'''CREATE TRIGGER IF NOT EXISTS trg_resumo_aluno_inserido AFTER INSERT ON Alunos BEGIN
+            INSERT OR IGNORE INTO ResumoAlunoDisciplina (id_aluno, id_disciplina, total_aulas)
+            SELECT NEW.id_aluno, D.id_disciplina, (SELECT COUNT(*) FROM Aulas AU WHERE AU.id_disciplina = D.id_disciplina)
+            FROM Disciplinas D{mesmo_professor_da_disciplina};
+        END;''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_aluno_removido AFTER DELETE ON Alunos BEGIN
+            DELETE FROM ResumoAlunoDisciplina WHERE id_aluno = OLD.id_aluno;
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_resumo_disciplina_inserida AFTER INSERT ON Disciplinas BEGIN
+            INSERT OR IGNORE INTO ResumoAlunoDisciplina (id_aluno, id_disciplina) SELECT id_aluno, NEW.id_disciplina FROM Alunos{mesmo_professor_do_aluno};
+        END;''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_disciplina_removida AFTER DELETE ON Disciplinas BEGIN
+            DELETE FROM ResumoAlunoDisciplina WHERE id_disciplina = OLD.id_disciplina;
+        END;''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_aula_inserida AFTER INSERT ON Aulas BEGIN
+            UPDATE ResumoAlunoDisciplina SET total_aulas = total_aulas + 1 WHERE id_disciplina = NEW.id_disciplina;
+        END;''',
+        # Ao apagar uma aula, apague antes a Frequencia dela (senão as presenças não são descontadas)
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_aula_removida AFTER DELETE ON Aulas BEGIN
+            UPDATE ResumoAlunoDisciplina SET total_aulas = total_aulas - 1 WHERE id_disciplina = OLD.id_disciplina;
+        END;''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_presenca_inserida AFTER INSERT ON Frequencia WHEN NEW.presente = 1 BEGIN
+            UPDATE ResumoAlunoDisciplina SET total_presencas = total_presencas + 1
+            WHERE id_aluno = NEW.id_aluno AND id_disciplina = (SELECT id_disciplina FROM Aulas WHERE id_aula = NEW.id_aula);
+        END;''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_presenca_alterada AFTER UPDATE OF presente ON Frequencia
+        WHEN (NEW.presente = 1) <> (OLD.presente = 1) BEGIN
+            UPDATE ResumoAlunoDisciplina SET total_presencas = total_presencas + (CASE WHEN NEW.presente = 1 THEN 1 ELSE -1 END)
+            WHERE id_aluno = NEW.id_aluno AND id_disciplina = (SELECT id_disciplina FROM Aulas WHERE id_aula = NEW.id_aula);
+        END;''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_presenca_removida AFTER DELETE ON Frequencia WHEN OLD.presente = 1 BEGIN
+            UPDATE ResumoAlunoDisciplina SET total_presencas = total_presencas - 1
+            WHERE id_aluno = OLD.id_aluno AND id_disciplina = (SELECT id_disciplina FROM Aulas WHERE id_aula = OLD.id_aula);
+        END;''',
+        # Nota nova: gatilho de INSERT; o upsert de SQL_GRAVAR_NOTA sobre uma nota existente cai no de UPDATE (trg_resumo_nota_alterada)
+        f'''CREATE TRIGGER IF NOT EXISTS trg_resumo_nota_inserida AFTER INSERT ON Notas BEGIN
+            UPDATE ResumoAlunoDisciplina SET {nota_lancada}
+            WHERE id_aluno = NEW.id_aluno AND id_disciplina = NEW.id_disciplina;
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_resumo_nota_alterada AFTER UPDATE ON Notas BEGIN
+            UPDATE ResumoAlunoDisciplina SET {nota_apagada}
+            WHERE id_aluno = OLD.id_aluno AND id_disciplina = OLD.id_disciplina;
+            UPDATE ResumoAlunoDisciplina SET {nota_lancada}
+            WHERE id_aluno = NEW.id_aluno AND id_disciplina = NEW.id_disciplina;
+        END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_resumo_nota_removida AFTER DELETE ON Notas BEGIN
+            UPDATE ResumoAlunoDisciplina SET {nota_apagada}
+            WHERE id_aluno = OLD.id_aluno AND id_disciplina = OLD.id_disciplina;
+        END;''',
+    ]
+
+def gatilhos_versao_dados_por_professor():
+    """SQL dos gatilhos que sobem a versão do professor dono de cada linha escrita."""
+    # Dono da linha: direto em Alunos/Disciplinas, pela disciplina (Aulas) ou pelo aluno (Frequencia, Notas)
+    origem_do_dono = {
+        'Alunos': "VALUES ({linha}.id_professor, 1)",
+        'Disciplinas': "VALUES ({linha}.id_professor, 1)",
+        'Aulas': "SELECT id_professor, 1 FROM Disciplinas WHERE id_disciplina = {linha}.id_disciplina",
+        'Frequencia': "SELECT id_professor, 1 FROM Alunos WHERE id_aluno = {linha}.id_aluno",
+        'Notas': "SELECT id_professor, 1 FROM Alunos WHERE id_aluno = {linha}.id_aluno",
+    }
+    gatilhos = []
+    for tabela, origem in origem_do_dono.items():
+        for evento in ['INSERT', 'UPDATE', 'DELETE']:
+            linha = "OLD" if evento == 'DELETE' else "NEW"
+            gatilhos.append(
+                f"CREATE TRIGGER IF NOT EXISTS trg_versao_{tabela.lower()}_{evento.lower()} AFTER {evento} ON {tabela} BEGIN "
+                f"INSERT INTO VersaoDadosProfessor (id_professor, versao) {origem.format(linha=linha)} "
+                "ON CONFLICT (id_professor) DO UPDATE SET versao = VersaoDadosProfessor.versao + 1; END;")
+    return gatilhos
+
+# Ano letivo das notas (usado pelo arquivo): as existentes ficam no ano da última aula da disciplina ou,
+# sem aulas, no ano corrente. Mesmo DDL nos diários por professor (migração 008) e no da raiz (006).
+DDL_ANO_LETIVO_DAS_NOTAS = (
+    "ALTER TABLE Notas ADD COLUMN ano_letivo INTEGER",
+    """UPDATE Notas SET ano_letivo = COALESCE(
+        (SELECT CAST(strftime('%Y', MAX(AU.data_aula)) AS INTEGER) FROM Aulas AU WHERE AU.id_disciplina = Notas.id_disciplina),
+        CAST(strftime('%Y', 'now') AS INTEGER))""",
+    "CREATE INDEX IF NOT EXISTS idx_notas_ano_letivo ON Notas (ano_letivo)",
+    "CREATE INDEX IF NOT EXISTS idx_aulas_data ON Aulas (data_aula)",
+)
+
+def sql_reconstruir_resumo(tipos_avaliacao, por_professor=False):
+    """INSERT ... SELECT que recalcula ResumoAlunoDisciplina (colunas nota_<tipo>) a partir de Notas, Aulas e Frequencia.
+
+    por_professor=True recalcula só os alunos e disciplinas do professor :id_professor.
+    """
+    colunas_resumo = ", ".join(f"nota_{tipo}" for tipo in tipos_avaliacao)
+    pivot_notas = ",\n            ".join(f"""MAX(CASE WHEN tipo_avaliacao = '{tipo}' THEN valor_nota ELSE NULL END) AS "{tipo}\""""
+                                      for tipo in tipos_avaliacao)
+    colunas_do_pivot = ", ".join(f'NP."{tipo}"' for tipo in tipos_avaliacao)
+    if por_professor:
+        disciplinas_dele = "id_disciplina IN (SELECT id_disciplina FROM Disciplinas WHERE id_professor = :id_professor)"
+        filtro_notas = filtro_aulas = f"\n        WHERE {disciplinas_dele}"
+        filtro_presencas = f" AND AU.{disciplinas_dele}"
+        alunos_x_disciplinas = "Alunos A JOIN Disciplinas D ON D.id_professor = A.id_professor"
+        filtro_alunos = "\n    WHERE A.id_professor = :id_professor"
+    else:
+        filtro_notas = filtro_aulas = filtro_presencas = filtro_alunos = ""
+        alunos_x_disciplinas = "Alunos A CROSS JOIN Disciplinas D"
+    return f"""
+    INSERT INTO ResumoAlunoDisciplina (id_aluno, id_disciplina, total_presencas, total_aulas, {colunas_resumo})
+    WITH NotasPivot AS (
+        SELECT id_aluno, id_disciplina,
+            {pivot_notas}
+        FROM Notas{filtro_notas}
+        GROUP BY id_aluno, id_disciplina
+    ),
+    AulasPorDisciplina AS (
+        SELECT id_disciplina, COUNT(*) AS Total_Aulas
+        FROM Aulas{filtro_aulas}
+        GROUP BY id_disciplina
+    ),
+    PresencasPorAluno AS (
+        SELECT F.id_aluno, AU.id_disciplina, COUNT(*) AS Total_Presencas
+        FROM Frequencia F
+        JOIN Aulas AU ON AU.id_aula = F.id_aula
+        WHERE F.presente = 1{filtro_presencas}
+        GROUP BY F.id_aluno, AU.id_disciplina
+    )
+    SELECT A.id_aluno, D.id_disciplina,
+        COALESCE(PA.Total_Presencas, 0),
+        COALESCE(AD.Total_Aulas, 0),
+        {colunas_do_pivot}
+    FROM {alunos_x_disciplinas}
+    LEFT JOIN NotasPivot NP ON NP.id_aluno = A.id_aluno AND NP.id_disciplina = D.id_disciplina
+    LEFT JOIN AulasPorDisciplina AD ON AD.id_disciplina = D.id_disciplina
+    LEFT JOIN PresencasPorAluno PA ON PA.id_aluno = A.id_aluno AND PA.id_disciplina = D.id_disciplina{filtro_alunos};
+"""
+
+def reconstruir_resumo(cursor, tipos_avaliacao, id_professor=None):
+    """Recalcula ResumoAlunoDisciplina do zero (todo ou só as linhas das disciplinas do professor)."""
+    if id_professor is None:
+        cursor.execute("DELETE FROM ResumoAlunoDisciplina")
+        cursor.execute(sql_reconstruir_resumo(tipos_avaliacao))
+    else:
+        cursor.execute("DELETE FROM ResumoAlunoDisciplina WHERE id_disciplina IN (SELECT id_disciplina FROM Disciplinas WHERE id_professor = ?)", (id_professor,))
+        cursor.execute(sql_reconstruir_resumo(tipos_avaliacao, por_professor=True), {"id_professor": id_professor})
+
+def migracoes_diario_por_professor(tipos_avaliacao, sql_nivel_alerta):
+    """Migrações SQLite (PRAGMA user_version) dos diários com vários professores, em ordem.
+
+    Cada migração roda uma única vez. Nunca altere uma migração já publicada:
+    acrescente uma nova função ao final da lista. O que depende das regras de avaliação
+    chega como texto literal do diário, congelado como foi publicado: as avaliações
+    (colunas nota_<tipo>, migrações 004 e 006) e a expressão de nivel_alerta (008).
+    """
+
+    def _migracao_001_schema_inicial(cursor):
+        cursor.execute('''CREATE TABLE IF NOT EXISTS Professores (id_professor INTEGER PRIMARY KEY, usuario TEXT UNIQUE NOT NULL, senha TEXT NOT NULL, nome_completo TEXT, is_admin BOOLEAN NOT NULL, data_expiracao DATE);''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS Turmas (id_turma INTEGER PRIMARY KEY, nome_turma TEXT NOT NULL, ano_letivo INTEGER NOT NULL);''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS Alunos (id_aluno INTEGER PRIMARY KEY, nome TEXT NOT NULL, matricula TEXT UNIQUE NOT NULL);''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS Disciplinas (id_disciplina INTEGER PRIMARY KEY, nome_disciplina TEXT UNIQUE NOT NULL);''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS Aulas (id_aula INTEGER PRIMARY KEY, id_turma INTEGER, id_disciplina INTEGER, data_aula DATE NOT NULL, conteudo_lecionado TEXT, FOREIGN KEY (id_turma) REFERENCES Turmas(id_turma), FOREIGN KEY (id_disciplina) REFERENCES Disciplinas(id_disciplina));''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS Notas (id_nota INTEGER PRIMARY KEY, id_aluno INTEGER, id_disciplina INTEGER, tipo_avaliacao TEXT NOT NULL, valor_nota REAL NOT NULL, UNIQUE(id_aluno, id_disciplina, tipo_avaliacao), FOREIGN KEY (id_aluno) REFERENCES Alunos(id_aluno), FOREIGN KEY (id_disciplina) REFERENCES Disciplinas(id_disciplina));''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS Frequencia (id_frequencia INTEGER PRIMARY KEY, id_aula INTEGER, id_aluno INTEGER, presente BOOLEAN NOT NULL, UNIQUE(id_aula, id_aluno), FOREIGN KEY (id_aula) REFERENCES Aulas(id_aula), FOREIGN KEY (id_aluno) REFERENCES Alunos(id_aluno));''')
+
+    def _migracao_002_nome_completo_professores(cursor):
+        # Bancos antigos foram criados antes da coluna nome_completo existir
+        colunas = {linha[1] for linha in cursor.execute("PRAGMA table_info(Professores)")}
+        if 'nome_completo' not in colunas:
+            cursor.execute("ALTER TABLE Professores ADD COLUMN nome_completo TEXT")
+
+    def _migracao_003_indices_consultas(cursor):
+        # Índices dos caminhos quentes (ver consultas_monitoradas / verificar_planos_de_consulta)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_aulas_turma_disciplina_data ON Aulas (id_turma, id_disciplina, data_aula)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_aulas_disciplina ON Aulas (id_disciplina)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_frequencia_aluno_aula ON Frequencia (id_aluno, id_aula)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notas_disciplina_aluno ON Notas (id_disciplina, id_aluno)")
+
+    def _migracao_004_resumo_aluno_disciplina(cursor):
+        # Resumo materializado do relatório: uma linha por (aluno, disciplina), mantida pelos gatilhos
+        colunas_notas = ", ".join(f"nota_{tipo} REAL" for tipo in tipos_avaliacao)
+        cursor.execute(f'''CREATE TABLE IF NOT EXISTS ResumoAlunoDisciplina (id_aluno INTEGER NOT NULL, id_disciplina INTEGER NOT NULL, total_presencas INTEGER NOT NULL DEFAULT 0, total_aulas INTEGER NOT NULL DEFAULT 0, {colunas_notas}, PRIMARY KEY (id_aluno, id_disciplina)) WITHOUT ROWID;''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumo_disciplina ON ResumoAlunoDisciplina (id_disciplina)")
+        for gatilho in gatilhos_resumo_aluno_disciplina(tipos_avaliacao, por_professor=False):
+            cursor.execute(gatilho)
+        reconstruir_resumo(cursor, tipos_avaliacao)
+
+    def _migracao_005_versao_dados(cursor):
+        # Contador incrementado por qualquer escrita nas tabelas do diário (ver gerar_relatorio_final)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS VersaoDados (id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL);''')
+        cursor.execute("INSERT OR IGNORE INTO VersaoDados (id, versao) VALUES (1, 0)")
+        for tabela in ['Alunos', 'Disciplinas', 'Aulas', 'Frequencia', 'Notas']:
+            for evento in ['INSERT', 'UPDATE', 'DELETE']:
+                cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_versao_{tabela.lower()}_{evento.lower()} AFTER {evento} ON {tabela} BEGIN {SQL_INCREMENTAR_VERSAO_DADOS}; END;")
+
+    def _migracao_006_isolamento_por_professor(cursor):
+        # Cada professor só enxerga os próprios alunos e disciplinas: matrícula e nome da disciplina
+        # passam a ser únicos por professor e VersaoDados vira uma versão por professor.
+        # Os dados que já existiam ficam com o primeiro professor cadastrado.
+        dono = cursor.execute("SELECT COALESCE(MIN(id_professor), 1) FROM Professores").fetchone()[0]
+        for (gatilho,) in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            cursor.execute(f"DROP TRIGGER {gatilho}")
+
+        # O SQLite não remove o UNIQUE de uma coluna: as tabelas são recriadas, com os mesmos ids
+        cursor.execute('''CREATE TABLE Alunos_nova (id_aluno INTEGER PRIMARY KEY, id_professor INTEGER NOT NULL, nome TEXT NOT NULL, matricula TEXT NOT NULL, UNIQUE(id_professor, matricula));''')
+        cursor.execute("INSERT INTO Alunos_nova (id_aluno, id_professor, nome, matricula) SELECT id_aluno, ?, nome, matricula FROM Alunos", (dono,))
+        cursor.execute("DROP TABLE Alunos")
+        cursor.execute("ALTER TABLE Alunos_nova RENAME TO Alunos")
+        cursor.execute('''CREATE TABLE Disciplinas_nova (id_disciplina INTEGER PRIMARY KEY, id_professor INTEGER NOT NULL, nome_disciplina TEXT NOT NULL, UNIQUE(id_professor, nome_disciplina));''')
+        cursor.execute("INSERT INTO Disciplinas_nova (id_disciplina, id_professor, nome_disciplina) SELECT id_disciplina, ?, nome_disciplina FROM Disciplinas", (dono,))
+        cursor.execute("DROP TABLE Disciplinas")
+        cursor.execute("ALTER TABLE Disciplinas_nova RENAME TO Disciplinas")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_alunos_professor_nome ON Alunos (id_professor, nome)")
+
+        cursor.execute('''CREATE TABLE IF NOT EXISTS VersaoDadosProfessor (id_professor INTEGER PRIMARY KEY, versao INTEGER NOT NULL);''')
+        cursor.execute("INSERT OR IGNORE INTO VersaoDadosProfessor (id_professor, versao) SELECT ?, versao FROM VersaoDados", (dono,))
+        cursor.execute("DROP TABLE VersaoDados")
+
+        for gatilho in gatilhos_resumo_aluno_disciplina(tipos_avaliacao) + gatilhos_versao_dados_por_professor():
+            cursor.execute(gatilho)
+
+    def _migracao_007_ano_letivo_das_notas(cursor):
+        # As notas ganham o próprio ano letivo: o arquivo de um ano deixa de depender das turmas
+        for comando in DDL_ANO_LETIVO_DAS_NOTAS:
+            cursor.execute(comando)
+
+    def _migracao_008_alertas_de_risco(cursor):
+        # Nível de alerta de cada (aluno, disciplina): coluna gerada do resumo, recalculada só na linha que os gatilhos atualizam.
+        # As notas de corte ficam gravadas na expressão: se mudarem, uma migração nova faz DROP INDEX idx_resumo_alerta,
+        # ALTER TABLE ... DROP COLUMN nivel_alerta e a recria com o texto novo (ver conferir_schema_com_as_regras)
+        cursor.execute(f"ALTER TABLE ResumoAlunoDisciplina ADD COLUMN nivel_alerta INTEGER GENERATED ALWAYS AS ({sql_nivel_alerta}) VIRTUAL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumo_alerta ON ResumoAlunoDisciplina (nivel_alerta) WHERE nivel_alerta IS NOT NULL")
+
+    return [
+        _migracao_001_schema_inicial,
+        _migracao_002_nome_completo_professores,
+        _migracao_003_indices_consultas,
+        _migracao_004_resumo_aluno_disciplina,
+        _migracao_005_versao_dados,
+        _migracao_006_isolamento_por_professor,
+        _migracao_007_ano_letivo_das_notas,
+        _migracao_008_alertas_de_risco,
+    ]
+
+def migracoes_postgres_diario_por_professor(tipos_avaliacao, sql_nivel_alerta):
+    """Migrações PostgreSQL (versão em VersaoSchema): o schema nasce direto no estado final das migrações SQLite.
+
+    Recebem os mesmos textos literais congelados de migracoes_diario_por_professor.
+    """
+
+    def _migracao_pg_001_schema_completo(cursor):
+        for comando in schema_postgres_diario(tipos_avaliacao):
+            cursor.execute(comando)
+
+    def _migracao_pg_002_isolamento_por_professor(cursor):
+        for comando in schema_postgres_isolamento_por_professor():
+            cursor.execute(comando)
+
+    def _migracao_pg_003_ano_letivo_das_notas(cursor):
+        for comando in schema_postgres_ano_letivo_das_notas():
+            cursor.execute(comando)
+
+    def _migracao_pg_004_alertas_de_risco(cursor):
+        for comando in schema_postgres_alertas_de_risco(sql_nivel_alerta):
+            cursor.execute(comando)
+
+    return [
+        _migracao_pg_001_schema_completo,
+        _migracao_pg_002_isolamento_por_professor,
+        _migracao_pg_003_ano_letivo_das_notas,
+        _migracao_pg_004_alertas_de_risco,
+    ]
+
+class SchemaDivergeDasRegras(RuntimeError):
+    """As regras de avaliação mudaram sem uma migração que leve a mudança ao schema."""
+
+def _normalizar_sql(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+def conferir_schema_com_as_regras(regras, tipos_avaliacao_do_schema, sql_nivel_alerta_do_schema):
+    """Recusa subir o diário se o schema congelado pelas migrações não bate com as regras vigentes.
+
+    tipos_avaliacao_do_schema e sql_nivel_alerta_do_schema são os textos literais da última migração que
+    gravou cada um no schema. Sem esta conferência, mudar uma nota de corte em regras_avaliacao.py deixaria o
+    painel de alertas (coluna gerada nivel_alerta) com a regra antiga e o relatório com a nova.
+    """
+    divergencias = []
+    if list(tipos_avaliacao_do_schema) != list(regras.tipos_avaliacao):
+        divergencias.append(f"avaliações do schema {list(tipos_avaliacao_do_schema)} != regras {list(regras.tipos_avaliacao)}")
+    if _normalizar_sql(sql_nivel_alerta_do_schema) != _normalizar_sql(regras.sql_nivel_alerta):
+        divergencias.append("expressão de nivel_alerta do schema != RegrasCompiladas.sql_nivel_alerta")
+    if divergencias:
+        raise SchemaDivergeDasRegras(
+            f"Regras '{regras.nome}' divergem do schema publicado ({'; '.join(divergencias)}). "
+            "Acrescente uma migração que leve as regras novas ao schema; não edite as migrações publicadas.")
+
+def preparar_banco_de_professores(repositorio, professores_demo):
+    """Aplica as migrações e, em banco vazio, cadastra os professores de exemplo
+    [(usuario, senha, nome_completo, is_admin, data_expiracao)]."""
+    repositorio.aplicar_migracoes()
+    with repositorio.conexao() as conn:
+        banco_vazio = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM Professores)").fetchone()[0]
+        if banco_vazio:
+            conn.executemany("INSERT INTO Professores (usuario, senha, nome_completo, is_admin, data_expiracao) VALUES (?, ?, ?, ?, ?) ON CONFLICT DO NOTHING", professores_demo)
+
+def mapas_do_professor(repositorio, id_professor, turma, disciplinas, alunos):
+    """(aluno_map, disciplina_map) {nome: id} do professor.
+
+    No primeiro acesso dele, semeia a turma (id_turma, nome_turma, ano_letivo), as
+    disciplinas e os alunos [(nome, matricula)] de exemplo.
+    """
+    with repositorio.conexao() as conn:
+        sem_dados = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM Disciplinas WHERE id_professor = ?)", (id_professor,)).fetchone()[0]
+        if sem_dados:
+            conn.execute("INSERT INTO Turmas (id_turma, nome_turma, ano_letivo) VALUES (?, ?, ?) ON CONFLICT DO NOTHING", turma)
+            conn.executemany("INSERT INTO Disciplinas (id_professor, nome_disciplina) VALUES (?, ?) ON CONFLICT DO NOTHING",
+                             [(id_professor, nome) for nome in disciplinas])
+            conn.executemany("INSERT INTO Alunos (id_professor, nome, matricula) VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+                             [(id_professor, nome, matricula) for nome, matricula in alunos])
+
+        disciplina_map = {nome_disc: id_disc for id_disc, nome_disc in conn.execute(SQL_DISCIPLINAS_DO_PROFESSOR, (id_professor,))}
+        aluno_map = {nome_aluno: id_aluno for id_aluno, nome_aluno in conn.execute(SQL_ALUNOS_DO_PROFESSOR, (id_professor,))}
+    return aluno_map, disciplina_map
+
+# =========================================================================
+# 5. SQL DO RELATÓRIO, DO ARQUIVO E PLANOS DE CONSULTA
+# =========================================================================
+
+def _sql_linhas_do_relatorio(regras, condicoes, por_professor):
+    """Alunos x Disciplinas com as notas e totais do resumo (uma busca por chave primária por linha).
+
+    Sem professor, o produto é de todos os alunos com todas as disciplinas; por professor, só
+    os alunos e disciplinas do mesmo dono (id_professor = :id_professor ou ?, em `condicoes`).
+    """
+    alunos_x_disciplinas = "Alunos A JOIN Disciplinas D ON D.id_professor = A.id_professor" if por_professor else "Alunos A CROSS JOIN Disciplinas D"
+    filtro = f"\n        WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return f"""SELECT A.id_aluno, D.id_disciplina, A.nome AS "Aluno", D.nome_disciplina AS "Disciplina",
+            {regras.sql_notas_do_resumo()},
+            COALESCE(R.total_presencas, 0) AS "Total_Presencas",
+            COALESCE(R.total_aulas, 0) AS "Total_Aulas"
+        FROM {alunos_x_disciplinas}
+        LEFT JOIN ResumoAlunoDisciplina R ON R.id_aluno = A.id_aluno AND R.id_disciplina = D.id_disciplina{filtro}"""
+
+def sql_relatorio_consolidado(regras, por_professor=True):
+    """Relatório completo, em ordem de aluno e disciplina; por professor, recebe id_professor (?)."""
+    return _sql_linhas_do_relatorio(regras, ["A.id_professor = ?"] if por_professor else [], por_professor) + "\n        ORDER BY A.nome, D.nome_disciplina"
+
+def sql_relatorio_filtrado(regras, condicoes, por_professor=True):
+    """CTEs do relatório com a situação final calculada no próprio SQL.
+
+    Espelha regras.avaliar para que filtro por situação, ordenação e LIMIT/OFFSET
+    rodem no banco. `condicoes` são filtros extras sobre Alunos (A) e Disciplinas (D);
+    por professor, :id_professor entra sempre. Quem chama completa com o SELECT
+    final sobre Situacoes.
+    """
+    if por_professor:
+        condicoes = ["A.id_professor = :id_professor"] + list(condicoes)
+    return f"""
+    WITH Linhas AS (
+        {_sql_linhas_do_relatorio(regras, condicoes, por_professor)}
+    ),
+    {regras.sql_ctes_situacao}"""
+
+def sql_pagina_do_relatorio(regras, id_disciplina, situacao, prefixo_nome, coluna_ordenacao, decrescente, por_professor=True):
+    """(sql_total, sql_pagina, parâmetros dos filtros) de uma página do relatório; só os filtros informados entram.
+
+    Quem executa completa os parâmetros com :limite e :deslocamento (e :id_professor, por professor).
+    """
+    condicoes, parametros = [], {}
+    if id_disciplina is not None:
+        condicoes.append("D.id_disciplina = :id_disciplina")
+        parametros["id_disciplina"] = id_disciplina
+    if prefixo_nome:
+        # '!' escapa os curingas do LIKE digitados no filtro
+        condicoes.append("UPPER(A.nome) LIKE UPPER(:prefixo_nome) ESCAPE '!'")
+        parametros["prefixo_nome"] = prefixo_nome.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+    sql_base = sql_relatorio_filtrado(regras, condicoes, por_professor)
+
+    filtro_situacao = ""
+    if situacao:
+        filtro_situacao = "WHERE situacao_final = :situacao"
+        parametros["situacao"] = situacao
+    direcao = "DESC" if decrescente else "ASC"
+    sql_total = sql_base + f"SELECT COUNT(*) FROM Situacoes {filtro_situacao}"
+    sql_pagina = sql_base + f"""SELECT * FROM Situacoes {filtro_situacao}
+        ORDER BY {coluna_ordenacao} {direcao}, "Aluno", "Disciplina", id_aluno, id_disciplina
+        LIMIT :limite OFFSET :deslocamento"""
+    return sql_total, sql_pagina, parametros
+
+# Ano letivo de uma aula = ano de data_aula; o de uma nota, Notas.ano_letivo (ver SQL_CONTAR_DO_ANO_LETIVO).
+# As notas vão na turma das aulas da disciplina no ano (a menor, para cair numa única partição).
+def conjuntos_arquivo(por_professor=True):
+    """{conjunto do arquivo Parquet: consulta que o alimenta} (:ano_letivo, :inicio, :fim).
+
+    Por professor, cada linha leva o id_professor da disciplina (filtro da leitura do arquivo).
+    """
+    professor = "D.id_professor, " if por_professor else ""
+    return {
+        "aulas": f"""
+    SELECT CAST(:ano_letivo AS INTEGER) AS ano_letivo, AU.id_turma, AU.id_disciplina, {professor}AU.id_aula, AU.data_aula, AU.conteudo_lecionado, D.nome_disciplina
+    FROM Aulas AU
+    JOIN Disciplinas D ON D.id_disciplina = AU.id_disciplina
+    WHERE AU.data_aula >= :inicio AND AU.data_aula < :fim
+""",
+        "frequencia": f"""
+    SELECT CAST(:ano_letivo AS INTEGER) AS ano_letivo, AU.id_turma, AU.id_disciplina, {professor}F.id_aula, F.id_aluno, A.nome, A.matricula, F.presente
+    FROM Aulas AU
+    JOIN Disciplinas D ON D.id_disciplina = AU.id_disciplina
+    JOIN Frequencia F ON F.id_aula = AU.id_aula
+    JOIN Alunos A ON A.id_aluno = F.id_aluno
+    WHERE AU.data_aula >= :inicio AND AU.data_aula < :fim
+""",
+        "notas": f"""
+    WITH TurmaDaDisciplina AS (
+        SELECT id_disciplina, MIN(id_turma) AS id_turma
+        FROM Aulas
+        WHERE data_aula >= :inicio AND data_aula < :fim
+        GROUP BY id_disciplina
+    )
+    SELECT N.ano_letivo, TD.id_turma, N.id_disciplina, {professor}N.id_aluno, A.nome, A.matricula, N.tipo_avaliacao, N.valor_nota
+    FROM Notas N
+    JOIN Disciplinas D ON D.id_disciplina = N.id_disciplina
+    JOIN Alunos A ON A.id_aluno = N.id_aluno
+    LEFT JOIN TurmaDaDisciplina TD ON TD.id_disciplina = N.id_disciplina
+    WHERE N.ano_letivo = :ano_letivo
+""",
+    }
+
+def consultas_monitoradas(regras, id_turma, por_professor=True):
+    """(nome, sql, parâmetros de exemplo, aliases/tabelas em que um SCAN completo é esperado)
+    de todo o SQL que o diário executa depois das migrações, exatamente como o app o executa.
+
+    O SQL de conjuntos_arquivo e da página do relatório vem das mesmas funções que o app usa;
+    tests/test_planos_de_consulta.py confere que toda constante SQL_* dos diários está aqui.
+    """
+    professor = (1,) if por_professor else ()
+    periodo = {"data_inicio": "2026-02-01", "data_fim": "2026-06-30", "id_turma": id_turma, "id_disciplina": 1, "conteudo": "", "dias_semana": "135"}
+    ano = {"ano_letivo": 2025, "inicio": "2025-01-01", "fim": "2026-01-01"}
+    pagina = {"limite": 50, "deslocamento": 0, **({"id_professor": 1} if por_professor else {})}
+    # Página com todos os filtros (disciplina, nome e situação) e sem nenhum: os dois extremos do WHERE
+    total_filtrado, pagina_filtrada, filtros = sql_pagina_do_relatorio(regras, 1, "PENDENTE ⚠️", "Ana", '"Aluno"', False, por_professor)
+    total_sem_filtro, pagina_sem_filtro, _ = sql_pagina_do_relatorio(regras, None, None, "", "nota_final", True, por_professor)
+    # Sem professor, o relatório percorre Alunos x Disciplinas; por professor, busca pelos índices de id_professor
+    relatorio = set() if por_professor else {"A", "D"}
+    consultas = [
+        ("aula_por_turma_disciplina_data", SQL_AULA_POR_TURMA_DISCIPLINA_DATA_DO_PROFESSOR if por_professor else SQL_AULA_POR_TURMA_DISCIPLINA_DATA,
+         (id_turma, 1, "2026-01-01") + professor, set()),
+        ("chamada_da_aula", SQL_CHAMADA_DA_AULA_DO_PROFESSOR if por_professor else SQL_CHAMADA_DA_AULA, (1,) + professor, set()),
+        ("atualizar_presenca", SQL_ATUALIZAR_PRESENCA_DO_PROFESSOR if por_professor else SQL_ATUALIZAR_PRESENCA, (1, 1) + professor, set()),
+        ("inserir_aula", SQL_INSERIR_AULA_DO_PROFESSOR if por_professor else SQL_INSERIR_AULA,
+         (id_turma, "2026-01-01", "", 1, 1) if por_professor else (id_turma, 1, "2026-01-01", ""), set()),
+        ("inserir_frequencia", SQL_INSERIR_FREQUENCIA, (1, 1, 1), set()),
+        ("ultima_aula", SQL_ULTIMA_AULA, (), set()),
+        # A CTE de datas (Dias) é varrida por natureza; a checagem de aula existente usa o índice
+        ("lancar_aulas_do_periodo", SQL_LANCAR_AULAS_DO_PERIODO_DO_PROFESSOR if por_professor else SQL_LANCAR_AULAS_DO_PERIODO,
+         {**periodo, "id_professor": 1} if por_professor else periodo, {"Dias"}),
+        ("contar_aulas_novas", SQL_CONTAR_AULAS_NOVAS, (0,), set()),
+        # Mesmo filtro usado pelos gatilhos de Aulas em ResumoAlunoDisciplina
+        ("resumo_da_disciplina", "UPDATE ResumoAlunoDisciplina SET total_aulas = total_aulas + 1 WHERE id_disciplina = ?", (1,), set()),
+        ("gravar_nota", SQL_GRAVAR_NOTA_DO_PROFESSOR if por_professor else SQL_GRAVAR_NOTA,
+         ("P1", 7.0, 2026, 1, 1, 1) if por_professor else (1, 1, "P1", 7.0, 2026), set()),
+        # Importação em lote: o mesmo upsert, com os mapas da planilha lidos antes
+        ("importar_notas", SQL_GRAVAR_NOTA, (1, 1, "P1", 7.0, 2026), set()),
+        ("matriculas", SQL_MATRICULAS_DO_PROFESSOR if por_professor else SQL_MATRICULAS, professor, set() if por_professor else {"Alunos"}),
+        ("nomes_disciplinas", SQL_NOMES_DISCIPLINAS_DO_PROFESSOR if por_professor else SQL_NOMES_DISCIPLINAS, professor,
+         set() if por_professor else {"Disciplinas"}),
+        ("versao_dados", SQL_VERSAO_DADOS_DO_PROFESSOR if por_professor else SQL_VERSAO_DADOS, professor, set()),
+        # Mesmo comando dos gatilhos de versão; a reconstrução do resumo também o executa
+        ("incrementar_versao_dados", SQL_INCREMENTAR_VERSAO_DO_PROFESSOR if por_professor else SQL_INCREMENTAR_VERSAO_DADOS, professor, set()),
+        ("relatorio_consolidado", sql_relatorio_consolidado(regras, por_professor), professor, relatorio),
+        ("relatorio_paginado_total", total_filtrado, {**pagina, **filtros}, relatorio - {"D"}),
+        ("relatorio_paginado", pagina_filtrada, {**pagina, **filtros}, relatorio - {"D"}),
+        ("relatorio_paginado_sem_filtro_total", total_sem_filtro, pagina, relatorio),
+        ("relatorio_paginado_sem_filtro", pagina_sem_filtro, pagina, relatorio),
+        # Painel de alertas de risco: índice parcial de nivel_alerta (ou alunos do professor), sem varrer o resumo
+        ("alertas_de_risco", SQL_ALERTAS_DE_RISCO_DO_PROFESSOR if por_professor else SQL_ALERTAS_DE_RISCO, professor, set()),
+        # Arquivo do ano letivo: aulas pelo índice de data_aula, notas pelo de ano_letivo
+        ("contar_do_ano_letivo", SQL_CONTAR_DO_ANO_LETIVO, ano, set()),
+        *((f"arquivo_{conjunto}", sql, ano, set()) for conjunto, sql in conjuntos_arquivo(por_professor).items()),
+        *((f"remover_ano_letivo_{i}", sql, ano, set()) for i, sql in enumerate(SQL_REMOVER_ANO_LETIVO, 1)),
+    ]
+    if not por_professor:
+        return consultas + [
+            ("alunos", SQL_ALUNOS, (), {"Alunos"}), # Todos presentes na aula nova
+            ("presencas_das_aulas_novas", SQL_PRESENCAS_DAS_AULAS_NOVAS, (0,), {"A"}),
+            ("remover_notas_do_aluno", SQL_REMOVER_ALUNO[0], (1,), set()),
+            ("remover_frequencia_do_aluno", SQL_REMOVER_ALUNO[1], (1,), set()),
+            ("remover_aluno", SQL_REMOVER_ALUNO[2], (1,), set()),
+        ]
+    return consultas + [
+        ("alunos", SQL_IDS_ALUNOS_DO_PROFESSOR, (1,), set()),
+        ("presencas_das_aulas_novas", SQL_PRESENCAS_DAS_AULAS_NOVAS_DO_PROFESSOR, (0, 1), set()),
+        ("remover_notas_do_aluno", SQL_REMOVER_ALUNO_DO_PROFESSOR[0], (1, 1), set()),
+        ("remover_frequencia_do_aluno", SQL_REMOVER_ALUNO_DO_PROFESSOR[1], (1, 1), set()),
+        ("remover_aluno", SQL_REMOVER_ALUNO_DO_PROFESSOR[2], (1, 1), set()),
+        ("inserir_aluno", SQL_INSERIR_ALUNO, (1, "Aluno", "M1"), set()),
+        ("login_professor", SQL_LOGIN_PROFESSOR, ("usuario", "senha"), set()),
+        ("status_professor", SQL_STATUS_PROFESSOR, ("usuario",), set()),
+        ("alunos_do_professor", SQL_ALUNOS_DO_PROFESSOR, (1,), set()),
+        ("disciplinas_do_professor", SQL_DISCIPLINAS_DO_PROFESSOR, (1,), set()),
+    ]
+
+def verificar_planos_de_consulta(conn, consultas):
+    """Roda EXPLAIN QUERY PLAN em cada consulta de consultas_monitoradas.
+
+    Devolve a lista (nome_da_consulta, detalhe_do_plano) de cada etapa que faz
+    SCAN em uma tabela fora das varreduras esperadas. Lista vazia = nenhuma regressão.
+    """
+    regressoes = []
+    for nome, sql, parametros, scans_permitidos in consultas:
+        for _, _, _, detalhe in conn.execute("EXPLAIN QUERY PLAN " + sql, parametros):
+            # "SCAN CONSTANT ROW" é um SELECT sem FROM (ex.: âncora de CTE), não uma tabela
+            if detalhe.startswith("SCAN ") and detalhe != "SCAN CONSTANT ROW" and detalhe.split()[1] not in scans_permitidos:
+                regressoes.append((nome, detalhe))
+    return regressoes
+
+# =========================================================================
+# 6. CACHES (relatório e permissões)
+# =========================================================================
+
+class CacheRelatorio:
+    """LRU de relatórios prontos {chave: (versao_dados, valor)}, seguro entre threads.
+
+    Uma entrada gravada com outra versão dos dados conta como ausente.
+    """
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave, versao_dados):
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada[0] != versao_dados:
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada[1]
+
+    def guardar(self, chave, versao_dados, valor):
+        with self._trava:
+            # Versões antigas nunca voltam a ser pedidas: basta uma entrada por chave
+            self._entradas[chave] = (versao_dados, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+
+class CacheAcessos:
+    """Cache de permissões com TTL por chave {(tipo, usuario): (expira_em, valor, falhou)}, seguro entre threads.
+
+    Uma resposta obtida com o banco fora do ar (falhou=True) expira em ttl_falha_s,
+    para a próxima tentativa não esperar o TTL inteiro.
+    """
+
+    def __init__(self, ttl_s, ttl_falha_s, max_usuarios):
+        self.ttl_s = ttl_s
+        self.ttl_falha_s = ttl_falha_s
+        self.max_usuarios = max_usuarios
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def guardar(self, chave, valor, falhou=False):
+        ttl = self.ttl_falha_s if falhou else self.ttl_s
+        with self._trava:
+            self._entradas[chave] = (time.monotonic() + ttl, valor, falhou)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_usuarios:
+                self._entradas.popitem(last=False)
+
+    def obter(self, chave, consultar, valor_em_falha):
+        """Devolve (valor, falhou). consultar() só roda sem entrada válida no cache; se o banco falhar,
+        valor_em_falha é guardado por ttl_falha_s para não repetir a tentativa a cada clique."""
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self._entradas.move_to_end(chave)
+                return entrada[1], entrada[2]
+        try:
+            valor, falhou = consultar(), False # Fora da trava: outras sessões não esperam pelo banco
+        except Exception:
+            valor, falhou = valor_em_falha, True
+        self.guardar(chave, valor, falhou)
+        return valor, falhou
+
+    def invalidar(self, chave=None):
+        """Descarta a entrada de um usuário (upgrade, nova expiração, logout) ou, sem chave, o cache inteiro."""
+        with self._trava:
+            if chave is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(chave, None)
+
+def versao_dos_dados(conn, id_professor=None):
+    """Contador que muda a cada escrita: o global ou o do professor."""
+    if id_professor is None:
+        return conn.execute(SQL_VERSAO_DADOS).fetchone()[0]
+    return conn.execute(SQL_VERSAO_DADOS_DO_PROFESSOR, (id_professor,)).fetchone()[0]
+
+# =========================================================================
+# 7. AULAS E FREQUÊNCIA
+# =========================================================================
+
+def lancar_aula_e_frequencia(repositorio, id_turma, id_disciplina, data_aula, conteudo, id_professor=None):
+    """Cria a aula com todos os alunos presentes. Devolve o id_aula.
+
+    Sem alunos cadastrados levanta SemAlunosCadastrados e nada é gravado; por professor,
+    uma disciplina que não é dele levanta DisciplinaNaoEncontrada.
+    """
+    with repositorio.conexao() as conn:
+        if id_professor is None:
+            id_aula = conn.inserir_e_obter_id(SQL_INSERIR_AULA, (id_turma, id_disciplina, data_aula, conteudo), "id_aula")
+            alunos_ids = [linha[0] for linha in conn.execute(SQL_ALUNOS)]
+        else:
+            id_aula = conn.inserir_e_obter_id(SQL_INSERIR_AULA_DO_PROFESSOR, (id_turma, data_aula, conteudo, id_disciplina, id_professor), "id_aula")
+            if id_aula is None:
+                raise DisciplinaNaoEncontrada("Disciplina não encontrada entre as suas. Por favor, recarregue a página.")
+            alunos_ids = [linha[0] for linha in conn.execute(SQL_IDS_ALUNOS_DO_PROFESSOR, (id_professor,))]
+        if not alunos_ids:
+            raise SemAlunosCadastrados("Alunos não encontrados no DB. Por favor, recarregue a página.")
+
+        conn.executemany(SQL_INSERIR_FREQUENCIA, [(id_aula, id_aluno, 1) for id_aluno in alunos_ids])
+    return id_aula
+
+def lancar_aulas_do_periodo(repositorio, id_turma, ids_disciplinas, data_inicio, data_fim, dias_semana, conteudo, id_professor=None):
+    """Cria todas as aulas do período (nos dias da semana escolhidos) e a frequência padrão (todos presentes).
+
+    Tudo numa única transação e só com INSERT ... SELECT: datas e alunos não passam pelo Python.
+    Por professor, disciplinas que não são dele ficam sem aulas. Devolve quantas aulas foram criadas.
+    """
+    if data_fim < data_inicio:
+        raise PeriodoInvalido("A data final deve ser igual ou posterior à data inicial.")
+    with repositorio.conexao() as conn:
+        conn.iniciar_escrita_exclusiva("Aulas") # Trava de escrita antes de ler o último id_aula
+        ultimo_id_aula = conn.execute(SQL_ULTIMA_AULA).fetchone()[0]
+        if id_professor is None:
+            sql_periodo = SQL_LANCAR_AULAS_DO_PERIODO_POSTGRES if conn.dialeto == "postgresql" else SQL_LANCAR_AULAS_DO_PERIODO
+        else:
+            sql_periodo = SQL_LANCAR_AULAS_DO_PERIODO_POSTGRES_DO_PROFESSOR if conn.dialeto == "postgresql" else SQL_LANCAR_AULAS_DO_PERIODO_DO_PROFESSOR
+        for id_disciplina in ids_disciplinas:
+            conn.execute(sql_periodo, {
+                "data_inicio": data_inicio.strftime("%Y-%m-%d"), "data_fim": data_fim.strftime("%Y-%m-%d"),
+                "id_turma": id_turma, "id_disciplina": id_disciplina,
+                "conteudo": conteudo, "dias_semana": "".join(dias_semana),
+                **({} if id_professor is None else {"id_professor": id_professor}),
+            })
+        if id_professor is None:
+            conn.execute(SQL_PRESENCAS_DAS_AULAS_NOVAS, (ultimo_id_aula,))
+        else:
+            conn.execute(SQL_PRESENCAS_DAS_AULAS_NOVAS_DO_PROFESSOR, (ultimo_id_aula, id_professor))
+        return conn.execute(SQL_CONTAR_AULAS_NOVAS, (ultimo_id_aula,)).fetchone()[0]
+
+def obter_chamada_da_aula(repositorio, id_turma, id_disciplina, data_aula, id_professor=None):
+    """(df_chamada, id_aula) da aula da turma/disciplina na data.
+
+    df_chamada traz Aluno, id_frequencia, presente, 'Status Atual' e 'Opção'; por professor,
+    só a aula de uma disciplina dele e só os alunos dele. Levanta AulaNaoEncontrada ou ChamadaVazia.
+    """
+    import numpy as np
+
+    with repositorio.conexao() as conn:
+        if id_professor is None:
+            resultado = conn.execute(SQL_AULA_POR_TURMA_DISCIPLINA_DATA, (id_turma, id_disciplina, data_aula)).fetchone()
+        else:
+            resultado = conn.execute(SQL_AULA_POR_TURMA_DISCIPLINA_DATA_DO_PROFESSOR, (id_turma, id_disciplina, data_aula, id_professor)).fetchone()
+        if not resultado:
+            raise AulaNaoEncontrada("Aula não encontrada para essa data/disciplina.")
+        id_aula = resultado[0]
+        if id_professor is None:
+            df = ler_dataframe(conn, SQL_CHAMADA_DA_AULA, (id_aula,))
+        else:
+            df = ler_dataframe(conn, SQL_CHAMADA_DA_AULA_DO_PROFESSOR, (id_aula, id_professor))
+
+    if df.empty:
+        raise ChamadaVazia(f"Nenhum registro de frequência encontrado para a Aula ID: {id_aula}.")
+
+    df['Status Atual'] = np.where(df['presente'] == 1, 'PRESENTE ✅', 'FALTA 🚫')
+    df['Opção'] = df['id_frequencia'].astype(str) + ' - ' + df['Aluno']
+    return df, id_aula
+
+def atualizar_presenca(repositorio, id_frequencia, novo_status, id_professor=None):
+    with repositorio.conexao() as conn:
+        if id_professor is None:
+            conn.execute(SQL_ATUALIZAR_PRESENCA, (novo_status, id_frequencia))
+        else:
+            conn.execute(SQL_ATUALIZAR_PRESENCA_DO_PROFESSOR, (novo_status, id_frequencia, id_professor))
+
+def presencas_alteradas(df_chamada, df_grade):
+    """[(presente, id_frequencia)] das linhas em que a grade editada difere da chamada carregada."""
+    presente_original = df_chamada['presente'].astype(int).to_numpy()
+    presente_editado = df_grade['Presente'].reindex(df_chamada.index).astype(int).to_numpy()
+    mudou = presente_original != presente_editado
+    return list(zip(presente_editado[mudou].tolist(), df_chamada['id_frequencia'].to_numpy()[mudou].tolist()))
+
+def gravar_presencas(repositorio, alteracoes, id_professor=None):
+    """Grava as alterações de presencas_alteradas num único executemany (uma transação)."""
+    with repositorio.conexao() as conn:
+        if id_professor is None:
+            conn.executemany(SQL_ATUALIZAR_PRESENCA, alteracoes)
+        else:
+            conn.executemany(SQL_ATUALIZAR_PRESENCA_DO_PROFESSOR, [(presente, id_frequencia, id_professor) for presente, id_frequencia in alteracoes])
+    return len(alteracoes)
+
+# =========================================================================
+# 8. NOTAS
+# =========================================================================
+
+def validar_nota(tipo_avaliacao, valor_nota, tipos_avaliacao):
+    if valor_nota is None or valor_nota < 0 or valor_nota > NOTA_MAXIMA:
+        raise NotaInvalida(f"Erro: Insira um valor de nota válido (0.0 a {NOTA_MAXIMA:.1f}).")
+    if tipo_avaliacao not in tipos_avaliacao:
+        raise AvaliacaoInvalida(f"Erro: Tipo de avaliação inválido. Use {', '.join(tipos_avaliacao)}.")
+
+def ano_letivo_corrente():
+    """Ano letivo em que as notas são lançadas agora (o ano civil, como o das aulas pela data_aula)."""
+    return datetime.date.today().year
+
+def gravar_nota(repositorio, id_aluno, id_disciplina, tipo_avaliacao, valor_nota, tipos_avaliacao, id_professor=None):
+    """Valida e grava (insere ou atualiza) a nota do aluno na disciplina, no ano letivo corrente.
+
+    Com id_professor, só grava se o aluno e a disciplina forem dele.
+    """
+    validar_nota(tipo_avaliacao, valor_nota, tipos_avaliacao)
+    with repositorio.conexao() as conn:
+        if id_professor is None:
+            conn.execute(SQL_GRAVAR_NOTA, (id_aluno, id_disciplina, tipo_avaliacao, valor_nota, ano_letivo_corrente()))
+        else:
+            conn.execute(SQL_GRAVAR_NOTA_DO_PROFESSOR, (tipo_avaliacao, valor_nota, ano_letivo_corrente(), id_aluno, id_disciplina, id_professor))
+
+def ler_planilha(arquivo):
+    """Lê o CSV (',' ou ';') ou XLSX enviado, tudo como texto, com o cabeçalho sem acentos e em minúsculas."""
+    import pandas as pd
+
+    if arquivo.name.lower().endswith('.xlsx'):
+        df = pd.read_excel(arquivo, dtype=str)
+    else:
+        cabecalho = arquivo.getvalue()[:1024].decode('utf-8', errors='ignore').split('\n')[0]
+        df = pd.read_csv(arquivo, dtype=str, sep=';' if cabecalho.count(';') > cabecalho.count(',') else ',')
+    df.columns = (df.columns.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+                  .str.strip().str.lower())
+    return df.reset_index(drop=True)
+
+def validar_planilha_de_notas(df_planilha, matricula_map, disciplina_map, tipos_avaliacao):
+    """Validação colunar da planilha (sem laço por linha).
+
+    Devolve (df_validas, df_erros): df_validas com as colunas de SQL_GRAVAR_NOTA (menos o ano letivo) e
+    df_erros com a linha da planilha e o primeiro problema encontrado nela.
+    """
+    import numpy as np
+    import pandas as pd
+
+    faltando = [coluna for coluna in COLUNAS_IMPORTACAO_NOTAS if coluna not in df_planilha.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes na planilha: {', '.join(faltando)}")
+
+    texto = df_planilha[COLUNAS_IMPORTACAO_NOTAS].fillna('').apply(lambda coluna: coluna.str.strip())
+    id_aluno = texto['matricula'].map(matricula_map)
+    id_disciplina = texto['disciplina'].str.casefold().map({nome.casefold(): id_disc for nome, id_disc in disciplina_map.items()})
+    tipo_avaliacao = texto['avaliacao'].str.casefold().map({tipo.casefold(): tipo for tipo in tipos_avaliacao})
+    valor_nota = pd.to_numeric(texto['nota'].str.replace(',', '.', regex=False), errors='coerce')
+
+    erro = pd.Series(np.select(
+        [id_aluno.isna(), id_disciplina.isna(), tipo_avaliacao.isna(), valor_nota.isna(), (valor_nota < 0) | (valor_nota > NOTA_MAXIMA)],
+        ["Matrícula não cadastrada", "Disciplina não cadastrada",
+         f"Avaliação inválida (use {', '.join(tipos_avaliacao)})", "Nota vazia ou não numérica", f"Nota fora do intervalo 0.0 a {NOTA_MAXIMA:.1f}"],
+        default="",
+    ), index=texto.index)
+    valida = erro == ""
+
+    # Mesma (aluno, disciplina, avaliação) mais de uma vez: vale a última linha, como no lançamento manual
+    chave = pd.DataFrame({"id_aluno": id_aluno, "id_disciplina": id_disciplina, "tipo_avaliacao": tipo_avaliacao})
+    repetida = chave[valida].duplicated(keep='last').reindex(texto.index, fill_value=False)
+    erro = erro.mask(repetida, "Avaliação repetida na planilha (vale a última ocorrência)")
+    valida &= ~repetida
+
+    df_validas = pd.DataFrame({
+        "id_aluno": id_aluno[valida].astype(int),
+        "id_disciplina": id_disciplina[valida].astype(int),
+        "tipo_avaliacao": tipo_avaliacao[valida],
+        "valor_nota": valor_nota[valida].astype(float),
+    })
+    df_erros = pd.DataFrame({
+        "Linha": texto.index[~valida] + 2, # +1 do cabeçalho, +1 porque a planilha começa em 1
+        "Matrícula": texto['matricula'][~valida],
+        "Disciplina": texto['disciplina'][~valida],
+        "Avaliação": texto['avaliacao'][~valida],
+        "Nota": texto['nota'][~valida],
+        "Erro": erro[~valida],
+    })
+    return df_validas, df_erros
+
+def importar_notas_em_lote(repositorio, arquivo, tipos_avaliacao, id_professor=None):
+    """Importa a planilha inteira numa única transação. Devolve (notas_gravadas, df_erros)."""
+    df_planilha = ler_planilha(arquivo)
+    with repositorio.conexao() as conn:
+        if id_professor is None:
+            matricula_map = dict(conn.execute(SQL_MATRICULAS))
+            disciplina_map = dict(conn.execute(SQL_NOMES_DISCIPLINAS))
+        else:
+            # Só matrículas e disciplinas do professor: as de outros professores contam como não cadastradas
+            matricula_map = dict(conn.execute(SQL_MATRICULAS_DO_PROFESSOR, (id_professor,)))
+            disciplina_map = dict(conn.execute(SQL_NOMES_DISCIPLINAS_DO_PROFESSOR, (id_professor,)))
+        df_validas, df_erros = validar_planilha_de_notas(df_planilha, matricula_map, disciplina_map, tipos_avaliacao)
+        conn.executemany(SQL_GRAVAR_NOTA, df_validas.assign(ano_letivo=ano_letivo_corrente()).itertuples(index=False, name=None))
+    return len(df_validas), df_erros
+
+# =========================================================================
+# 9. ALUNOS
+# =========================================================================
+
+def adicionar_aluno(repositorio, id_professor, nome, matricula):
+    try:
+        with repositorio.conexao() as conn:
+            conn.execute(SQL_INSERIR_ALUNO, (id_professor, nome, matricula))
+    except erros_de_integridade():
+        raise MatriculaDuplicada(f"Erro: Matrícula '{matricula}' já existe no sistema.") from None
+
+def remover_aluno(repositorio, id_aluno, id_professor=None):
+    """Remove o aluno com as notas e frequências dele, numa transação (com id_professor, só se o aluno for dele)."""
+    with repositorio.conexao() as conn:
+        if id_professor is None:
+            for sql_remocao in SQL_REMOVER_ALUNO:
+                conn.execute(sql_remocao, (id_aluno,))
+        else:
+            for sql_remocao in SQL_REMOVER_ALUNO_DO_PROFESSOR:
+                conn.execute(sql_remocao, (id_aluno, id_professor))
+
+# =========================================================================
+# 10. RELATÓRIO
+# =========================================================================
+
+def gerar_relatorio_final(repositorio, cache, chave, sql_relatorio, montar_relatorio, id_professor=None):
+    """Relatório consolidado pronto (None se não há aluno/disciplina).
+
+    sql_relatorio é a consulta do diário (com id_professor = ? quando houver professor) e
+    montar_relatorio(df) aplica as regras de aprovação dele. SQL e pandas só rodam de
+    novo quando a versão dos dados muda; até lá o resultado sai de `cache`.
+    """
+    with repositorio.conexao() as conn:
+        conn.iniciar_leitura_consistente() # Versão e relatório lidos do mesmo snapshot
+        versao_dados = versao_dos_dados(conn, id_professor)
+        df_final = cache.obter(chave, versao_dados)
+        if df_final is not None:
+            return df_final
+        df_relatorio = ler_dataframe(conn, sql_relatorio, () if id_professor is None else (id_professor,))
+
+    if df_relatorio.empty:
+        return None
+    df_final = montar_relatorio(df_relatorio)
+    cache.guardar(chave, versao_dados, df_final)
+    return df_final
+
+def formatar_nota_vetorizado(serie):
+    """Formata uma coluna de notas com uma casa decimal ('-' quando vazia)."""
+    serie = serie.astype(float)
+    return serie.map("{:.1f}".format).where(serie.notna(), '-')
+
+def montar_relatorio_final(df_relatorio, regras):
+    """Relatório pronto para a tela: notas formatadas, Média Final, frequência e situação pelas regras do diário."""
+    import pandas as pd
+
+    situacao = regras.avaliar(df_relatorio)
+    return pd.DataFrame({
+        "Aluno": df_relatorio['Aluno'], "Disciplina": df_relatorio['Disciplina'],
+        **{coluna: formatar_nota_vetorizado(df_relatorio[coluna]) for coluna in regras.colunas.values()},
+        "Média Final": formatar_nota_vetorizado(situacao['nota_final']),
+        "Frequência (%)": formatar_nota_vetorizado(situacao['frequencia_percentual']),
+        "Situação Final": situacao['situacao_final']
+    })
+
+def consultar_pagina_do_relatorio(repositorio, cache, regras, montar_relatorio, id_disciplina, situacao, prefixo_nome,
+                                  coluna_ordenacao, decrescente, pagina, tamanho_pagina, id_professor=None):
+    """Uma página do relatório, com filtros, ordenação e LIMIT/OFFSET aplicados no banco.
+
+    coluna_ordenacao é uma coluna de Situacoes (ver sql_relatorio_filtrado). Devolve
+    (df_pagina, total_de_linhas_filtradas); o total alimenta a navegação entre páginas.
+    Cada página fica em `cache` até a versão dos dados (do professor) mudar.
+    """
+    sql_total, sql_pagina, parametros = sql_pagina_do_relatorio(regras, id_disciplina, situacao, prefixo_nome, coluna_ordenacao,
+                                                                decrescente, por_professor=id_professor is not None)
+    if id_professor is not None:
+        parametros["id_professor"] = id_professor
+
+    chave = (id_professor, id_disciplina, situacao, prefixo_nome, coluna_ordenacao, decrescente, pagina, tamanho_pagina)
+    with repositorio.conexao() as conn:
+        conn.iniciar_leitura_consistente() # Versão, total e página lidos do mesmo snapshot
+        versao_dados = versao_dos_dados(conn, id_professor)
+        resultado = cache.obter(chave, versao_dados)
+        if resultado is None:
+            total = conn.execute(sql_total, parametros).fetchone()[0]
+            df_relatorio = ler_dataframe(conn, sql_pagina, {
+                **parametros, "limite": tamanho_pagina, "deslocamento": (pagina - 1) * tamanho_pagina,
+            })
+            resultado = (montar_relatorio(df_relatorio), total)
+            cache.guardar(chave, versao_dados, resultado)
+    return resultado
+
+def exportar_relatorio_completo(repositorio, sql_relatorio, montar_relatorio, formato, id_professor=None):
+    """Bytes do relatório completo em CSV, Parquet ou XLSX, lido e gravado lote a lote."""
+    with repositorio.conexao() as conn:
+        conn.iniciar_leitura_consistente()
+        parametros = () if id_professor is None else (id_professor,)
+        lotes = (montar_relatorio(df_lote) for df_lote in ler_em_lotes(conn, sql_relatorio, parametros))
+        return exportar_em_lotes(lotes, formato)
+
+def reconstruir_resumo_relatorio(repositorio, regras, id_professor=None):
+    """Reconstrói o resumo (todo ou só o do professor) e sobe a versão dos dados (manutenção: corrige qualquer divergência)."""
+    with repositorio.conexao() as conn:
+        reconstruir_resumo(conn.cursor(), regras.tipos_avaliacao, id_professor)
+        if id_professor is None:
+            conn.execute(SQL_INCREMENTAR_VERSAO_DADOS)
+        else:
+            conn.execute(SQL_INCREMENTAR_VERSAO_DO_PROFESSOR, (id_professor,))
+
+def listar_alertas_de_risco(repositorio, id_professor=None):
+    """Alunos em risco (Aluno, Disciplina, Alerta), do alerta mais grave para o mais leve.
+
+    O nível já está gravado no resumo, atualizado pelos gatilhos a cada aula, presença
+    ou nota: a leitura só percorre as linhas com alerta, sem montar o relatório.
+    """
+    with repositorio.conexao() as conn:
+        if id_professor is None:
+            df_alertas = ler_dataframe(conn, SQL_ALERTAS_DE_RISCO)
+        else:
+            df_alertas = ler_dataframe(conn, SQL_ALERTAS_DE_RISCO_DO_PROFESSOR, (id_professor,))
+    df_alertas["Alerta"] = df_alertas.pop("nivel_alerta").map(ALERTAS_DE_RISCO)
+    return df_alertas
+
+# =========================================================================
+# 11. ARQUIVO DE ANOS LETIVOS ENCERRADOS (Parquet)
+# =========================================================================
+
+def arquivar_ano_letivo(repositorios, ano_letivo, diretorio, conjuntos):
+    """Move as aulas, frequências e notas do ano letivo de cada repositório para o arquivo Parquet.
+
+    Só anos já encerrados: o corrente (ou um futuro) é recusado com AnoLetivoEmAberto.
+    conjuntos = {nome_do_conjunto: sql}. Em cada banco, exportação e remoção
+    acontecem na mesma transação de escrita (nada muda entre gravar e apagar);
+    se ela falhar, os arquivos gravados são apagados e o erro sobe.
+    Devolve (aulas arquivadas, notas arquivadas).
+    """
+    if ano_letivo >= ano_letivo_corrente():
+        raise AnoLetivoEmAberto(f"Erro: O ano letivo {ano_letivo} ainda não terminou; só anos encerrados podem ser arquivados.")
+    parametros = {"ano_letivo": ano_letivo, "inicio": f"{ano_letivo:04d}-01-01", "fim": f"{ano_letivo + 1:04d}-01-01"}
+    aulas_arquivadas = notas_arquivadas = 0
+    for repositorio in repositorios:
+        caminhos = []
+        try:
+            with repositorio.conexao() as conn:
+                conn.iniciar_escrita_exclusiva("Aulas, Frequencia, Notas")
+                aulas_do_ano, notas_do_ano = conn.execute(SQL_CONTAR_DO_ANO_LETIVO, parametros).fetchone()
+                if aulas_do_ano or notas_do_ano:
+                    for conjunto, sql in conjuntos.items():
+                        caminhos += gravar_no_arquivo(ler_em_lotes(conn, sql, parametros), diretorio, conjunto)
+                    for sql in SQL_REMOVER_ANO_LETIVO:
+                        conn.execute(sql, parametros)
+        except Exception:
+            remover_do_arquivo(caminhos)
+            raise
+        aulas_arquivadas += aulas_do_ano
+        notas_arquivadas += notas_do_ano
+    return aulas_arquivadas, notas_arquivadas
+
+def consolidar_arquivo(df_aulas, df_frequencia, df_notas, regras):
+    """Mesmas colunas do relatório consolidado, calculadas a partir dos conjuntos do arquivo."""
+    import pandas as pd
+
+    chave = ["id_aluno", "nome", "id_disciplina"]
+    presencas = df_frequencia.groupby(chave)["presente"].sum().rename("Total_Presencas")
+    notas = df_notas.pivot_table(index=chave, columns="tipo_avaliacao", values="valor_nota", aggfunc="max")
+    df = pd.concat([presencas, notas.reindex(columns=regras.tipos_avaliacao)], axis=1).reset_index()
+    aulas = df_aulas.groupby(["id_disciplina", "nome_disciplina"]).size().rename("Total_Aulas").reset_index()
+    df = df.merge(aulas, on="id_disciplina", how="left")
+    df["Total_Presencas"] = df["Total_Presencas"].fillna(0).astype(int)
+    df["Total_Aulas"] = df["Total_Aulas"].fillna(0).astype(int)
+    df = df.rename(columns={"nome": "Aluno", "nome_disciplina": "Disciplina", **regras.colunas})
+    return df.sort_values(["Aluno", "Disciplina"], ignore_index=True)
+
+def gerar_relatorio_arquivado(diretorio, regras, montar_relatorio, ano_letivo, id_disciplina=None, id_professor=None):
+    """Relatório consolidado de um ano letivo arquivado (do professor, se houver), lido só das partições pedidas."""
+    filtros = {"ano_letivo": ano_letivo}
+    if id_professor is not None:
+        filtros["id_professor"] = id_professor
+    if id_disciplina is not None:
+        filtros["id_disciplina"] = id_disciplina
+    df_aulas = ler_do_arquivo(diretorio, "aulas", filtros, ["id_disciplina", "nome_disciplina", "id_aula"])
+    df_frequencia = ler_do_arquivo(diretorio, "frequencia", filtros, ["id_disciplina", "id_aluno", "nome", "presente"])
+    df_notas = ler_do_arquivo(diretorio, "notas", filtros, ["id_disciplina", "id_aluno", "nome", "tipo_avaliacao", "valor_nota"])
+    return montar_relatorio(consolidar_arquivo(df_aulas, df_frequencia, df_notas, regras))
+
+# =========================================================================
+# 12. CRM
+# =========================================================================
+
+def inserir_sessao(repositorio, id_cliente, data_servico, descricao, valor, status):
+    """Registra a sessão/atividade do cliente. Devolve o id_sessao."""
+    if valor is not None and valor < 0:
+        raise SessaoInvalida("Erro: O valor cobrado não pode ser negativo.")
+    try:
+        with repositorio.conexao() as conn:
+            return conn.inserir_e_obter_id(SQL_INSERIR_SESSAO, (id_cliente, data_servico, descricao, valor, status), "id_sessao")
+    except erros_de_integridade():
+        raise SessaoInvalida("Erro: Essa sessão já está registrada (mesmo cliente, data, descrição e valor).") from None
+
+def _ler_extrato_ofx(arquivo):
+    """Créditos do extrato OFX como linhas de sessão paga (NAME = cliente, MEMO = descrição)."""
+    import pandas as pd
+
+    bruto = arquivo.getvalue()
+    try:
+        texto = bruto.decode('utf-8')
+    except UnicodeDecodeError:
+        texto = bruto.decode('latin-1') # Bancos brasileiros costumam exportar em Latin-1
+
+    def campo(bloco, tag):
+        encontrado = re.search(rf'<{tag}>([^<\r\n]*)', bloco, re.IGNORECASE)
+        return encontrado.group(1).strip() if encontrado else ''
+
+    linhas = []
+    for bloco in re.findall(r'<STMTTRN>(.*?)</STMTTRN>', texto, re.IGNORECASE | re.DOTALL):
+        valor = campo(bloco, 'TRNAMT').replace(',', '.')
+        if not valor or valor.startswith('-'): # Débitos não são sessões
+            continue
+        data = campo(bloco, 'DTPOSTED')[:8]
+        linhas.append({'cliente': campo(bloco, 'NAME'), 'data': f"{data[:4]}-{data[4:6]}-{data[6:8]}" if len(data) == 8 else data,
+                       'descricao': campo(bloco, 'MEMO'), 'valor': valor, 'status': 'Pago'})
+    return pd.DataFrame(linhas, columns=COLUNAS_IMPORTACAO_SESSOES + ['status'], dtype=str)
+
+def ler_arquivo_de_sessoes(arquivo):
+    """Planilha (CSV/XLSX, ver ler_planilha) ou extrato bancário OFX, no formato de COLUNAS_IMPORTACAO_SESSOES."""
+    if arquivo.name.lower().endswith('.ofx'):
+        return _ler_extrato_ofx(arquivo)
+    return ler_planilha(arquivo)
+
+def validar_planilha_de_sessoes(df_planilha, cliente_map, status_padrao):
+    """Validação colunar das sessões importadas (sem laço por linha).
+
+    cliente_map = {nome ou contato em casefold: id_cliente}. Linhas sem status recebem
+    status_padrao. Devolve (df_validas, df_erros): df_validas já no formato de
+    SQL_IMPORTAR_SESSAO e df_erros com a linha do arquivo e o primeiro problema dela.
+    """
+    import numpy as np
+    import pandas as pd
+
+    faltando = [coluna for coluna in COLUNAS_IMPORTACAO_SESSOES if coluna not in df_planilha.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes no arquivo: {', '.join(faltando)}")
+
+    colunas = COLUNAS_IMPORTACAO_SESSOES + (['status'] if 'status' in df_planilha.columns else [])
+    texto = df_planilha[colunas].fillna('').apply(lambda coluna: coluna.str.strip())
+    if 'status' not in texto.columns:
+        texto['status'] = ''
+    id_cliente = texto['cliente'].str.casefold().map(cliente_map)
+    # Datas no formato ISO (2026-03-01) ou brasileiro (01/03/2026)
+    data_servico = pd.to_datetime(texto['data'], format='%Y-%m-%d', errors='coerce').fillna(
+        pd.to_datetime(texto['data'], format='%d/%m/%Y', errors='coerce'))
+    # Valor com vírgula decimal (1.234,56) ou ponto (1234.56), com ou sem "R$"
+    valor = texto['valor'].str.replace('R$', '', regex=False).str.strip()
+    decimal_com_virgula = valor.str.contains(',', regex=False)
+    valor = pd.to_numeric(valor.where(~decimal_com_virgula,
+                                      valor.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)), errors='coerce')
+    status = texto['status'].str.casefold().map({opcao.casefold(): opcao for opcao in STATUS_PAGAMENTO})
+    status = status.mask(texto['status'] == '', status_padrao)
+
+    erro = pd.Series(np.select(
+        [id_cliente.isna(), data_servico.isna(), valor.isna(), valor < 0, status.isna()],
+        ["Cliente não cadastrado", "Data inválida (use AAAA-MM-DD ou DD/MM/AAAA)", "Valor vazio ou não numérico",
+         "Valor negativo", f"Status inválido (use {', '.join(STATUS_PAGAMENTO)})"],
+        default="",
+    ), index=texto.index)
+    valida = erro == ""
+
+    df_validas = pd.DataFrame({
+        "id_cliente": id_cliente[valida].astype(int),
+        "data_servico": data_servico[valida].dt.strftime('%Y-%m-%d'),
+        "descricao_servico": texto['descricao'][valida],
+        "valor_cobrado": valor[valida].astype(float),
+        "status_pagamento": status[valida],
+    })
+    # Mesma chave natural mais de uma vez no arquivo: vale a primeira linha, como no banco
+    repetida = df_validas.drop(columns="status_pagamento").duplicated(keep='first').reindex(texto.index, fill_value=False)
+    erro = erro.mask(repetida, "Sessão repetida no arquivo (vale a primeira ocorrência)")
+    valida &= ~repetida
+    df_validas = df_validas[~repetida[df_validas.index]]
+
+    df_erros = pd.DataFrame({
+        "Linha": texto.index[~valida] + 2, # +1 do cabeçalho, +1 porque a planilha começa em 1
+        "Cliente": texto['cliente'][~valida],
+        "Data": texto['data'][~valida],
+        "Descrição": texto['descricao'][~valida],
+        "Valor": texto['valor'][~valida],
+        "Erro": erro[~valida],
+    })
+    return df_validas, df_erros
+
+def importar_sessoes_em_lote(repositorio, arquivo, status_padrao):
+    """Importa o arquivo inteiro numa única transação (executemany).
+
+    Sessões já registradas (mesma chave natural) são ignoradas, então importar o mesmo
+    arquivo de novo não duplica nada. Devolve (sessoes_novas, sessoes_ja_registradas, df_erros).
+    """
+    df_planilha = ler_arquivo_de_sessoes(arquivo)
+    with repositorio.conexao() as conn:
+        cliente_map = {}
+        for id_cliente, nome, contato in conn.execute("SELECT id_cliente, nome_cliente, contato_principal FROM Clientes"):
+            cliente_map[nome.casefold()] = id_cliente
+            if contato:
+                cliente_map[contato.casefold()] = id_cliente
+        df_validas, df_erros = validar_planilha_de_sessoes(df_planilha, cliente_map, status_padrao)
+        sessoes_novas = conn.executemany(SQL_IMPORTAR_SESSAO, df_validas.itertuples(index=False, name=None)).rowcount
+    return sessoes_novas, len(df_validas) - sessoes_novas, df_erros
+
+def termos_de_busca(texto):
+    """Palavras do texto digitado, em minúsculas e sem acento (o mesmo que os índices de busca guardam)."""
+    sem_acento = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return re.findall(r"[^\W_]+", sem_acento.casefold())
+
+def buscar_clientes(repositorio, texto, limite):
+    """Até `limite` clientes cujo nome ou contato tenha palavras começando por cada termo digitado.
+
+    Sem termos, devolve os primeiros clientes em ordem alfabética. Só as linhas pedidas saem do
+    banco, qualquer que seja o número de clientes.
+    """
+    termos = termos_de_busca(texto)
+    with repositorio.conexao() as conn:
+        if not termos:
+            return ler_dataframe(conn, SQL_PRIMEIROS_CLIENTES, {"limite": limite})
+        if conn.dialeto == "postgresql":
+            return ler_dataframe(conn, SQL_BUSCAR_CLIENTES_POSTGRES, {"consulta": " & ".join(f"{termo}:*" for termo in termos), "limite": limite, "candidatos": CANDIDATOS_BUSCA_CLIENTES})
+        return ler_dataframe(conn, SQL_BUSCAR_CLIENTES, {"consulta": " ".join(f'"{termo}"*' for termo in termos), "limite": limite, "candidatos": CANDIDATOS_BUSCA_CLIENTES})
+
+def envelhecimento_de_recebiveis(repositorio, cache, hoje=None):
+    """Valor pendente de cada cliente nas faixas 0–30, 31–60, 61–90 e 90+ dias de atraso.
+
+    O resultado fica em `cache` até a próxima mudança em sessões pendentes (VersaoRecebiveis,
+    mantida por gatilhos) ou até o dia virar.
+    """
+    hoje = hoje or datetime.date.today()
+    with repositorio.conexao() as conn:
+        conn.iniciar_leitura_consistente() # Versão e relatório lidos do mesmo snapshot
+        versao_recebiveis = conn.execute(SQL_VERSAO_RECEBIVEIS).fetchone()[0]
+        df_recebiveis = cache.obter(hoje, versao_recebiveis)
+        if df_recebiveis is not None:
+            return df_recebiveis
+        sql = SQL_ENVELHECIMENTO_RECEBIVEIS_POSTGRES if conn.dialeto == "postgresql" else SQL_ENVELHECIMENTO_RECEBIVEIS
+        df_recebiveis = ler_dataframe(conn, sql, {"hoje": hoje.strftime("%Y-%m-%d")})
+    cache.guardar(hoje, versao_recebiveis, df_recebiveis)
+    return df_recebiveis
+
+def mes_inicial(meses, hoje=None):
+    """'AAAA-MM' do primeiro dos últimos `meses` meses (o mês corrente incluso)."""
+    hoje = hoje or datetime.date.today()
+    indice = hoje.year * 12 + hoje.month - 1 - (meses - 1)
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+def painel_de_faturamento(repositorio, meses, maiores_clientes):
+    """Faturamento dos últimos `meses` meses, totais por status e maiores clientes (valor pago).
+
+    Devolve {"por_mes", "por_status", "maiores_clientes"} (DataFrames), lidos dos agregados
+    de faturamento no mesmo snapshot, e "total_clientes".
+    """
+    with repositorio.conexao() as conn:
+        conn.iniciar_leitura_consistente()
+        return {
+            "por_mes": ler_dataframe(conn, SQL_FATURAMENTO_POR_MES, (mes_inicial(meses),)),
+            "por_status": ler_dataframe(conn, SQL_FATURAMENTO_POR_STATUS),
+            "maiores_clientes": ler_dataframe(conn, SQL_MAIORES_CLIENTES, (maiores_clientes,)),
+            "total_clientes": conn.execute(SQL_CONTAR_CLIENTES).fetchone()[0],
+        }
+
+def extrato_do_cliente(repositorio, id_cliente, meses):
+    """Sessões e valor do cliente por mês e status nos últimos `meses` meses."""
+    with repositorio.conexao() as conn:
+        return ler_dataframe(conn, SQL_EXTRATO_DO_CLIENTE, (id_cliente, mes_inicial(meses)))
@@ -0,0 +1,348 @@
+# regras_avaliacao.py - REGRAS DE AVALIAÇÃO DECLARATIVAS (um motor para todos os tipos de curso)
+# Cada tipo de curso é só uma entrada em REGRAS_DE_AVALIACAO: avaliações parciais e pesos, notas
+# de corte, avaliação de recuperação e rótulos das situações. compilar_regras transforma a entrada
+# num avaliador colunar (numpy, uma passada sobre o DataFrame do relatório) e no SQL equivalente
+# (pivot das notas e CTEs da situação final do relatório paginado), em cache por conjunto de regras.
+# Um tipo de curso novo é registrado aqui (ou com registrar_regras), sem outra cópia do app.
+# --- IMPORTS ---
+import functools
+
+# =========================================================================
+# 1. CONSTANTES
+# =========================================================================
+
+SITUACAO_APROVADO_GERAL = "APROVADO GERAL 🟢"
+SITUACAO_PENDENTE = "PENDENTE ⚠️"
+SITUACAO_REPROVADO_GERAL = "REPROVADO GERAL 🔴"
+
+# Nível (coluna nivel_alerta de ResumoAlunoDisciplina) -> texto do alerta; menor = mais grave
+ALERTAS_DE_RISCO = {
+    1: "🔴 Frequência abaixo do mínimo",
+    2: "🔴 Média abaixo da recuperação",
+    3: "🟠 A próxima falta reprova por frequência",
+    4: "🟡 Média abaixo da aprovação",
+}
+
+# Valores assumidos por toda entrada que não os declara
+REGRAS_PADRAO = {
+    "pesos": None,                         # peso de cada parcial, na ordem de "parciais" (None = todas com peso 1)
+    "recuperacao": None,                   # avaliação que recupera a média ((média + ela) / 2); None = aprovação pelo conselho
+    "corte_frequencia": 75,                # frequência mínima (%)
+    "nota_minima_aprovacao": 6.0,          # média parcial que aprova direto
+    "nota_minima_recuperacao": 5.0,        # abaixo dela, reprovado sem recuperação
+    "nota_minima_final": 5.0,              # (média + recuperação) / 2 mínima
+    "media_sobre": "lancadas",             # "lancadas": divide pelo peso das notas lançadas; "todas": nota que falta vale zero
+    "exige_todas_as_parciais": True,       # sem todas as parciais, fica pendente (não vai à recuperação nem reprova)
+    "aprovacao_exige_todas_as_parciais": False,
+    "reprovacao_por_nota_e_geral": False,  # True: reprovado por nota aparece como REPROVADO GERAL na situação final
+    "rotulos_colunas": {},                 # avaliação -> nome da coluna no relatório (padrão: o próprio tipo)
+    "rotulo_aprovado": "APROVADO",
+    "rotulo_aprovado_recuperacao": "APROVADO (Recuperação)",
+    "rotulo_pendente_recuperacao": "PENDENTE (Recuperação)",
+    "rotulo_pendente_parciais": "PENDENTE ({lancadas} de {total} Avaliações)",
+    "rotulo_reprovado": "REPROVADO POR NOTA",
+    "rotulo_reprovado_direto": "REPROVADO POR NOTA",
+    "rotulo_sem_notas": None,              # situação própria para quem não tem nenhuma nota (None = segue as regras)
+}
+
+# =========================================================================
+# 2. REGISTRO
+# =========================================================================
+
+REGRAS_DE_AVALIACAO = {
+    # Diário da raiz: média de P1 e P2 (a que falta vale zero); P3 recupera quem fica entre 4 e 7
+    "p1_p2_recuperacao_p3": {
+        "parciais": ["P1", "P2"],
+        "recuperacao": "P3",
+        "nota_minima_aprovacao": 7.0,
+        "nota_minima_recuperacao": 4.0,
+        "media_sobre": "todas",
+        "exige_todas_as_parciais": False,
+        "reprovacao_por_nota_e_geral": True,
+        "rotulo_aprovado": "APROVADO POR MÉDIA",
+        "rotulo_aprovado_recuperacao": "APROVADO APÓS P3",
+        "rotulo_pendente_recuperacao": "PENDENTE (AGUARDANDO P3)",
+        "rotulo_reprovado_direto": "REPROVADO DIRETO",
+    },
+    # Educação Básica: média dos 4 bimestres; entre 5 e 6 aprova pelo conselho
+    "educacao_basica_bimestral": {
+        "parciais": ["B1", "B2", "B3", "B4"],
+        "aprovacao_exige_todas_as_parciais": True,
+        "rotulo_aprovado_recuperacao": "APROVADO (Conselho)",
+        "rotulo_pendente_parciais": "PENDENTE ({lancadas} de {total} Bimestres)",
+        "rotulo_sem_notas": "SEM NOTAS",
+    },
+    # Ensino Superior: média de P1-P3; entre 4 e 7 (com as 3 provas) vai ao Exame Final
+    "ensino_superior_exame_final": {
+        "parciais": ["P1", "P2", "P3"],
+        "recuperacao": "Final",
+        "nota_minima_aprovacao": 7.0,
+        "nota_minima_recuperacao": 4.0,
+        "rotulos_colunas": {"Final": "Exame Final"},
+        "rotulo_aprovado_recuperacao": "APROVADO (Final)",
+        "rotulo_pendente_recuperacao": "PENDENTE (Exame Final)",
+        "rotulo_pendente_parciais": "PENDENTE ({lancadas} de {total} Provas)",
+    },
+}
+
+def registrar_regras(nome, regras):
+    """Registra (ou substitui) um conjunto de regras; a próxima compilar_regras(nome) já usa a versão nova."""
+    desconhecidas = set(regras) - set(REGRAS_PADRAO) - {"parciais"}
+    if desconhecidas:
+        raise ValueError(f"Regras de avaliação desconhecidas em '{nome}': {', '.join(sorted(desconhecidas))}")
+    if not regras.get("parciais"):
+        raise ValueError(f"O conjunto de regras '{nome}' precisa de ao menos uma avaliação parcial.")
+    REGRAS_DE_AVALIACAO[nome] = regras
+    compilar_regras.cache_clear()
+
+# =========================================================================
+# 3. COMPILAÇÃO (avaliador colunar + SQL equivalente)
+# =========================================================================
+
+def _sql_numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class RegrasCompiladas:
+    """Conjunto de regras pronto para uso: avaliar(df) e os trechos de SQL que espelham a avaliação."""
+
+    def __init__(self, nome, regras):
+        regras = {**REGRAS_PADRAO, **regras}
+        self.nome = nome
+        self.parciais = list(regras["parciais"])
+        self.recuperacao = regras["recuperacao"]
+        self.pesos = list(regras["pesos"] or [1] * len(self.parciais))
+        if len(self.pesos) != len(self.parciais):
+            raise ValueError(f"'{nome}': {len(self.pesos)} peso(s) para {len(self.parciais)} avaliação(ões) parcial(is).")
+        if regras["media_sobre"] not in ("lancadas", "todas"):
+            raise ValueError(f"'{nome}': media_sobre deve ser 'lancadas' ou 'todas'.")
+        self.regras = regras
+        self.corte_frequencia = regras["corte_frequencia"]
+
+        # Avaliações lançáveis (cada uma vira a coluna nota_<tipo> de ResumoAlunoDisciplina)
+        self.tipos_avaliacao = self.parciais + ([self.recuperacao] if self.recuperacao else [])
+        self.colunas = {tipo: regras["rotulos_colunas"].get(tipo, tipo) for tipo in self.tipos_avaliacao}
+
+        situacoes_por_nota = [] if regras["reprovacao_por_nota_e_geral"] else [regras["rotulo_reprovado"], regras["rotulo_reprovado_direto"]]
+        if regras["rotulo_sem_notas"]:
+            situacoes_por_nota.append(regras["rotulo_sem_notas"])
+        # Valores possíveis de situacao_final (filtro do relatório), sem repetição
+        self.situacoes_finais = list(dict.fromkeys(
+            [SITUACAO_APROVADO_GERAL, SITUACAO_PENDENTE, SITUACAO_REPROVADO_GERAL] + situacoes_por_nota))
+
+        self.sql_ctes_situacao = self._gerar_sql_ctes_situacao()
+        self.sql_nivel_alerta = self._gerar_sql_nivel_alerta()
+
+    # --- SQL ---
+
+    def sql_notas_do_resumo(self, alias="R"):
+        """Colunas de nota do relatório lidas de ResumoAlunoDisciplina (ex.: R.nota_P1 AS "P1")."""
+        return ", ".join(f'{alias}.nota_{tipo} AS "{self.colunas[tipo]}"' for tipo in self.tipos_avaliacao)
+
+    def _gerar_sql_ctes_situacao(self):
+        """CTEs Contagens, Medias e Situacoes sobre a CTE Linhas (notas por rótulo, Total_Presencas e Total_Aulas).
+
+        Mesmo resultado de avaliar(): nota_final e situacao_final calculadas no banco,
+        para que filtro por situação, ordenação e LIMIT/OFFSET rodem lá.
+        """
+        r = self.regras
+        total = len(self.parciais)
+        colunas = [f'"{self.colunas[tipo]}"' for tipo in self.parciais]
+        pesos_unitarios = all(peso == 1 for peso in self.pesos)
+
+        num_notas = " + ".join(f"CASE WHEN {coluna} IS NOT NULL THEN 1 ELSE 0 END" for coluna in colunas)
+        soma_notas = " + ".join(
+            f"COALESCE({coluna}, 0.0)" + ("" if peso == 1 else f" * {_sql_numero(peso)}")
+            for coluna, peso in zip(colunas, self.pesos))
+        contagens = [f"{num_notas} AS num_notas", f"{soma_notas} AS soma_notas"]
+        if not pesos_unitarios:
+            peso_notas = " + ".join(f"CASE WHEN {coluna} IS NOT NULL THEN {_sql_numero(peso)} ELSE 0 END"
+                                    for coluna, peso in zip(colunas, self.pesos))
+            contagens.append(f"{peso_notas} AS peso_notas")
+        if r["media_sobre"] == "todas":
+            media_parcial = f"soma_notas / {_sql_numero(sum(self.pesos))}"
+        else:
+            media_parcial = f"CASE WHEN num_notas > 0 THEN soma_notas / {'num_notas' if pesos_unitarios else 'peso_notas'} ELSE 0.0 END"
+
+        aprovado = [f"media_parcial >= {_sql_numero(r['nota_minima_aprovacao'])}"]
+        if r["aprovacao_exige_todas_as_parciais"]:
+            aprovado.append(f"num_notas = {total}")
+        elif r["rotulo_sem_notas"]:
+            aprovado.append("num_notas > 0")
+        na_faixa = [f"media_parcial >= {_sql_numero(r['nota_minima_recuperacao'])}"]
+        if r["exige_todas_as_parciais"]:
+            na_faixa.append(f"num_notas = {total}")
+        elif r["rotulo_sem_notas"]:
+            na_faixa.append("num_notas > 0")
+        aprovado, na_faixa = " AND ".join(aprovado), " AND ".join(na_faixa)
+
+        casos = [f"WHEN frequencia < {_sql_numero(self.corte_frequencia)} THEN '{SITUACAO_REPROVADO_GERAL}'"]
+        if r["rotulo_sem_notas"]:
+            casos.append(f"WHEN num_notas = 0 THEN '{r['rotulo_sem_notas']}'")
+        casos.append(f"WHEN {aprovado} THEN '{SITUACAO_APROVADO_GERAL}'")
+        if self.recuperacao:
+            recuperacao = f'"{self.colunas[self.recuperacao]}"'
+            nota_com_recuperacao = f"(media_parcial + {recuperacao}) / 2"
+            nota_final = (f"CASE WHEN NOT ({aprovado}) AND {na_faixa} AND {recuperacao} IS NOT NULL\n"
+                          f"                THEN {nota_com_recuperacao} ELSE media_parcial END")
+            casos.append(f"WHEN {na_faixa} AND {recuperacao} IS NULL THEN '{SITUACAO_PENDENTE}'")
+            casos.append(f"WHEN {na_faixa} AND {nota_com_recuperacao} >= {_sql_numero(r['nota_minima_final'])} THEN '{SITUACAO_APROVADO_GERAL}'")
+        else:
+            nota_final = "media_parcial"
+            casos.append(f"WHEN {na_faixa} THEN '{SITUACAO_APROVADO_GERAL}'")
+        if r["exige_todas_as_parciais"]:
+            casos.append(f"WHEN num_notas < {total} THEN '{SITUACAO_PENDENTE}'")
+        if r["reprovacao_por_nota_e_geral"]:
+            casos.append(f"ELSE '{SITUACAO_REPROVADO_GERAL}'")
+        elif r["rotulo_reprovado"] != r["rotulo_reprovado_direto"]:
+            casos.append(f"WHEN {na_faixa} THEN '{r['rotulo_reprovado']}'")
+            casos.append(f"ELSE '{r['rotulo_reprovado_direto']}'")
+        else:
+            casos.append(f"ELSE '{r['rotulo_reprovado']}'")
+        casos = "\n                ".join(casos)
+        contagens = ",\n            ".join(contagens)
+
+        return f"""Contagens AS (
+        SELECT L.*,
+            {contagens},
+            CASE WHEN "Total_Aulas" > 0 THEN "Total_Presencas" * 1.0 / "Total_Aulas" * 100 ELSE 0.0 END AS frequencia
+        FROM Linhas L
+    ),
+    Medias AS (
+        SELECT C.*, {media_parcial} AS media_parcial
+        FROM Contagens C
+    ),
+    Situacoes AS (
+        SELECT M.*,
+            {nota_final} AS nota_final,
+            CASE
+                {casos}
+            END AS situacao_final
+        FROM Medias M
+    )
+    """
+
+    def _gerar_sql_nivel_alerta(self):
+        """Nível de ALERTAS_DE_RISCO de uma linha de ResumoAlunoDisciplina (NULL = sem alerta).
+
+        Usa só as colunas da própria linha (presenças, aulas e notas já lançadas), para virar
+        coluna gerada: os gatilhos que atualizam o resumo a cada escrita recalculam o alerta
+        daquela linha, sem varrer o relatório. A média é a das notas lançadas até agora.
+        """
+        r = self.regras
+        corte = _sql_numero(self.corte_frequencia)
+        soma_lancada = " + ".join(
+            f"COALESCE(nota_{tipo}, 0.0)" + ("" if peso == 1 else f" * {_sql_numero(peso)}")
+            for tipo, peso in zip(self.parciais, self.pesos))
+        peso_lancado = " + ".join(f"CASE WHEN nota_{tipo} IS NOT NULL THEN {_sql_numero(peso)} ELSE 0 END"
+                                  for tipo, peso in zip(self.parciais, self.pesos))
+        sem_recuperacao = f"nota_{self.recuperacao} IS NULL AND " if self.recuperacao else ""
+
+        def media_abaixo_de(nota):
+            return f"{sem_recuperacao}({peso_lancado}) > 0 AND ({soma_lancada}) < {_sql_numero(nota)} * ({peso_lancado})"
+
+        return f"""CASE
+            WHEN total_aulas > 0 AND total_presencas * 100 < {corte} * total_aulas THEN 1
+            WHEN {media_abaixo_de(r['nota_minima_recuperacao'])} THEN 2
+            WHEN total_aulas > 0 AND total_presencas * 100 < {corte} * (total_aulas + 1) THEN 3
+            WHEN {media_abaixo_de(r['nota_minima_aprovacao'])} THEN 4
+        END"""
+
+    # --- AVALIAÇÃO COLUNAR ---
+
+    def avaliar(self, df_relatorio):
+        """Situação de todas as linhas do relatório numa passada colunar.
+
+        Recebe o DataFrame do relatório (uma coluna por avaliação, com o rótulo de
+        self.colunas, mais Total_Presencas e Total_Aulas) e devolve as colunas
+        media_parcial, nota_final, frequencia_percentual, situacao_nota,
+        situacao_frequencia e situacao_final, com o mesmo índice.
+        """
+        import numpy as np
+        import pandas as pd
+
+        r = self.regras
+        linhas = len(df_relatorio)
+        total = len(self.parciais)
+        num_notas = np.zeros(linhas, dtype=int)
+        soma_notas = np.zeros(linhas)
+        peso_notas = np.zeros(linhas)
+        for tipo, peso in zip(self.parciais, self.pesos):
+            notas = df_relatorio[self.colunas[tipo]].astype(float).to_numpy()
+            lancada = ~np.isnan(notas)
+            num_notas += lancada
+            soma_notas = soma_notas + np.where(lancada, notas, 0.0) * peso
+            peso_notas = peso_notas + lancada * peso
+
+        if r["media_sobre"] == "todas":
+            media_parcial = soma_notas / sum(self.pesos)
+        else:
+            media_parcial = np.divide(soma_notas, peso_notas, out=np.zeros(linhas), where=num_notas > 0)
+
+        completo = num_notas == total
+        sem_notas = (num_notas == 0) if r["rotulo_sem_notas"] else np.zeros(linhas, dtype=bool)
+        aprovado_media = (media_parcial >= r["nota_minima_aprovacao"]) & ~sem_notas
+        if r["aprovacao_exige_todas_as_parciais"]:
+            aprovado_media &= completo
+        na_faixa = ~aprovado_media & ~sem_notas & (media_parcial >= r["nota_minima_recuperacao"])
+        if r["exige_todas_as_parciais"]:
+            na_faixa &= completo
+
+        if self.recuperacao:
+            recuperacao = df_relatorio[self.colunas[self.recuperacao]].astype(float).to_numpy()
+            tem_recuperacao = ~np.isnan(recuperacao)
+            com_recuperacao = na_faixa & tem_recuperacao
+            nota_final = np.where(com_recuperacao, (media_parcial + np.where(tem_recuperacao, recuperacao, 0.0)) / 2, media_parcial)
+            aprovado_recuperacao = com_recuperacao & (nota_final >= r["nota_minima_final"])
+            pendente_recuperacao = na_faixa & ~tem_recuperacao
+        else: # Sem avaliação de recuperação: a faixa aprova pelo conselho
+            nota_final = media_parcial
+            aprovado_recuperacao = na_faixa
+            pendente_recuperacao = np.zeros(linhas, dtype=bool)
+        pendente_parciais = ~aprovado_media & ~na_faixa & ~sem_notas & ~completo if r["exige_todas_as_parciais"] else np.zeros(linhas, dtype=bool)
+
+        antes, depois = r["rotulo_pendente_parciais"].format(lancadas="\0", total=total).split("\0")
+        situacao_nota = np.select(
+            [aprovado_media, aprovado_recuperacao, pendente_recuperacao, pendente_parciais, sem_notas, na_faixa],
+            [r["rotulo_aprovado"], r["rotulo_aprovado_recuperacao"], r["rotulo_pendente_recuperacao"],
+             antes + num_notas.astype(str).astype(object) + depois, r["rotulo_sem_notas"] or "", r["rotulo_reprovado"]],
+            default=r["rotulo_reprovado_direto"],
+        )
+
+        total_aulas = df_relatorio['Total_Aulas'].astype(float).fillna(0).to_numpy()
+        total_presencas = df_relatorio['Total_Presencas'].astype(float).fillna(0).to_numpy()
+        frequencia_percentual = np.divide(
+            total_presencas * 1.0, total_aulas, out=np.zeros(linhas), where=total_aulas > 0
+        ) * 100
+        reprovado_falta = frequencia_percentual < self.corte_frequencia
+
+        situacao_frequencia = np.where(reprovado_falta, "REPROVADO POR FALTA", "APROVADO POR FREQUÊNCIA")
+        situacao_final = np.select(
+            [reprovado_falta, aprovado_media | aprovado_recuperacao, pendente_recuperacao | pendente_parciais, sem_notas],
+            [SITUACAO_REPROVADO_GERAL, SITUACAO_APROVADO_GERAL, SITUACAO_PENDENTE, situacao_nota],
+            default=SITUACAO_REPROVADO_GERAL if r["reprovacao_por_nota_e_geral"] else situacao_nota,
+        )
+
+        return pd.DataFrame({
+            "media_parcial": media_parcial,
+            "nota_final": nota_final,
+            "frequencia_percentual": frequencia_percentual,
+            "situacao_nota": situacao_nota,
+            "situacao_frequencia": situacao_frequencia,
+            "situacao_final": situacao_final,
+        }, index=df_relatorio.index)
+
+    def calcular_media_final(self, avaliacoes):
+        """(nota_final, situacao_nota, media_parcial) de um aluno; `avaliacoes` é {tipo: nota ou None}."""
+        import pandas as pd
+
+        linha = pd.DataFrame({self.colunas[tipo]: [avaliacoes.get(tipo)] for tipo in self.tipos_avaliacao})
+        linha["Total_Presencas"], linha["Total_Aulas"] = 0, 0
+        situacao = self.avaliar(linha).iloc[0]
+        return situacao["nota_final"], situacao["situacao_nota"], situacao["media_parcial"]
+
+@functools.lru_cache(maxsize=None)
+def compilar_regras(nome):
+    """RegrasCompiladas do conjunto registrado com esse nome (compilado uma vez por processo)."""
+    if nome not in REGRAS_DE_AVALIACAO:
+        raise KeyError(f"Conjunto de regras de avaliação não registrado: '{nome}'")
+    return RegrasCompiladas(nome, REGRAS_DE_AVALIACAO[nome])
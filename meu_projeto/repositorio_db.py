@@ -0,0 +1,559 @@
+# repositorio_db.py - CAMADA DE ARMAZENAMENTO COMPARTILHADA (SQLite local OU PostgreSQL)
+# Os diários e o CRM pegam suas conexões daqui. As duas implementações têm a mesma API:
+#   repositorio.conexao()            -> context manager (commit ao sair, rollback em caso de erro)
+#   repositorio.aplicar_migracoes()  -> aplica as migrações que faltam e devolve a versão do schema
+# e as conexões entregues aceitam o MESMO SQL (placeholders ? e :nome, no formato do SQLite).
+# --- IMPORTS ---
+import functools
+import itertools
+import queue
+import re
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+# pandas, SQLAlchemy e psycopg são importados só nas funções que os usam: a tela de login
+# dos apps (e o SQLite sem PostgreSQL) não paga pelo carregamento deles.
+
+# =========================================================================
+# 1. CONSTANTES DE CONEXÃO
+# =========================================================================
+
+# Pool de conexões SQLite (compartilhado entre reruns e sessões do Streamlit)
+POOL_TAMANHO_MAXIMO = 8
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_CACHED_STATEMENTS = 256
+
+# Pool do PostgreSQL (QueuePool do SQLAlchemy) - por réplica do app
+PG_POOL_TAMANHO = 5
+PG_POOL_MAX_EXTRA = 10          # Conexões além do pool em picos (fechadas ao devolver)
+PG_POOL_ESPERA_S = 30
+PG_POOL_RECICLAR_S = 1800       # Renova conexões antigas (proxies/servidor derrubam conexões ociosas)
+PG_PREPARAR_APOS = 3            # Execuções da mesma consulta até o psycopg prepará-la no servidor
+
+# Linhas por lote em ler_em_lotes (exportações e leituras grandes)
+LEITURA_TAMANHO_LOTE = 5000
+
+# Chave do pg_advisory_xact_lock: só uma réplica aplica migrações por vez
+PG_TRAVA_MIGRACOES = 20260101
+
+# =========================================================================
+# 2. CONEXÕES (mesma interface nos dois bancos)
+# =========================================================================
+
+class ConexaoSQLite(sqlite3.Connection):
+    """sqlite3.Connection com os extras que a conexão PostgreSQL também oferece."""
+    dialeto = "sqlite"
+
+    def inserir_e_obter_id(self, sql, parametros, coluna_id):
+        cursor = self.execute(sql, parametros)
+        return cursor.lastrowid if cursor.rowcount else None # INSERT ... SELECT que não gravou linha
+
+    def iniciar_escrita_exclusiva(self, tabela):
+        self.execute("BEGIN IMMEDIATE") # Trava de escrita do arquivo inteiro
+
+    def iniciar_leitura_consistente(self):
+        self.execute("BEGIN") # Leituras seguintes enxergam o mesmo snapshot (WAL)
+
+    def cursor_no_servidor(self):
+        return self.cursor() # O cursor do SQLite já percorre o resultado sob demanda
+
+
+# Strings e identificadores entre aspas são copiados; ? e :nome viram os placeholders do psycopg
+_TOKENS_SQL = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|(::)|\?|:([A-Za-z_]\w*)|%""")
+
+@functools.lru_cache(maxsize=512)
+def _sql_para_postgres(sql):
+    """Converte o SQL escrito para o SQLite (? e :nome) para o formato do psycopg (%s e %(nome)s)."""
+    def trocar(token):
+        if token.group(1):
+            return token.group(1).replace('%', '%%')
+        if token.group(2):
+            return token.group(2)
+        if token.group(3):
+            return f"%({token.group(3)})s"
+        return '%s' if token.group(0) == '?' else '%%'
+    return _TOKENS_SQL.sub(trocar, sql)
+
+
+class CursorPostgres:
+    """Cursor psycopg que aceita o SQL no formato do SQLite."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, parametros=()):
+        self._cursor.execute(_sql_para_postgres(sql), parametros)
+        return self
+
+    def executemany(self, sql, sequencia):
+        self._cursor.executemany(_sql_para_postgres(sql), sequencia)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome): # fetchone, fetchall, description, rowcount...
+        return getattr(self._cursor, nome)
+
+
+# Nomes únicos para os cursores no servidor (DECLARE <nome> CURSOR)
+_NUMERO_CURSOR = itertools.count(1)
+
+class ConexaoPostgres:
+    """Conexão emprestada do QueuePool, com a mesma interface de ConexaoSQLite."""
+    dialeto = "postgresql"
+
+    def __init__(self, conexao_pool):
+        self._conexao_pool = conexao_pool
+
+    def cursor(self):
+        return CursorPostgres(self._conexao_pool.cursor())
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+    def inserir_e_obter_id(self, sql, parametros, coluna_id):
+        linha = self.execute(f"{sql} RETURNING {coluna_id}", parametros).fetchone()
+        return linha[0] if linha else None # INSERT ... SELECT que não gravou linha
+
+    def iniciar_escrita_exclusiva(self, tabela):
+        # Bloqueia outras escritas na tabela (leituras continuam) até o fim da transação
+        self.execute(f"LOCK TABLE {tabela} IN SHARE ROW EXCLUSIVE MODE")
+
+    def iniciar_leitura_consistente(self):
+        self.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+    def cursor_no_servidor(self):
+        # Cursor nomeado: o resultado fica no servidor e cada fetchmany traz só o próximo lote
+        return CursorPostgres(self._conexao_pool.cursor(name=f"cursor_lotes_{next(_NUMERO_CURSOR)}"))
+
+    def commit(self):
+        self._conexao_pool.commit()
+
+    def rollback(self):
+        self._conexao_pool.rollback()
+
+
+def erros_de_integridade():
+    """Exceções de violação de restrição (UNIQUE, FK...) dos drivers em uso.
+
+    O psycopg só entra na tupla depois de importado por um RepositorioPostgres: antes
+    disso nenhuma conexão PostgreSQL existe e o erro dele não tem como aparecer.
+    """
+    psycopg = sys.modules.get("psycopg")
+    return (sqlite3.IntegrityError, psycopg.IntegrityError) if psycopg else (sqlite3.IntegrityError,)
+
+def ler_dataframe(conn, sql, parametros=()):
+    """Equivalente a pd.read_sql_query que funciona com as duas conexões."""
+    import pandas as pd
+
+    cursor = conn.execute(sql, parametros)
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=[coluna[0] for coluna in cursor.description])
+
+def ler_em_lotes(conn, sql, parametros=(), tamanho_lote=LEITURA_TAMANHO_LOTE):
+    """Como ler_dataframe, mas entrega o resultado em DataFrames de até tamanho_lote linhas.
+
+    As linhas são buscadas conforme os lotes são consumidos (use dentro do bloco
+    da conexão). Sempre entrega ao menos um lote, vazio mas com as colunas.
+    """
+    import pandas as pd
+
+    cursor = conn.cursor_no_servidor()
+    try:
+        cursor.execute(sql, parametros)
+        colunas = [coluna[0] for coluna in cursor.description]
+        primeiro_lote = True
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if linhas or primeiro_lote:
+                yield pd.DataFrame.from_records(linhas, columns=colunas)
+            if len(linhas) < tamanho_lote:
+                break
+            primeiro_lote = False
+    finally:
+        cursor.close()
+
+# =========================================================================
+# 3. REPOSITÓRIOS
+# =========================================================================
+
+class RepositorioSQLite:
+    """Arquivo SQLite local (WAL) com pool de conexões; versão do schema em PRAGMA user_version."""
+    dialeto = "sqlite"
+
+    def __init__(self, caminho, migracoes):
+        self.caminho = caminho
+        self.migracoes = migracoes
+        self._pool = queue.LifoQueue(maxsize=POOL_TAMANHO_MAXIMO) # Conexões ociosas (thread-safe)
+
+    def _abrir_conexao(self):
+        conn = sqlite3.connect(
+            self.caminho,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False, # A conexão circula entre as threads de script via pool
+            cached_statements=SQLITE_CACHED_STATEMENTS,
+            factory=ConexaoSQLite,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def conexao(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._abrir_conexao()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def aplicar_migracoes(self):
+        """Aplica só as migrações que faltam; cada uma em sua própria transação. Retorna a versão final."""
+        with self.conexao() as conn:
+            versao_atual = conn.execute("PRAGMA user_version").fetchone()[0]
+            for versao, migracao in enumerate(self.migracoes, start=1):
+                if versao <= versao_atual:
+                    continue
+                conn.execute("BEGIN")
+                try:
+                    migracao(conn.cursor())
+                    conn.execute(f"PRAGMA user_version = {versao}")
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                versao_atual = versao
+        return versao_atual
+
+
+def _url_psycopg(url):
+    # O Render entrega postgres://...; o SQLAlchemy quer o nome do driver explícito
+    return re.sub(r"^postgres(ql)?(\+\w+)?://", "postgresql+psycopg://", url)
+
+class RepositorioPostgres:
+    """PostgreSQL via QueuePool do SQLAlchemy (pool_pre_ping) e psycopg 3 com prepared statements no servidor."""
+    dialeto = "postgresql"
+
+    def __init__(self, url, migracoes):
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import QueuePool
+
+        self.migracoes = migracoes
+        self.engine = create_engine(
+            _url_psycopg(url),
+            poolclass=QueuePool,
+            pool_size=PG_POOL_TAMANHO,
+            max_overflow=PG_POOL_MAX_EXTRA,
+            pool_timeout=PG_POOL_ESPERA_S,
+            pool_recycle=PG_POOL_RECICLAR_S,
+            pool_pre_ping=True, # Descarta conexões mortas (réplica reiniciada, failover) antes de usar
+            connect_args={"prepare_threshold": PG_PREPARAR_APOS},
+        )
+
+    @contextmanager
+    def conexao(self):
+        conexao_pool = self.engine.raw_connection()
+        try:
+            yield ConexaoPostgres(conexao_pool)
+            conexao_pool.commit()
+        except BaseException:
+            conexao_pool.rollback()
+            raise
+        finally:
+            conexao_pool.close() # Devolve ao QueuePool
+
+    def aplicar_migracoes(self):
+        """Aplica as migrações que faltam numa única transação (DDL é transacional no PostgreSQL)."""
+        with self.conexao() as conn:
+            conn.execute("SELECT pg_advisory_xact_lock(?)", (PG_TRAVA_MIGRACOES,))
+            conn.execute("CREATE TABLE IF NOT EXISTS VersaoSchema (id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL)")
+            conn.execute("INSERT INTO VersaoSchema (id, versao) VALUES (1, 0) ON CONFLICT DO NOTHING")
+            versao_atual = conn.execute("SELECT versao FROM VersaoSchema WHERE id = 1").fetchone()[0]
+            for versao, migracao in enumerate(self.migracoes, start=1):
+                if versao <= versao_atual:
+                    continue
+                migracao(conn.cursor())
+                conn.execute("UPDATE VersaoSchema SET versao = ? WHERE id = 1", (versao,))
+                versao_atual = versao
+        return versao_atual
+
+
+def criar_repositorio(db_url, caminho_sqlite, migracoes_sqlite, migracoes_postgres):
+    """PostgreSQL se db_url for postgres://...; senão SQLite (sqlite:///caminho ou o arquivo padrão do app)."""
+    if db_url and db_url.startswith(("postgres://", "postgresql")):
+        return RepositorioPostgres(db_url, migracoes_postgres)
+    if db_url and db_url.startswith("sqlite:///"):
+        caminho_sqlite = db_url[len("sqlite:///"):]
+    return RepositorioSQLite(caminho_sqlite, migracoes_sqlite)
+
+# =========================================================================
+# 4. SCHEMA DO DIÁRIO NO POSTGRESQL
+# =========================================================================
+
+def _gatilho_postgres(nome, evento, tabela, corpo, por_linha=True, quando="", transicao=""):
+    """Função plpgsql + gatilho AFTER (recriados do zero, para a migração poder rodar de novo)."""
+    return [
+        f"CREATE OR REPLACE FUNCTION {nome}() RETURNS trigger AS $$ BEGIN {corpo} RETURN NULL; END $$ LANGUAGE plpgsql",
+        f"DROP TRIGGER IF EXISTS {nome} ON {tabela}",
+        f"CREATE TRIGGER {nome} AFTER {evento} ON {tabela} {transicao} FOR EACH {'ROW' if por_linha else 'STATEMENT'} {quando} EXECUTE FUNCTION {nome}()",
+    ]
+
+def schema_postgres_diario(tipos_avaliacao, com_professores=True):
+    """DDL do diário no PostgreSQL: o mesmo estado final das migrações SQLite dos apps.
+
+    Inclui o resumo materializado (ResumoAlunoDisciplina) e o contador VersaoDados, com
+    gatilhos equivalentes aos do SQLite. presente/is_admin ficam INTEGER para que o SQL
+    compartilhado (presente = 1) funcione igual nos dois bancos.
+    """
+    colunas_notas = ", ".join(f"nota_{tipo} DOUBLE PRECISION" for tipo in tipos_avaliacao)
+    nota_lancada = ", ".join(
+        f"nota_{tipo} = CASE WHEN NEW.tipo_avaliacao = '{tipo}' THEN NEW.valor_nota ELSE nota_{tipo} END"
+        for tipo in tipos_avaliacao)
+    nota_apagada = ", ".join(
+        f"nota_{tipo} = CASE WHEN OLD.tipo_avaliacao = '{tipo}' THEN NULL ELSE nota_{tipo} END"
+        for tipo in tipos_avaliacao)
+
+    ddl = []
+    if com_professores:
+        ddl.append('''CREATE TABLE IF NOT EXISTS Professores (id_professor SERIAL PRIMARY KEY, usuario TEXT UNIQUE NOT NULL, senha TEXT NOT NULL, nome_completo TEXT, is_admin INTEGER NOT NULL, data_expiracao DATE)''')
+    ddl += [
+        '''CREATE TABLE IF NOT EXISTS Turmas (id_turma SERIAL PRIMARY KEY, nome_turma TEXT NOT NULL, ano_letivo INTEGER NOT NULL)''',
+        '''CREATE TABLE IF NOT EXISTS Alunos (id_aluno SERIAL PRIMARY KEY, nome TEXT NOT NULL, matricula TEXT UNIQUE NOT NULL)''',
+        '''CREATE TABLE IF NOT EXISTS Disciplinas (id_disciplina SERIAL PRIMARY KEY, nome_disciplina TEXT UNIQUE NOT NULL)''',
+        '''CREATE TABLE IF NOT EXISTS Aulas (id_aula SERIAL PRIMARY KEY, id_turma INTEGER REFERENCES Turmas(id_turma), id_disciplina INTEGER REFERENCES Disciplinas(id_disciplina), data_aula DATE NOT NULL, conteudo_lecionado TEXT)''',
+        '''CREATE TABLE IF NOT EXISTS Notas (id_nota SERIAL PRIMARY KEY, id_aluno INTEGER REFERENCES Alunos(id_aluno), id_disciplina INTEGER REFERENCES Disciplinas(id_disciplina), tipo_avaliacao TEXT NOT NULL, valor_nota DOUBLE PRECISION NOT NULL, UNIQUE (id_aluno, id_disciplina, tipo_avaliacao))''',
+        '''CREATE TABLE IF NOT EXISTS Frequencia (id_frequencia SERIAL PRIMARY KEY, id_aula INTEGER REFERENCES Aulas(id_aula), id_aluno INTEGER REFERENCES Alunos(id_aluno), presente INTEGER NOT NULL, UNIQUE (id_aula, id_aluno))''',
+        "CREATE INDEX IF NOT EXISTS idx_aulas_turma_disciplina_data ON Aulas (id_turma, id_disciplina, data_aula)",
+        "CREATE INDEX IF NOT EXISTS idx_aulas_disciplina ON Aulas (id_disciplina)",
+        "CREATE INDEX IF NOT EXISTS idx_frequencia_aluno_aula ON Frequencia (id_aluno, id_aula)",
+        "CREATE INDEX IF NOT EXISTS idx_notas_disciplina_aluno ON Notas (id_disciplina, id_aluno)",
+        f'''CREATE TABLE IF NOT EXISTS ResumoAlunoDisciplina (id_aluno INTEGER NOT NULL, id_disciplina INTEGER NOT NULL, total_presencas INTEGER NOT NULL DEFAULT 0, total_aulas INTEGER NOT NULL DEFAULT 0, {colunas_notas}, PRIMARY KEY (id_aluno, id_disciplina))''',
+        "CREATE INDEX IF NOT EXISTS idx_resumo_disciplina ON ResumoAlunoDisciplina (id_disciplina)",
+        '''CREATE TABLE IF NOT EXISTS VersaoDados (id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL)''',
+        "INSERT INTO VersaoDados (id, versao) VALUES (1, 0) ON CONFLICT DO NOTHING",
+    ]
+
+    disciplina_da_aula = "(SELECT id_disciplina FROM Aulas WHERE id_aula = {}.id_aula)"
+    ddl += _gatilho_postgres("trg_resumo_aluno_inserido", "INSERT", "Alunos", '''
+        INSERT INTO ResumoAlunoDisciplina (id_aluno, id_disciplina, total_aulas)
+        SELECT NEW.id_aluno, D.id_disciplina, (SELECT COUNT(*) FROM Aulas AU WHERE AU.id_disciplina = D.id_disciplina)
+        FROM Disciplinas D ON CONFLICT DO NOTHING;''')
+    ddl += _gatilho_postgres("trg_resumo_aluno_removido", "DELETE", "Alunos",
+        "DELETE FROM ResumoAlunoDisciplina WHERE id_aluno = OLD.id_aluno;")
+    ddl += _gatilho_postgres("trg_resumo_disciplina_inserida", "INSERT", "Disciplinas",
+        "INSERT INTO ResumoAlunoDisciplina (id_aluno, id_disciplina) SELECT id_aluno, NEW.id_disciplina FROM Alunos ON CONFLICT DO NOTHING;")
+    ddl += _gatilho_postgres("trg_resumo_disciplina_removida", "DELETE", "Disciplinas",
+        "DELETE FROM ResumoAlunoDisciplina WHERE id_disciplina = OLD.id_disciplina;")
+    ddl += _gatilho_postgres("trg_resumo_aula_inserida", "INSERT", "Aulas",
+        "UPDATE ResumoAlunoDisciplina SET total_aulas = total_aulas + 1 WHERE id_disciplina = NEW.id_disciplina;")
+    ddl += _gatilho_postgres("trg_resumo_aula_removida", "DELETE", "Aulas",
+        "UPDATE ResumoAlunoDisciplina SET total_aulas = total_aulas - 1 WHERE id_disciplina = OLD.id_disciplina;")
+    ddl += _gatilho_postgres("trg_resumo_presenca_inserida", "INSERT", "Frequencia", f'''
+        UPDATE ResumoAlunoDisciplina SET total_presencas = total_presencas + 1
+        WHERE id_aluno = NEW.id_aluno AND id_disciplina = {disciplina_da_aula.format("NEW")};''',
+        quando="WHEN (NEW.presente = 1)")
+    ddl += _gatilho_postgres("trg_resumo_presenca_alterada", "UPDATE OF presente", "Frequencia", f'''
+        UPDATE ResumoAlunoDisciplina SET total_presencas = total_presencas + (CASE WHEN NEW.presente = 1 THEN 1 ELSE -1 END)
+        WHERE id_aluno = NEW.id_aluno AND id_disciplina = {disciplina_da_aula.format("NEW")};''',
+        quando="WHEN ((NEW.presente = 1) <> (OLD.presente = 1))")
+    ddl += _gatilho_postgres("trg_resumo_presenca_removida", "DELETE", "Frequencia", f'''
+        UPDATE ResumoAlunoDisciplina SET total_presencas = total_presencas - 1
+        WHERE id_aluno = OLD.id_aluno AND id_disciplina = {disciplina_da_aula.format("OLD")};''',
+        quando="WHEN (OLD.presente = 1)")
+    ddl += _gatilho_postgres("trg_resumo_nota_inserida", "INSERT", "Notas", f'''
+        UPDATE ResumoAlunoDisciplina SET {nota_lancada}
+        WHERE id_aluno = NEW.id_aluno AND id_disciplina = NEW.id_disciplina;''')
+    ddl += _gatilho_postgres("trg_resumo_nota_alterada", "UPDATE", "Notas", f'''
+        UPDATE ResumoAlunoDisciplina SET {nota_apagada}
+        WHERE id_aluno = OLD.id_aluno AND id_disciplina = OLD.id_disciplina;
+        UPDATE ResumoAlunoDisciplina SET {nota_lancada}
+        WHERE id_aluno = NEW.id_aluno AND id_disciplina = NEW.id_disciplina;''')
+    ddl += _gatilho_postgres("trg_resumo_nota_removida", "DELETE", "Notas", f'''
+        UPDATE ResumoAlunoDisciplina SET {nota_apagada}
+        WHERE id_aluno = OLD.id_aluno AND id_disciplina = OLD.id_disciplina;''')
+
+    # No PostgreSQL a versão sobe uma vez por comando (FOR EACH STATEMENT), não por linha
+    for tabela in ['Alunos', 'Disciplinas', 'Aulas', 'Frequencia', 'Notas']:
+        ddl += _gatilho_postgres(f"trg_versao_{tabela.lower()}", "INSERT OR UPDATE OR DELETE", tabela,
+                                 "UPDATE VersaoDados SET versao = versao + 1 WHERE id = 1;", por_linha=False)
+    return ddl
+
+def schema_postgres_isolamento_por_professor():
+    """DDL que separa os dados do diário por professor (mesmo estado da migração SQLite 006).
+
+    Alunos e Disciplinas ganham o dono (id_professor), com matrícula e nome de disciplina
+    únicos por professor; os dados já existentes ficam com o primeiro professor cadastrado.
+    O resumo só cruza aluno e disciplina do mesmo professor, e VersaoDados vira uma versão
+    por professor, incrementada uma vez por comando para cada dono afetado.
+    """
+    tabelas = ['Alunos', 'Disciplinas', 'Aulas', 'Frequencia', 'Notas']
+    dono_legado = "(SELECT COALESCE(MIN(id_professor), 1) FROM Professores)"
+
+    ddl = [f"DROP TRIGGER IF EXISTS trg_versao_{tabela.lower()} ON {tabela}" for tabela in tabelas]
+    ddl += [f"DROP FUNCTION IF EXISTS trg_versao_{tabela.lower()}()" for tabela in tabelas]
+    for tabela, coluna in [('Alunos', 'matricula'), ('Disciplinas', 'nome_disciplina')]:
+        ddl += [
+            f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS id_professor INTEGER",
+            f"UPDATE {tabela} SET id_professor = {dono_legado} WHERE id_professor IS NULL",
+            f"ALTER TABLE {tabela} ALTER COLUMN id_professor SET NOT NULL",
+            f"ALTER TABLE {tabela} DROP CONSTRAINT IF EXISTS {tabela.lower()}_{coluna}_key",
+            f"ALTER TABLE {tabela} DROP CONSTRAINT IF EXISTS {tabela.lower()}_professor_{coluna}_key",
+            f"ALTER TABLE {tabela} ADD CONSTRAINT {tabela.lower()}_professor_{coluna}_key UNIQUE (id_professor, {coluna})",
+        ]
+    ddl += [
+        "CREATE INDEX IF NOT EXISTS idx_alunos_professor_nome ON Alunos (id_professor, nome)",
+        "CREATE TABLE IF NOT EXISTS VersaoDadosProfessor (id_professor INTEGER PRIMARY KEY, versao INTEGER NOT NULL)",
+        f"INSERT INTO VersaoDadosProfessor (id_professor, versao) SELECT {dono_legado}, versao FROM VersaoDados ON CONFLICT DO NOTHING",
+        "DROP TABLE IF EXISTS VersaoDados",
+    ]
+
+    ddl += _gatilho_postgres("trg_resumo_aluno_inserido", "INSERT", "Alunos", '''
+        INSERT INTO ResumoAlunoDisciplina (id_aluno, id_disciplina, total_aulas)
+        SELECT NEW.id_aluno, D.id_disciplina, (SELECT COUNT(*) FROM Aulas AU WHERE AU.id_disciplina = D.id_disciplina)
+        FROM Disciplinas D WHERE D.id_professor = NEW.id_professor ON CONFLICT DO NOTHING;''')
+    ddl += _gatilho_postgres("trg_resumo_disciplina_inserida", "INSERT", "Disciplinas",
+        "INSERT INTO ResumoAlunoDisciplina (id_aluno, id_disciplina) SELECT id_aluno, NEW.id_disciplina FROM Alunos WHERE id_professor = NEW.id_professor ON CONFLICT DO NOTHING;")
+
+    # Donos das linhas de cada comando (tabela de transição "linhas"): direto, pela disciplina ou pelo aluno
+    donos = {
+        'Alunos': "SELECT DISTINCT id_professor FROM linhas",
+        'Disciplinas': "SELECT DISTINCT id_professor FROM linhas",
+        'Aulas': "SELECT DISTINCT D.id_professor FROM linhas L JOIN Disciplinas D ON D.id_disciplina = L.id_disciplina",
+        'Frequencia': "SELECT DISTINCT A.id_professor FROM linhas L JOIN Alunos A ON A.id_aluno = L.id_aluno",
+        'Notas': "SELECT DISTINCT A.id_professor FROM linhas L JOIN Alunos A ON A.id_aluno = L.id_aluno",
+    }
+    for tabela in tabelas:
+        for evento in ['INSERT', 'UPDATE', 'DELETE']:
+            ddl += _gatilho_postgres(
+                f"trg_versao_{tabela.lower()}_{evento.lower()}", evento, tabela,
+                f"INSERT INTO VersaoDadosProfessor (id_professor, versao) SELECT id_professor, 1 FROM ({donos[tabela]}) donos "
+                "ON CONFLICT (id_professor) DO UPDATE SET versao = VersaoDadosProfessor.versao + 1;",
+                por_linha=False, transicao=f"REFERENCING {'OLD' if evento == 'DELETE' else 'NEW'} TABLE AS linhas")
+    return ddl
+
+def schema_postgres_ano_letivo_das_notas():
+    """Coluna Notas.ano_letivo e índices do arquivo por ano (mesmo estado das migrações SQLite equivalentes).
+
+    As notas existentes ficam no ano da última aula da disciplina ou, sem aulas, no ano corrente.
+    """
+    return [
+        "ALTER TABLE Notas ADD COLUMN IF NOT EXISTS ano_letivo INTEGER",
+        """UPDATE Notas N SET ano_letivo = COALESCE(
+            (SELECT CAST(EXTRACT(YEAR FROM MAX(AU.data_aula)) AS INTEGER) FROM Aulas AU WHERE AU.id_disciplina = N.id_disciplina),
+            CAST(EXTRACT(YEAR FROM CURRENT_DATE) AS INTEGER))
+        WHERE N.ano_letivo IS NULL""",
+        "CREATE INDEX IF NOT EXISTS idx_notas_ano_letivo ON Notas (ano_letivo)",
+        "CREATE INDEX IF NOT EXISTS idx_aulas_data ON Aulas (data_aula)",
+    ]
+
+def schema_postgres_alertas_de_risco(sql_nivel_alerta):
+    """DDL do nível de alerta de risco no resumo (mesmo estado das migrações SQLite de alertas).
+
+    sql_nivel_alerta é o texto congelado pela migração do diário (igual a RegrasCompiladas.sql_nivel_alerta
+    quando ela foi publicada). No PostgreSQL a coluna gerada é
+    STORED: calculada quando os gatilhos atualizam a linha do resumo, nunca na leitura.
+    """
+    return [
+        f"ALTER TABLE ResumoAlunoDisciplina ADD COLUMN IF NOT EXISTS nivel_alerta INTEGER GENERATED ALWAYS AS ({sql_nivel_alerta}) STORED",
+        "CREATE INDEX IF NOT EXISTS idx_resumo_alerta ON ResumoAlunoDisciplina (nivel_alerta) WHERE nivel_alerta IS NOT NULL",
+    ]
+
+# =========================================================================
+# 5. SCHEMA DO CRM NO POSTGRESQL
+# =========================================================================
+
+def schema_postgres_faturamento_crm():
+    """DDL do faturamento agregado do CRM (mesmo estado da migração SQLite 002 do crm_profissional).
+
+    Sessões e valor por (cliente, mês, status), por (mês, status) e por (cliente, status), mantidos
+    pelos gatilhos de Sessoes_Atividades na mesma transação de cada escrita.
+    """
+    chaves = {
+        "id_cliente": "{}.id_cliente",
+        "mes": "to_char({}.data_servico, 'YYYY-MM')",
+        "status_pagamento": "{}.status_pagamento",
+    }
+    agregados = {
+        "FaturamentoClienteMes": ["id_cliente", "mes", "status_pagamento"],
+        "FaturamentoMes": ["mes", "status_pagamento"],
+        "FaturamentoCliente": ["id_cliente", "status_pagamento"],
+    }
+    tipos = {"id_cliente": "INTEGER", "mes": "TEXT", "status_pagamento": "TEXT"}
+
+    ddl, sessao_incluida, sessao_excluida = [], "", ""
+    for tabela, colunas in agregados.items():
+        lista = ", ".join(colunas)
+        chave_antiga = " AND ".join(f"{coluna} = {chaves[coluna].format('OLD')}" for coluna in colunas)
+        ddl += [
+            f"CREATE TABLE IF NOT EXISTS {tabela} ({', '.join(f'{coluna} {tipos[coluna]} NOT NULL' for coluna in colunas)}, total_sessoes INTEGER NOT NULL, valor_total DOUBLE PRECISION NOT NULL, PRIMARY KEY ({lista}))",
+            f"DELETE FROM {tabela}",
+            f"""INSERT INTO {tabela} ({lista}, total_sessoes, valor_total)
+            SELECT {', '.join(chaves[coluna].format('S') for coluna in colunas)}, COUNT(*), SUM(COALESCE(S.valor_cobrado, 0))
+            FROM Sessoes_Atividades S GROUP BY {', '.join(chaves[coluna].format('S') for coluna in colunas)}""",
+        ]
+        sessao_incluida += f"""
+            INSERT INTO {tabela} ({lista}, total_sessoes, valor_total)
+            VALUES ({', '.join(chaves[coluna].format('NEW') for coluna in colunas)}, 1, COALESCE(NEW.valor_cobrado, 0))
+            ON CONFLICT ({lista}) DO UPDATE SET
+                total_sessoes = {tabela}.total_sessoes + 1, valor_total = {tabela}.valor_total + EXCLUDED.valor_total;"""
+        sessao_excluida += f"""
+            UPDATE {tabela} SET total_sessoes = total_sessoes - 1, valor_total = valor_total - COALESCE(OLD.valor_cobrado, 0)
+            WHERE {chave_antiga};
+            DELETE FROM {tabela} WHERE {chave_antiga} AND total_sessoes = 0;"""
+    ddl += [
+        "CREATE INDEX IF NOT EXISTS idx_faturamento_cliente_valor ON FaturamentoCliente (status_pagamento, valor_total)",
+    ]
+    ddl += _gatilho_postgres("trg_faturamento_sessao_inserida", "INSERT", "Sessoes_Atividades", sessao_incluida)
+    ddl += _gatilho_postgres("trg_faturamento_sessao_removida", "DELETE", "Sessoes_Atividades", sessao_excluida)
+    ddl += _gatilho_postgres("trg_faturamento_sessao_alterada", "UPDATE OF id_cliente, data_servico, valor_cobrado, status_pagamento",
+                             "Sessoes_Atividades", sessao_excluida + sessao_incluida)
+    return ddl
+
+def schema_postgres_busca_clientes():
+    """DDL da busca de clientes do CRM (equivalente PostgreSQL do índice FTS5 da migração SQLite 004).
+
+    Coluna tsvector gerada sobre nome e contato (minúsculas, sem acento, com . @ _ - separando
+    palavras, como o tokenizador unicode61 do FTS5) e índice GIN para as consultas por prefixo.
+    """
+    com_acento, sem_acento = "áàâãäåéèêëíìîïóòôõöúùûüçñý.@_-", "aaaaaaeeeeiiiiooooouuuucny    "
+    texto = f"translate(lower(nome_cliente || ' ' || COALESCE(contato_principal, '')), '{com_acento}', '{sem_acento}')"
+    return [
+        f"ALTER TABLE Clientes ADD COLUMN IF NOT EXISTS busca tsvector GENERATED ALWAYS AS (to_tsvector('simple', {texto})) STORED",
+        "CREATE INDEX IF NOT EXISTS idx_clientes_busca ON Clientes USING GIN (busca)",
+        "CREATE INDEX IF NOT EXISTS idx_clientes_nome ON Clientes (nome_cliente)",
+    ]
+
+def schema_postgres_recebiveis_crm():
+    """DDL do contador VersaoRecebiveis do CRM (par da migração SQLite 005 do crm_profissional).
+
+    Os gatilhos sobem a versão a cada escrita que mexe numa sessão pendente (ou no nome
+    do cliente), o que invalida o relatório de contas a receber em cache.
+    """
+    subir_versao = "UPDATE VersaoRecebiveis SET versao = versao + 1 WHERE id = 1;"
+    ddl = [
+        "CREATE TABLE IF NOT EXISTS VersaoRecebiveis (id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL)",
+        "INSERT INTO VersaoRecebiveis (id, versao) VALUES (1, 0) ON CONFLICT DO NOTHING",
+    ]
+    ddl += _gatilho_postgres("trg_recebiveis_sessao_inserida", "INSERT", "Sessoes_Atividades", subir_versao,
+                             quando="WHEN (NEW.status_pagamento = 'Pendente')")
+    ddl += _gatilho_postgres("trg_recebiveis_sessao_removida", "DELETE", "Sessoes_Atividades", subir_versao,
+                             quando="WHEN (OLD.status_pagamento = 'Pendente')")
+    ddl += _gatilho_postgres("trg_recebiveis_sessao_alterada", "UPDATE OF id_cliente, data_servico, valor_cobrado, status_pagamento",
+                             "Sessoes_Atividades", subir_versao,
+                             quando="WHEN ('Pendente' IN (OLD.status_pagamento, NEW.status_pagamento))")
+    ddl += _gatilho_postgres("trg_recebiveis_cliente_renomeado", "UPDATE OF nome_cliente", "Clientes", subir_versao)
+    return ddl
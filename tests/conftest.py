@@ -0,0 +1,59 @@
+# conftest.py - caminhos de import dos testes e carga dos apps Streamlit num diretório temporário
+import importlib.util
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_PROJETO = os.path.join(RAIZ, "meu_projeto")
+
+# O diário da raiz importa meu_projeto.*; os apps de meu_projeto/ importam os módulos pelo nome
+for caminho in (PASTA_PROJETO, RAIZ):
+    if caminho not in sys.path:
+        sys.path.insert(0, caminho)
+
+APPS = {
+    "raiz": os.path.join(RAIZ, "Diario_Web.final.py"),
+    "educacao_basica": os.path.join(PASTA_PROJETO, "Diario_Web_final.py"),
+    "faculdade": os.path.join(PASTA_PROJETO, "diario_faculdade.py"),
+    "crm": os.path.join(PASTA_PROJETO, "crm_profissional.py"),
+}
+
+def carregar_app(nome):
+    """Módulo do app (sem rodar main(): os apps só desenham a tela sob __main__)."""
+    spec = importlib.util.spec_from_file_location(f"app_{nome}", APPS[nome])
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+@pytest.fixture
+def pasta_temporaria(tmp_path, monkeypatch):
+    """Roda o teste dentro de tmp_path: os apps criam seus bancos SQLite no diretório atual."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+# =========================================================================
+# POSTGRESQL DESCARTÁVEL (pgserver; sem ele, os testes de PostgreSQL são pulados)
+# =========================================================================
+
+@pytest.fixture(scope="session")
+def servidor_postgres(tmp_path_factory):
+    pgserver = pytest.importorskip("pgserver")
+    pytest.importorskip("psycopg")
+    pytest.importorskip("sqlalchemy")
+    pasta = tmp_path_factory.mktemp("pgdata")
+    servidor = pgserver.get_server(str(pasta), cleanup_mode="delete")
+    yield f"postgresql://postgres:@/{{}}?host={pasta}"
+    servidor.cleanup()
+
+@pytest.fixture
+def url_postgres(servidor_postgres, request):
+    """URL de um banco PostgreSQL novo e vazio, só deste teste."""
+    import psycopg
+
+    nome = "teste_" + "".join(c if c.isalnum() else "_" for c in request.node.name.lower())[:50]
+    with psycopg.connect(servidor_postgres.format("postgres"), autocommit=True) as conn:
+        conn.execute(f"DROP DATABASE IF EXISTS {nome}")
+        conn.execute(f"CREATE DATABASE {nome}")
+    return servidor_postgres.format(nome)
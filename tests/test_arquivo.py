@@ -0,0 +1,79 @@
+# test_arquivo.py - encerramento de ano letivo: o que sai do banco, o que fica e o relatório do arquivo
+# Ano de uma aula = ano de data_aula; o de uma nota, Notas.ano_letivo. O ano corrente nunca é arquivado.
+import datetime
+
+import pytest
+
+import nucleo
+from conftest import carregar_app
+from repositorio_db import RepositorioSQLite, criar_repositorio
+
+ANO_CORRENTE = datetime.date.today().year
+ANO_ENCERRADO = ANO_CORRENTE - 1
+
+def _diario_com_dois_anos(repositorio, app):
+    """Banco do diário da Educação Básica com uma aula e uma nota no ano encerrado e outras no corrente."""
+    nucleo.preparar_banco_de_professores(repositorio, app.professores_demo())
+    with repositorio.conexao() as conn:
+        id_professor = conn.execute("SELECT id_professor FROM Professores WHERE usuario = 'demo_eb_a'").fetchone()[0]
+    aluno_map, disciplina_map = nucleo.mapas_do_professor(repositorio, id_professor, app.TURMA_PADRAO, app.DISCIPLINAS_DEMO, app.ALUNOS_DEMO)
+    id_aluno, id_disciplina = aluno_map["Aluno A"], disciplina_map["Matemática"]
+    for data_aula in (f"{ANO_ENCERRADO}-11-10", f"{ANO_CORRENTE}-02-02"):
+        nucleo.lancar_aula_e_frequencia(repositorio, app.ID_TURMA_PADRAO, id_disciplina, data_aula, "Conteúdo", id_professor)
+    with repositorio.conexao() as conn:
+        conn.execute(nucleo.SQL_GRAVAR_NOTA, (id_aluno, id_disciplina, "B1", 4.0, ANO_ENCERRADO))
+    nucleo.gravar_nota(repositorio, id_aluno, id_disciplina, "B2", 8.0, app.TIPOS_AVALIACAO)
+    return id_professor, id_disciplina
+
+def _conferir_arquivamento(repositorio, app, diretorio):
+    id_professor, id_disciplina = _diario_com_dois_anos(repositorio, app)
+    with repositorio.conexao() as conn:
+        turmas_antes = conn.execute("SELECT id_turma, ano_letivo FROM Turmas ORDER BY id_turma").fetchall()
+
+    with pytest.raises(nucleo.AnoLetivoEmAberto):
+        nucleo.arquivar_ano_letivo([repositorio], ANO_CORRENTE, diretorio, nucleo.conjuntos_arquivo())
+    aulas, notas = nucleo.arquivar_ano_letivo([repositorio], ANO_ENCERRADO, diretorio, nucleo.conjuntos_arquivo())
+    assert (aulas, notas) == (1, 1)
+
+    with repositorio.conexao() as conn:
+        assert [str(data)[:4] for (data,) in conn.execute("SELECT data_aula FROM Aulas")] == [str(ANO_CORRENTE)]
+        assert conn.execute("SELECT tipo_avaliacao, ano_letivo FROM Notas").fetchall() == [("B2", ANO_CORRENTE)]
+        assert conn.execute("SELECT COUNT(*) FROM Frequencia").fetchone()[0] == len(app.ALUNOS_DEMO)
+        assert conn.execute("SELECT id_turma, ano_letivo FROM Turmas ORDER BY id_turma").fetchall() == turmas_antes
+
+    df = nucleo.gerar_relatorio_arquivado(diretorio, app.REGRAS_AVALIACAO, lambda df: df, ANO_ENCERRADO, id_professor=id_professor)
+    linha = df[(df["Aluno"] == "Aluno A") & (df["id_disciplina"] == id_disciplina)].iloc[0]
+    assert linha["Total_Aulas"] == 1 and linha["Total_Presencas"] == 1
+    assert linha[app.REGRAS_AVALIACAO.colunas["B1"]] == 4.0
+
+    # Arquivar de novo o mesmo ano não encontra mais nada
+    assert nucleo.arquivar_ano_letivo([repositorio], ANO_ENCERRADO, diretorio, nucleo.conjuntos_arquivo()) == (0, 0)
+
+def test_arquivar_ano_letivo_sqlite(pasta_temporaria):
+    app = carregar_app("educacao_basica")
+    repositorio = RepositorioSQLite("diario.db", app.MIGRACOES_SCHEMA)
+    _conferir_arquivamento(repositorio, app, str(pasta_temporaria / "arquivo"))
+
+def test_arquivar_ano_letivo_postgres(url_postgres, tmp_path):
+    app = carregar_app("educacao_basica")
+    repositorio = criar_repositorio(url_postgres, "nao_usado.db", app.MIGRACOES_SCHEMA, app.MIGRACOES_SCHEMA_POSTGRES)
+    try:
+        _conferir_arquivamento(repositorio, app, str(tmp_path / "arquivo"))
+    finally:
+        repositorio.engine.dispose()
+
+def test_migracao_poe_as_notas_existentes_no_ano_da_ultima_aula(pasta_temporaria):
+    app = carregar_app("raiz")
+    migracoes = app.MIGRACOES_SCHEMA
+    repositorio = RepositorioSQLite("raiz.db", migracoes[:migracoes.index(app._migracao_005_ano_letivo_das_notas)])
+    repositorio.aplicar_migracoes()
+    with repositorio.conexao() as conn:
+        conn.execute("INSERT INTO Turmas (id_turma, nome_turma, ano_letivo) VALUES (1, 'T', 2030)")
+        conn.execute("INSERT INTO Disciplinas (id_disciplina, nome_disciplina) VALUES (1, 'Com aulas'), (2, 'Sem aulas')")
+        conn.execute("INSERT INTO Alunos (id_aluno, nome, matricula) VALUES (1, 'Aluno', 'M1')")
+        conn.execute("INSERT INTO Aulas (id_turma, id_disciplina, data_aula) VALUES (1, 1, '2023-05-02'), (1, 1, '2024-03-04')")
+        conn.execute("INSERT INTO Notas (id_aluno, id_disciplina, tipo_avaliacao, valor_nota) VALUES (1, 1, 'P1', 7.0), (1, 2, 'P1', 5.0)")
+
+    assert RepositorioSQLite("raiz.db", migracoes).aplicar_migracoes() == len(migracoes)
+    with repositorio.conexao() as conn:
+        assert conn.execute("SELECT id_disciplina, ano_letivo FROM Notas ORDER BY id_disciplina").fetchall() == [(1, 2024), (2, ANO_CORRENTE)]
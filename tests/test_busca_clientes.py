@@ -0,0 +1,60 @@
+# test_busca_clientes.py - busca de clientes do CRM por prefixo, sem diferenciar acento e caixa
+# O índice (FTS5 no SQLite, tsvector no PostgreSQL) acompanha inclusões, renomeações e exclusões de clientes.
+import nucleo
+from conftest import carregar_app
+from repositorio_db import criar_repositorio
+
+CLIENTES = [
+    ("Psicóloga Ana Conceição", "ana.psi@email.com"),
+    ("Advogado Marcos", "marcos.adv@email.com"),
+    ("Consultor Pedro", None),
+    ("Psicopedagoga Clara", "clara@escola.com.br"),
+]
+
+def _nomes(repositorio, texto, limite=20):
+    return sorted(nucleo.buscar_clientes(repositorio, texto, limite)["nome_cliente"])
+
+def _conferir_busca(repositorio):
+    repositorio.aplicar_migracoes()
+    with repositorio.conexao() as conn:
+        ids = {nome: conn.inserir_e_obter_id("INSERT INTO Clientes (nome_cliente, contato_principal, data_cadastro) VALUES (?, ?, '2026-01-05')",
+                                             (nome, contato), "id_cliente")
+               for nome, contato in CLIENTES}
+
+    assert _nomes(repositorio, "psico") == ["Psicopedagoga Clara", "Psicóloga Ana Conceição"]
+    assert _nomes(repositorio, "PSICÓ") == _nomes(repositorio, "psico")
+    assert _nomes(repositorio, "concei") == _nomes(repositorio, "conceição") == ["Psicóloga Ana Conceição"]
+    assert _nomes(repositorio, "psi ana") == ["Psicóloga Ana Conceição"] # Todos os termos, cada um como prefixo
+    assert _nomes(repositorio, "escola") == ["Psicopedagoga Clara"] # Contato também entra na busca
+    assert _nomes(repositorio, "cos") == [] # Prefixo, não trecho do meio da palavra
+    assert _nomes(repositorio, "") == sorted(nome for nome, _ in CLIENTES)
+    assert len(nucleo.buscar_clientes(repositorio, "p", limite=1)) == 1
+
+    # Renomear tira o nome antigo do índice e põe o novo
+    with repositorio.conexao() as conn:
+        conn.execute("UPDATE Clientes SET nome_cliente = 'Nutricionista Ana Conceição' WHERE id_cliente = ?", (ids["Psicóloga Ana Conceição"],))
+    assert _nomes(repositorio, "psico") == ["Psicopedagoga Clara"]
+    assert _nomes(repositorio, "nutri") == ["Nutricionista Ana Conceição"]
+    assert _nomes(repositorio, "ana.psi") == ["Nutricionista Ana Conceição"] # Contato não mudou
+
+    # Excluir tira o cliente do índice
+    with repositorio.conexao() as conn:
+        conn.execute("DELETE FROM Clientes WHERE id_cliente = ?", (ids["Psicopedagoga Clara"],))
+    assert _nomes(repositorio, "psico") == []
+    assert _nomes(repositorio, "clara") == []
+
+def test_busca_de_clientes_sqlite(pasta_temporaria):
+    app = carregar_app("crm")
+    repositorio = criar_repositorio(None, "crm.db", app.MIGRACOES_SCHEMA, app.MIGRACOES_SCHEMA_POSTGRES)
+    _conferir_busca(repositorio)
+    # O índice FTS5 continua íntegro em relação a Clientes depois das escritas
+    with repositorio.conexao() as conn:
+        conn.execute("INSERT INTO ClientesBusca (ClientesBusca, rank) VALUES ('integrity-check', 1)")
+
+def test_busca_de_clientes_postgres(url_postgres):
+    app = carregar_app("crm")
+    repositorio = criar_repositorio(url_postgres, "nao_usado.db", app.MIGRACOES_SCHEMA, app.MIGRACOES_SCHEMA_POSTGRES)
+    try:
+        _conferir_busca(repositorio)
+    finally:
+        repositorio.engine.dispose()
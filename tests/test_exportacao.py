@@ -0,0 +1,47 @@
+# test_exportacao.py - exportação do relatório lote a lote (CSV, Parquet e XLSX)
+# O arquivo montado lote a lote tem de ser o mesmo do DataFrame inteiro, qualquer que seja o tamanho do lote.
+import datetime
+import functools
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import carregar_app
+from exportacao import exportar_em_lotes
+
+# Como o relatório formatado: só texto, com "-" onde não há nota
+RELATORIO = pd.DataFrame({
+    "Aluno": [f"Aluno {i:02d}" for i in range(7)],
+    "Disciplina": ["Matemática", "Português", "Ciências", "História", "Geografia", "Inglês", "Artes"],
+    "Nota Final": ["7.5", "-", "10.0", "4.2", "6.0", "-", "9.9"],
+    "Situação Final": ["APROVADO GERAL 🟢", "PENDENTE ⚠️", "APROVADO GERAL 🟢", "REPROVADO GERAL 🔴",
+                       "APROVADO GERAL 🟢", "PENDENTE ⚠️", "APROVADO GERAL 🟢"],
+})
+
+def _lotes(df, tamanho_lote):
+    return iter([df.iloc[i:i + tamanho_lote] for i in range(0, len(df), tamanho_lote)])
+
+@pytest.mark.parametrize("tamanho_lote", [1, 3, 100])
+def test_exportar_em_lotes_igual_ao_dataframe_inteiro(tamanho_lote):
+    assert exportar_em_lotes(_lotes(RELATORIO, tamanho_lote), "CSV") == RELATORIO.to_csv(index=False).encode("utf-8")
+    parquet = exportar_em_lotes(_lotes(RELATORIO, tamanho_lote), "Parquet")
+    pd.testing.assert_frame_equal(pd.read_parquet(io.BytesIO(parquet)), RELATORIO)
+    xlsx = exportar_em_lotes(_lotes(RELATORIO, tamanho_lote), "XLSX")
+    pd.testing.assert_frame_equal(pd.read_excel(io.BytesIO(xlsx), sheet_name="Relatorio", dtype=str), RELATORIO)
+
+def test_exportacao_do_diario_igual_ao_relatorio_completo(pasta_temporaria, monkeypatch):
+    app = carregar_app("raiz")
+    app.DB_NAME = "exportacao.db"
+    for funcao_em_cache in (app.obter_repositorio, app.obter_cache_relatorio, app.criar_e_popular_sqlite):
+        funcao_em_cache.clear()
+    aluno_map, disciplina_map = app.criar_e_popular_sqlite()
+    app.lancar_aulas_do_periodo(list(disciplina_map.values()), datetime.date(2026, 3, 2), datetime.date(2026, 3, 13), ["1", "3", "5"], "Conteúdo")
+    for i, id_aluno in enumerate(aluno_map.values()):
+        app.inserir_nota_no_db(id_aluno, next(iter(disciplina_map.values())), "P1", 3.0 + i)
+
+    # Lotes de 2 linhas: o relatório do diário ocupa vários lotes
+    monkeypatch.setattr(app.nucleo, "ler_em_lotes", functools.partial(app.nucleo.ler_em_lotes, tamanho_lote=2))
+    esperado = app.gerar_relatorio_final_completo()
+    assert len(esperado) > 2
+    assert app.exportar_relatorio_completo(app.obter_repositorio(), "CSV") == esperado.to_csv(index=False).encode("utf-8")
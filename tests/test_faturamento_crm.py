@@ -0,0 +1,95 @@
+# test_faturamento_crm.py - agregados de faturamento do CRM (gatilhos) contra um GROUP BY em Sessoes_Atividades
+# Depois de cada INSERT, UPDATE e DELETE nas sessões, os três agregados batem com o recálculo do zero.
+import nucleo
+from conftest import carregar_app
+from repositorio_db import criar_repositorio
+
+# Agregado -> colunas da chave (mes = 'AAAA-MM' de data_servico)
+AGREGADOS = {
+    "FaturamentoClienteMes": ["id_cliente", "mes", "status_pagamento"],
+    "FaturamentoMes": ["mes", "status_pagamento"],
+    "FaturamentoCliente": ["id_cliente", "status_pagamento"],
+}
+MES_DA_SESSAO = {"sqlite": "strftime('%Y-%m', data_servico)", "postgresql": "to_char(data_servico, 'YYYY-MM')"}
+
+def _repositorio_crm(db_url, ate_migracao=None):
+    app = carregar_app("crm")
+    return criar_repositorio(db_url, "crm.db", app.MIGRACOES_SCHEMA[:ate_migracao], app.MIGRACOES_SCHEMA_POSTGRES[:ate_migracao])
+
+def _cadastrar_cliente(repositorio, nome):
+    with repositorio.conexao() as conn:
+        return conn.inserir_e_obter_id("INSERT INTO Clientes (nome_cliente, contato_principal, data_cadastro) VALUES (?, ?, '2026-01-05')",
+                                       (nome, None), "id_cliente")
+
+def _conferir_agregados(repositorio):
+    with repositorio.conexao() as conn:
+        for tabela, chave in AGREGADOS.items():
+            colunas = ", ".join(chave)
+            chave_da_sessao = ", ".join(f"{MES_DA_SESSAO[conn.dialeto]} AS mes" if coluna == "mes" else coluna for coluna in chave)
+            agregado = conn.execute(f"SELECT {colunas}, total_sessoes, valor_total FROM {tabela} ORDER BY {colunas}").fetchall()
+            recalculado = conn.execute(f"""
+                SELECT {colunas}, COUNT(*), SUM(COALESCE(valor_cobrado, 0))
+                FROM (SELECT {chave_da_sessao}, valor_cobrado FROM Sessoes_Atividades) S
+                GROUP BY {colunas} ORDER BY {colunas}""").fetchall()
+            assert [tuple(linha) for linha in agregado] == [tuple(linha) for linha in recalculado], tabela
+
+def _conferir_faturamento(repositorio):
+    repositorio.aplicar_migracoes()
+    marcos, ana = _cadastrar_cliente(repositorio, "Advogado Marcos"), _cadastrar_cliente(repositorio, "Psicóloga Ana")
+    sessoes = [
+        (marcos, "2026-01-10", "Consulta", 350.0, "Pago"),
+        (marcos, "2026-01-24", "Retorno", 120.5, "Pendente"),
+        (ana, "2026-01-24", "Terapia", 150.0, "Pendente"),
+        (ana, "2026-02-07", "Terapia", None, "Pendente"), # Sem valor: conta a sessão, soma 0
+        (ana, "2026-02-14", "Terapia", 150.0, "Pago"),
+    ]
+    ids = [nucleo.inserir_sessao(repositorio, *sessao) for sessao in sessoes]
+    _conferir_agregados(repositorio)
+
+    with repositorio.conexao() as conn:
+        conn.execute("UPDATE Sessoes_Atividades SET status_pagamento = 'Pago' WHERE id_sessao = ?", (ids[1],))
+        conn.execute("UPDATE Sessoes_Atividades SET data_servico = '2026-03-02', valor_cobrado = 99.25 WHERE id_sessao = ?", (ids[3],))
+        conn.execute("UPDATE Sessoes_Atividades SET id_cliente = ? WHERE id_sessao = ?", (marcos, ids[2]))
+        conn.execute("UPDATE Sessoes_Atividades SET descricao_servico = 'Terapia de casal' WHERE id_sessao = ?", (ids[4],))
+    _conferir_agregados(repositorio)
+
+    with repositorio.conexao() as conn:
+        conn.execute("DELETE FROM Sessoes_Atividades WHERE id_sessao IN (?, ?)", (ids[0], ids[4]))
+        # O agregado que fica sem sessões some (não sobra linha com total_sessoes = 0)
+        assert conn.execute("SELECT COUNT(*) FROM FaturamentoCliente WHERE id_cliente = ? AND status_pagamento = 'Pago'", (ana,)).fetchone()[0] == 0
+    _conferir_agregados(repositorio)
+
+    painel = nucleo.painel_de_faturamento(repositorio, meses=1200, maiores_clientes=1)
+    assert painel["total_clientes"] == 2
+    assert painel["maiores_clientes"]["Cliente"].tolist() == ["Advogado Marcos"]
+    assert painel["por_status"].set_index("status_pagamento")["valor_total"].to_dict() == {"Pago": 120.5, "Pendente": 249.25}
+
+def _conferir_carga_das_sessoes_existentes(repositorio_antigo, repositorio):
+    # Sessões gravadas antes da migração dos agregados entram nela pelo GROUP BY inicial
+    repositorio_antigo.aplicar_migracoes()
+    marcos = _cadastrar_cliente(repositorio_antigo, "Advogado Marcos")
+    nucleo.inserir_sessao(repositorio_antigo, marcos, "2026-01-10", "Consulta", 350.0, "Pago")
+    nucleo.inserir_sessao(repositorio_antigo, marcos, "2026-02-10", "Consulta", 350.0, "Pendente")
+    repositorio.aplicar_migracoes()
+    _conferir_agregados(repositorio)
+
+def test_faturamento_agregado_sqlite(pasta_temporaria):
+    _conferir_faturamento(_repositorio_crm(None))
+
+def test_faturamento_agregado_postgres(url_postgres):
+    repositorio = _repositorio_crm(url_postgres)
+    try:
+        _conferir_faturamento(repositorio)
+    finally:
+        repositorio.engine.dispose()
+
+def test_migracao_agrega_sessoes_existentes_sqlite(pasta_temporaria):
+    _conferir_carga_das_sessoes_existentes(_repositorio_crm(None, ate_migracao=1), _repositorio_crm(None))
+
+def test_migracao_agrega_sessoes_existentes_postgres(url_postgres):
+    repositorio_antigo, repositorio = _repositorio_crm(url_postgres, ate_migracao=1), _repositorio_crm(url_postgres)
+    try:
+        _conferir_carga_das_sessoes_existentes(repositorio_antigo, repositorio)
+    finally:
+        repositorio_antigo.engine.dispose()
+        repositorio.engine.dispose()
@@ -0,0 +1,84 @@
+# test_importacao_sessoes.py - importação de sessões do CRM (CSV/XLSX e extrato OFX) idempotente pela chave natural
+# A mesma sessão (cliente, data, descrição, valor) importada de novo é ignorada: o segundo envio não grava nada.
+import io
+
+import pytest
+
+import nucleo
+from conftest import carregar_app
+from repositorio_db import criar_repositorio
+
+PLANILHA = """cliente;data;descricao;valor;status
+Advogado Marcos;01/03/2026;Consulta inicial;"1.350,00";Pago
+ana.psi@email.com;2026-03-02;Terapia;150;Pendente
+Psicóloga Ana;2026-03-09;Terapia;R$ 150,00;
+Cliente Desconhecido;2026-03-09;Terapia;150;Pago
+"""
+
+EXTRATO_OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260305120000[-3:BRT]<TRNAMT>350.00<FITID>1<NAME>Advogado Marcos<MEMO>Consulta</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260306120000[-3:BRT]<TRNAMT>-89.90<FITID>2<NAME>Tarifa<MEMO>Pacote de serviços</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260310120000[-3:BRT]<TRNAMT>150,00<FITID>3<NAME>Psicóloga Ana<MEMO>Terapia</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+def _arquivo(nome, conteudo, codificacao="utf-8"):
+    """Arquivo enviado pelo st.file_uploader: bytes com .name."""
+    arquivo = io.BytesIO(conteudo.encode(codificacao))
+    arquivo.name = nome
+    return arquivo
+
+def _preparar(repositorio):
+    repositorio.aplicar_migracoes()
+    with repositorio.conexao() as conn:
+        for nome, contato in [("Advogado Marcos", "marcos.adv@email.com"), ("Psicóloga Ana", "ana.psi@email.com")]:
+            conn.execute("INSERT INTO Clientes (nome_cliente, contato_principal, data_cadastro) VALUES (?, ?, '2026-01-05')", (nome, contato))
+
+def _sessoes(repositorio):
+    with repositorio.conexao() as conn:
+        return conn.execute("""SELECT C.nome_cliente, CAST(S.data_servico AS TEXT), S.descricao_servico, S.valor_cobrado, S.status_pagamento
+                               FROM Sessoes_Atividades S JOIN Clientes C ON C.id_cliente = S.id_cliente
+                               ORDER BY S.data_servico, C.nome_cliente""").fetchall()
+
+def _conferir_importacao(repositorio):
+    _preparar(repositorio)
+
+    novas, ja_registradas, df_erros = nucleo.importar_sessoes_em_lote(repositorio, _arquivo("sessoes.csv", PLANILHA), "Pendente")
+    assert (novas, ja_registradas) == (3, 0)
+    assert df_erros[["Linha", "Erro"]].values.tolist() == [[5, "Cliente não cadastrado"]]
+    novas, ja_registradas, _ = nucleo.importar_sessoes_em_lote(repositorio, _arquivo("sessoes.csv", PLANILHA), "Pago")
+    assert (novas, ja_registradas) == (0, 3)
+
+    # Extrato em Latin-1, como os bancos costumam exportar
+    novas, ja_registradas, df_erros = nucleo.importar_sessoes_em_lote(repositorio, _arquivo("extrato.ofx", EXTRATO_OFX, "latin-1"), "Pendente")
+    assert (novas, ja_registradas, len(df_erros)) == (2, 0, 0) # O débito não é sessão
+    novas, ja_registradas, _ = nucleo.importar_sessoes_em_lote(repositorio, _arquivo("extrato.ofx", EXTRATO_OFX, "latin-1"), "Pendente")
+    assert (novas, ja_registradas) == (0, 2)
+
+    assert [tuple(linha) for linha in _sessoes(repositorio)] == [
+        ("Advogado Marcos", "2026-03-01", "Consulta inicial", 1350.0, "Pago"),
+        ("Psicóloga Ana", "2026-03-02", "Terapia", 150.0, "Pendente"),
+        ("Advogado Marcos", "2026-03-05", "Consulta", 350.0, "Pago"),
+        ("Psicóloga Ana", "2026-03-09", "Terapia", 150.0, "Pendente"), # Sem status: o padrão do primeiro envio
+        ("Psicóloga Ana", "2026-03-10", "Terapia", 150.0, "Pago"),
+    ]
+
+    # A mesma sessão lançada à mão também esbarra na chave natural
+    with repositorio.conexao() as conn:
+        id_ana = conn.execute("SELECT id_cliente FROM Clientes WHERE nome_cliente = 'Psicóloga Ana'").fetchone()[0]
+    with pytest.raises(nucleo.SessaoInvalida):
+        nucleo.inserir_sessao(repositorio, id_ana, "2026-03-02", "Terapia", 150.0, "Pago")
+    assert len(_sessoes(repositorio)) == 5
+
+def test_importacao_idempotente_sqlite(pasta_temporaria):
+    app = carregar_app("crm")
+    _conferir_importacao(criar_repositorio(None, "crm.db", app.MIGRACOES_SCHEMA, app.MIGRACOES_SCHEMA_POSTGRES))
+
+def test_importacao_idempotente_postgres(url_postgres):
+    app = carregar_app("crm")
+    repositorio = criar_repositorio(url_postgres, "nao_usado.db", app.MIGRACOES_SCHEMA, app.MIGRACOES_SCHEMA_POSTGRES)
+    try:
+        _conferir_importacao(repositorio)
+    finally:
+        repositorio.engine.dispose()
@@ -0,0 +1,88 @@
+# test_isolamento_professores.py - banco compartilhado: as escritas de um professor não alcançam os dados de outro
+# Os ids vêm da sessão do professor; um id de aluno, disciplina ou frequência de outro professor não pode ser alterado.
+import datetime
+
+import pytest
+
+import nucleo
+from conftest import carregar_app
+from repositorio_db import RepositorioSQLite, criar_repositorio
+
+def _dois_professores(repositorio, app):
+    """{usuario: (id_professor, id_aluno, id_disciplina, id_frequencia)} de demo_eb_a e demo_eb_b, cada um com uma aula."""
+    nucleo.preparar_banco_de_professores(repositorio, app.professores_demo())
+    dados = {}
+    for usuario in ("demo_eb_a", "demo_eb_b"):
+        with repositorio.conexao() as conn:
+            id_professor = conn.execute("SELECT id_professor FROM Professores WHERE usuario = ?", (usuario,)).fetchone()[0]
+        aluno_map, disciplina_map = nucleo.mapas_do_professor(repositorio, id_professor, app.TURMA_PADRAO, app.DISCIPLINAS_DEMO, app.ALUNOS_DEMO)
+        id_aluno, id_disciplina = aluno_map["Aluno A"], disciplina_map["Matemática"]
+        id_aula = nucleo.lancar_aula_e_frequencia(repositorio, app.ID_TURMA_PADRAO, id_disciplina, "2026-03-02", "Conteúdo", id_professor)
+        with repositorio.conexao() as conn:
+            id_frequencia = conn.execute("SELECT id_frequencia FROM Frequencia WHERE id_aula = ? AND id_aluno = ?", (id_aula, id_aluno)).fetchone()[0]
+        nucleo.gravar_nota(repositorio, id_aluno, id_disciplina, "B1", 9.0, app.TIPOS_AVALIACAO, id_professor)
+        dados[usuario] = (id_professor, id_aluno, id_disciplina, id_frequencia)
+    return dados
+
+def _estado(repositorio, id_aluno):
+    with repositorio.conexao() as conn:
+        return (
+            conn.execute("SELECT COUNT(*) FROM Alunos WHERE id_aluno = ?", (id_aluno,)).fetchone()[0],
+            conn.execute("SELECT presente FROM Frequencia WHERE id_aluno = ?", (id_aluno,)).fetchall(),
+            conn.execute("SELECT tipo_avaliacao, valor_nota FROM Notas WHERE id_aluno = ? ORDER BY tipo_avaliacao", (id_aluno,)).fetchall(),
+        )
+
+def _estado_da_disciplina(repositorio, id_disciplina, id_professor):
+    """(aulas, total_aulas do resumo, versão dos dados do professor) da disciplina."""
+    with repositorio.conexao() as conn:
+        return (
+            conn.execute("SELECT COUNT(*) FROM Aulas WHERE id_disciplina = ?", (id_disciplina,)).fetchone()[0],
+            conn.execute("SELECT total_aulas FROM ResumoAlunoDisciplina WHERE id_disciplina = ? ORDER BY id_aluno", (id_disciplina,)).fetchall(),
+            nucleo.versao_dos_dados(conn, id_professor),
+        )
+
+def _conferir_isolamento(repositorio, app):
+    dados = _dois_professores(repositorio, app)
+    id_professor_a, id_aluno_a, id_disciplina_a, id_frequencia_a = dados["demo_eb_a"]
+    id_professor_b, id_aluno_b, id_disciplina_b, id_frequencia_b = dados["demo_eb_b"]
+    estado_b = _estado(repositorio, id_aluno_b)
+    disciplina_b = _estado_da_disciplina(repositorio, id_disciplina_b, id_professor_b)
+
+    # O professor A mirando os ids do professor B: nada muda
+    nucleo.atualizar_presenca(repositorio, id_frequencia_b, 0, id_professor_a)
+    nucleo.gravar_presencas(repositorio, [(0, id_frequencia_b)], id_professor_a)
+    nucleo.gravar_nota(repositorio, id_aluno_b, id_disciplina_b, "B1", 1.0, app.TIPOS_AVALIACAO, id_professor_a)
+    nucleo.gravar_nota(repositorio, id_aluno_a, id_disciplina_b, "B2", 1.0, app.TIPOS_AVALIACAO, id_professor_a)
+    nucleo.remover_aluno(repositorio, id_aluno_b, id_professor_a)
+    with pytest.raises(nucleo.DisciplinaNaoEncontrada):
+        nucleo.lancar_aula_e_frequencia(repositorio, app.ID_TURMA_PADRAO, id_disciplina_b, "2026-03-04", "Conteúdo", id_professor_a)
+    assert nucleo.lancar_aulas_do_periodo(repositorio, app.ID_TURMA_PADRAO, [id_disciplina_b], datetime.date(2026, 3, 9),
+                                          datetime.date(2026, 3, 20), ["1", "3"], "Conteúdo", id_professor_a) == 0
+    with pytest.raises(nucleo.AulaNaoEncontrada):
+        nucleo.obter_chamada_da_aula(repositorio, app.ID_TURMA_PADRAO, id_disciplina_b, "2026-03-02", id_professor_a)
+    assert _estado(repositorio, id_aluno_b) == estado_b
+    assert _estado_da_disciplina(repositorio, id_disciplina_b, id_professor_b) == disciplina_b
+    assert _estado(repositorio, id_aluno_a)[2] == [("B1", 9.0)]
+
+    # Nos próprios ids, as mesmas escritas valem
+    nucleo.gravar_presencas(repositorio, [(0, id_frequencia_a)], id_professor_a)
+    nucleo.gravar_nota(repositorio, id_aluno_a, id_disciplina_a, "B1", 6.5, app.TIPOS_AVALIACAO, id_professor_a)
+    assert _estado(repositorio, id_aluno_a) == (1, [(0,)], [("B1", 6.5)])
+    assert nucleo.lancar_aulas_do_periodo(repositorio, app.ID_TURMA_PADRAO, [id_disciplina_a], datetime.date(2026, 3, 9),
+                                          datetime.date(2026, 3, 20), ["1", "3"], "Conteúdo", id_professor_a) == 4
+    df_chamada, _ = nucleo.obter_chamada_da_aula(repositorio, app.ID_TURMA_PADRAO, id_disciplina_a, "2026-03-02", id_professor_a)
+    assert id_frequencia_a in df_chamada["id_frequencia"].tolist()
+    nucleo.remover_aluno(repositorio, id_aluno_a, id_professor_a)
+    assert _estado(repositorio, id_aluno_a) == (0, [], [])
+
+def test_isolamento_sqlite(pasta_temporaria):
+    app = carregar_app("educacao_basica")
+    _conferir_isolamento(RepositorioSQLite("diario.db", app.MIGRACOES_SCHEMA), app)
+
+def test_isolamento_postgres(url_postgres):
+    app = carregar_app("educacao_basica")
+    repositorio = criar_repositorio(url_postgres, "nao_usado.db", app.MIGRACOES_SCHEMA, app.MIGRACOES_SCHEMA_POSTGRES)
+    try:
+        _conferir_isolamento(repositorio, app)
+    finally:
+        repositorio.engine.dispose()
@@ -0,0 +1,58 @@
+# test_migracoes.py - migrações publicadas de cada diário: texto congelado e schema resultante
+# O que depende das regras de avaliação (colunas nota_<tipo> e a expressão de nivel_alerta) fica em texto
+# literal no diário. Se as regras mudarem, estes testes falham: a correção é uma migração nova, não editar a antiga.
+import re
+
+import pytest
+
+import nucleo
+from conftest import carregar_app
+from regras_avaliacao import compilar_regras
+from repositorio_db import RepositorioSQLite
+
+# App -> (nome das regras, constante com as avaliações congeladas, constante com o nivel_alerta congelado)
+MIGRACOES_CONGELADAS = {
+    "raiz": ("p1_p2_recuperacao_p3", "TIPOS_AVALIACAO_MIGRACAO_003", "SQL_NIVEL_ALERTA_MIGRACAO_006"),
+    "educacao_basica": ("educacao_basica_bimestral", "TIPOS_AVALIACAO_MIGRACAO_004", "SQL_NIVEL_ALERTA_MIGRACAO_008"),
+    "faculdade": ("ensino_superior_exame_final", "TIPOS_AVALIACAO_MIGRACAO_004", "SQL_NIVEL_ALERTA_MIGRACAO_008"),
+}
+
+def _normalizar(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+def _banco_migrado(app):
+    repositorio = RepositorioSQLite("migrado.db", app.MIGRACOES_SCHEMA)
+    repositorio.aplicar_migracoes()
+    return repositorio
+
+@pytest.mark.parametrize("nome_app", sorted(MIGRACOES_CONGELADAS))
+def test_texto_congelado_igual_as_regras_vigentes(nome_app):
+    nome_regras, constante_tipos, constante_alerta = MIGRACOES_CONGELADAS[nome_app]
+    app = carregar_app(nome_app)
+    regras = compilar_regras(nome_regras)
+    assert list(getattr(app, constante_tipos)) == list(regras.tipos_avaliacao)
+    assert _normalizar(getattr(app, constante_alerta)) == _normalizar(regras.sql_nivel_alerta)
+
+@pytest.mark.parametrize("nome_app", sorted(MIGRACOES_CONGELADAS))
+def test_schema_migrado_usa_o_texto_congelado(nome_app, pasta_temporaria):
+    _, constante_tipos, constante_alerta = MIGRACOES_CONGELADAS[nome_app]
+    app = carregar_app(nome_app)
+    repositorio = _banco_migrado(app)
+    with repositorio.conexao() as conn:
+        colunas = [linha[1] for linha in conn.execute("PRAGMA table_xinfo(ResumoAlunoDisciplina)").fetchall()]
+        sql_tabela = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'ResumoAlunoDisciplina'").fetchone()[0]
+    assert [c for c in colunas if c.startswith("nota_")] == [f"nota_{tipo}" for tipo in getattr(app, constante_tipos)]
+    assert f"GENERATED ALWAYS AS ({_normalizar(getattr(app, constante_alerta))}) VIRTUAL" in _normalizar(sql_tabela)
+
+@pytest.mark.parametrize("nome_app", sorted(MIGRACOES_CONGELADAS))
+def test_regras_alteradas_sem_migracao_param_o_diario(nome_app):
+    nome_regras, constante_tipos, constante_alerta = MIGRACOES_CONGELADAS[nome_app]
+    app = carregar_app(nome_app)
+    regras = compilar_regras(nome_regras)
+    tipos, sql_nivel_alerta = getattr(app, constante_tipos), getattr(app, constante_alerta)
+    nucleo.conferir_schema_com_as_regras(regras, tipos, sql_nivel_alerta)
+    # Mesmo schema, nota mínima de alerta trocada: a coluna gerada ficaria com a regra antiga
+    with pytest.raises(nucleo.SchemaDivergeDasRegras, match="nivel_alerta"):
+        nucleo.conferir_schema_com_as_regras(regras, tipos, sql_nivel_alerta.replace(" < 4.0 *", " < 4.5 *").replace(" < 5.0 *", " < 5.5 *"))
+    with pytest.raises(nucleo.SchemaDivergeDasRegras, match="avaliações"):
+        nucleo.conferir_schema_com_as_regras(regras, tuple(tipos) + ("Extra",), sql_nivel_alerta)
@@ -0,0 +1,36 @@
+# test_partida.py - partida a frio: importar um app não pode carregar as bibliotecas pesadas
+# Cada app é importado num processo novo com python -X importtime; a tela de login não usa
+# pandas/numpy/SQLAlchemy/psycopg, que só entram na primeira função que precisa deles.
+import subprocess
+import sys
+
+import pytest
+
+from conftest import APPS, PASTA_PROJETO, RAIZ
+
+MODULOS_PESADOS = {"pandas", "numpy", "sqlalchemy", "psycopg", "psycopg2"}
+
+_SCRIPT = """
+import importlib.util, sys
+sys.path[:0] = {caminhos!r}
+spec = importlib.util.spec_from_file_location("app_partida", {arquivo!r})
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+"""
+
+def _modulos_importados(saida_importtime):
+    """Pacotes de primeiro nível que aparecem na saída de -X importtime."""
+    modulos = set()
+    for linha in saida_importtime.splitlines():
+        if linha.startswith("import time:") and linha.count("|") == 2:
+            modulos.add(linha.rsplit("|", 1)[1].strip().split(".")[0])
+    return modulos
+
+@pytest.mark.parametrize("app", sorted(APPS))
+def test_importar_o_app_nao_carrega_modulos_pesados(app, tmp_path):
+    script = _SCRIPT.format(caminhos=[PASTA_PROJETO, RAIZ], arquivo=APPS[app])
+    processo = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=tmp_path,
+                              capture_output=True, text=True, check=True)
+    importados = _modulos_importados(processo.stderr)
+    assert "streamlit" in importados # A saída foi mesmo lida
+    assert not importados & MODULOS_PESADOS, f"{app} carrega na importação: {sorted(importados & MODULOS_PESADOS)}"
+    assert not list(tmp_path.iterdir()), "importar o app não deve criar banco nem arquivo"
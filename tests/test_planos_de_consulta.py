@@ -0,0 +1,50 @@
+# test_planos_de_consulta.py - nenhum caminho quente de cada diário varre uma tabela num banco recém-migrado
+# CONSULTAS_MONITORADAS é exatamente o SQL que o app executa; os SCANs esperados já vêm declarados nela.
+import re
+
+import pytest
+
+import nucleo
+from conftest import carregar_app
+from repositorio_db import RepositorioSQLite
+
+DIARIOS = ["raiz", "educacao_basica", "faculdade"]
+
+# SQL de nucleo.py que não é dos diários no SQLite: o do CRM e as variantes do PostgreSQL
+SQL_DO_CRM = re.compile(r"Clientes|Sessoes_Atividades|Faturamento|VersaoRecebiveis")
+
+def _sql_dos_diarios():
+    """{nome da constante: SQL} de cada constante SQL_* de nucleo.py usada pelos diários no SQLite."""
+    sql_dos_diarios = {}
+    for nome, valor in vars(nucleo).items():
+        if not nome.startswith("SQL_") or "POSTGRES" in nome:
+            continue
+        comandos = [valor] if isinstance(valor, str) else list(valor)
+        for i, sql in enumerate(comandos):
+            if not SQL_DO_CRM.search(sql):
+                sql_dos_diarios[nome if isinstance(valor, str) else f"{nome}[{i}]"] = sql
+    return sql_dos_diarios
+
+def _banco_migrado(app):
+    repositorio = RepositorioSQLite("planos.db", app.MIGRACOES_SCHEMA)
+    repositorio.aplicar_migracoes()
+    return repositorio
+
+@pytest.mark.parametrize("nome_app", DIARIOS)
+def test_consultas_monitoradas_sem_scan(nome_app, pasta_temporaria):
+    app = carregar_app(nome_app)
+    with _banco_migrado(app).conexao() as conn:
+        assert app.verificar_planos_de_consulta(conn) == []
+
+def test_indice_removido_aparece_como_regressao(pasta_temporaria):
+    app = carregar_app("educacao_basica")
+    with _banco_migrado(app).conexao() as conn:
+        conn.execute("DROP INDEX idx_frequencia_aluno_aula")
+        regressoes = app.verificar_planos_de_consulta(conn)
+    assert regressoes == [("remover_frequencia_do_aluno", "SCAN Frequencia")]
+
+def test_todo_sql_dos_diarios_e_monitorado():
+    # Uma consulta nova só escapa da checagem de planos se ficar fora de consultas_monitoradas
+    monitorado = [sql for nome_app in DIARIOS for _, sql, _, _ in carregar_app(nome_app).CONSULTAS_MONITORADAS]
+    fora = [nome for nome, sql in _sql_dos_diarios().items() if not any(sql in consulta for consulta in monitorado)]
+    assert fora == []
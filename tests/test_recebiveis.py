@@ -0,0 +1,80 @@
+# test_recebiveis.py - contas a receber do CRM por faixa de atraso e versão dos recebíveis (invalidação do cache)
+# Faixas: 0–30, 31–60, 61–90 e 90+ dias entre data_servico e hoje; só sessões pendentes entram.
+import datetime
+
+import nucleo
+from conftest import carregar_app
+from repositorio_db import criar_repositorio
+
+HOJE = datetime.date(2026, 5, 20)
+# Dias em aberto -> valor (potências de 2: cada soma de faixa identifica exatamente quais sessões entraram)
+PENDENTES = {0: 1.0, 30: 2.0, 31: 4.0, 60: 8.0, 61: 16.0, 90: 32.0, 91: 64.0}
+
+def _data(dias_em_aberto):
+    return (HOJE - datetime.timedelta(days=dias_em_aberto)).strftime("%Y-%m-%d")
+
+def _versao(repositorio):
+    with repositorio.conexao() as conn:
+        return conn.execute(nucleo.SQL_VERSAO_RECEBIVEIS).fetchone()[0]
+
+def _conferir_recebiveis(repositorio):
+    repositorio.aplicar_migracoes()
+    with repositorio.conexao() as conn:
+        marcos, ana = (conn.inserir_e_obter_id("INSERT INTO Clientes (nome_cliente, contato_principal, data_cadastro) VALUES (?, NULL, '2026-01-05')",
+                                               (nome,), "id_cliente") for nome in ("Advogado Marcos", "Psicóloga Ana"))
+    for dias, valor in PENDENTES.items():
+        nucleo.inserir_sessao(repositorio, marcos, _data(dias), f"Sessão de {dias} dias", valor, "Pendente")
+    nucleo.inserir_sessao(repositorio, marcos, _data(120), "Paga", 500.0, "Pago") # Paga não é recebível
+    nucleo.inserir_sessao(repositorio, ana, _data(45), "Terapia", 100.0, "Pendente")
+
+    cache = nucleo.CacheRelatorio(4)
+    df = nucleo.envelhecimento_de_recebiveis(repositorio, cache, HOJE)
+    assert df["Cliente"].tolist() == ["Advogado Marcos", "Psicóloga Ana"] # Maior total primeiro
+    linha = df.iloc[0]
+    assert (linha["0–30 dias"], linha["31–60 dias"], linha["61–90 dias"], linha["90+ dias"]) == (1.0 + 2.0, 4.0 + 8.0, 16.0 + 32.0, 64.0)
+    assert (linha["Total Pendente"], linha["Sessões Pendentes"], linha["Maior Atraso (dias)"]) == (127.0, 7, 91)
+    assert df.iloc[1][["31–60 dias", "Total Pendente", "Maior Atraso (dias)"]].tolist() == [100.0, 100.0, 45]
+
+    # Sem escrita nos recebíveis, o relatório sai do cache; no dia seguinte, é recalculado
+    assert nucleo.envelhecimento_de_recebiveis(repositorio, cache, HOJE) is df
+    amanha = nucleo.envelhecimento_de_recebiveis(repositorio, cache, HOJE + datetime.timedelta(days=1))
+    assert amanha.iloc[0][["0–30 dias", "31–60 dias", "61–90 dias", "90+ dias"]].tolist() == [1.0, 2.0 + 4.0, 8.0 + 16.0, 32.0 + 64.0]
+
+    # A versão só sobe nas escritas que mexem numa sessão pendente (ou no nome do cliente)
+    versao = _versao(repositorio)
+    id_paga = nucleo.inserir_sessao(repositorio, ana, _data(10), "Paga", 80.0, "Pago")
+    with repositorio.conexao() as conn:
+        conn.execute("UPDATE Sessoes_Atividades SET valor_cobrado = 90.0 WHERE id_sessao = ?", (id_paga,))
+    assert _versao(repositorio) == versao
+    assert nucleo.envelhecimento_de_recebiveis(repositorio, cache, HOJE) is df
+
+    id_pendente = nucleo.inserir_sessao(repositorio, ana, _data(5), "Terapia", 150.0, "Pendente")
+    assert _versao(repositorio) == versao + 1
+    with repositorio.conexao() as conn:
+        conn.execute("UPDATE Sessoes_Atividades SET status_pagamento = 'Pendente' WHERE id_sessao = ?", (id_paga,))
+    assert _versao(repositorio) == versao + 2
+    with repositorio.conexao() as conn:
+        conn.execute("UPDATE Sessoes_Atividades SET status_pagamento = 'Pago' WHERE id_sessao = ?", (id_pendente,))
+    assert _versao(repositorio) == versao + 3
+    with repositorio.conexao() as conn:
+        conn.execute("UPDATE Clientes SET nome_cliente = 'Nutricionista Ana' WHERE id_cliente = ?", (ana,))
+    assert _versao(repositorio) == versao + 4
+    with repositorio.conexao() as conn:
+        conn.execute("DELETE FROM Sessoes_Atividades WHERE id_sessao = ?", (id_paga,))
+    assert _versao(repositorio) == versao + 5
+
+    df_novo = nucleo.envelhecimento_de_recebiveis(repositorio, cache, HOJE)
+    assert df_novo is not df
+    assert df_novo["Cliente"].tolist() == ["Advogado Marcos", "Nutricionista Ana"]
+
+def test_recebiveis_sqlite(pasta_temporaria):
+    app = carregar_app("crm")
+    _conferir_recebiveis(criar_repositorio(None, "crm.db", app.MIGRACOES_SCHEMA, app.MIGRACOES_SCHEMA_POSTGRES))
+
+def test_recebiveis_postgres(url_postgres):
+    app = carregar_app("crm")
+    repositorio = criar_repositorio(url_postgres, "nao_usado.db", app.MIGRACOES_SCHEMA, app.MIGRACOES_SCHEMA_POSTGRES)
+    try:
+        _conferir_recebiveis(repositorio)
+    finally:
+        repositorio.engine.dispose()
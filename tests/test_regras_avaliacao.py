@@ -0,0 +1,196 @@
+# test_regras_avaliacao.py - o motor declarativo contra a lógica escalar original de cada diário
+# O oráculo abaixo é o calcular_media_final (e a combinação com a frequência) de cada app como era
+# antes do relatório colunar: avaliar() e sql_ctes_situacao têm de dar o mesmo resultado, linha a linha.
+import sqlite3
+
+import pandas as pd
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from regras_avaliacao import compilar_regras
+
+CORTE_FREQUENCIA = 75
+
+# =========================================================================
+# 1. ORÁCULO: LÓGICA ESCALAR ORIGINAL
+# =========================================================================
+
+def _lancada(valor):
+    return valor is not None and not pd.isna(valor)
+
+def _media_final_raiz(avaliacoes):
+    """Diário da raiz: média de P1 e P2 (a que falta vale zero) e P3 de recuperação."""
+    p1 = float(avaliacoes["P1"]) if _lancada(avaliacoes.get("P1")) else 0.0
+    p2 = float(avaliacoes["P2"]) if _lancada(avaliacoes.get("P2")) else 0.0
+    p3 = float(avaliacoes["P3"]) if _lancada(avaliacoes.get("P3")) else None
+    media_parcial = (p1 + p2) / 2
+    nota_final = media_parcial
+    if media_parcial >= 7.0:
+        situacao_nota = "APROVADO POR MÉDIA"
+    elif media_parcial >= 4.0:
+        if p3 is None:
+            situacao_nota = "PENDENTE (AGUARDANDO P3)"
+        else:
+            nota_final = (media_parcial + p3) / 2
+            situacao_nota = "APROVADO APÓS P3" if nota_final >= 5.0 else "REPROVADO POR NOTA"
+    else:
+        situacao_nota = "REPROVADO DIRETO"
+    return nota_final, situacao_nota, media_parcial
+
+def _media_final_educacao_basica(avaliacoes):
+    """Educação Básica: média dos bimestres lançados; só conclui com os 4."""
+    notas = [float(avaliacoes[f"B{i}"]) for i in range(1, 5) if _lancada(avaliacoes.get(f"B{i}"))]
+    media_parcial = sum(notas) / len(notas) if notas else 0.0
+    if len(notas) == 4:
+        if media_parcial >= 6.0:
+            situacao_nota = "APROVADO"
+        elif media_parcial >= 5.0:
+            situacao_nota = "APROVADO (Conselho)"
+        else:
+            situacao_nota = "REPROVADO POR NOTA"
+    elif notas:
+        situacao_nota = f"PENDENTE ({len(notas)} de 4 Bimestres)"
+    else:
+        situacao_nota = "SEM NOTAS"
+    return media_parcial, situacao_nota, media_parcial
+
+def _media_final_ensino_superior(avaliacoes):
+    """Ensino Superior: média de P1-P3; entre 4 e 7, com as 3 provas, vai ao Exame Final."""
+    notas = [float(avaliacoes[f"P{i}"]) for i in range(1, 4) if _lancada(avaliacoes.get(f"P{i}"))]
+    final = avaliacoes.get("Final")
+    media_parcial = sum(notas) / 3 if len(notas) >= 3 else (sum(notas) / len(notas) if notas else 0.0)
+    nota_final = media_parcial
+    if media_parcial >= 7.0:
+        situacao_nota = "APROVADO"
+    elif media_parcial >= 4.0 and len(notas) == 3:
+        if _lancada(final):
+            nota_final = (media_parcial + float(final)) / 2
+            situacao_nota = "APROVADO (Final)" if nota_final >= 5.0 else "REPROVADO POR NOTA"
+        else:
+            situacao_nota = "PENDENTE (Exame Final)"
+    elif len(notas) < 3:
+        situacao_nota = f"PENDENTE ({len(notas)} de 3 Provas)"
+    else:
+        situacao_nota = "REPROVADO POR NOTA"
+    return nota_final, situacao_nota, media_parcial
+
+def _situacao_final_raiz(situacao_nota, reprovado_falta):
+    if reprovado_falta or situacao_nota.startswith("REPROVADO"):
+        return "REPROVADO GERAL 🔴"
+    if situacao_nota.startswith("PENDENTE"):
+        return "PENDENTE ⚠️"
+    return "APROVADO GERAL 🟢"
+
+def _situacao_final_diarios(situacao_nota, reprovado_falta):
+    if reprovado_falta:
+        return "REPROVADO GERAL 🔴"
+    if situacao_nota.startswith("APROVADO"):
+        return "APROVADO GERAL 🟢"
+    if situacao_nota.startswith("PENDENTE"):
+        return "PENDENTE ⚠️"
+    return situacao_nota
+
+# Conjunto de regras -> (média escalar, combinação com a frequência)
+ORACULOS = {
+    "p1_p2_recuperacao_p3": (_media_final_raiz, _situacao_final_raiz),
+    "educacao_basica_bimestral": (_media_final_educacao_basica, _situacao_final_diarios),
+    "ensino_superior_exame_final": (_media_final_ensino_superior, _situacao_final_diarios),
+}
+
+def oraculo(nome_regras, avaliacoes, total_presencas, total_aulas):
+    media_final, combinar = ORACULOS[nome_regras]
+    nota_final, situacao_nota, media_parcial = media_final(avaliacoes)
+    frequencia = (total_presencas / total_aulas * 100) if total_aulas > 0 else 0
+    return {
+        "nota_final": nota_final,
+        "situacao_nota": situacao_nota,
+        "media_parcial": media_parcial,
+        "situacao_final": combinar(situacao_nota, frequencia < CORTE_FREQUENCIA),
+    }
+
+# =========================================================================
+# 2. GERADORES
+# =========================================================================
+
+# Notas de corte e vizinhas aparecem mais do que o acaso sortearia
+nota = st.one_of(
+    st.none(),
+    st.sampled_from([0.0, 3.999, 4.0, 4.5, 5.0, 5.5, 6.0, 6.5, 7.0, 10.0]),
+    st.floats(min_value=0, max_value=10, allow_nan=False),
+)
+
+@st.composite
+def linhas_do_relatorio(draw, nome_regras):
+    regras = compilar_regras(nome_regras)
+    linhas = []
+    for _ in range(draw(st.integers(min_value=1, max_value=25))):
+        total_aulas = draw(st.integers(min_value=0, max_value=40))
+        linhas.append({
+            "avaliacoes": {tipo: draw(nota) for tipo in regras.tipos_avaliacao},
+            "Total_Presencas": draw(st.integers(min_value=0, max_value=total_aulas)),
+            "Total_Aulas": total_aulas,
+        })
+    return linhas
+
+def _dataframe(regras, linhas):
+    return pd.DataFrame([
+        {**{regras.colunas[tipo]: linha["avaliacoes"][tipo] for tipo in regras.tipos_avaliacao},
+         "Total_Presencas": linha["Total_Presencas"], "Total_Aulas": linha["Total_Aulas"]}
+        for linha in linhas
+    ], dtype=object)
+
+def _avaliar_no_sqlite(regras, df):
+    """nota_final e situacao_final das CTEs do relatório paginado, sobre as mesmas linhas."""
+    colunas = ", ".join(f'"{coluna}"' for coluna in df.columns)
+    marcadores = ", ".join("?" for _ in df.columns)
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute(f"CREATE TABLE Linhas_teste (ordem INTEGER, {colunas})")
+        conn.executemany(
+            f"INSERT INTO Linhas_teste VALUES (?, {marcadores})",
+            [(ordem, *(None if pd.isna(v) else v for v in linha)) for ordem, linha in enumerate(df.itertuples(index=False))],
+        )
+        return conn.execute(f"""
+            WITH Linhas AS (SELECT * FROM Linhas_teste),
+            {regras.sql_ctes_situacao}
+            SELECT nota_final, situacao_final FROM Situacoes ORDER BY ordem
+        """).fetchall()
+    finally:
+        conn.close()
+
+# =========================================================================
+# 3. EQUIVALÊNCIA
+# =========================================================================
+
+@pytest.mark.parametrize("nome_regras", sorted(ORACULOS))
+@settings(max_examples=300, deadline=None)
+@given(dados=st.data())
+def test_avaliar_e_sql_iguais_a_logica_escalar(nome_regras, dados):
+    regras = compilar_regras(nome_regras)
+    linhas = dados.draw(linhas_do_relatorio(nome_regras))
+    df = _dataframe(regras, linhas)
+    esperado = [oraculo(nome_regras, l["avaliacoes"], l["Total_Presencas"], l["Total_Aulas"]) for l in linhas]
+
+    colunar = regras.avaliar(df)
+    for i, linha in enumerate(esperado):
+        obtido = colunar.iloc[i]
+        assert obtido["situacao_nota"] == linha["situacao_nota"]
+        assert obtido["situacao_final"] == linha["situacao_final"]
+        assert obtido["media_parcial"] == pytest.approx(linha["media_parcial"])
+        assert obtido["nota_final"] == pytest.approx(linha["nota_final"])
+
+    for (nota_final, situacao_final), linha in zip(_avaliar_no_sqlite(regras, df), esperado):
+        assert situacao_final == linha["situacao_final"]
+        assert nota_final == pytest.approx(linha["nota_final"])
+
+@pytest.mark.parametrize("nome_regras", sorted(ORACULOS))
+@settings(max_examples=200, deadline=None)
+@given(dados=st.data())
+def test_calcular_media_final_igual_a_logica_escalar(nome_regras, dados):
+    regras = compilar_regras(nome_regras)
+    avaliacoes = {tipo: dados.draw(nota) for tipo in regras.tipos_avaliacao}
+    nota_final, situacao_nota, media_parcial = regras.calcular_media_final(avaliacoes)
+    esperado = oraculo(nome_regras, avaliacoes, 0, 0)
+    assert situacao_nota == esperado["situacao_nota"]
+    assert nota_final == pytest.approx(esperado["nota_final"])
+    assert media_parcial == pytest.approx(esperado["media_parcial"])
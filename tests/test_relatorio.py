@@ -0,0 +1,185 @@
+# test_relatorio.py - totais do relatório consolidado contra um oráculo e contra a consulta original (CROSS JOIN)
+# A consulta original cruzava cada nota com cada aula da disciplina: Total_Aulas e Total_Presencas saíam
+# multiplicados pelo número de avaliações lançadas e o custo crescia com aulas x avaliações.
+import pandas as pd
+import pytest
+
+import nucleo
+from conftest import carregar_app
+from repositorio_db import RepositorioSQLite, ler_dataframe
+
+TIPOS = ("P1", "P2", "P3")
+
+# Relatório do diário da raiz antes da reescrita (só para comparação)
+SQL_RELATORIO_CROSS_JOIN_ORIGINAL = """
+    SELECT A.nome AS "Aluno", D.nome_disciplina AS "Disciplina",
+        MAX(CASE WHEN N.tipo_avaliacao = 'P1' THEN N.valor_nota ELSE NULL END) AS "P1",
+        MAX(CASE WHEN N.tipo_avaliacao = 'P2' THEN N.valor_nota ELSE NULL END) AS "P2",
+        MAX(CASE WHEN N.tipo_avaliacao = 'P3' THEN N.valor_nota ELSE NULL END) AS "P3",
+        COUNT(CASE WHEN F.presente = 1 THEN 1 ELSE NULL END) AS "Total_Presencas",
+        COUNT(AU.id_aula) AS "Total_Aulas"
+    FROM Alunos A CROSS JOIN Disciplinas D
+    LEFT JOIN Notas N ON A.id_aluno = N.id_aluno AND D.id_disciplina = N.id_disciplina
+    LEFT JOIN Aulas AU ON D.id_disciplina = AU.id_disciplina
+    LEFT JOIN Frequencia F ON A.id_aluno = F.id_aluno AND AU.id_aula = F.id_aula
+    GROUP BY A.nome, D.nome_disciplina
+"""
+
+# =========================================================================
+# 1. DADOS E ORÁCULO
+# =========================================================================
+
+def _banco_do_diario(repositorio, alunos, disciplinas, aulas_por_disciplina, avaliacoes=None):
+    """Popula o diário da raiz e devolve o oráculo {(aluno, disciplina): (notas, presenças, aulas)}.
+
+    Cada par (aluno, disciplina) recebe de 0 a 3 avaliações (ou `avaliacoes`, se dado);
+    a presença segue um padrão fixo, com faltas espalhadas.
+    """
+    oraculo = {}
+    with repositorio.conexao() as conn:
+        conn.execute("INSERT INTO Turmas (id_turma, nome_turma, ano_letivo) VALUES (1, 'Turma', 2026)")
+        conn.executemany("INSERT INTO Alunos (id_aluno, nome, matricula) VALUES (?, ?, ?)",
+                         [(a, f"Aluno {a:03d}", f"M{a}") for a in range(1, alunos + 1)])
+        conn.executemany("INSERT INTO Disciplinas (id_disciplina, nome_disciplina) VALUES (?, ?)",
+                         [(d, f"Disciplina {d:02d}") for d in range(1, disciplinas + 1)])
+        aulas = [(d, (d - 1) * aulas_por_disciplina + i) for d in range(1, disciplinas + 1) for i in range(1, aulas_por_disciplina + 1)]
+        conn.executemany("INSERT INTO Aulas (id_aula, id_turma, id_disciplina, data_aula) VALUES (?, 1, ?, '2026-03-02')",
+                         [(id_aula, d) for d, id_aula in aulas])
+        presencas = [(id_aula, a, int((a * 7 + id_aula) % 4 != 0)) for d, id_aula in aulas for a in range(1, alunos + 1)]
+        conn.executemany("INSERT INTO Frequencia (id_aula, id_aluno, presente) VALUES (?, ?, ?)", presencas)
+        for a in range(1, alunos + 1):
+            for d in range(1, disciplinas + 1):
+                lancadas = TIPOS[:(a + d) % (len(TIPOS) + 1)] if avaliacoes is None else avaliacoes
+                notas = {tipo: float((a + d + i) % 11) for i, tipo in enumerate(lancadas)}
+                conn.executemany("INSERT INTO Notas (id_aluno, id_disciplina, tipo_avaliacao, valor_nota) VALUES (?, ?, ?, ?)",
+                                 [(a, d, tipo, valor) for tipo, valor in notas.items()])
+                presentes = sum(p for id_aula, aluno, p in presencas if aluno == a and (id_aula - 1) // aulas_por_disciplina + 1 == d)
+                oraculo[(f"Aluno {a:03d}", f"Disciplina {d:02d}")] = (notas, presentes, aulas_por_disciplina)
+    return oraculo
+
+def _diario_da_raiz(nome_banco):
+    app = carregar_app("raiz")
+    repositorio = RepositorioSQLite(nome_banco, app.MIGRACOES_SCHEMA)
+    repositorio.aplicar_migracoes()
+    return app, repositorio
+
+def _linhas(conn, sql):
+    cursor = conn.execute(sql)
+    colunas = [c[0] for c in cursor.description]
+    return {(linha["Aluno"], linha["Disciplina"]): linha for linha in (dict(zip(colunas, valores)) for valores in cursor)}
+
+def _conferir_com_oraculo(linhas, oraculo):
+    assert set(linhas) == set(oraculo)
+    for chave, (notas, presencas, aulas) in oraculo.items():
+        linha = linhas[chave]
+        assert (linha["Total_Presencas"], linha["Total_Aulas"]) == (presencas, aulas), chave
+        assert {tipo: linha[tipo] for tipo in TIPOS if linha[tipo] is not None} == notas, chave
+
+# =========================================================================
+# 2. TOTAIS CORRETOS
+# =========================================================================
+
+def test_relatorio_consolidado_igual_ao_oraculo(pasta_temporaria):
+    app, repositorio = _diario_da_raiz("relatorio.db")
+    oraculo = _banco_do_diario(repositorio, alunos=12, disciplinas=4, aulas_por_disciplina=9)
+    with repositorio.conexao() as conn:
+        _conferir_com_oraculo(_linhas(conn, app.SQL_RELATORIO_CONSOLIDADO), oraculo) # mantido pelos gatilhos
+        nucleo.reconstruir_resumo(conn.cursor(), TIPOS)
+        _conferir_com_oraculo(_linhas(conn, app.SQL_RELATORIO_CONSOLIDADO), oraculo) # reconstruído do zero
+
+def test_cross_join_original_multiplicava_pelas_avaliacoes(pasta_temporaria):
+    app, repositorio = _diario_da_raiz("relatorio.db")
+    oraculo = _banco_do_diario(repositorio, alunos=12, disciplinas=4, aulas_por_disciplina=9)
+    with repositorio.conexao() as conn:
+        novo = _linhas(conn, app.SQL_RELATORIO_CONSOLIDADO)
+        original = _linhas(conn, SQL_RELATORIO_CROSS_JOIN_ORIGINAL)
+    assert any(len(notas) >= 2 for notas, _, _ in oraculo.values())
+    for chave, (notas, _, _) in oraculo.items():
+        fator = max(1, len(notas))
+        # Com até uma avaliação os números batem; com mais, o original os multiplica
+        assert original[chave]["Total_Aulas"] == novo[chave]["Total_Aulas"] * fator, chave
+        assert original[chave]["Total_Presencas"] == novo[chave]["Total_Presencas"] * fator, chave
+        assert all(original[chave][tipo] == novo[chave][tipo] for tipo in TIPOS), chave
+
+# =========================================================================
+# 3. CUSTO LINEAR NAS AULAS
+# =========================================================================
+# Custo = instruções da VM do SQLite (progress handler a cada instrução): determinístico, ao contrário do tempo.
+
+def _instrucoes(conn, sql):
+    contador = [0]
+
+    def contar():
+        contador[0] += 1
+        return 0
+
+    conn.set_progress_handler(contar, 1)
+    try:
+        conn.execute(sql).fetchall()
+    finally:
+        conn.set_progress_handler(None, 1)
+    return contador[0]
+
+def _custos(aulas_por_disciplina, avaliacoes, nome_banco):
+    _, repositorio = _diario_da_raiz(nome_banco)
+    _banco_do_diario(repositorio, alunos=10, disciplinas=3, aulas_por_disciplina=aulas_por_disciplina, avaliacoes=avaliacoes)
+    sql_reconstrucao = nucleo.sql_reconstruir_resumo(TIPOS)
+    sql_agregado = sql_reconstrucao[sql_reconstrucao.index("WITH"):].rstrip().rstrip(";") # o SELECT, sem o INSERT
+    with repositorio.conexao() as conn:
+        return _instrucoes(conn, sql_agregado), _instrucoes(conn, SQL_RELATORIO_CROSS_JOIN_ORIGINAL)
+
+@pytest.mark.parametrize("avaliacoes", [TIPOS[:1], TIPOS])
+def test_custo_do_agregado_cresce_linearmente_com_as_aulas(avaliacoes, pasta_temporaria):
+    agregado_20, _ = _custos(20, avaliacoes, "aulas_20.db")
+    agregado_40, _ = _custos(40, avaliacoes, "aulas_40.db")
+    agregado_80, _ = _custos(80, avaliacoes, "aulas_80.db")
+    # Custo fixo + custo por aula: dobrar as aulas acrescentadas dobra o acréscimo de custo
+    assert 1.9 < (agregado_80 - agregado_40) / (agregado_40 - agregado_20) < 2.1
+
+def test_custo_do_agregado_nao_multiplica_pelas_avaliacoes(pasta_temporaria):
+    agregado_uma, original_uma = _custos(40, TIPOS[:1], "uma.db")
+    agregado_tres, original_tres = _custos(40, TIPOS, "tres.db")
+    assert agregado_tres / agregado_uma < 1.2
+    assert original_tres / original_uma > 2.5
+
+# =========================================================================
+# 4. RELATÓRIO PAGINADO
+# =========================================================================
+# Filtros, situação final e LIMIT/OFFSET rodam no SQL; o resultado tem de bater com as regras do pandas.
+
+def _linhas_do_df(df):
+    return sorted(map(tuple, df.astype(str).values.tolist()))
+
+def test_paginas_do_relatorio_iguais_ao_relatorio_completo(pasta_temporaria):
+    app = carregar_app("raiz")
+    app.DB_NAME = "paginado.db"
+    app.obter_repositorio.clear()
+    app.obter_cache_relatorio.clear()
+    repositorio = app.obter_repositorio()
+    repositorio.aplicar_migracoes()
+    _banco_do_diario(repositorio, alunos=12, disciplinas=4, aulas_por_disciplina=9)
+    with repositorio.conexao() as conn:
+        df_completo = app._montar_relatorio_final(ler_dataframe(conn, app.SQL_RELATORIO_CONSOLIDADO))
+    assert set(df_completo["Situação Final"]) == set(app.SITUACOES_FINAIS)
+
+    filtros = [(None, None, "")] + [(None, situacao, "") for situacao in app.SITUACOES_FINAIS] + [(2, None, ""), (None, None, "aluno 00")]
+    for id_disciplina, situacao, prefixo_nome in filtros:
+        esperado = df_completo
+        if id_disciplina is not None:
+            esperado = esperado[esperado["Disciplina"] == f"Disciplina {id_disciplina:02d}"]
+        if situacao is not None:
+            esperado = esperado[esperado["Situação Final"] == situacao]
+        if prefixo_nome:
+            esperado = esperado[esperado["Aluno"].str.upper().str.startswith(prefixo_nome.upper())]
+
+        paginas, pagina = [], 1
+        while True:
+            df_pagina, total = app.consultar_pagina_do_relatorio(id_disciplina, situacao, prefixo_nome, "Nota Final", True, pagina, 7)
+            assert total == len(esperado)
+            if df_pagina.empty:
+                break
+            assert len(df_pagina) <= 7
+            paginas.append(df_pagina)
+            pagina += 1
+        assert pagina - 1 == -(-total // 7)
+        assert _linhas_do_df(pd.concat(paginas) if paginas else esperado.head(0)) == _linhas_do_df(esperado), (id_disciplina, situacao, prefixo_nome)
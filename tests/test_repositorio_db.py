@@ -0,0 +1,171 @@
+# test_repositorio_db.py - tradução de SQL para o psycopg, escolha do backend, pool e migrações
+import sqlite3
+
+import pytest
+
+import repositorio_db
+from repositorio_db import (
+    RepositorioPostgres, RepositorioSQLite, _sql_para_postgres, _url_psycopg, criar_repositorio, ler_dataframe,
+    ler_em_lotes,
+)
+
+def _migracoes_de_teste():
+    return [
+        lambda cursor: cursor.execute("CREATE TABLE Itens (id INTEGER PRIMARY KEY, nome TEXT NOT NULL UNIQUE)"),
+        lambda cursor: cursor.execute("CREATE INDEX idx_itens_nome ON Itens(nome)"),
+    ]
+
+# =========================================================================
+# 1. SQL NO FORMATO DO PSYCOPG
+# =========================================================================
+
+@pytest.mark.parametrize("sql, esperado", [
+    ("SELECT * FROM Alunos WHERE id_aluno = ?", "SELECT * FROM Alunos WHERE id_aluno = %s"),
+    ("UPDATE Notas SET valor_nota = ? WHERE id_aluno = ? AND tipo_avaliacao = ?",
+     "UPDATE Notas SET valor_nota = %s WHERE id_aluno = %s AND tipo_avaliacao = %s"),
+    ("SELECT * FROM Alunos WHERE id_professor = :id_professor LIMIT :limite",
+     "SELECT * FROM Alunos WHERE id_professor = %(id_professor)s LIMIT %(limite)s"),
+    # % solto vira %% (o psycopg o leria como placeholder)
+    ("SELECT nota % 2 FROM Notas", "SELECT nota %% 2 FROM Notas"),
+    # Dentro de strings: ? e :nome ficam como estão; % é escapado
+    ("SELECT '?' , ':nome', 'a''?b' FROM X WHERE y = ?", "SELECT '?' , ':nome', 'a''?b' FROM X WHERE y = %s"),
+    ("SELECT * FROM Alunos WHERE nome LIKE '%silva%' AND id = ?", "SELECT * FROM Alunos WHERE nome LIKE '%%silva%%' AND id = %s"),
+    # Identificadores entre aspas e casts :: ficam intactos
+    ('SELECT "Total:Aulas", "a""?b" FROM X', 'SELECT "Total:Aulas", "a""?b" FROM X'),
+    ("SELECT :data::date, valor::numeric(10, 2) FROM X", "SELECT %(data)s::date, valor::numeric(10, 2) FROM X"),
+])
+def test_sql_para_postgres(sql, esperado):
+    assert _sql_para_postgres(sql) == esperado
+
+@pytest.mark.parametrize("url, esperado", [
+    ("postgres://u:s@host/db", "postgresql+psycopg://u:s@host/db"),
+    ("postgresql://u:s@host/db", "postgresql+psycopg://u:s@host/db"),
+    ("postgresql+psycopg2://u:s@host/db", "postgresql+psycopg://u:s@host/db"),
+])
+def test_url_psycopg(url, esperado):
+    assert _url_psycopg(url) == esperado
+
+# =========================================================================
+# 2. ESCOLHA DO BACKEND
+# =========================================================================
+
+def test_criar_repositorio_sem_url_usa_o_arquivo_padrao():
+    repositorio = criar_repositorio(None, "padrao.db", ["m"], ["pg"])
+    assert isinstance(repositorio, RepositorioSQLite)
+    assert repositorio.caminho == "padrao.db" and repositorio.migracoes == ["m"]
+
+def test_criar_repositorio_sqlite_url(tmp_path):
+    caminho = tmp_path / "outro.db"
+    repositorio = criar_repositorio(f"sqlite:///{caminho}", "padrao.db", _migracoes_de_teste(), [])
+    assert isinstance(repositorio, RepositorioSQLite)
+    assert repositorio.caminho == str(caminho)
+    assert repositorio.aplicar_migracoes() == 2
+    assert caminho.exists() and not (tmp_path / "padrao.db").exists()
+
+@pytest.mark.parametrize("url", ["postgres://u:s@localhost/db", "postgresql://u:s@localhost/db"])
+def test_criar_repositorio_postgres_monta_o_pool_sem_conectar(url):
+    pytest.importorskip("sqlalchemy")
+    pytest.importorskip("psycopg")
+    from sqlalchemy.pool import QueuePool
+
+    repositorio = criar_repositorio(url, "padrao.db", [], ["pg"])
+    assert isinstance(repositorio, RepositorioPostgres)
+    assert repositorio.migracoes == ["pg"]
+    pool = repositorio.engine.pool
+    assert isinstance(pool, QueuePool)
+    assert pool.size() == repositorio_db.PG_POOL_TAMANHO
+    assert repositorio.engine.dialect.driver == "psycopg"
+    repositorio.engine.dispose()
+
+# =========================================================================
+# 3. REPOSITÓRIO SQLITE: MIGRAÇÕES, TRANSAÇÕES E POOL
+# =========================================================================
+
+@pytest.fixture
+def repositorio(tmp_path):
+    repositorio = RepositorioSQLite(str(tmp_path / "teste.db"), _migracoes_de_teste())
+    repositorio.aplicar_migracoes()
+    return repositorio
+
+def test_migracoes_aplicadas_uma_vez(repositorio):
+    with repositorio.conexao() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    assert repositorio.aplicar_migracoes() == 2 # Nada a fazer: não recria a tabela nem o índice
+
+def test_migracao_com_erro_volta_atras_e_nao_avanca_a_versao(repositorio):
+    def quebrada(cursor):
+        cursor.execute("CREATE TABLE Parcial (id INTEGER)")
+        cursor.execute("INSERT INTO Inexistente VALUES (1)")
+    repositorio.migracoes = _migracoes_de_teste() + [quebrada]
+    with pytest.raises(sqlite3.OperationalError):
+        repositorio.aplicar_migracoes()
+    with repositorio.conexao() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'Parcial'").fetchone()[0] == 0
+
+def test_conexao_faz_commit_ou_rollback(repositorio):
+    with repositorio.conexao() as conn:
+        conn.execute("INSERT INTO Itens (nome) VALUES ('a')")
+    with pytest.raises(RuntimeError):
+        with repositorio.conexao() as conn:
+            conn.execute("INSERT INTO Itens (nome) VALUES ('b')")
+            raise RuntimeError("falha no meio da escrita")
+    with repositorio.conexao() as conn:
+        assert [linha[0] for linha in conn.execute("SELECT nome FROM Itens")] == ["a"]
+
+def test_pool_reaproveita_conexoes_configuradas(repositorio):
+    with repositorio.conexao() as primeira:
+        assert primeira.dialeto == "sqlite"
+        assert primeira.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert primeira.execute("PRAGMA busy_timeout").fetchone()[0] == repositorio_db.SQLITE_BUSY_TIMEOUT_MS
+    with repositorio.conexao() as segunda:
+        assert segunda is primeira
+        with repositorio.conexao() as simultanea: # Emprestada ao mesmo tempo: conexão nova
+            assert simultanea is not segunda
+
+def test_pool_fecha_o_que_passa_do_tamanho_maximo(repositorio, monkeypatch):
+    monkeypatch.setattr(repositorio, "_pool", type(repositorio._pool)(maxsize=1))
+    with repositorio.conexao() as a, repositorio.conexao() as b:
+        pass
+    assert repositorio._pool.qsize() == 1
+    with pytest.raises(sqlite3.ProgrammingError): # A que sobrou foi fechada
+        a.execute("SELECT 1")
+    assert b.execute("SELECT 1").fetchone() == (1,)
+
+def test_inserir_e_obter_id(repositorio):
+    with repositorio.conexao() as conn:
+        id_item = conn.inserir_e_obter_id("INSERT INTO Itens (nome) VALUES (?)", ("x",), "id")
+        assert conn.execute("SELECT nome FROM Itens WHERE id = ?", (id_item,)).fetchone() == ("x",)
+
+def test_ler_em_lotes(repositorio):
+    with repositorio.conexao() as conn:
+        conn.executemany("INSERT INTO Itens (nome) VALUES (?)", [(f"item{i:02d}",) for i in range(12)])
+        lotes = list(ler_em_lotes(conn, "SELECT nome FROM Itens ORDER BY nome", tamanho_lote=5))
+        assert [len(lote) for lote in lotes] == [5, 5, 2]
+        assert lotes[2]["nome"].tolist() == ["item10", "item11"]
+        vazio = list(ler_em_lotes(conn, "SELECT id, nome FROM Itens WHERE nome = ?", ("nenhum",)))
+        assert len(vazio) == 1 and vazio[0].empty and list(vazio[0].columns) == ["id", "nome"]
+
+# =========================================================================
+# 4. REPOSITÓRIO POSTGRESQL (banco descartável)
+# =========================================================================
+
+def test_postgres_mesma_api_do_sqlite(url_postgres):
+    repositorio = criar_repositorio(url_postgres, "nao_usado.db", [], [
+        lambda cursor: cursor.execute("CREATE TABLE Itens (id SERIAL PRIMARY KEY, nome TEXT NOT NULL UNIQUE, valor INTEGER)"),
+    ])
+    assert repositorio.aplicar_migracoes() == 1
+    assert repositorio.aplicar_migracoes() == 1
+    with repositorio.conexao() as conn:
+        assert conn.dialeto == "postgresql"
+        id_item = conn.inserir_e_obter_id("INSERT INTO Itens (nome, valor) VALUES (?, ?)", ("a%b", 7), "id")
+        conn.executemany("INSERT INTO Itens (nome, valor) VALUES (:nome, :valor)", [{"nome": f"n{i}", "valor": i} for i in range(7)])
+    with pytest.raises(repositorio_db.erros_de_integridade()):
+        with repositorio.conexao() as conn:
+            conn.execute("INSERT INTO Itens (nome, valor) VALUES ('n1', 1)")
+    with repositorio.conexao() as conn:
+        assert conn.execute("SELECT nome FROM Itens WHERE id = ? AND nome LIKE '%\\%%' ESCAPE '\\'", (id_item,)).fetchone() == ("a%b",)
+        assert ler_dataframe(conn, "SELECT COUNT(*) AS n FROM Itens WHERE valor % 2 = ?", (1,))["n"].tolist() == [4]
+        lotes = list(ler_em_lotes(conn, "SELECT valor FROM Itens ORDER BY valor", tamanho_lote=3))
+        assert [len(lote) for lote in lotes] == [3, 3, 2]
+    repositorio.engine.dispose()